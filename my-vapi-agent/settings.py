@@ -0,0 +1,123 @@
+"""
+Immutable configuration for the symptom search tool server.
+
+Settings are resolved once at startup and passed to the tool. The request
+path never reads or mutates `os.environ`; proxies are ignored by the HTTP
+session itself (`trust_env=False`). Reloading is an explicit action, wired
+to SIGHUP by the server.
+"""
+
+import logging
+import os
+import signal
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Read-only configuration for the symptom search tool."""
+
+    searchapi_api_key: Optional[str] = field(default=None, repr=False)
+    searchapi_url: str = "https://www.searchapi.io/api/v1/search"
+    amazon_domain: str = "amazon.com"
+    searchapi_timeout: float = 30.0
+    http_pool_maxsize: int = 10
+    port: int = 5000
+
+    @classmethod
+    def from_env(cls, override: bool = False) -> 'Settings':
+        """Build settings from `.env` and the current environment."""
+        load_dotenv(override=override)
+        return cls(
+            searchapi_api_key=os.getenv('SEARCHAPI_API_KEY') or None,
+            searchapi_url=os.getenv('SEARCHAPI_URL') or cls.searchapi_url,
+            amazon_domain=os.getenv('AMAZON_DOMAIN') or cls.amazon_domain,
+            searchapi_timeout=_env_float('SEARCHAPI_TIMEOUT', cls.searchapi_timeout),
+            http_pool_maxsize=_env_int('HTTP_POOL_MAXSIZE', cls.http_pool_maxsize),
+            port=_env_int('PORT', cls.port),
+        )
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_reload_callbacks: List[Callable[[Settings], None]] = []
+_reload_requested = threading.Event()
+_reloader: Optional[threading.Thread] = None
+
+
+def get_settings() -> Settings:
+    """Return the process-wide settings, resolving them on first use."""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """Re-resolve settings and notify registered callbacks."""
+    global _settings
+    # One reload at a time; _settings_lock is only held to swap the object
+    with _reload_lock:
+        new_settings = Settings.from_env(override=True)
+        with _settings_lock:
+            _settings = new_settings
+            callbacks = list(_reload_callbacks)
+        for callback in callbacks:
+            callback(new_settings)
+    return new_settings
+
+
+def on_reload(callback: Callable[[Settings], None]) -> None:
+    """Register a callback that runs after every reload_settings()."""
+    with _settings_lock:
+        _reload_callbacks.append(callback)
+
+
+def install_reload_signal_handler(signum: int = getattr(signal, 'SIGHUP', 0)) -> bool:
+    """
+    Reload settings on `signum` (SIGHUP by default). Main thread only.
+
+    The handler only sets an event; a background thread does the reload, so a
+    signal that arrives while the main thread holds a settings lock cannot deadlock.
+    """
+    global _reloader
+    if not signum or threading.current_thread() is not threading.main_thread():
+        return False
+    with _settings_lock:
+        if _reloader is None:
+            _reloader = threading.Thread(target=_reload_when_requested, name='settings-reloader', daemon=True)
+            _reloader.start()
+    signal.signal(signum, lambda _signum, _frame: _reload_requested.set())
+    return True
+
+
+def _reload_when_requested() -> None:
+    while True:
+        _reload_requested.wait()
+        _reload_requested.clear()
+        try:
+            reload_settings()
+        except Exception:
+            # Keep serving the old settings and keep listening for the next signal
+            logging.getLogger(__name__).exception("Settings reload failed")
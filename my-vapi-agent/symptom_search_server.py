@@ -1,11 +1,11 @@
 from flask import Flask, request, jsonify
 from symptom_search_tool import search_products_for_symptoms
-import os
-from dotenv import load_dotenv
+from settings import get_settings, install_reload_signal_handler, on_reload
 import logging
 
-# Load environment variables
-load_dotenv()
+# Resolve configuration once at startup; SIGHUP reloads it explicitly
+settings = get_settings()
+install_reload_signal_handler()
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -13,21 +13,12 @@ logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-def clear_proxy_settings():
-    """
-    Clear any proxy-related environment variables that might be causing issues.
-    This function ensures that the symptom search tool works correctly without proxy interference.
-    """
-    proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'NO_PROXY', 'http_proxy', 'https_proxy', 'no_proxy']
-    for var in proxy_vars:
-        if var in os.environ:
-            del os.environ[var]
-    
-    # Clear any Vapi-related environment variables that might be causing issues
-    vapi_vars = ['VAPI_INSTALL', 'VAPI_CONFIG', 'VAPI_ENV']
-    for var in vapi_vars:
-        if var in os.environ:
-            del os.environ[var]
+def _apply_reloaded_settings(new_settings):
+    global settings
+    settings = new_settings
+    logger.info("Settings reloaded")
+
+on_reload(_apply_reloaded_settings)
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -45,9 +36,6 @@ def search_symptoms():
     }
     """
     try:
-        # Clear proxy settings before processing
-        clear_proxy_settings()
-        
         # Get JSON data from request
         data = request.get_json()
         
@@ -71,7 +59,7 @@ def search_symptoms():
         logger.info(f"Searching for products based on symptoms: {symptoms}")
         
         # Call the symptom search tool
-        results = search_products_for_symptoms(symptoms, max_results)
+        results = search_products_for_symptoms(symptoms, max_results, settings)
         
         logger.info(f"Search completed. Found {len(results.get('results', []))} results")
         
@@ -91,9 +79,6 @@ def webhook():
     This endpoint handles the Vapi function calling format.
     """
     try:
-        # Clear proxy settings before processing
-        clear_proxy_settings()
-        
         data = request.get_json()
         logger.info(f"Received webhook request: {data}")
         
@@ -127,7 +112,7 @@ def webhook():
             logger.info(f"Processing function call: {function_name} with symptoms: {symptoms}")
             
             # Call the symptom search tool
-            results = search_products_for_symptoms(symptoms, max_results)
+            results = search_products_for_symptoms(symptoms, max_results, settings)
             
             return jsonify(results)
         else:
@@ -158,17 +143,14 @@ def index():
     })
 
 if __name__ == '__main__':
-    # Get port from environment variable or default to 5000
-    port = int(os.environ.get('PORT', 5000))
+    # Get port from settings (PORT environment variable, default 5000)
+    port = settings.port
     
     # Check if SearchAPI key is configured
-    if not os.getenv('SEARCHAPI_API_KEY'):
+    if not settings.searchapi_api_key:
         logger.error("SEARCHAPI_API_KEY not found in environment variables")
         logger.error("Please add SEARCHAPI_API_KEY to your .env file")
         exit(1)
     
-    # Clear proxy settings before starting the server
-    clear_proxy_settings()
-    
     logger.info(f"Starting Symptom Search Tool server on port {port}")
     app.run(host='0.0.0.0', port=port, debug=True)
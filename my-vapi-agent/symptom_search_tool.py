@@ -1,11 +1,31 @@
-import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
+from settings import Settings, get_settings
 
-# Load environment variables
-load_dotenv()
+_sessions: Dict[Settings, requests.Session] = {}
+
+def get_session(settings: Settings) -> requests.Session:
+    """
+    Return the pooled SearchAPI session for these settings, creating it on first use.
+    The session ignores proxy environment variables instead of deleting them.
+    
+    Args:
+        settings (Settings): Tool settings
+        
+    Returns:
+        requests.Session: Configured session
+    """
+    session = _sessions.get(settings)
+    if session is None:
+        session = requests.Session()
+        session.trust_env = False  # Don't use environment proxy settings
+        adapter = HTTPAdapter(pool_maxsize=settings.http_pool_maxsize)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session = _sessions.setdefault(settings, session)
+    return session
 
 class SymptomSearchTool:
     """
@@ -13,18 +33,16 @@ class SymptomSearchTool:
     Uses the Amazon Search API to find relevant health and wellness products.
     """
     
-    def __init__(self):
-        self.api_key = os.getenv('SEARCHAPI_API_KEY')
-        self.base_url = "https://www.searchapi.io/api/v1/search"
+    def __init__(self, settings: Optional[Settings] = None, session: Optional[requests.Session] = None):
+        self.settings = settings or get_settings()
+        self.api_key = self.settings.searchapi_api_key
+        self.base_url = self.settings.searchapi_url
         
         if not self.api_key:
             raise ValueError("SEARCHAPI_API_KEY not found in environment variables")
         
-        # Create a clean session without proxies to avoid issues
-        self.session = requests.Session()
-        # Clear any proxy settings that might be causing issues
-        self.session.proxies = {}
-        self.session.trust_env = False  # Don't use environment proxy settings
+        # Reuse a pooled session that ignores environment proxy settings
+        self.session = session or get_session(self.settings)
     
     def search_products_by_symptoms(self, symptoms: str, max_results: int = 5) -> Dict:
         """
@@ -46,12 +64,12 @@ class SymptomSearchTool:
                 "engine": "amazon_search",
                 "q": search_query,
                 "api_key": self.api_key,
-                "amazon_domain": "amazon.com",
+                "amazon_domain": self.settings.amazon_domain,
                 "sort_by": "featured"  # Default sort order
             }
             
             # Make API request using the clean session
-            response = self.session.get(self.base_url, params=params, timeout=30)
+            response = self.session.get(self.base_url, params=params, timeout=self.settings.searchapi_timeout)
             response.raise_for_status()
             
             # Parse response
@@ -256,19 +274,20 @@ class SymptomSearchTool:
         return description
 
 # Function to be called by Vapi
-def search_products_for_symptoms(symptoms: str, max_results: int = 5) -> Dict:
+def search_products_for_symptoms(symptoms: str, max_results: int = 5, settings: Optional[Settings] = None) -> Dict:
     """
     Main function to be called by Vapi when user reports symptoms.
     
     Args:
         symptoms (str): User's symptoms or health concerns
         max_results (int): Maximum number of results to return
+        settings (Settings): Tool settings (defaults to the process-wide settings)
         
     Returns:
         Dict: Search results with product recommendations
     """
     try:
-        tool = SymptomSearchTool()
+        tool = SymptomSearchTool(settings)
         results = tool.search_products_by_symptoms(symptoms, max_results)
         
         if results["status"] == "success":
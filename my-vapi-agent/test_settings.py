@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the tool server's settings, reloads and pooled SearchAPI session.
+These tests run offline and do not require API keys.
+"""
+
+import os
+import signal
+import threading
+import time
+
+import settings as settings_module
+from settings import Settings, get_settings, on_reload, reload_settings
+from symptom_search_tool import SymptomSearchTool, get_session
+
+
+def _with_env(values, action):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        return action()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_from_env_and_pooled_session_ignore_proxy_variables():
+    """Settings are typed once; the shared session never reads proxy variables and environ is untouched."""
+    environment = {'SEARCHAPI_TIMEOUT': '9', 'HTTP_POOL_MAXSIZE': 'lots', 'HTTPS_PROXY': 'http://proxy.invalid:1'}
+
+    def build():
+        loaded = Settings.from_env()
+        session = get_session(loaded)
+        SymptomSearchTool(Settings(searchapi_api_key='test'))
+        assert os.environ['HTTPS_PROXY'] == 'http://proxy.invalid:1'
+        return loaded, session
+
+    loaded, session = _with_env(environment, build)
+    assert loaded.searchapi_timeout == 9.0
+    assert loaded.http_pool_maxsize == Settings.http_pool_maxsize
+    assert session.trust_env is False
+    assert get_session(loaded) is session
+
+
+def test_reload_swaps_settings_and_runs_callbacks():
+    """reload_settings() replaces get_settings() and passes the new object to callbacks."""
+    seen = []
+    on_reload(seen.append)
+    try:
+        reloaded = _with_env({'PORT': '5055'}, reload_settings)
+    finally:
+        settings_module._reload_callbacks.remove(seen.append)
+    assert get_settings() is reloaded
+    assert reloaded.port == 5055
+    assert seen == [reloaded]
+
+
+def test_signal_reload_runs_outside_the_handler():
+    """A SIGHUP that arrives while the main thread holds the settings lock must not deadlock."""
+    if not hasattr(signal, 'SIGHUP'):
+        return
+    previous = signal.getsignal(signal.SIGHUP)
+    done = threading.Event()
+
+    def callback(_settings):
+        done.set()
+
+    on_reload(callback)
+    try:
+        assert settings_module.install_reload_signal_handler()
+        with settings_module._settings_lock:
+            os.kill(os.getpid(), signal.SIGHUP)
+            time.sleep(0.05)
+            assert not done.is_set()
+        assert done.wait(5)
+    finally:
+        signal.signal(signal.SIGHUP, previous)
+        settings_module._reload_callbacks.remove(callback)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing settings")
+    print("=" * 50)
+    for test in [test_from_env_and_pooled_session_ignore_proxy_variables,
+                 test_reload_swaps_settings_and_runs_callbacks, test_signal_reload_runs_outside_the_handler]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All settings tests passed!")
@@ -0,0 +1,101 @@
+"""
+Admission control for pipeline requests.
+
+Each process runs at most `max_in_flight` pipelines at once. Up to
+`max_queue` further requests wait, each for at most `max_wait_seconds`.
+Anything beyond that is shed immediately. Callers answer shed requests
+with a cheap degraded response rather than queueing work whose caller
+will have hung up by the time it finishes.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import metrics
+
+
+class AdmissionController:
+    """
+    Bounded concurrency with a short, bounded wait queue.
+
+    Args:
+        max_in_flight (int): Pipelines allowed to run at once
+        max_queue (int): Requests allowed to wait for a slot
+        max_wait_seconds (float): Longest a request waits before it is shed
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int, max_wait_seconds: float):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self.max_wait_seconds = max_wait_seconds
+        self._condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+
+    def try_acquire(self) -> Optional[str]:
+        """
+        Take a pipeline slot, waiting briefly if all are busy.
+
+        Returns:
+            Optional[str]: None when admitted (call release() afterwards),
+            otherwise why the request was shed ('queue_full' or 'timeout')
+        """
+        start = time.monotonic()
+        with self._condition:
+            if self.in_flight < self.max_in_flight and not self.waiting:
+                self._admit(start)
+                return None
+            if self.waiting >= self.max_queue:
+                return self._shed('queue_full')
+            self.waiting += 1
+            metrics.set_gauge('admission_queue_depth', self.waiting)
+            try:
+                deadline = start + self.max_wait_seconds
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return self._shed('timeout')
+                    self._condition.wait(remaining)
+                self._admit(start)
+                return None
+            finally:
+                self.waiting -= 1
+                metrics.set_gauge('admission_queue_depth', self.waiting)
+
+    def release(self) -> None:
+        """Give back a slot taken by try_acquire()."""
+        with self._condition:
+            self.in_flight -= 1
+            metrics.set_gauge('admission_in_flight', self.in_flight)
+            self._condition.notify()
+
+    @contextmanager
+    def admit(self) -> Iterator[Optional[str]]:
+        """
+        Context manager around try_acquire()/release().
+
+        Example:
+            with controller.admit() as shed_reason:
+                if shed_reason:
+                    return degraded_response()
+                return full_response()
+        """
+        shed_reason = self.try_acquire()
+        try:
+            yield shed_reason
+        finally:
+            if shed_reason is None:
+                self.release()
+
+    def _admit(self, start: float) -> None:
+        self.in_flight += 1
+        metrics.set_gauge('admission_in_flight', self.in_flight)
+        metrics.observe('admission_wait_ms', (time.monotonic() - start) * 1000)
+        metrics.inc('admission_total', outcome='admitted')
+
+    def _shed(self, reason: str) -> str:
+        metrics.inc('admission_total', outcome='shed')
+        metrics.inc('admission_shed_total', reason=reason)
+        return reason
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Benchmark: per-result dicts vs compact ProductRecords.
+
+Decodes a SearchAPI-shaped JSON payload of N results and processes it both
+ways (the old nine-key dict per result and the `__slots__` record), then
+drops the raw payload, as the services do. Reports the memory and number of
+live allocations still held by the processed results, and processing time
+(measured under tracemalloc, so slower than normal).
+
+Usage:
+    python benchmark_product_records.py [--count 20000]
+"""
+
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from product_record import ProductRecord
+
+BRANDS = ["Advil", "Tylenol", "Motrin", "Aleve", "Equate", "Amazon Basic Care", "Mucinex", "Zyrtec"]
+
+
+def raw_results(count: int) -> List[Dict]:
+    """Synthetic SearchAPI organic results (brands repeat, as in real responses)."""
+    return [
+        {
+            "title": f"{BRANDS[i % len(BRANDS)]} Pain Reliever Tablets, {i % 300 + 20} Count",
+            "brand": BRANDS[i % len(BRANDS)],
+            "price": f"${i % 40 + 3}.{i % 100:02d}",
+            "rating": 3.5 + (i % 15) / 10,
+            "reviews": 100 + i * 7,
+            "link": f"https://www.amazon.com/dp/B{i:09d}",
+            "thumbnail": f"https://m.media-amazon.com/images/I/{i:011d}.jpg",
+            "is_prime": i % 3 != 0,
+        }
+        for i in range(count)
+    ]
+
+
+def build_dicts(raw: List[Dict]) -> List[Dict]:
+    return [
+        {
+            "title": result.get("title", ""),
+            "brand": result.get("brand", ""),
+            "price": result.get("price", "Price not available"),
+            "rating": result.get("rating", 0),
+            "reviews": result.get("reviews", 0),
+            "link": result.get("link", ""),
+            "thumbnail": result.get("thumbnail", ""),
+            "is_prime": result.get("is_prime", False),
+            "medicine_name": "ibuprofen",
+        }
+        for result in raw
+    ]
+
+
+def build_records(raw: List[Dict]) -> List[ProductRecord]:
+    return [ProductRecord.from_search_result(result, "ibuprofen") for result in raw]
+
+
+def measure(build: Callable[[List[Dict]], List], payload: str) -> Dict:
+    """Decode and process the payload; retained memory counts only what outlives the raw results."""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    built = build(json.loads(payload))
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    snapshot = tracemalloc.take_snapshot()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocations = sum(stat.count for stat in snapshot.statistics('filename'))
+    del built
+    return {"retained_bytes": current, "peak_bytes": peak, "allocations": allocations, "seconds": elapsed}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compare memory of dict results vs ProductRecords")
+    parser.add_argument("--count", type=int, default=20000, help="Number of results to build")
+    args = parser.parse_args()
+
+    payload = json.dumps(raw_results(args.count))
+    rows = [("dict", measure(build_dicts, payload)), ("ProductRecord", measure(build_records, payload))]
+
+    print(f"📊 {args.count} results")
+    print(f"{'':15}{'retained':>14}{'per result':>12}{'live blocks':>14}{'build ms':>10}")
+    for name, row in rows:
+        print(f"{name:15}{row['retained_bytes'] / 1024:>11.0f} KB{row['retained_bytes'] / args.count:>10.0f} B"
+              f"{row['allocations']:>14}{row['seconds'] * 1000:>10.1f}")
+    dicts, records = rows[0][1], rows[1][1]
+    print(f"✅ Records retain {100 * (1 - records['retained_bytes'] / dicts['retained_bytes']):.0f}% less memory")
+
+
+if __name__ == "__main__":
+    main()
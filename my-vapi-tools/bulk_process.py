@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Resumable bulk processing of conversations from a JSONL file.
+
+Streams conversations from the input file, runs process_symptom_conversation
+on a bounded worker pool, appends each result to the output JSONL as soon as
+it finishes, and checkpoints progress so an interrupted run resumes where it
+stopped. Prints a throughput and latency summary at the end.
+
+Usage:
+    python bulk_process.py calls.jsonl results.jsonl --workers 8
+    python bulk_process.py calls.jsonl results.jsonl --workers 8   # resumes after an interruption
+
+Each input line is a JSON object with a conversation field (default
+"conversation") and an optional id field (default "id"). Each output line
+has the input line number, the record id, the latency and the pipeline result.
+
+Records whose pipeline result is an error count as done, so a plain resume
+does not retry them. Pass --retry-errors to process them again: the new
+result is appended, and the last output line for an input line wins.
+Invalid input lines (bad JSON, missing conversation) are never retried.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from settings import get_settings
+from structured_logging import setup_logging
+from symptom_search_pipeline import process_symptom_conversation
+
+
+class Checkpoint:
+    """
+    Tracks completed input lines.
+
+    Stores a watermark (every line at or below it is done) plus the sparse
+    set of completed lines above it, which stays small because at most
+    `workers * 2` records are in flight at any time. Lines whose pipeline
+    result was an error are also kept in `failed`; lines in `retrying` are
+    reported as not done so they run again.
+    """
+
+    def __init__(self, path: str, input_path: str):
+        self.path = path
+        self.input_path = input_path
+        self.watermark = 0
+        self.done_above: Set[int] = set()
+        self.failed: Set[int] = set()
+        self.retrying: Set[int] = set()
+
+    @classmethod
+    def load(cls, path: str, input_path: str) -> 'Checkpoint':
+        checkpoint = cls(path, input_path)
+        if os.path.exists(path):
+            with open(path) as f:
+                data = json.load(f)
+            if data.get('input') not in (None, os.path.abspath(input_path)):
+                raise ValueError(f"Checkpoint {path} belongs to a different input file: {data.get('input')}")
+            checkpoint.watermark = data.get('watermark', 0)
+            checkpoint.done_above = set(data.get('done_above', []))
+            checkpoint.failed = set(data.get('failed', []))
+        return checkpoint
+
+    def is_done(self, line_number: int) -> bool:
+        if line_number in self.retrying:
+            return False
+        return line_number <= self.watermark or line_number in self.done_above
+
+    def mark_done(self, line_number: int, failed: bool = False) -> None:
+        self.retrying.discard(line_number)
+        if failed:
+            self.failed.add(line_number)
+        else:
+            self.failed.discard(line_number)
+        if line_number <= self.watermark:
+            return
+        self.done_above.add(line_number)
+        while self.watermark + 1 in self.done_above:
+            self.watermark += 1
+            self.done_above.discard(self.watermark)
+
+    def save(self) -> None:
+        """Atomically write the checkpoint (write to a temp file, then rename)."""
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({
+                'input': os.path.abspath(self.input_path),
+                'watermark': self.watermark,
+                'done_above': sorted(self.done_above),
+                'failed': sorted(self.failed),
+                'updated_at': time.time(),
+            }, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+def recover_output(output_path: str, checkpoint: Checkpoint) -> None:
+    """
+    Reconcile the output file with the checkpoint before resuming.
+
+    Drops a partially written last line and marks any records that reached
+    the output after the last checkpoint save as done, so they are not
+    processed (and written) twice. Their pipeline errors are recorded too;
+    a later line for the same input line replaces an earlier one.
+    """
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, 'rb+') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        if size and _last_byte(f, size) != b'\n':
+            # Truncate to the last complete line
+            position = size - 1
+            while position > 0 and _last_byte(f, position) != b'\n':
+                position -= 1
+            f.truncate(position)
+    with open(output_path) as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                line_number = record['input_line']
+                failed = not record.get('invalid') and record['result'].get('status') != 'success'
+            except (ValueError, KeyError, TypeError, AttributeError):
+                continue
+            if not checkpoint.is_done(line_number) or (line_number in checkpoint.failed and not failed):
+                checkpoint.mark_done(line_number, failed)
+
+
+def _last_byte(f, end: int) -> bytes:
+    f.seek(end - 1)
+    return f.read(1)
+
+
+def iter_pending(input_path: str, checkpoint: Checkpoint, field: str, id_field: str) -> Iterator[Tuple[int, Optional[str], Optional[str], Optional[str]]]:
+    """
+    Stream (line number, id, conversation, error) for input lines not yet processed.
+
+    Args:
+        input_path (str): Input JSONL path
+        checkpoint (Checkpoint): Progress so far
+        field (str): Name of the conversation field
+        id_field (str): Name of the record id field
+
+    Yields:
+        Tuple: Line number, record id, conversation text and a parse error (if any)
+    """
+    with open(input_path) as f:
+        for line_number, line in enumerate(f, 1):
+            if checkpoint.is_done(line_number):
+                continue
+            if not line.strip():
+                checkpoint.mark_done(line_number)
+                continue
+            try:
+                record = json.loads(line)
+                conversation = record.get(field)
+                record_id = record.get(id_field)
+            except (ValueError, AttributeError) as e:
+                yield line_number, None, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(conversation, str) or not conversation:
+                yield line_number, record_id, None, f"Missing '{field}' field"
+                continue
+            yield line_number, record_id, conversation, None
+
+
+def _process_one(conversation: str, max_results: int, settings) -> Tuple[Dict, float]:
+    start = time.perf_counter()
+    result = process_symptom_conversation(conversation, max_results, settings)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run(input_path: str, output_path: str, checkpoint_path: Optional[str] = None, workers: int = 4,
+        max_results: int = 5, field: str = 'conversation', id_field: str = 'id',
+        checkpoint_every: int = 50, retry_errors: bool = False) -> Dict:
+    """
+    Process all pending records of `input_path` and append results to `output_path`.
+
+    Args:
+        input_path (str): Input JSONL path
+        output_path (str): Output JSONL path (appended to)
+        checkpoint_path (str): Checkpoint path (defaults to `<output>.checkpoint`)
+        workers (int): Number of concurrent pipelines
+        max_results (int): Maximum results per medicine
+        field (str): Name of the conversation field
+        id_field (str): Name of the record id field
+        checkpoint_every (int): Save the checkpoint after this many completed records
+        retry_errors (bool): Process records whose earlier pipeline result was an error again
+
+    Returns:
+        Dict: Run summary (counts, throughput and latency percentiles)
+    """
+    settings = get_settings()
+    checkpoint = Checkpoint.load(checkpoint_path or output_path + '.checkpoint', input_path)
+    recover_output(output_path, checkpoint)
+    if retry_errors:
+        checkpoint.retrying = set(checkpoint.failed)
+
+    latencies: List[float] = []
+    counts = {'processed': 0, 'success': 0, 'error': 0, 'invalid': 0}
+    start = time.perf_counter()
+    max_in_flight = max(1, workers) * 2
+
+    with open(output_path, 'a') as out, ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        in_flight: Dict = {}
+
+        def write(line_number: int, record_id, payload: Dict, failed: bool = False) -> None:
+            out.write(json.dumps(dict(payload, input_line=line_number, id=record_id)) + '\n')
+            checkpoint.mark_done(line_number, failed)
+            counts['processed'] += 1
+            if counts['processed'] % checkpoint_every == 0:
+                out.flush()
+                os.fsync(out.fileno())
+                checkpoint.save()
+
+        def drain(block_until_below: int) -> None:
+            while len(in_flight) >= block_until_below and in_flight:
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    line_number, record_id = in_flight.pop(future)
+                    try:
+                        result, latency_ms = future.result()
+                    except Exception as e:
+                        result, latency_ms = {"status": "error", "message": str(e)}, 0.0
+                    latencies.append(latency_ms)
+                    succeeded = result.get('status') == 'success'
+                    counts['success' if succeeded else 'error'] += 1
+                    write(line_number, record_id, {'latency_ms': round(latency_ms, 1), 'result': result},
+                          failed=not succeeded)
+
+        try:
+            for line_number, record_id, conversation, error in iter_pending(input_path, checkpoint, field, id_field):
+                if error:
+                    counts['invalid'] += 1
+                    write(line_number, record_id, {'latency_ms': 0.0, 'invalid': True,
+                                                   'result': {"status": "error", "message": error}})
+                    continue
+                drain(max_in_flight)
+                future = executor.submit(_process_one, conversation, max_results, settings)
+                in_flight[future] = (line_number, record_id)
+            drain(1)
+        finally:
+            out.flush()
+            os.fsync(out.fileno())
+            checkpoint.save()
+
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'processed': counts['processed'],
+        'success': counts['success'],
+        'error': counts['error'],
+        'invalid': counts['invalid'],
+        'elapsed_seconds': round(elapsed, 2),
+        'throughput_per_second': round(counts['processed'] / elapsed, 2) if elapsed > 0 else 0.0,
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 0.50), 1),
+            'p95': round(_percentile(latencies, 0.95), 1),
+            'p99': round(_percentile(latencies, 0.99), 1),
+            'max': round(latencies[-1], 1) if latencies else 0.0,
+        },
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Process conversations from a JSONL file through the symptom search pipeline.")
+    parser.add_argument('input', help="Input JSONL file (one conversation record per line)")
+    parser.add_argument('output', help="Output JSONL file (results are appended)")
+    parser.add_argument('--checkpoint', help="Checkpoint file (default: <output>.checkpoint)")
+    parser.add_argument('--workers', type=int, default=4, help="Concurrent pipelines (default: 4)")
+    parser.add_argument('--max-results', type=int, default=5, help="Maximum results per medicine (default: 5)")
+    parser.add_argument('--field', default='conversation', help="Conversation field name (default: conversation)")
+    parser.add_argument('--id-field', default='id', help="Record id field name (default: id)")
+    parser.add_argument('--checkpoint-every', type=int, default=50, help="Records between checkpoint saves (default: 50)")
+    parser.add_argument('--retry-errors', action='store_true',
+                        help="Process records whose earlier pipeline result was an error again")
+    args = parser.parse_args(argv)
+    setup_logging(get_settings().log)
+
+    try:
+        summary = run(args.input, args.output, args.checkpoint, args.workers, args.max_results,
+                      args.field, args.id_field, args.checkpoint_every, args.retry_errors)
+    except KeyboardInterrupt:
+        print("\n⏸️  Interrupted. Progress was checkpointed; re-run the same command to resume.", file=sys.stderr)
+        return 130
+
+    print("\n📊 Bulk processing summary")
+    print("=" * 40)
+    print(f"Processed: {summary['processed']} (success {summary['success']}, error {summary['error']}, invalid {summary['invalid']})")
+    print(f"Elapsed: {summary['elapsed_seconds']}s  Throughput: {summary['throughput_per_second']} records/s")
+    latency = summary['latency_ms']
+    print(f"Latency ms: p50 {latency['p50']}  p95 {latency['p95']}  p99 {latency['p99']}  max {latency['max']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
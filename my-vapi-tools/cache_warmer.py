@@ -0,0 +1,264 @@
+"""
+Popularity-driven background warmer for the product catalog.
+
+Seeds from the medicines in the pipeline's fallback mapping and the queries
+in the tool's symptom mapping, then learns from observed query frequency.
+Periodically refreshes the hottest queries before their catalog entries
+expire, without exceeding a SearchAPI quota budget.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+import metrics
+from product_catalog import get_catalog, query_key
+from rate_limit import RateLimited, SQLiteTokenBucket
+from settings import Settings
+from structured_logging import get_logger, log_event
+
+logger = get_logger(__name__)
+
+
+class PopularityTracker:
+    """
+    Exponentially decayed query frequency.
+
+    Each observation adds 1 to a query's score; scores halve every
+    `half_life_seconds`, so recently popular queries rank first.
+    """
+
+    def __init__(self, half_life_seconds: float = 3600.0, max_entries: int = 5000):
+        self.decay_rate = math.log(2) / half_life_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._scores: Dict[str, float] = {}
+        self._updated: Dict[str, float] = {}
+        self._queries: Dict[str, str] = {}
+
+    def record(self, query: str, weight: float = 1.0, now: Optional[float] = None) -> None:
+        now = now or time.time()
+        key = query_key(query)
+        with self._lock:
+            self._scores[key] = self._decayed(key, now) + weight
+            self._updated[key] = now
+            self._queries.setdefault(key, query)
+            if len(self._scores) > self.max_entries:
+                self._evict(now)
+
+    def top(self, count: int, now: Optional[float] = None) -> List[str]:
+        """Most popular queries first."""
+        now = now or time.time()
+        with self._lock:
+            ranked = sorted(self._scores, key=lambda key: self._decayed(key, now), reverse=True)
+            return [self._queries[key] for key in ranked[:count]]
+
+    def score(self, query: str, now: Optional[float] = None) -> float:
+        with self._lock:
+            return self._decayed(query_key(query), now or time.time())
+
+    def _decayed(self, key: str, now: float) -> float:
+        score = self._scores.get(key, 0.0)
+        if not score:
+            return 0.0
+        return score * math.exp(-self.decay_rate * (now - self._updated[key]))
+
+    def _evict(self, now: float) -> None:
+        # Drop the coldest 10% in one pass
+        ranked = sorted(self._scores, key=lambda key: self._decayed(key, now))
+        for key in ranked[:max(1, len(ranked) // 10)]:
+            del self._scores[key], self._updated[key], self._queries[key]
+
+
+class QuotaBudget:
+    """
+    SearchAPI calls the warmer may spend per hour.
+
+    In-process it is a sliding one-hour window. With `path` set the budget is
+    a token bucket in that SQLite file (see rate_limit.SQLiteTokenBucket),
+    shared by every worker on the host: it holds `calls_per_hour` calls and
+    refills at `calls_per_hour` per hour.
+
+    Args:
+        calls_per_hour (int): Calls allowed per hour
+        path (str): SQLite file shared by the workers (empty for per-process)
+    """
+
+    def __init__(self, calls_per_hour: int, path: str = ""):
+        self.calls_per_hour = calls_per_hour
+        self._calls: Deque[float] = deque()
+        self._lock = threading.Lock()
+        self._shared: Optional[SQLiteTokenBucket] = None
+        if path and calls_per_hour > 0:
+            self._shared = SQLiteTokenBucket(path, 'cache_warmer', calls_per_hour / 3600.0, calls_per_hour)
+
+    def try_spend(self, now: Optional[float] = None) -> bool:
+        if self._shared is not None:
+            try:
+                self._shared.reserve(1, max_wait=0)
+                return True
+            except RateLimited:
+                return False
+        now = now or time.time()
+        with self._lock:
+            while self._calls and now - self._calls[0] > 3600:
+                self._calls.popleft()
+            if len(self._calls) >= self.calls_per_hour:
+                return False
+            self._calls.append(now)
+            return True
+
+    def used(self, now: Optional[float] = None) -> int:
+        if self._shared is not None:
+            return max(0, round(self.calls_per_hour - self._shared.available()))
+        now = now or time.time()
+        with self._lock:
+            while self._calls and now - self._calls[0] > 3600:
+                self._calls.popleft()
+            return len(self._calls)
+
+
+# Observed queries from every SearchAPI lookup (see searchapi_client.fetch_organic_results)
+popularity = PopularityTracker()
+
+
+def seed_queries() -> List[str]:
+    """Canonical medicines from the pipeline fallback mapping, queries from the tool mapping and merged tool queries."""
+    from medicine_names import MEDICINE_SYNONYMS, MedicineCanonicalizer
+    from query_planner import COMBINED_QUERIES
+    from symptom_search_pipeline import MEDICINE_MAPPINGS
+    from symptom_search_tool import SYMPTOM_QUERY_MAPPINGS
+
+    # The pipeline searches canonical names, so warm those
+    canonicalizer = MedicineCanonicalizer(MEDICINE_SYNONYMS)
+    medicines = [canonicalizer.canonical(m) for medicines in MEDICINE_MAPPINGS.values() for m in medicines]
+    seeds: List[str] = []
+    seen = set()
+    for query in medicines + list(SYMPTOM_QUERY_MAPPINGS.values()) + list(COMBINED_QUERIES):
+        key = query_key(query)
+        if key not in seen:
+            seen.add(key)
+            seeds.append(query)
+    return seeds
+
+
+class CacheWarmer:
+    """
+    Background thread that keeps popular catalog entries fresh.
+
+    Every `interval_seconds` it ranks seed and observed queries by
+    popularity, and refreshes those whose catalog entry is missing or older
+    than `refresh_ahead_fraction` of the catalog max age, spending at most
+    `quota_per_hour` SearchAPI calls per hour (shared by all workers when
+    `rate_limit_path` is set).
+    """
+
+    def __init__(self, settings: Settings, session, tracker: PopularityTracker = popularity):
+        self.settings = settings
+        self.session = session
+        self.tracker = tracker
+        self.budget = QuotaBudget(settings.cache_warmer_quota_per_hour, settings.rate_limit_path)
+        self.seeds = seed_queries()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        metrics.set_gauge('cache_warmer_quota_budget_per_hour', settings.cache_warmer_quota_per_hour)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='cache-warmer', daemon=True)
+            self._thread.start()
+            log_event(logger, "cache_warmer_started", seeds=len(self.seeds))
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                log_event(logger, "cache_warmer_cycle_failed", logging.WARNING, error=str(e))
+            self._stop.wait(self.settings.cache_warmer_interval_seconds)
+
+    def candidates(self) -> List[str]:
+        """Queries to consider this cycle, hottest first (observed queries, then unobserved seeds)."""
+        now = time.time()
+        ranked = self.tracker.top(self.settings.cache_warmer_top_n, now)
+        seen = {query_key(query) for query in ranked}
+        for seed in self.seeds:
+            if query_key(seed) not in seen:
+                ranked.append(seed)
+        return ranked
+
+    def run_once(self) -> int:
+        """
+        Run one warming cycle.
+
+        Returns:
+            int: Number of queries refreshed
+        """
+        from searchapi_client import fetch_live
+
+        catalog = get_catalog(self.settings)
+        if catalog is None:
+            return 0
+        refresh_after = self.settings.catalog_max_age_seconds * self.settings.cache_warmer_refresh_ahead_fraction
+        now = time.time()
+        refreshed = 0
+        for query in self.candidates():
+            if self._stop.is_set():
+                break
+            fetched_at = catalog.fetched_at(query)
+            if fetched_at is not None and now - fetched_at < refresh_after:
+                continue
+            if not self.budget.try_spend():
+                metrics.inc('cache_warmer_budget_exhausted_total')
+                break
+            try:
+                fetch_live(self.settings, self.session, query)
+                refreshed += 1
+                metrics.inc('cache_warmer_refreshes_total')
+            except Exception as e:
+                metrics.inc('cache_warmer_refresh_errors_total')
+                log_event(logger, "cache_warmer_refresh_failed", logging.WARNING, query=query, error=str(e))
+        metrics.set_gauge('cache_warmer_quota_used_last_hour', self.budget.used())
+        metrics.inc('cache_warmer_cycles_total')
+        if refreshed:
+            log_event(logger, "cache_warmer_cycle", refreshed=refreshed, quota_used=self.budget.used())
+        return refreshed
+
+
+_warmer: Optional[CacheWarmer] = None
+_warmer_lock = threading.Lock()
+
+
+def start_cache_warmer(settings: Settings, session) -> Optional[CacheWarmer]:
+    """
+    Start the process-wide warmer if enabled (requires the catalog and a SearchAPI key).
+
+    Called by the server's entry points (gunicorn.conf.py, `python
+    symptom_search_server.py`), never on import.
+
+    Returns:
+        Optional[CacheWarmer]: The running warmer, or None when disabled
+    """
+    global _warmer
+    if not (settings.cache_warmer_enabled and settings.catalog_enabled and settings.searchapi_api_key):
+        return None
+    with _warmer_lock:
+        if _warmer is None:
+            _warmer = CacheWarmer(settings, session)
+            _warmer.start()
+        return _warmer
+
+
+def stop_cache_warmer() -> None:
+    """Stop the process-wide warmer (e.g. before starting one with reloaded settings)."""
+    global _warmer
+    with _warmer_lock:
+        if _warmer is not None:
+            _warmer.stop()
+            _warmer = None
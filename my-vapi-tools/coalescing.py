@@ -0,0 +1,202 @@
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same thing (same normalized key) share
+one upstream call: the first caller runs it, the rest wait for its result.
+Errors raised by the upstream call are re-raised in every waiter, and each
+waiter can bound how long it is willing to wait. Both threaded and asyncio
+callers are supported.
+"""
+
+import asyncio
+import re
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+import metrics
+
+_whitespace = re.compile(r'\s+')
+
+
+class CoalescingTimeout(TimeoutError):
+    """Raised in a waiter that gave up before the shared call finished."""
+
+
+def normalize_key(*parts: Any) -> Tuple:
+    """
+    Build a coalescing key from request inputs.
+
+    Strings are lowercased with whitespace collapsed; lists, tuples and sets
+    are normalized element-wise and sorted so ordering does not matter.
+
+    Returns:
+        Tuple: Hashable, normalized key
+    """
+    return tuple(_normalize_part(part) for part in parts)
+
+
+def _normalize_part(part: Any) -> Any:
+    if isinstance(part, str):
+        return _whitespace.sub(' ', part.strip().lower())
+    if isinstance(part, (list, tuple, set, frozenset)):
+        return tuple(sorted((_normalize_part(item) for item in part), key=repr))
+    if isinstance(part, dict):
+        return tuple(sorted((str(k), _normalize_part(v)) for k, v in part.items()))
+    return part
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error', 'waiters')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls that share a key.
+
+    Example:
+        flight = SingleFlight('searchapi')
+        data = flight.do(normalize_key('ibuprofen'), lambda: fetch('ibuprofen'), timeout=30)
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls: Dict[Any, _Call] = {}
+        self._async_calls: Dict[Tuple[int, Any], 'asyncio.Future'] = {}
+        self.leader_calls = 0
+        self.shared_calls = 0
+        self.timeouts = 0
+
+    def do(self, key: Any, fn: Callable[[], Any], timeout: Optional[float] = None) -> Any:
+        """
+        Run `fn` once for all concurrent callers with the same key.
+
+        Args:
+            key (Any): Hashable, normalized request key
+            fn (Callable): Zero-argument function performing the upstream call
+            timeout (float): Maximum seconds a waiter blocks (None waits indefinitely)
+
+        Returns:
+            Any: The shared result (treat as read-only)
+
+        Raises:
+            CoalescingTimeout: If this waiter gave up before the call finished
+            Exception: Whatever `fn` raised, re-raised in every caller
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leader_calls += 1
+            else:
+                call.waiters += 1
+                self.shared_calls += 1
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._calls.pop(key, None)
+                call.done.set()
+        elif not call.done.wait(timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise CoalescingTimeout(f"{self.name}: timed out after {timeout}s waiting for shared call")
+
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key: Any, fn: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        """
+        Asyncio variant of do(): concurrent coroutines with the same key await one task.
+
+        A waiter that times out is cancelled on its own; the shared task keeps
+        running for the remaining waiters.
+
+        Args:
+            key (Any): Hashable, normalized request key
+            fn (Callable): Zero-argument coroutine function performing the upstream call
+            timeout (float): Maximum seconds a waiter awaits (None waits indefinitely)
+
+        Returns:
+            Any: The shared result (treat as read-only)
+        """
+        loop = asyncio.get_running_loop()
+        loop_key = (id(loop), key)
+        with self._lock:
+            task = self._async_calls.get(loop_key)
+            if task is None:
+                task = loop.create_task(fn())
+                self._async_calls[loop_key] = task
+                task.add_done_callback(lambda _t: self._forget_async(loop_key, _t))
+                self.leader_calls += 1
+            else:
+                self.shared_calls += 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise CoalescingTimeout(f"{self.name}: timed out after {timeout}s waiting for shared call")
+
+    def _forget_async(self, loop_key: Tuple[int, Any], task: 'asyncio.Future') -> None:
+        with self._lock:
+            if self._async_calls.get(loop_key) is task:
+                del self._async_calls[loop_key]
+
+    def in_flight(self) -> int:
+        """Number of distinct keys currently being fetched."""
+        with self._lock:
+            return len(self._calls) + len(self._async_calls)
+
+    def stats(self) -> Dict[str, int]:
+        """Counters for monitoring how much upstream work was saved."""
+        with self._lock:
+            return {
+                'leader_calls': self.leader_calls,
+                'shared_calls': self.shared_calls,
+                'timeouts': self.timeouts,
+                'in_flight': len(self._calls) + len(self._async_calls),
+            }
+
+
+_flights: Dict[str, SingleFlight] = {}
+_flights_lock = threading.Lock()
+
+
+def get_flight(name: str) -> SingleFlight:
+    """Return the process-wide SingleFlight registered under `name`."""
+    with _flights_lock:
+        flight = _flights.get(name)
+        if flight is None:
+            flight = _flights[name] = SingleFlight(name)
+        return flight
+
+
+def all_flights() -> Iterable[SingleFlight]:
+    """All registered flights (for metrics)."""
+    with _flights_lock:
+        return list(_flights.values())
+
+
+def _collect_metrics() -> Dict[str, float]:
+    values = {}
+    for flight in all_flights():
+        for stat, value in flight.stats().items():
+            values[f'singleflight_{flight.name}_{stat}'] = value
+    return values
+
+
+metrics.register_collector(_collect_metrics)
@@ -0,0 +1,132 @@
+"""
+End-to-end request deadlines for the pipeline.
+
+A `Deadline` holds one request's time budget and how it is split across
+the layers (extraction, recommendation, search, formatting). Each layer
+gets its share of whatever time is left when it begins, so time a fast
+layer does not use passes to the layers after it. Upstream calls take
+their timeouts from the current layer's share, but never less than
+`min_call_seconds` while the request has that much time left. Once the
+request itself has less than that, calls are not made at all:
+`DeadlineExceeded` is raised so the layer falls back at once.
+
+The deadline also records which layers fell back ("degraded"), so the
+response can say which parts of the answer are approximate.
+"""
+
+import time
+from typing import Dict, List, Optional
+
+LAYERS = ('extraction', 'recommendation', 'search', 'formatting')
+
+
+class DeadlineExceeded(Exception):
+    """Raised instead of starting an upstream call the deadline leaves no time for."""
+
+
+def is_valid_budget(value) -> bool:
+    """True for a usable per-request budget: None, or a finite number of seconds >= 0."""
+    if value is None:
+        return True
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value < float('inf')
+
+
+def is_timeout_error(error: Exception) -> bool:
+    """True for timeouts from the standard library, requests/httpx or the OpenAI SDK."""
+    return isinstance(error, TimeoutError) or 'timeout' in type(error).__name__.lower()
+
+
+def parse_split(value: str) -> Dict[str, float]:
+    """Comma-separated layer:weight pairs ("extraction:2,search:4") → {"extraction": 2.0, "search": 4.0}."""
+    split = {}
+    for pair in (value or '').split(','):
+        layer, _, weight = pair.strip().partition(':')
+        try:
+            split[layer.strip()] = max(0.0, float(weight))
+        except ValueError:
+            continue
+    return split
+
+
+class Deadline:
+    """
+    One request's time budget.
+
+    Args:
+        budget_seconds (float): Total budget (None or <= 0 for no deadline)
+        split (Dict[str, float]): Relative share of each layer (missing layers weigh 1)
+        min_call_seconds (float): Least time worth giving an upstream call
+    """
+
+    def __init__(self, budget_seconds: Optional[float], split: Optional[Dict[str, float]] = None,
+                 min_call_seconds: float = 0.5):
+        self.budget_seconds = budget_seconds if budget_seconds and budget_seconds > 0 else None
+        self.split = split or {}
+        self.min_call_seconds = min_call_seconds
+        self.start = time.monotonic()
+        self.end = self.start + self.budget_seconds if self.budget_seconds else float('inf')
+        self.degraded: List[str] = []
+        self._layer_ends: Dict[str, float] = {}
+
+    @property
+    def bounded(self) -> bool:
+        return self.budget_seconds is not None
+
+    def remaining(self, layer: Optional[str] = None) -> float:
+        """Seconds left for the request, or for a layer that has begun."""
+        end = self._layer_ends.get(layer, self.end) if layer else self.end
+        return end - time.monotonic()
+
+    def begin(self, layer: str) -> float:
+        """
+        Start a layer: it gets its weight's share of the time left for it and the layers after it.
+
+        Returns:
+            float: Seconds allotted to the layer
+        """
+        if not self.bounded:
+            return float('inf')
+        later = LAYERS[LAYERS.index(layer):] if layer in LAYERS else (layer,)
+        weights = sum(self.split.get(name, 1.0) for name in later)
+        share = self.split.get(layer, 1.0) / weights if weights else 1.0
+        allotted = max(0.0, self.remaining()) * share
+        self._layer_ends[layer] = time.monotonic() + allotted
+        return allotted
+
+    def timeout(self, layer: str, cap: float) -> float:
+        """
+        Timeout for an upstream call in a layer.
+
+        Args:
+            layer (str): Layer making the call
+            cap (float): The call's usual timeout
+
+        Returns:
+            float: The layer's remaining share (at least min_call_seconds), capped by
+            `cap` and by the time left for the request
+
+        Raises:
+            DeadlineExceeded: If the request has less than min_call_seconds left
+        """
+        if not self.bounded:
+            return cap
+        left = self.remaining()
+        if left < self.min_call_seconds:
+            raise DeadlineExceeded(f"{layer}: {max(0.0, left):.2f}s left of the {self.budget_seconds}s deadline")
+        return min(cap, left, max(self.remaining(layer), self.min_call_seconds))
+
+    def expired(self, layer: Optional[str] = None) -> bool:
+        return self.bounded and self.remaining(layer) <= 0
+
+    def degrade(self, layer: str) -> None:
+        """Record that a layer fell back to a cheaper answer."""
+        if layer not in self.degraded:
+            self.degraded.append(layer)
+
+    def report(self) -> Dict:
+        """Deadline summary for the response."""
+        return {
+            "budget_ms": round(self.budget_seconds * 1000) if self.bounded else None,
+            "elapsed_ms": round((time.monotonic() - self.start) * 1000, 1),
+            "degraded_layers": list(self.degraded)
+        }
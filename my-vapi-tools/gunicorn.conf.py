@@ -0,0 +1,28 @@
+"""
+Gunicorn configuration, picked up automatically from the working directory.
+
+Background work starts in each worker after it has loaded the app, so
+importing symptom_search_server (tests, scripts) never starts threads.
+
+Admission control (admission.py) queues and sheds requests inside a worker
+process, so each worker serves requests on threads (gthread). With sync
+workers a process only ever has one request, and its limits never apply.
+GUNICORN_THREADS overrides the thread count.
+"""
+
+import os
+
+from settings import Settings
+
+_settings = Settings.from_env()
+
+worker_class = 'gthread'
+# Room for every admitted and queued request, and as many again that are shed
+# with a degraded answer instead of waiting in the listen backlog
+threads = int(os.getenv('GUNICORN_THREADS') or 0) or 2 * (
+    _settings.admission_max_in_flight + _settings.admission_max_queue)
+
+
+def post_worker_init(worker):
+    import symptom_search_server
+    symptom_search_server.start_background_tasks()
@@ -0,0 +1,94 @@
+"""
+Shared HTTP clients built from Settings.
+
+Clients ignore proxy and CA-bundle environment variables (`trust_env=False`)
+instead of deleting them from `os.environ`, and are reused across requests
+so connection pools stay warm. A settings reload swaps in fresh clients
+and closes the old ones once requests that still hold them have finished.
+"""
+
+import threading
+from typing import Dict, List, Union
+
+import httpx
+import requests
+from openai import OpenAI
+from requests.adapters import HTTPAdapter
+
+from settings import Settings, on_reload
+
+_lock = threading.Lock()
+_search_sessions: Dict[Settings, requests.Session] = {}
+_openai_clients: Dict[Settings, OpenAI] = {}
+
+# Longer than any request holds a client (per-call timeouts bound each request)
+CLOSE_DELAY_SECONDS = 300.0
+
+
+def get_search_session(settings: Settings) -> requests.Session:
+    """
+    Return the pooled SearchAPI session for these settings.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        requests.Session: Session that ignores environment proxies
+    """
+    with _lock:
+        session = _search_sessions.get(settings)
+        if session is None:
+            session = requests.Session()
+            session.trust_env = False
+            adapter = HTTPAdapter(pool_connections=settings.http_pool_connections,
+                                  pool_maxsize=settings.http_pool_maxsize)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _search_sessions[settings] = session
+        return session
+
+
+def get_openai_client(settings: Settings) -> OpenAI:
+    """
+    Return the pooled OpenAI client for these settings.
+
+    Args:
+        settings (Settings): Service settings (must include OPENAI_API_KEY)
+
+    Returns:
+        OpenAI: Client backed by an httpx client that ignores environment proxies
+    """
+    with _lock:
+        client = _openai_clients.get(settings)
+        if client is None:
+            http_client = httpx.Client(
+                trust_env=False,
+                timeout=settings.openai_timeout,
+                limits=httpx.Limits(max_connections=settings.http_pool_maxsize,
+                                    max_keepalive_connections=settings.http_pool_connections),
+            )
+            client = OpenAI(api_key=settings.openai_api_key, http_client=http_client)
+            _openai_clients[settings] = client
+        return client
+
+
+def _close_later(clients: List[Union[requests.Session, OpenAI]]) -> None:
+    # Closing releases the pooled sockets; in-flight requests get CLOSE_DELAY_SECONDS to finish first
+    def close():
+        for client in clients:
+            client.close()
+    timer = threading.Timer(CLOSE_DELAY_SECONDS, close)
+    timer.daemon = True
+    timer.start()
+
+
+def _drop_stale_clients(new_settings: Settings) -> None:
+    # Requests that already hold a client keep using it; new lookups build fresh ones.
+    with _lock:
+        stale = [_search_sessions.pop(key) for key in [key for key in _search_sessions if key != new_settings]]
+        stale += [_openai_clients.pop(key) for key in [key for key in _openai_clients if key != new_settings]]
+    if stale:
+        _close_later(stale)
+
+
+on_reload(_drop_stale_clients)
@@ -0,0 +1,89 @@
+"""
+Idempotent handling of retried Vapi tool calls.
+
+When a response is slow, Vapi and proxies in between retry the webhook
+with the same tool-call id. Without deduplication, each retry would
+start its own four-layer pipeline at exactly the wrong moment.
+`IdempotencyStore.run()` keys executions on the tool-call id:
+- The first request runs the work.
+- A retry that arrives while the work is running attaches to it
+  (coalescing.SingleFlight) and gets the same response.
+- A retry that arrives after completion gets the stored response, as
+  long as it is within the retention window.
+
+Only successful responses are stored. If the work raises, or `produce`
+marks its response as not worth replaying (an error body returned with
+status 200), every attached request sees that response, and a later
+retry runs the work again.
+
+The store lives in the process. A retry that a load balancer routes to
+a different worker process runs again.
+"""
+
+from typing import Any, Callable, Tuple
+
+import metrics
+from coalescing import SingleFlight
+from response_profiles import ResponseCache
+
+
+class IdempotencyStore:
+    """
+    In-flight and completed responses by idempotency key.
+
+    Args:
+        retention_seconds (float): How long a completed response is replayed
+        max_entries (int): Most completed responses kept (least recently used are evicted)
+        wait_seconds (float): Longest a retry waits for the original to finish
+    """
+
+    def __init__(self, retention_seconds: float, max_entries: int, wait_seconds: float):
+        self.wait_seconds = wait_seconds
+        self._completed = ResponseCache(max_entries, retention_seconds)
+        self._flight = SingleFlight('idempotency')
+
+    def run(self, key: Any, produce: Callable[[], Tuple[bytes, bool]]) -> Tuple[bytes, str]:
+        """
+        Produce the response for a key at most once.
+
+        Args:
+            key (Any): Hashable idempotency key (tool-call id and anything that shapes the response)
+            produce (Callable[[], Tuple[bytes, bool]]): Builds the encoded response body and whether it
+                succeeded (only successful bodies are replayed)
+
+        Returns:
+            Tuple[bytes, str]: The body and how it was obtained: 'executed', 'attached' or 'replayed'
+
+        Raises:
+            CoalescingTimeout: If the original was still running after wait_seconds
+            Exception: Whatever `produce` raised
+        """
+        body = self._completed.get(key)
+        if body is not None:
+            metrics.inc('idempotency_total', outcome='replayed')
+            return body, 'replayed'
+        outcomes = []
+
+        def execute() -> bytes:
+            # The original may have finished between the lookup above and taking the lead
+            result = self._completed.get(key)
+            if result is not None:
+                outcomes.append('replayed')
+                return result
+            outcomes.append('executed')
+            result, succeeded = produce()
+            if succeeded:
+                # Stored before the flight ends, so no retry slips between the two and runs again
+                self._completed.put(key, result)
+            return result
+
+        body = self._flight.do(key, execute, timeout=self.wait_seconds)
+        outcome = outcomes[0] if outcomes else 'attached'
+        metrics.inc('idempotency_total', outcome=outcome)
+        return body, outcome
+
+    def in_flight(self) -> int:
+        return self._flight.in_flight()
+
+    def __len__(self) -> int:
+        return len(self._completed)
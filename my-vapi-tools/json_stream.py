@@ -0,0 +1,161 @@
+"""
+Incremental extraction of one array from a streamed JSON document.
+
+SearchAPI responses carry metadata, ads, filters, pagination and related
+searches around the `organic_results` we use. `iter_array_field()` reads
+the body chunk by chunk and yields the elements of one top-level array
+as each element completes, so the caller can stop reading as soon as it
+has enough. New text is scanned once for the bracket that closes the
+current object or array, and the value is then decoded once with the
+C-accelerated `json.JSONDecoder.raw_decode`, so a large element split
+across many chunks costs linear time. Only the unread part of the body
+is kept in memory.
+
+This is for well-formed documents from an API. For tolerant parsing of
+LLM output, see tolerant_json.py.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Iterable, Iterator, Optional
+
+_WHITESPACE = re.compile(r'\s*')
+_STRUCTURE = re.compile(r'["\[\]{}]')
+_STRING_SPECIAL = re.compile(r'["\\]')
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Decoded text of a byte stream, read on demand."""
+
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+
+    def _read(self) -> Optional[str]:
+        # Text of the next non-empty chunk, or None at the end of the stream
+        for chunk in self._chunks:
+            if chunk:
+                return self._utf8.decode(chunk)
+        return None
+
+    def more(self) -> bool:
+        """Append the next chunk (dropping text already consumed). False at the end of the stream."""
+        text = self._read()
+        if text is None:
+            return False
+        self.text = self.text[self.pos:] + text
+        self.pos = 0
+        return True
+
+    def _buffer_container(self) -> None:
+        """Read until the object or array at `pos` is closed, scanning each chunk's text once."""
+        pieces = [self.text[self.pos:]]
+        piece = pieces[0]
+        depth, in_string, escaped = 0, False, False
+        while True:
+            index = 0
+            if escaped and piece:
+                index, escaped = 1, False
+            while True:
+                match = (_STRING_SPECIAL if in_string else _STRUCTURE).search(piece, index)
+                if match is None:
+                    break
+                index = match.end()
+                char = match.group()
+                if in_string:
+                    if char == '\\':
+                        escaped = index == len(piece)
+                        index += 1
+                    else:
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char in '[{':
+                    depth += 1
+                else:
+                    depth -= 1
+                    if depth == 0:
+                        self.text, self.pos = ''.join(pieces), 0
+                        return
+            piece = self._read()
+            if piece is None:
+                raise ValueError("unexpected end of JSON stream")
+            pieces.append(piece)
+
+    def peek(self) -> str:
+        """Next non-whitespace character."""
+        while True:
+            self.pos = _WHITESPACE.match(self.text, self.pos).end()
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.more():
+                raise ValueError("unexpected end of JSON stream")
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"expected {char!r} at offset {self.pos} of JSON stream")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decode the next complete JSON value."""
+        if self.peek() in '[{':
+            # Decoded once its closing bracket has arrived, not again with every chunk
+            self._buffer_container()
+            value, self.pos = _decoder.raw_decode(self.text, self.pos)
+            return value
+        # Strings and numbers are short: retry as chunks arrive
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if self.more():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(self.text) and self.more():
+                continue
+            self.pos = end
+            return value
+
+
+def iter_array_field(chunks: Iterable[bytes], field: str) -> Iterator[Any]:
+    """
+    Yield the elements of the top-level array `field` of a streamed JSON object.
+
+    Values of other top-level fields are decoded and discarded; nothing after the
+    array is read once the caller stops iterating.
+
+    Args:
+        chunks (Iterable[bytes]): Response body chunks (UTF-8)
+        field (str): Top-level key of the array
+
+    Yields:
+        Any: Each element of the array, as soon as it is complete
+
+    Raises:
+        ValueError: If the stream is not a JSON object or ends early
+    """
+    reader = _Reader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        key = reader.value()
+        reader.expect(':')
+        if key == field and reader.peek() == '[':
+            reader.pos += 1
+            if reader.peek() == ']':
+                return
+            while True:
+                yield reader.value()
+                if reader.peek() == ']':
+                    return
+                reader.expect(',')
+        reader.value()
+        if reader.peek() == '}':
+            return
+        reader.expect(',')
@@ -0,0 +1,176 @@
+"""
+Fewest medicines covering every extracted symptom.
+
+Layer 2 often recommends six or more medicines, and Layer 3 searches
+each one. Yet one broad option such as ibuprofen may cover headache,
+fever and body aches on its own. `CoverageTable` knows which symptoms
+each medicine covers. It starts from the pipeline's keyword mapping
+(MEDICINE_MAPPINGS) and learns more from Layer 2 answers to
+single-symptom requests.
+
+`select()` works with bitsets. Each Layer 2 medicine gets a mask of the
+extracted symptoms it covers. The best subset is found by enumerating
+all subsets, building each union incrementally from a smaller subset.
+The best subset covers the most symptoms, then needs the fewest new
+searches, then has the fewest medicines, then keeps Layer 2's order.
+Medicines already searched (earlier in a call, or started while Layer 2
+streamed) count as free.
+
+A symptom the table cannot cover is never dropped silently. The
+remaining search slots then go to Layer 2's other picks, starting with
+medicines the table knows nothing about.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Set
+
+import metrics
+from medicine_names import get_canonicalizer
+from settings import Settings
+
+# Largest candidate set enumerated exhaustively (2^12 subsets)
+MAX_CANDIDATES = 12
+# Cap on learned (medicine, symptom) pairs
+MAX_LEARNED_PAIRS = 10000
+
+
+def _popcount(mask: int) -> int:
+    return bin(mask).count('1')
+
+
+class CoverageTable:
+    """
+    Medicine → symptoms it covers.
+
+    Args:
+        mapping (Dict[str, List[str]]): Symptom → medicines (e.g. MEDICINE_MAPPINGS)
+    """
+
+    def __init__(self, mapping: Dict[str, List[str]]):
+        self._lock = threading.Lock()
+        self._covers: Dict[str, Set[str]] = {}
+        self._learned = 0
+        for symptom, medicines in mapping.items():
+            for medicine in medicines:
+                self._covers.setdefault(medicine, set()).add(symptom.lower())
+
+    def learn(self, symptoms: List[str], medicines: Iterable[str]) -> None:
+        """Record a Layer 2 answer; only single-symptom answers say which symptom a medicine covers."""
+        if len(symptoms) != 1:
+            return
+        symptom = symptoms[0].lower()
+        with self._lock:
+            for medicine in medicines:
+                covered = self._covers.setdefault(medicine, set())
+                if symptom not in covered and self._learned < MAX_LEARNED_PAIRS:
+                    covered.add(symptom)
+                    self._learned += 1
+
+    def masks(self, symptoms: List[str], medicines: List[str]) -> List[int]:
+        """
+        Bitset of the symptoms each medicine covers.
+
+        Bit i is set when a covered symptom matches symptoms[i]: equal, or one contains the other
+        ("fever" covers "mild fever").
+        """
+        lowered = [symptom.lower() for symptom in symptoms]
+        with self._lock:
+            covers = [set(self._covers.get(medicine, ())) for medicine in medicines]
+        return [
+            sum(1 << i for i, symptom in enumerate(lowered)
+                if any(known == symptom or known in symptom or symptom in known for known in covered))
+            for covered in covers
+        ]
+
+    def select(self, symptoms: List[str], medicines: List[str], max_searches: int,
+               searched: Iterable[str] = ()) -> List[str]:
+        """
+        Choose a small ordered set of medicines covering the symptoms.
+
+        Args:
+            symptoms (List[str]): Extracted symptoms
+            medicines (List[str]): Candidates, in Layer 2's order of preference
+            max_searches (int): Most medicines that may need a new search (0 = no cap)
+            searched (Iterable[str]): Medicines whose results are already available
+
+        Returns:
+            List[str]: Chosen medicines, broadest first
+        """
+        medicines = list(dict.fromkeys(medicines))
+        searched = set(searched)
+        max_searches = max_searches if max_searches > 0 else len(medicines)
+        if not symptoms or not medicines:
+            return [m for m in medicines if m in searched] + [m for m in medicines if m not in searched][:max_searches]
+
+        masks = self.masks(symptoms, medicines)
+        known = [index for index, mask in enumerate(masks) if mask][:MAX_CANDIDATES]
+        count = len(known)
+        size = 1 << count
+        # union[s], new[s], rank[s] for every subset s of the known candidates, each from s minus its lowest bit
+        union, new, rank = [0] * size, [0] * size, [0] * size
+        best, best_key = 0, None
+        for subset in range(1, size):
+            low = subset & -subset
+            bit = low.bit_length() - 1
+            rest = subset ^ low
+            index = known[bit]
+            union[subset] = union[rest] | masks[index]
+            new[subset] = new[rest] + (medicines[index] not in searched)
+            rank[subset] = rank[rest] + index
+            if new[subset] > max_searches:
+                continue
+            key = (-_popcount(union[subset]), new[subset], _popcount(subset), rank[subset])
+            if best_key is None or key < best_key:
+                best, best_key = subset, key
+
+        chosen = sorted((known[bit] for bit in range(count) if best >> bit & 1),
+                        key=lambda index: (-_popcount(masks[index]), index))
+        selected = [medicines[index] for index in chosen]
+
+        # Symptoms the table cannot cover keep Layer 2's other picks, unknown medicines first
+        if union[best] != (1 << len(symptoms)) - 1:
+            slots = max_searches - sum(medicine not in searched for medicine in selected)
+            with self._lock:
+                unknown = {medicine for medicine in medicines if not self._covers.get(medicine)}
+            leftovers = sorted((index for index in range(len(medicines)) if medicines[index] not in selected),
+                               key=lambda index: (medicines[index] not in unknown, index))
+            for index in leftovers:
+                if medicines[index] in searched:
+                    selected.append(medicines[index])
+                elif slots > 0:
+                    selected.append(medicines[index])
+                    slots -= 1
+
+        metrics.inc('medicine_cover_total', len(selected), result='selected')
+        metrics.inc('medicine_cover_total', len(medicines) - len(selected), result='skipped')
+        return selected
+
+
+_tables: Dict[Optional[str], CoverageTable] = {}
+_tables_lock = threading.Lock()
+
+
+def get_coverage_table(settings: Settings) -> Optional[CoverageTable]:
+    """
+    Return the shared coverage table, or None when MEDICINE_COVER_ENABLED is off.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        Optional[CoverageTable]: Table seeded from the pipeline's keyword mapping (canonical names)
+    """
+    if not settings.medicine_cover_enabled:
+        return None
+    from symptom_search_pipeline import MEDICINE_MAPPINGS
+
+    key = settings.medicine_synonyms_path if settings.medicine_canonicalization else None
+    with _tables_lock:
+        if key not in _tables:
+            canonicalizer = get_canonicalizer(settings)
+            mapping = {
+                symptom: [canonicalizer.canonical(m) if canonicalizer is not None else m for m in medicines]
+                for symptom, medicines in MEDICINE_MAPPINGS.items()
+            }
+            _tables[key] = CoverageTable(mapping)
+        return _tables[key]
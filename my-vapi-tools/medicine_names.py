@@ -0,0 +1,218 @@
+"""
+Canonical medicine names between Layer 2 and Layer 3.
+
+Layer 2 answers with free-form names: "Tylenol", "acetaminophen",
+"Acetaminophen 500mg tablets" and "paracetamol" all mean the same
+products. Searched as written, each would be its own SearchAPI call and
+its own catalog and coalescing key.
+
+`MedicineCanonicalizer` maps each name to its active ingredient(s) and
+dosage form:
+- Brand names, salts and common misspellings come from a synonym table.
+  The table is compiled into a dict keyed on token tuples and matched
+  longest first, so "tylenol pm" wins over "tylenol".
+- Strengths, counts and words like "extra strength" are dropped.
+- Oral solid forms (tablets, caplets, capsules, softgels) are dropped,
+  because they search the same products. Other forms (spray, drops,
+  cream, liquid, ...) are kept, because they are different products.
+
+Names with no known ingredient keep their normalized wording. Extra
+synonyms can be loaded from the JSON file at MEDICINE_SYNONYMS_PATH
+({"canonical name": ["variant", ...]}).
+"""
+
+import json
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import metrics
+from settings import Settings, on_reload
+from structured_logging import get_logger, log_event
+
+logger = get_logger(__name__)
+
+# Canonical ingredient(s) → brand names, salts and spelling variants.
+# Combination products list their ingredients joined by " and ".
+MEDICINE_SYNONYMS = {
+    'acetaminophen': ['tylenol', 'paracetamol', 'panadol', 'apap', 'acetaminofen', 'acetominophen',
+                      'acetaminophin', 'acetamenophen'],
+    'ibuprofen': ['advil', 'motrin', 'nurofen', 'midol', 'ibuprofin', 'ibuprophen', 'ibuprofen sodium'],
+    'naproxen': ['aleve', 'naprosyn', 'naproxen sodium', 'naproxin'],
+    'aspirin': ['bayer', 'bayer aspirin', 'ecotrin', 'bufferin', 'acetylsalicylic acid', 'asa', 'asprin'],
+    'diphenhydramine': ['benadryl', 'zzzquil', 'diphenhydramine hcl', 'diphenhydramine hydrochloride',
+                        'diphenhydramine citrate', 'diphenhidramine'],
+    'doxylamine': ['unisom', 'doxylamine succinate'],
+    'cetirizine': ['zyrtec', 'cetirizine hcl', 'cetirizine hydrochloride', 'cetirizin', 'cetrizine'],
+    'levocetirizine': ['xyzal'],
+    'loratadine': ['claritin', 'alavert', 'loratidine', 'loratadin'],
+    'fexofenadine': ['allegra', 'fexofenadine hcl'],
+    'pseudoephedrine': ['sudafed', 'pseudoephedrine hcl', 'pseudoephedrine sulfate'],
+    'phenylephrine': ['sudafed pe', 'phenylephrine hcl'],
+    'dextromethorphan': ['delsym', 'dextromethorphan hbr', 'dxm'],
+    'guaifenesin': ['mucinex', 'robitussin', 'guaifenesen', 'guaifenisin'],
+    'dextromethorphan and guaifenesin': ['mucinex dm', 'robitussin dm'],
+    'acetaminophen and diphenhydramine': ['tylenol pm'],
+    'ibuprofen and diphenhydramine': ['advil pm'],
+    'cetirizine and pseudoephedrine': ['zyrtec d'],
+    'loratadine and pseudoephedrine': ['claritin d'],
+    'bismuth subsalicylate': ['pepto bismol', 'pepto', 'kaopectate'],
+    'loperamide': ['imodium', 'loperamide hcl'],
+    'famotidine': ['pepcid'],
+    'omeprazole': ['prilosec'],
+    'calcium carbonate': ['tums', 'rolaids'],
+    'simethicone': ['gas x'],
+    'meclizine': ['bonine', 'dramamine less drowsy'],
+    'dimenhydrinate': ['dramamine'],
+    'docusate': ['colace', 'docusate sodium'],
+    'hydrocortisone': ['cortizone', 'cortaid'],
+    'melatonin': ['melatonine'],
+    'oxymetazoline': ['afrin'],
+    'fluticasone': ['flonase', 'fluticasone propionate'],
+    'ketotifen': ['zaditor', 'alaway'],
+}
+
+# Dosage forms: oral solids collapse to the bare ingredient, other forms are part of the key
+ORAL_SOLID_FORMS = {'tablet', 'tablets', 'tab', 'tabs', 'caplet', 'caplets', 'capsule', 'capsules', 'softgel',
+                    'softgels', 'gelcap', 'gelcaps', 'pill', 'pills', 'geltabs'}
+DOSAGE_FORMS = {
+    'spray': 'spray', 'sprays': 'spray', 'drop': 'drops', 'drops': 'drops', 'cream': 'cream',
+    'ointment': 'ointment', 'gel': 'gel', 'patch': 'patch', 'patches': 'patch', 'liquid': 'liquid',
+    'syrup': 'liquid', 'suspension': 'liquid', 'elixir': 'liquid', 'chewable': 'chewable',
+    'chewables': 'chewable', 'gummy': 'gummies', 'gummies': 'gummies', 'lozenge': 'lozenges',
+    'lozenges': 'lozenges', 'powder': 'powder',
+}
+QUALIFIERS = {'children': "children's", 'childrens': "children's", 'kids': "children's", 'infant': 'infant',
+              'infants': 'infant'}
+FILLER_WORDS = {'extra', 'maximum', 'max', 'regular', 'strength', 'rapid', 'release', 'fast', 'acting', 'relief',
+                'brand', 'generic', 'otc', 'oral', 'adult', 'adults', 'mg', 'mcg', 'ml', 'iu', 'count', 'ct', 'pack'}
+
+# Strengths and counts: "500mg", "200 mg", "0.05%", "100ct", "2x"
+_QUANTITY = re.compile(r'\b\d+(?:\.\d+)?\s*(?:mg|mcg|g|ml|iu|%|ct|count|pk|pack|x)?(?![a-z])')
+_NON_WORD = re.compile(r"[^a-z0-9%.]+")
+# "Liqui-Gels", "liquid gels": capsules, not a liquid
+_LIQUID_GELS = re.compile(r'\bliqui(?:d)?[\s-]*gels?\b')
+
+
+def _tokens(name: str) -> List[str]:
+    text = name.lower().replace("'s", 's').replace('®', '').replace('™', '')
+    text = _LIQUID_GELS.sub(' softgels ', text)
+    text = _QUANTITY.sub(' ', text)
+    return [token.strip('.') for token in _NON_WORD.split(text) if token.strip('.')]
+
+
+class MedicineCanonicalizer:
+    """
+    Maps medicine names to canonical ingredient and dosage-form keys.
+
+    Args:
+        synonyms (Dict[str, List[str]]): Canonical name → variants (the canonical name matches itself)
+    """
+
+    def __init__(self, synonyms: Dict[str, List[str]]):
+        self._lookup: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+        for canonical, variants in synonyms.items():
+            ingredients = tuple(canonical.split(' and '))
+            for variant in [canonical] + list(variants):
+                self._lookup[tuple(_tokens(variant))] = ingredients
+        self._longest = max((len(key) for key in self._lookup), default=1)
+
+    def canonical(self, name: str) -> str:
+        """
+        Canonical key for one medicine name.
+
+        Args:
+            name (str): Free-form name from Layer 2
+
+        Returns:
+            str: Ingredient(s) plus qualifier and non-oral-solid dosage form
+            (e.g. "Tylenol Extra Strength 500mg Caplets" → "acetaminophen"),
+            or the normalized name when no ingredient is known
+        """
+        tokens = _tokens(name)
+        ingredients: List[str] = []
+        qualifier, form = '', ''
+        position = 0
+        while position < len(tokens):
+            for length in range(min(self._longest, len(tokens) - position), 0, -1):
+                matched = self._lookup.get(tuple(tokens[position:position + length]))
+                if matched is not None:
+                    ingredients.extend(ingredient for ingredient in matched if ingredient not in ingredients)
+                    position += length
+                    break
+            else:
+                token = tokens[position]
+                if token in QUALIFIERS:
+                    qualifier = QUALIFIERS[token]
+                elif token in DOSAGE_FORMS:
+                    form = DOSAGE_FORMS[token]
+                position += 1
+        if not ingredients:
+            # Unknown name: keep its wording (forms included) so searches stay meaningful
+            return ' '.join(token for token in tokens if token not in FILLER_WORDS) or name.strip().lower()
+        return ' '.join(part for part in (qualifier, ' and '.join(ingredients), form) if part)
+
+    def canonicalize_all(self, names: List[str]) -> List[str]:
+        """
+        Canonical keys for Layer 2's names, duplicates collapsed in first-seen order.
+
+        Args:
+            names (List[str]): Medicine names
+
+        Returns:
+            List[str]: Unique canonical names
+        """
+        unique: List[str] = []
+        for name in names:
+            canonical = self.canonical(name)
+            if canonical in unique:
+                metrics.inc('medicine_names_total', result='duplicate')
+                continue
+            metrics.inc('medicine_names_total', result='unchanged' if canonical == name else 'canonicalized')
+            unique.append(canonical)
+        return unique
+
+
+_canonicalizers: Dict[str, MedicineCanonicalizer] = {}
+_canonicalizers_lock = threading.Lock()
+
+
+def get_canonicalizer(settings: Settings) -> Optional[MedicineCanonicalizer]:
+    """
+    Return the shared canonicalizer (built-in synonyms plus MEDICINE_SYNONYMS_PATH), or None when disabled.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        Optional[MedicineCanonicalizer]: Compiled canonicalizer
+    """
+    if not settings.medicine_canonicalization:
+        return None
+    path = settings.medicine_synonyms_path
+    with _canonicalizers_lock:
+        if path not in _canonicalizers:
+            synonyms = dict(MEDICINE_SYNONYMS)
+            if path:
+                try:
+                    with open(path) as f:
+                        for canonical, variants in json.load(f).items():
+                            synonyms[canonical.lower()] = list(synonyms.get(canonical.lower(), [])) + list(variants)
+                    log_event(logger, "medicine_synonyms_loaded", path=path, names=len(synonyms))
+                except (OSError, ValueError, AttributeError, TypeError) as e:
+                    # Fall back to the built-in table rather than failing every request
+                    log_event(logger, "medicine_synonyms_load_failed", logging.WARNING, path=path,
+                              exists=os.path.exists(path), error=str(e))
+            _canonicalizers[path] = MedicineCanonicalizer(synonyms)
+        return _canonicalizers[path]
+
+
+def _drop_compiled_tables(_settings: Settings) -> None:
+    # An edited synonym file is picked up on reload (SIGHUP)
+    with _canonicalizers_lock:
+        _canonicalizers.clear()
+
+
+on_reload(_drop_compiled_tables)
@@ -0,0 +1,138 @@
+"""
+In-process metrics registry.
+
+Counters, gauges and latency histograms are kept in memory, are safe to
+update from any thread, and are exported by the server's `/metrics`
+endpoint in Prometheus text format (or as JSON with `?format=json`).
+Components that already keep their own statistics register a collector
+that is called at export time.
+"""
+
+import threading
+from typing import Callable, Dict, List, Tuple
+
+_DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+_lock = threading.Lock()
+_counters: Dict[str, Dict[LabelKey, float]] = {}
+_gauges: Dict[str, Dict[LabelKey, float]] = {}
+_histograms: Dict[str, Dict[LabelKey, List[float]]] = {}
+_collectors: List[Callable[[], Dict[str, float]]] = []
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1, **labels: str) -> None:
+    """Increase a counter."""
+    key = _label_key(labels)
+    with _lock:
+        series = _counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + value
+
+
+def set_gauge(name: str, value: float, **labels: str) -> None:
+    """Set a gauge to an absolute value."""
+    with _lock:
+        _gauges.setdefault(name, {})[_label_key(labels)] = value
+
+
+def add_gauge(name: str, delta: float, **labels: str) -> None:
+    """Move a gauge up or down (e.g. in-flight counts)."""
+    key = _label_key(labels)
+    with _lock:
+        series = _gauges.setdefault(name, {})
+        series[key] = series.get(key, 0) + delta
+
+
+def observe(name: str, value_ms: float, **labels: str) -> None:
+    """Record a latency observation in milliseconds."""
+    key = _label_key(labels)
+    with _lock:
+        series = _histograms.setdefault(name, {})
+        buckets = series.get(key)
+        if buckets is None:
+            # One slot per bucket, then +Inf, count and sum
+            buckets = series[key] = [0.0] * (len(_DEFAULT_BUCKETS) + 3)
+        for index, bound in enumerate(_DEFAULT_BUCKETS):
+            if value_ms <= bound:
+                buckets[index] += 1
+        buckets[-3] += 1
+        buckets[-2] += 1
+        buckets[-1] += value_ms
+
+
+def register_collector(collector: Callable[[], Dict[str, float]]) -> None:
+    """
+    Register a callable returning {metric_name: value} gauges, evaluated at export time.
+
+    Args:
+        collector (Callable): Function returning current gauge values
+    """
+    with _lock:
+        _collectors.append(collector)
+
+
+def get_counter(name: str, **labels: str) -> float:
+    """Current value of a counter (0 if never incremented)."""
+    with _lock:
+        return _counters.get(name, {}).get(_label_key(labels), 0)
+
+
+def snapshot() -> Dict:
+    """All metrics as a JSON-serializable dict."""
+    with _lock:
+        counters = {name: {_format_labels(k) or '': v for k, v in series.items()} for name, series in _counters.items()}
+        gauges = {name: {_format_labels(k) or '': v for k, v in series.items()} for name, series in _gauges.items()}
+        histograms = {
+            name: {_format_labels(k) or '': {'count': b[-2], 'sum_ms': round(b[-1], 1)} for k, b in series.items()}
+            for name, series in _histograms.items()
+        }
+        collectors = list(_collectors)
+    for collector in collectors:
+        for name, value in collector().items():
+            gauges.setdefault(name, {})[''] = value
+    return {'counters': counters, 'gauges': gauges, 'histograms': histograms}
+
+
+def render_prometheus() -> str:
+    """All metrics in Prometheus text exposition format."""
+    lines: List[str] = []
+    with _lock:
+        for name, series in sorted(_counters.items()):
+            lines.append(f'# TYPE {name} counter')
+            lines.extend(f'{name}{_format_labels(k)} {v}' for k, v in series.items())
+        for name, series in sorted(_gauges.items()):
+            lines.append(f'# TYPE {name} gauge')
+            lines.extend(f'{name}{_format_labels(k)} {v}' for k, v in series.items())
+        for name, series in sorted(_histograms.items()):
+            lines.append(f'# TYPE {name} histogram')
+            for key, buckets in series.items():
+                for index, bound in enumerate(_DEFAULT_BUCKETS):
+                    lines.append(f'{name}_bucket{_format_labels(key + (("le", str(bound)),))} {buckets[index]}')
+                lines.append(f'{name}_bucket{_format_labels(key + (("le", "+Inf"),))} {buckets[-3]}')
+                lines.append(f'{name}_count{_format_labels(key)} {buckets[-2]}')
+                lines.append(f'{name}_sum{_format_labels(key)} {buckets[-1]}')
+        collectors = list(_collectors)
+    for collector in collectors:
+        for name, value in sorted(collector().items()):
+            lines.append(f'# TYPE {name} gauge')
+            lines.append(f'{name} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ''
+    return '{' + ','.join(f'{k}="{v}"' for k, v in key) + '}'
+
+
+def reset() -> None:
+    """Clear all recorded values (collectors stay registered)."""
+    with _lock:
+        _counters.clear()
+        _gauges.clear()
+        _histograms.clear()
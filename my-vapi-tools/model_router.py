@@ -0,0 +1,276 @@
+"""
+Per-layer LLM model routing.
+
+Each LLM layer (extraction, recommendation, formatting) has a list of
+candidate models and a minimum quality tier. The router tracks observed
+latency (EWMA) and error rate per layer and model, and sends each call to
+the fastest healthy candidate that meets the layer's tier. A model that
+fails repeatedly is taken out of rotation for a cooldown, and calls fail
+over to the next candidate. If no candidate at the required tier is
+healthy, lower-tier candidates are used rather than failing the request.
+Calls draw from the API key's OpenAI rate limit, and the reservation is
+settled against the usage each call reports. A 429 holds the key back for
+its Retry-After period without counting as a model failure.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import metrics
+from deadline import DeadlineExceeded
+from rate_limit import RateLimiter, get_rate_limiter, is_rate_limit_error, key_id, retry_after_seconds, used_tokens
+from settings import Settings
+from structured_logging import get_logger, log_event
+
+logger = get_logger(__name__)
+
+LAYERS = ('extraction', 'recommendation', 'formatting')
+
+# Weight of the newest observation in the latency and error-rate averages
+EWMA_ALPHA = 0.2
+
+
+def parse_models(value: str) -> List[str]:
+    """Comma-separated model list ("gpt-4o-mini, gpt-4o") → ["gpt-4o-mini", "gpt-4o"]."""
+    return [model.strip() for model in (value or '').split(',') if model.strip()]
+
+
+def parse_tiers(value: str) -> Dict[str, int]:
+    """Comma-separated model:tier pairs ("gpt-4o:3,gpt-4o-mini:2") → {"gpt-4o": 3, "gpt-4o-mini": 2}."""
+    tiers = {}
+    for pair in (value or '').split(','):
+        model, _, tier = pair.strip().rpartition(':')
+        if model and tier.strip().isdigit():
+            tiers[model.strip()] = int(tier)
+    return tiers
+
+
+class ModelStats:
+    """Latency and error statistics for one model in one layer."""
+
+    __slots__ = ('latency_ms', 'error_rate', 'calls', 'consecutive_failures', 'unhealthy_until')
+
+    def __init__(self):
+        self.latency_ms: Optional[float] = None
+        self.error_rate = 0.0
+        self.calls = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+
+    def healthy(self, now: float) -> bool:
+        return now >= self.unhealthy_until
+
+
+class ModelRouter:
+    """
+    Chooses a model per call and records how each call went.
+
+    Args:
+        layer_models (Dict[str, List[str]]): Candidate models per layer, in preference order
+        layer_min_tiers (Dict[str, int]): Minimum quality tier per layer
+        model_tiers (Dict[str, int]): Quality tier per model (unlisted models meet every tier)
+        failure_threshold (int): Consecutive failures that take a model out of rotation
+        cooldown_seconds (float): How long an unhealthy model stays out of rotation
+        rate_limiter (RateLimiter): OpenAI request/token limits (None = unlimited)
+        rate_limit_key (str): Id of the OpenAI API key the limits apply to
+    """
+
+    def __init__(self, layer_models: Dict[str, List[str]], layer_min_tiers: Dict[str, int],
+                 model_tiers: Dict[str, int], failure_threshold: int = 3, cooldown_seconds: float = 30.0,
+                 rate_limiter: Optional[RateLimiter] = None, rate_limit_key: str = ''):
+        self.layer_models = layer_models
+        self.layer_min_tiers = layer_min_tiers
+        self.model_tiers = model_tiers
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown_seconds = cooldown_seconds
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self.rate_limiter = rate_limiter
+        self.rate_limit_key = rate_limit_key
+
+    def _tier(self, model: str) -> int:
+        return self.model_tiers.get(model, max(self.model_tiers.values(), default=0))
+
+    def _stats_for(self, layer: str, model: str) -> ModelStats:
+        stats = self._stats.get((layer, model))
+        if stats is None:
+            stats = self._stats[(layer, model)] = ModelStats()
+        return stats
+
+    def candidates(self, layer: str, now: Optional[float] = None) -> List[str]:
+        """
+        Models to try for a layer, best first.
+
+        Healthy models meeting the tier come first (unmeasured ones first so
+        they get measured, then fastest observed), then healthy lower-tier
+        models, then models in cooldown as a last resort.
+        """
+        now = now or time.time()
+        models = self.layer_models.get(layer) or []
+        min_tier = self.layer_min_tiers.get(layer, 0)
+        with self._lock:
+            def rank(item: Tuple[int, str]) -> Tuple:
+                position, model = item
+                stats = self._stats_for(layer, model)
+                group = 0 if self._tier(model) >= min_tier else 1
+                if not stats.healthy(now):
+                    return (2, stats.unhealthy_until, position)
+                # Penalize error-prone models: expected latency including a retry on failure
+                expected = -1.0 if stats.latency_ms is None else stats.latency_ms * (1 + stats.error_rate)
+                return (group, expected, position)
+            return [model for _position, model in sorted(enumerate(models), key=rank)]
+
+    def record(self, layer: str, model: str, latency_ms: float, success: bool, now: Optional[float] = None) -> None:
+        """Update a model's statistics after a call."""
+        now = now or time.time()
+        with self._lock:
+            stats = self._stats_for(layer, model)
+            stats.calls += 1
+            stats.error_rate += EWMA_ALPHA * ((0.0 if success else 1.0) - stats.error_rate)
+            if success:
+                stats.consecutive_failures = 0
+                stats.latency_ms = latency_ms if stats.latency_ms is None else (
+                    stats.latency_ms + EWMA_ALPHA * (latency_ms - stats.latency_ms))
+            else:
+                stats.consecutive_failures += 1
+                if stats.consecutive_failures >= self.failure_threshold:
+                    stats.unhealthy_until = now + self.cooldown_seconds
+                    stats.consecutive_failures = 0
+                    log_event(logger, "model_unhealthy", logging.WARNING, layer=layer, model=model,
+                              cooldown_seconds=self.cooldown_seconds)
+        metrics.inc('llm_requests_total', layer=layer, model=model, outcome='success' if success else 'error')
+        if success:
+            metrics.observe('llm_latency_ms', latency_ms, layer=layer, model=model)
+
+    def call(self, layer: str, fn: Callable[[str], Any], tokens: int = 0,
+             usage: Callable[[Any], Optional[int]] = used_tokens) -> Any:
+        """
+        Run `fn(model)` on the best candidate, failing over to the next on error.
+
+        Args:
+            layer (str): One of LAYERS
+            fn (Callable[[str], Any]): Performs the LLM call with the given model
+            tokens (int): Estimated tokens the call uses (for the OpenAI token limit)
+            usage (Callable[[Any], Optional[int]]): Actual tokens a result used (None if unknown)
+
+        Returns:
+            Any: The first successful result
+
+        Raises:
+            RateLimited: When the API key is out of rate-limit capacity
+            Exception: The last error when every candidate failed
+        """
+        candidates = self.candidates(layer)
+        if not candidates:
+            raise ValueError(f"No models configured for the {layer} layer")
+        last_error: Optional[Exception] = None
+        for model in candidates:
+            if self.rate_limiter is not None:
+                # One bucket per API key: if it has no capacity, no other model does either
+                self.rate_limiter.acquire('openai', self.rate_limit_key, tokens=tokens)
+            start = time.perf_counter()
+            try:
+                result = fn(model)
+            except DeadlineExceeded:
+                # Out of time for the request, not a model problem: stop failing over
+                self._release(tokens)
+                raise
+            except Exception as e:
+                self._release(tokens)
+                if is_rate_limit_error(e) and self.rate_limiter is not None:
+                    # Quota, not health: hold the model back briefly and try the next one
+                    self.rate_limiter.penalize('openai', self.rate_limit_key, retry_after_seconds(e))
+                    log_event(logger, "model_rate_limited", logging.WARNING, layer=layer, model=model)
+                    last_error = e
+                    continue
+                self.record(layer, model, (time.perf_counter() - start) * 1000, success=False)
+                log_event(logger, "model_call_failed", logging.WARNING, layer=layer, model=model, error=str(e))
+                last_error = e
+                continue
+            self.record(layer, model, (time.perf_counter() - start) * 1000, success=True)
+            actual = usage(result)
+            if self.rate_limiter is not None and tokens and actual is not None:
+                self.rate_limiter.settle('openai', self.rate_limit_key, tokens, actual)
+            return result
+        raise last_error
+
+    def _release(self, tokens: int) -> None:
+        # A failed call's reservation is settled to nothing
+        if self.rate_limiter is not None and tokens:
+            self.rate_limiter.settle('openai', self.rate_limit_key, tokens, 0)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current statistics per layer/model (for metrics)."""
+        now = time.time()
+        with self._lock:
+            return {
+                f'{layer}/{model}': {
+                    'latency_ms': round(stats.latency_ms, 1) if stats.latency_ms is not None else None,
+                    'error_rate': round(stats.error_rate, 3),
+                    'calls': stats.calls,
+                    'healthy': stats.healthy(now),
+                }
+                for (layer, model), stats in self._stats.items()
+            }
+
+
+_routers: Dict[tuple, ModelRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def get_model_router(settings: Settings) -> ModelRouter:
+    """
+    Return the shared router for these settings (statistics survive reloads that keep the same models).
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        ModelRouter: Shared router
+    """
+    key = (settings.extraction_model, settings.recommendation_model, settings.formatting_model,
+           settings.model_tiers, settings.extraction_min_tier, settings.recommendation_min_tier,
+           settings.formatting_min_tier, settings.model_failure_threshold, settings.model_cooldown_seconds,
+           settings.openai_requests_per_minute, settings.openai_tokens_per_minute,
+           settings.rate_limit_max_wait_seconds, settings.rate_limit_path, key_id(settings.openai_api_key))
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = _routers[key] = ModelRouter(
+                layer_models={
+                    'extraction': parse_models(settings.extraction_model),
+                    'recommendation': parse_models(settings.recommendation_model),
+                    'formatting': parse_models(settings.formatting_model),
+                },
+                layer_min_tiers={
+                    'extraction': settings.extraction_min_tier,
+                    'recommendation': settings.recommendation_min_tier,
+                    'formatting': settings.formatting_min_tier,
+                },
+                model_tiers=parse_tiers(settings.model_tiers),
+                failure_threshold=settings.model_failure_threshold,
+                cooldown_seconds=settings.model_cooldown_seconds,
+                rate_limiter=get_rate_limiter(settings),
+                rate_limit_key=key_id(settings.openai_api_key),
+            )
+        return router
+
+
+def _collect_metrics() -> Dict[str, float]:
+    values = {}
+    with _routers_lock:
+        routers = list(_routers.values())
+    for router in routers:
+        for name, stats in router.snapshot().items():
+            layer, model = name.split('/', 1)
+            prefix = f'model_router_{layer}_{model.replace("-", "_").replace(".", "_")}'
+            values[f'{prefix}_healthy'] = 1 if stats['healthy'] else 0
+            values[f'{prefix}_error_rate'] = stats['error_rate']
+            if stats['latency_ms'] is not None:
+                values[f'{prefix}_latency_ms'] = stats['latency_ms']
+    return values
+
+
+metrics.register_collector(_collect_metrics)
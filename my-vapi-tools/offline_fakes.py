@@ -0,0 +1,129 @@
+"""
+Fakes shared by the offline tests: settings, an OpenAI client and a SearchAPI fetch.
+
+Tests build a pipeline with `offline_pipeline()`, which needs no API keys and
+makes no network calls. The fake client answers each layer with canned JSON
+(or a test-supplied reply) and can stream, stall and time out like the real
+client.
+"""
+
+import dataclasses
+import logging
+import threading
+import time
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional
+
+from settings import Settings
+from symptom_search_pipeline import SymptomSearchPipeline
+
+SYMPTOMS_JSON = '{"symptoms": ["headache"], "severity": "mild", "duration": null, "context": "none"}'
+MEDICINES_JSON = '{"medicines": ["ibuprofen", "acetaminophen", "aspirin"]}'
+FORMATTED_TEXT = "1. Product - $1.00"
+
+
+def offline_settings(**overrides) -> Settings:
+    """Settings with fake keys and the shared caches (coalescing, semantic cache, catalog) off."""
+    values = dict(openai_api_key="test", searchapi_api_key="test", coalescing_enabled=False,
+                  semantic_cache_enabled=False, catalog_enabled=False)
+    values.update(overrides)
+    return dataclasses.replace(Settings.from_env(), **values)
+
+
+def prompt_layer(system_prompt: str) -> str:
+    """Which pipeline layer a system prompt belongs to: 'layer1', 'layer2' or 'layer4'."""
+    if "symptom extraction" in system_prompt:
+        return 'layer1'
+    if "medical expert" in system_prompt:
+        return 'layer2'
+    return 'layer4'
+
+
+def fake_openai_client(reply: Optional[Callable[[str, str], str]] = None, delays: Optional[Dict[str, float]] = None,
+                       chunk_delay: float = 0.01) -> SimpleNamespace:
+    """
+    Fake OpenAI client.
+
+    Args:
+        reply (Callable[[str, str], str]): (layer, user prompt) → reply text, or None for the canned reply
+        delays (Dict[str, float]): Seconds each layer takes; a call slower than its timeout raises TimeoutError
+        chunk_delay (float): Seconds between streamed chunks
+    """
+    canned = {'layer1': SYMPTOMS_JSON, 'layer2': MEDICINES_JSON, 'layer4': FORMATTED_TEXT}
+    delays = delays or {}
+
+    def create(model, messages, temperature, stream=False, timeout=None, **options):
+        layer = prompt_layer(messages[0]["content"])
+        text = reply(layer, messages[1]["content"]) if reply is not None else None
+        if text is None:
+            text = canned[layer]
+        delay = delays.get(layer, 0.0)
+        if timeout is not None and delay > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Request timed out")
+        time.sleep(delay)
+        if not stream:
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))])
+
+        def chunks():
+            for start in range(0, len(text), 5):
+                time.sleep(chunk_delay)
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text[start:start + 5]))])
+        return chunks()
+    return SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+
+def fake_product(query: str, title: Optional[str] = None) -> Dict:
+    """One raw SearchAPI organic result for a query."""
+    return {"title": title or f"{query} tablets", "rating": 4.5, "reviews": 100, "price": "$5.99",
+            "link": f"https://a/{query}"}
+
+
+def fake_fetch(searched: Optional[List[str]] = None, delay: float = 0.0, delays: Optional[Dict[str, float]] = None,
+               failing: tuple = ()) -> Callable[[str], List[Dict]]:
+    """
+    Fake `_fetch_organic_results`: one product per query.
+
+    Args:
+        searched (List[str]): Receives each query (thread-safe)
+        delay (float): Seconds per search
+        delays (Dict[str, float]): Seconds for specific queries
+        failing (tuple): Queries that raise instead
+    """
+    lock = threading.Lock()
+
+    def fetch(query):
+        if searched is not None:
+            with lock:
+                searched.append(query)
+        time.sleep((delays or {}).get(query, delay))
+        if query in failing:
+            raise RuntimeError(f"SearchAPI failed for {query}")
+        return [fake_product(query)]
+    return fetch
+
+
+def offline_server():
+    """
+    The server module, for Flask's test client.
+
+    Importing it sets up structured logging for the process; the host's (pytest's)
+    root handlers and level are put back afterwards.
+    """
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    try:
+        import symptom_search_server
+    finally:
+        root.handlers = handlers
+        root.setLevel(level)
+    return symptom_search_server
+
+
+def offline_pipeline(client: Optional[SimpleNamespace] = None, fetch: Optional[Callable[[str], List[Dict]]] = None,
+                     **overrides) -> SymptomSearchPipeline:
+    """Pipeline on offline_settings(**overrides) with a fake client and fetch."""
+    pipeline = SymptomSearchPipeline(offline_settings(**overrides))
+    pipeline.client = client if client is not None else fake_openai_client()
+    pipeline._fetch_organic_results = fetch if fetch is not None else fake_fetch()
+    return pipeline
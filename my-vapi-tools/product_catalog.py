@@ -0,0 +1,349 @@
+"""
+Local product catalog backed by SQLite.
+
+Filled from live SearchAPI responses, it answers Layer 3 lookups for the
+small, stable set of OTC medicines we recommend in milliseconds. Each
+stored query remembers when it was fetched; a FreshnessPolicy decides
+whether a lookup can be served as is, served while a background refresh
+runs, or needs a live SearchAPI call.
+
+A query with no entry of its own may borrow the newest entry stored for
+the same canonical medicine ("Advil" → "ibuprofen"). Such a hit is never
+served as fresh, so a refresh stores the query's own results. Products
+stored for other medicines are never returned.
+
+Entries older than the retention period are deleted, and only the most
+recently fetched `max_queries` are kept; products no entry refers to any
+more go with them.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from medicine_names import get_canonicalizer
+from settings import Settings
+
+_PRODUCT_FIELDS = ('title', 'brand', 'price', 'rating', 'reviews', 'link', 'thumbnail', 'is_prime')
+_asin_pattern = re.compile(r'/dp/([A-Z0-9]{10})')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY,
+    product_key TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL,
+    brand TEXT,
+    price TEXT,
+    rating REAL,
+    reviews INTEGER,
+    link TEXT,
+    thumbnail TEXT,
+    is_prime INTEGER,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS queries (
+    query_key TEXT PRIMARY KEY,
+    query TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    result_count INTEGER NOT NULL,
+    canonical_key TEXT
+);
+CREATE TABLE IF NOT EXISTS query_products (
+    query_key TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    product_id INTEGER NOT NULL REFERENCES products(id),
+    PRIMARY KEY (query_key, position)
+);
+CREATE INDEX IF NOT EXISTS query_products_product ON query_products(product_id);
+CREATE INDEX IF NOT EXISTS queries_fetched_at ON queries(fetched_at);
+CREATE INDEX IF NOT EXISTS queries_canonical ON queries(canonical_key, fetched_at);
+"""
+
+# Catalogs created with a full-text index: lookups go by query key, so nothing read it
+_DROP_FULL_TEXT_INDEX = """
+DROP TRIGGER IF EXISTS products_ai;
+DROP TRIGGER IF EXISTS products_au;
+DROP TRIGGER IF EXISTS products_ad;
+DROP TABLE IF EXISTS products_fts;
+"""
+
+
+def query_key(query: str) -> str:
+    """Normalize a search query or medicine name into a catalog key."""
+    return ' '.join(query.lower().split())
+
+
+def product_key(result: Dict) -> str:
+    """Stable identity for a product: its ASIN when the link has one, otherwise the link or title."""
+    link = result.get('link') or ''
+    match = _asin_pattern.search(link)
+    if match:
+        return match.group(1)
+    asin = result.get('asin')
+    if asin:
+        return str(asin)
+    return link or query_key(result.get('title', ''))
+
+
+class FreshnessPolicy:
+    """
+    Decides when catalog entries need a live refresh.
+
+    - age <= max_age_seconds: fresh, served directly
+    - age <= stale_serve_seconds: served, and a background refresh is scheduled
+    - older: a live SearchAPI call is required
+    """
+
+    FRESH = 'fresh'
+    STALE = 'stale'
+    EXPIRED = 'expired'
+
+    def __init__(self, max_age_seconds: float, stale_serve_seconds: float):
+        self.max_age_seconds = max_age_seconds
+        self.stale_serve_seconds = max(stale_serve_seconds, max_age_seconds)
+
+    def classify(self, fetched_at: float, now: Optional[float] = None) -> str:
+        age = (now or time.time()) - fetched_at
+        if age <= self.max_age_seconds:
+            return self.FRESH
+        if age <= self.stale_serve_seconds:
+            return self.STALE
+        return self.EXPIRED
+
+
+class CatalogHit:
+    """Result of a catalog lookup."""
+
+    __slots__ = ('results', 'fetched_at', 'freshness', 'source')
+
+    def __init__(self, results: List[Dict], fetched_at: float, freshness: str, source: str):
+        self.results = results
+        self.fetched_at = fetched_at
+        self.freshness = freshness
+        self.source = source  # 'query' (exact medicine/query match) or 'canonical' (same medicine, other wording)
+
+
+class ProductCatalog:
+    """
+    SQLite product catalog. Safe to share between threads (one connection per thread).
+
+    Example:
+        catalog = ProductCatalog('/var/lib/carespeak/catalog.db', FreshnessPolicy(6 * 3600, 24 * 3600))
+        catalog.store('ibuprofen', organic_results)
+        hit = catalog.lookup('Ibuprofen')
+
+    Args:
+        path (str): SQLite database file
+        policy (FreshnessPolicy): When entries need a refresh
+        canonical (Callable[[str], str]): Query → canonical medicine key for the fallback (None disables it)
+        retention_seconds (float): Entries fetched longer ago are deleted (0 = kept)
+        max_queries (int): Most entries kept, newest first (0 = no limit)
+    """
+
+    def __init__(self, path: str, policy: FreshnessPolicy, canonical: Optional[Callable[[str], str]] = None,
+                 retention_seconds: float = 0, max_queries: int = 0):
+        self.path = path
+        self.policy = policy
+        self.canonical = canonical
+        self.retention_seconds = retention_seconds
+        self.max_queries = max_queries
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        with self._write_lock, connection:
+            columns = {row['name'] for row in connection.execute("PRAGMA table_info(queries)")}
+            if columns and 'canonical_key' not in columns:
+                # Catalogs created before the canonical fallback
+                connection.execute('ALTER TABLE queries ADD COLUMN canonical_key TEXT')
+        connection.executescript(_DROP_FULL_TEXT_INDEX + _SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            connection.row_factory = sqlite3.Row
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def store(self, query: str, organic_results: List[Dict], fetched_at: Optional[float] = None) -> None:
+        """
+        Upsert products from a SearchAPI response and record them under `query`.
+
+        Args:
+            query (str): Query or medicine name the results were fetched for
+            organic_results (List[Dict]): Raw SearchAPI organic results, in ranking order
+            fetched_at (float): Fetch timestamp (defaults to now)
+        """
+        fetched_at = fetched_at or time.time()
+        key = query_key(query)
+        canonical_key = query_key(self.canonical(query)) if self.canonical is not None else key
+        connection = self._connection()
+        with self._write_lock, connection:
+            connection.execute('DELETE FROM query_products WHERE query_key = ?', (key,))
+            position = 0
+            for result in organic_results:
+                if not result.get('title'):
+                    continue
+                values = (
+                    product_key(result), result.get('title', ''), result.get('brand', ''),
+                    str(result.get('price', 'Price not available')), _to_number(result.get('rating'), float),
+                    _to_number(result.get('reviews'), int), result.get('link', ''), result.get('thumbnail', ''),
+                    1 if result.get('is_prime') else 0, fetched_at,
+                )
+                connection.execute(
+                    """
+                    INSERT INTO products (product_key, title, brand, price, rating, reviews, link, thumbnail, is_prime, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(product_key) DO UPDATE SET
+                        title=excluded.title, brand=excluded.brand, price=excluded.price, rating=excluded.rating,
+                        reviews=excluded.reviews, link=excluded.link, thumbnail=excluded.thumbnail,
+                        is_prime=excluded.is_prime, updated_at=excluded.updated_at
+                    """,
+                    values,
+                )
+                product_id = connection.execute(
+                    'SELECT id FROM products WHERE product_key = ?', (values[0],)
+                ).fetchone()[0]
+                connection.execute(
+                    'INSERT OR REPLACE INTO query_products (query_key, position, product_id) VALUES (?, ?, ?)',
+                    (key, position, product_id),
+                )
+                position += 1
+            connection.execute(
+                'INSERT OR REPLACE INTO queries (query_key, query, fetched_at, result_count, canonical_key)'
+                ' VALUES (?, ?, ?, ?, ?)',
+                (key, query, fetched_at, position, canonical_key),
+            )
+            self._prune(connection)
+
+    def _prune(self, connection: sqlite3.Connection) -> None:
+        # Drop entries past retention and beyond max_queries, then the products nothing refers to
+        removed = 0
+        if self.retention_seconds:
+            removed += connection.execute(
+                'DELETE FROM queries WHERE fetched_at < ?', (time.time() - self.retention_seconds,)
+            ).rowcount
+        if self.max_queries:
+            removed += connection.execute(
+                'DELETE FROM queries WHERE query_key NOT IN '
+                '(SELECT query_key FROM queries ORDER BY fetched_at DESC LIMIT ?)', (self.max_queries,)
+            ).rowcount
+        if removed:
+            connection.execute('DELETE FROM query_products WHERE query_key NOT IN (SELECT query_key FROM queries)')
+            connection.execute('DELETE FROM products WHERE id NOT IN (SELECT product_id FROM query_products)')
+
+    def fetched_at(self, query: str) -> Optional[float]:
+        """When `query` was last fetched live, or None if it never was."""
+        row = self._connection().execute(
+            'SELECT fetched_at FROM queries WHERE query_key = ?', (query_key(query),)
+        ).fetchone()
+        return row['fetched_at'] if row is not None else None
+
+    def lookup(self, query: str, limit: int = 20) -> Optional[CatalogHit]:
+        """
+        Look up products for a query or medicine name.
+
+        Tries the exact (normalized) query first, then the newest entry for
+        the same canonical medicine, which is served as stale at best.
+
+        Args:
+            query (str): Query or medicine name
+            limit (int): Maximum number of products to return
+
+        Returns:
+            Optional[CatalogHit]: Products in stored ranking order, or None on a miss
+        """
+        connection = self._connection()
+        key = query_key(query)
+        row = connection.execute('SELECT fetched_at FROM queries WHERE query_key = ?', (key,)).fetchone()
+        if row is not None:
+            fetched_at = row['fetched_at']
+            return CatalogHit(self._products(key, limit), fetched_at, self.policy.classify(fetched_at), 'query')
+
+        if self.canonical is not None:
+            row = connection.execute(
+                'SELECT query_key, fetched_at FROM queries WHERE canonical_key = ? AND result_count > 0 '
+                'ORDER BY fetched_at DESC LIMIT 1', (query_key(self.canonical(query)),)
+            ).fetchone()
+            if row is not None:
+                freshness = self.policy.classify(row['fetched_at'])
+                if freshness == FreshnessPolicy.FRESH:
+                    freshness = FreshnessPolicy.STALE
+                return CatalogHit(self._products(row['query_key'], limit), row['fetched_at'], freshness, 'canonical')
+        return None
+
+    def _products(self, key: str, limit: int) -> List[Dict]:
+        rows = self._connection().execute(
+            """
+            SELECT p.* FROM query_products qp JOIN products p ON p.id = qp.product_id
+            WHERE qp.query_key = ? ORDER BY qp.position LIMIT ?
+            """,
+            (key, limit),
+        ).fetchall()
+        return [_row_to_result(r) for r in rows]
+
+    def stats(self) -> Dict[str, int]:
+        """Catalog size for monitoring."""
+        connection = self._connection()
+        return {
+            'products': connection.execute('SELECT COUNT(*) FROM products').fetchone()[0],
+            'queries': connection.execute('SELECT COUNT(*) FROM queries').fetchone()[0],
+        }
+
+
+def _to_number(value, cast):
+    if isinstance(value, str):
+        value = value.replace(',', '').strip()
+    try:
+        return cast(float(value or 0))
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+def _row_to_result(row: sqlite3.Row) -> Dict:
+    # Same shape as a raw SearchAPI organic result, so downstream code is unchanged
+    result = {field: row[field] for field in _PRODUCT_FIELDS}
+    result['is_prime'] = bool(result['is_prime'])
+    if result['rating'] == int(result['rating']):
+        result['rating'] = int(result['rating'])
+    return result
+
+
+_catalogs: Dict[tuple, ProductCatalog] = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(settings: Settings) -> Optional[ProductCatalog]:
+    """
+    Return the shared catalog for these settings, or None when the catalog is disabled.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        Optional[ProductCatalog]: Shared catalog instance
+    """
+    if not settings.catalog_enabled:
+        return None
+    key = (settings.catalog_path, settings.catalog_max_age_seconds, settings.catalog_stale_serve_seconds,
+           settings.catalog_canonical_fallback, settings.catalog_retention_seconds, settings.catalog_max_queries)
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None:
+            canonicalizer = get_canonicalizer(settings) if settings.catalog_canonical_fallback else None
+            catalog = ProductCatalog(
+                settings.catalog_path,
+                FreshnessPolicy(settings.catalog_max_age_seconds, settings.catalog_stale_serve_seconds),
+                canonical=canonicalizer.canonical if canonicalizer is not None else None,
+                retention_seconds=settings.catalog_retention_seconds,
+                max_queries=settings.catalog_max_queries,
+            )
+            _catalogs[key] = catalog
+        return catalog
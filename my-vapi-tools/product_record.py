@@ -0,0 +1,139 @@
+"""
+Compact product records.
+
+Search results are held as `__slots__` objects instead of nine-key dicts:
+the price is kept as SearchAPI displayed it and parsed once into integer
+cents for ranking and filters, brand and medicine strings are
+interned (a handful of brands repeat across thousands of cached results),
+and dict/JSON conversion only happens at the edges (API responses and the
+Layer 4 prompt).
+"""
+
+import sys
+from typing import Dict, Optional
+
+from product_catalog import product_key
+from ranking import parse_price
+
+PRICE_NOT_AVAILABLE = "Price not available"
+
+
+def _intern(value) -> str:
+    return sys.intern(value) if isinstance(value, str) else ''
+
+
+def _display_price(price) -> str:
+    # Shown as SearchAPI gave it (currency, ranges, "2 for $10"); never rebuilt from cents
+    if isinstance(price, dict):
+        price = price.get('raw', price.get('value'))
+    if isinstance(price, str) and price.strip():
+        return price
+    if isinstance(price, (int, float)) and not isinstance(price, bool):
+        return str(price)
+    return PRICE_NOT_AVAILABLE
+
+
+def _number(value, cast):
+    if isinstance(value, str):
+        value = value.replace(',', '').strip()
+    try:
+        return cast(float(value or 0))
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+class ProductRecord:
+    """One Amazon product. Treat instances as immutable; they are shared between requests and caches."""
+
+    __slots__ = ('key', 'title', 'brand', 'price', 'price_cents', 'rating', 'reviews', 'link', 'thumbnail',
+                 'is_prime', 'medicine_name')
+
+    def __init__(self, key: str, title: str, brand: str, price: str, price_cents: Optional[int], rating: float,
+                 reviews: int, link: str, thumbnail: str, is_prime: bool, medicine_name: Optional[str] = None):
+        self.key = key
+        self.title = title
+        self.brand = brand
+        self.price = price
+        self.price_cents = price_cents
+        self.rating = rating
+        self.reviews = reviews
+        self.link = link
+        self.thumbnail = thumbnail
+        self.is_prime = is_prime
+        self.medicine_name = medicine_name
+
+    @classmethod
+    def from_search_result(cls, result: Dict, medicine_name: Optional[str] = None) -> 'ProductRecord':
+        """
+        Build a record from a raw SearchAPI organic result.
+
+        Args:
+            result (Dict): Raw organic result
+            medicine_name (str): Medicine the result was found for (pipeline only)
+
+        Returns:
+            ProductRecord: Parsed record
+        """
+        price = parse_price(result.get("price"))
+        rating = result.get("rating", 0)
+        return cls(
+            key=product_key(result),
+            title=result.get("title", "") or "",
+            brand=_intern(result.get("brand", "")),
+            price=_display_price(result.get("price")),
+            price_cents=None if price is None else int(round(price * 100)),
+            rating=rating if isinstance(rating, (int, float)) else _number(rating, float),
+            reviews=_number(result.get("reviews", 0), int),
+            link=result.get("link", "") or "",
+            thumbnail=result.get("thumbnail", "") or "",
+            is_prime=bool(result.get("is_prime", False)),
+            medicine_name=_intern(medicine_name) if medicine_name is not None else None,
+        )
+
+    @property
+    def description(self) -> str:
+        """Title with rating and Prime details, as spoken by the tool."""
+        description = self.title
+        if self.rating > 0 and self.reviews > 0:
+            description += f" (Rated {self.rating} out of 5 stars with {self.reviews} reviews)"
+        if self.is_prime:
+            description += " - Prime eligible"
+        return description
+
+    def to_dict(self, include_description: bool = False) -> Dict:
+        """
+        Full dict for API responses (same keys the services always returned).
+
+        Args:
+            include_description (bool): Add the spoken description (tool responses)
+
+        Returns:
+            Dict: Product fields
+        """
+        data = {
+            "title": self.title,
+            "brand": self.brand,
+            "price": self.price,
+            "rating": self.rating,
+            "reviews": self.reviews,
+            "link": self.link,
+            "thumbnail": self.thumbnail,
+            "is_prime": self.is_prime,
+        }
+        if self.medicine_name is not None:
+            data["medicine_name"] = self.medicine_name
+        if include_description:
+            data["description"] = self.description
+        return data
+
+    def to_prompt_dict(self) -> Dict:
+        """Only the fields the Layer 4 prompt needs (product name and price)."""
+        return {"title": self.title, "brand": self.brand, "price": self.price}
+
+    def with_medicine(self, medicine_name: str) -> 'ProductRecord':
+        """Copy of this record attributed to another medicine."""
+        return ProductRecord(self.key, self.title, self.brand, self.price, self.price_cents, self.rating, self.reviews,
+                             self.link, self.thumbnail, self.is_prime, _intern(medicine_name))
+
+    def __repr__(self) -> str:
+        return f"ProductRecord(key={self.key!r}, title={self.title[:40]!r}, price={self.price!r})"
@@ -0,0 +1,114 @@
+"""
+Search query planning for the symptom search tool.
+
+A conversation often mentions several symptoms ("headache and fever").
+Searching only the first one misses the rest, and one search per
+symptom wastes SearchAPI calls when a single product covers several
+symptoms. The planner picks the smallest set of queries that covers
+every detected symptom. It considers the per-symptom queries and the
+merged queries in COMBINED_QUERIES, such as "cold and flu relief".
+
+Queries whose results are already cached cost no SearchAPI call. Among
+plans with the same coverage, the planner therefore prefers the one
+with the fewest uncached queries, and then the one with the fewest
+queries.
+"""
+
+from itertools import combinations
+from typing import Callable, Dict, FrozenSet, List, Optional, Tuple
+
+# Merged queries and the symptoms each one covers
+COMBINED_QUERIES = {
+    "pain reliever fever reducer": ("headache", "fever", "muscle pain", "back pain", "joint pain", "toothache"),
+    "cold and flu relief": ("fever", "cough", "sore throat", "congestion", "runny nose"),
+    "allergy relief medicine": ("allergies", "seasonal allergies", "runny nose", "congestion"),
+    "upset stomach and heartburn relief": ("nausea", "upset stomach", "indigestion", "heartburn"),
+    "anti itch rash cream": ("rash", "itching"),
+    "migraine and headache relief": ("migraine", "headache"),
+    "stress and anxiety relief": ("stress", "anxiety"),
+}
+
+
+class QueryPlan:
+    """Queries chosen for a set of symptoms."""
+
+    __slots__ = ('queries', 'covers', 'cached', 'uncovered')
+
+    def __init__(self, queries: List[str], covers: Dict[str, List[str]], cached: List[str], uncovered: List[str]):
+        self.queries = queries
+        self.covers = covers
+        self.cached = cached
+        self.uncovered = uncovered
+
+    def to_dict(self) -> Dict:
+        return {
+            "queries": [
+                {"query": query, "symptoms": self.covers[query], "cached": query in self.cached}
+                for query in self.queries
+            ],
+            "uncovered_symptoms": self.uncovered
+        }
+
+
+def detect_symptoms(text: str, mappings: Dict[str, str]) -> List[str]:
+    """
+    Symptoms from `mappings` mentioned in the text, in mapping order.
+
+    A symptom contained in another detected one ("allergies" in "seasonal
+    allergies") is dropped.
+    """
+    text_lower = text.lower()
+    found = [symptom for symptom in mappings if symptom in text_lower]
+    return [symptom for symptom in found if not any(symptom != other and symptom in other for other in found)]
+
+
+def _candidates(symptoms: List[str], mappings: Dict[str, str]) -> List[Tuple[str, FrozenSet[str]]]:
+    detected = set(symptoms)
+    covers: Dict[str, set] = {}
+    # Merged queries are only worth it when they replace at least two searches
+    for query, covered in COMBINED_QUERIES.items():
+        matched = detected.intersection(covered)
+        if len(matched) >= 2:
+            covers[query] = matched
+    for symptom in symptoms:
+        covers.setdefault(mappings[symptom], set()).add(symptom)
+    return [(query, frozenset(covered)) for query, covered in covers.items()]
+
+
+def plan_queries(text: str, mappings: Dict[str, str], is_cached: Optional[Callable[[str], bool]] = None,
+                 max_queries: int = 3) -> Optional[QueryPlan]:
+    """
+    Choose the queries to search for the symptoms in a text.
+
+    Args:
+        text (str): User's symptoms
+        mappings (Dict[str, str]): Symptom → its own search query
+        is_cached (Callable[[str], bool]): Whether a query can be answered without a SearchAPI call
+        max_queries (int): Most queries in a plan
+
+    Returns:
+        Optional[QueryPlan]: The plan, or None if no known symptom is mentioned
+    """
+    symptoms = detect_symptoms(text, mappings)
+    if not symptoms:
+        return None
+    candidates = _candidates(symptoms, mappings)
+    cached = {query for query, _ in candidates if is_cached is not None and is_cached(query)}
+
+    # Few symptoms and candidates per turn: an exhaustive search stays small
+    best_key, best = None, ()
+    for size in range(1, min(max(1, max_queries), len(candidates)) + 1):
+        for combo in combinations(candidates, size):
+            covered = frozenset().union(*(covered for _, covered in combo))
+            key = (-len(covered), sum(query not in cached for query, _ in combo), size)
+            if best_key is None or key < best_key:
+                best_key, best = key, combo
+
+    queries = [query for query, _ in best]
+    covered = set().union(*(covered for _, covered in best))
+    return QueryPlan(
+        queries=queries,
+        covers={query: [symptom for symptom in symptoms if symptom in covered_by] for query, covered_by in best},
+        cached=[query for query in queries if query in cached],
+        uncovered=[symptom for symptom in symptoms if symptom not in covered]
+    )
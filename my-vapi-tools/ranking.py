@@ -0,0 +1,170 @@
+"""
+Multi-signal ranking of Amazon search results.
+
+The whole candidate set is scored in one vectorized NumPy pass combining
+star rating, log review count, Prime eligibility, parsed price and query
+relevance. For relevance, all titles are lowercased and tokenized in one
+pass over their joined text (a byte translation table, not a regex per
+title); per title only a C-level split and a set intersection with the
+query's tokens remain. Duplicates of the same product (same ASIN) found
+under several medicines are collapsed, and the top-K are selected with a
+partial sort, so the cost stays flat as the number of candidates grows.
+"""
+
+import re
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from product_record import ProductRecord
+
+# Relative weight of each signal in the final score
+RATING_WEIGHT = 0.35
+REVIEWS_WEIGHT = 0.25
+RELEVANCE_WEIGHT = 0.25
+PRICE_WEIGHT = 0.10
+PRIME_WEIGHT = 0.05
+
+_price_pattern = re.compile(r'(\d[\d,]*(?:\.\d+)?)')
+_token_pattern = re.compile(r'[a-z0-9]+')
+# Same tokens as _token_pattern for lowercased text encoded to ASCII: letters and digits are kept,
+# every other byte becomes a space and the \0 between titles a newline
+_TOKEN_BYTES = bytes(byte if chr(byte) in '0123456789abcdefghijklmnopqrstuvwxyz' else 10 if byte == 0 else 32
+                     for byte in range(256))
+
+
+def parse_price(price) -> Optional[float]:
+    """
+    Parse a SearchAPI price ("$12.99", "12.99", {"value": 12.99}, 12.99) into dollars.
+
+    Returns:
+        Optional[float]: Price in dollars, or None if unavailable
+    """
+    if isinstance(price, dict):
+        price = price.get('value', price.get('raw'))
+    if isinstance(price, (int, float)):
+        return float(price)
+    if isinstance(price, str):
+        match = _price_pattern.search(price)
+        if match:
+            return float(match.group(1).replace(',', ''))
+    return None
+
+
+def _query_tokens(query: str) -> frozenset:
+    return frozenset(token for token in _token_pattern.findall(query.lower()) if len(token) > 2)
+
+
+def _title_tokens(titles: Sequence[str]) -> List[List[bytes]]:
+    # One lower/encode/translate pass over all titles joined by \0; only the final split is per title
+    text = '\0'.join(titles).lower().encode('ascii', 'replace')
+    rows = text.translate(_TOKEN_BYTES).split(b'\n')
+    if len(rows) != len(titles):
+        # A title contained \0 itself
+        rows = [title.lower().encode('ascii', 'replace').translate(_TOKEN_BYTES) for title in titles]
+    return [row.split() for row in rows]
+
+
+def relevances(titles: Sequence[str], queries: Sequence[str]) -> np.ndarray:
+    """
+    Fraction of each query's meaningful tokens that appear in its title, for all titles at once.
+
+    Args:
+        titles (Sequence[str]): Product titles
+        queries (Sequence[str]): Query each title was found for (same length as titles)
+
+    Returns:
+        np.ndarray: One relevance in [0, 1] per title
+    """
+    scores = np.zeros(len(titles))
+    token_cache: Dict[str, frozenset] = {}
+    for index, (title_tokens, query) in enumerate(zip(_title_tokens(titles), queries)):
+        query_tokens = token_cache.get(query)
+        if query_tokens is None:
+            query_tokens = token_cache[query] = frozenset(token.encode() for token in _query_tokens(query))
+        if query_tokens:
+            scores[index] = len(query_tokens.intersection(title_tokens)) / len(query_tokens)
+    return scores
+
+
+def score_results(results: Sequence['ProductRecord'], queries: Sequence[str]) -> np.ndarray:
+    """
+    Score every result in one vectorized pass.
+
+    Args:
+        results (Sequence[ProductRecord]): Product records
+        queries (Sequence[str]): Query each result was found for (same length as results)
+
+    Returns:
+        np.ndarray: One score per result (higher is better)
+    """
+    count = len(results)
+    if count == 0:
+        return np.zeros(0)
+
+    ratings = np.empty(count)
+    reviews = np.empty(count)
+    prices = np.empty(count)
+    prime = np.empty(count)
+    for index, result in enumerate(results):
+        ratings[index] = result.rating
+        reviews[index] = result.reviews
+        prices[index] = np.nan if result.price_cents is None else result.price_cents
+        prime[index] = 1.0 if result.is_prime else 0.0
+    relevance = relevances([result.title for result in results], queries)
+
+    rating_score = np.clip(ratings, 0, 5) / 5.0
+    log_reviews = np.log1p(np.clip(reviews, 0, None))
+    review_score = log_reviews / log_reviews.max() if log_reviews.max() > 0 else np.zeros(count)
+
+    # Cheaper is better, normalized within the candidate set; unknown prices score neutrally
+    known = ~np.isnan(prices)
+    price_score = np.full(count, 0.5)
+    if known.any():
+        low, high = prices[known].min(), prices[known].max()
+        if high > low:
+            price_score[known] = 1.0 - (prices[known] - low) / (high - low)
+
+    return (RATING_WEIGHT * rating_score + REVIEWS_WEIGHT * review_score + RELEVANCE_WEIGHT * relevance
+            + PRICE_WEIGHT * price_score + PRIME_WEIGHT * prime)
+
+
+def rank_results(results: List['ProductRecord'], queries, top_k: Optional[int] = None) -> List['ProductRecord']:
+    """
+    Score, dedupe by product identity and select the top-K results.
+
+    Args:
+        results (List[ProductRecord]): Candidate records
+        queries (str or Sequence[str]): One query for all results, or the query per result
+        top_k (int): Number of results to keep (None keeps all unique results)
+
+    Returns:
+        List[ProductRecord]: Unique records, best first
+    """
+    if not results:
+        return []
+    if isinstance(queries, str):
+        queries = [queries] * len(results)
+    scores = score_results(results, queries)
+
+    # Keep only the best-scoring copy of each product
+    best_by_key: Dict[str, int] = {}
+    for index, result in enumerate(results):
+        current = best_by_key.get(result.key)
+        if current is None or scores[index] > scores[current]:
+            best_by_key[result.key] = index
+    unique = np.fromiter(best_by_key.values(), dtype=np.intp, count=len(best_by_key))
+    unique_scores = scores[unique]
+
+    k = len(unique) if top_k is None else max(0, min(top_k, len(unique)))
+    if k == 0:
+        return []
+    if k < len(unique):
+        # Partial sort: O(n) selection of the top k, then sort only those k
+        selected = np.argpartition(-unique_scores, k - 1)[:k]
+    else:
+        selected = np.arange(len(unique))
+    # Best score first; ties keep their original order
+    ordered = selected[np.lexsort((unique[selected], -unique_scores[selected]))]
+    return [results[unique[i]] for i in ordered]
@@ -0,0 +1,369 @@
+"""
+Client-side token-bucket rate limiting for SearchAPI and OpenAI.
+
+Each (upstream, key, kind) pair has its own bucket: SearchAPI requests per
+API key, and OpenAI requests and tokens per API key (OpenAI enforces its
+limits per key and organization, not per model). Buckets refill at the
+configured per-minute limit and allow ten seconds' worth of burst.
+
+By default buckets live in the process and are shared between its
+threads. With RATE_LIMIT_PATH set they live in a SQLite file, so every
+worker on the host draws from the same buckets.
+
+`acquire()` reserves capacity and sleeps for the reservation. If the wait
+would exceed `max_wait_seconds` it raises `RateLimited` with the wait
+instead, so the caller can serve a cached or fallback answer. A request
+larger than the burst is charged in full, so it waits (or is rejected) in
+proportion to its size. OpenAI token reservations are estimates; `settle()`
+refunds or charges the difference once the call reports its actual usage.
+A 429 from an upstream drains the bucket for the Retry-After period.
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import metrics
+from settings import Settings
+
+# Seconds of traffic a full bucket allows in one burst
+BURST_SECONDS = 10.0
+
+
+class RateLimited(Exception):
+    """Raised when a call would have to wait longer than allowed for rate-limit capacity."""
+
+    def __init__(self, upstream: str, wait_seconds: float):
+        super().__init__(f"{upstream} rate limit: would wait {wait_seconds:.1f}s")
+        self.upstream = upstream
+        self.wait_seconds = wait_seconds
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for HTTP 429 errors from requests or the OpenAI SDK."""
+    status = getattr(error, 'status_code', None)
+    if status is None:
+        status = getattr(getattr(error, 'response', None), 'status_code', None)
+    return status == 429
+
+
+def retry_after_seconds(error: Exception, default: float = 10.0) -> float:
+    """The Retry-After header of a 429 error, if present."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after') or headers.get('Retry-After') or default)
+    except (TypeError, ValueError):
+        return default
+
+
+def estimate_tokens(messages: List[Dict[str, str]], max_tokens: int) -> int:
+    """Rough token cost of a chat completion: prompt characters / 4 plus the completion limit."""
+    return sum(len(message.get('content') or '') for message in messages) // 4 + max_tokens
+
+
+def used_tokens(response: Any) -> Optional[int]:
+    """Tokens a chat completion actually used (its `usage.total_tokens`), or None when not reported."""
+    total = getattr(getattr(response, 'usage', None), 'total_tokens', None)
+    return total if isinstance(total, int) else None
+
+
+def key_id(secret: Optional[str]) -> str:
+    """Short, non-reversible identifier for an API key (safe for metrics and logs)."""
+    return hashlib.sha256((secret or '').encode()).hexdigest()[:8]
+
+
+class TokenBucket:
+    """
+    In-process token bucket, shared between threads.
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (float): Maximum tokens held
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def reserve(self, amount: float, max_wait: float) -> float:
+        """
+        Take `amount` tokens, going into debt if needed.
+
+        An amount larger than the capacity is charged in full: the caller
+        waits until the bucket could have held it.
+
+        Returns:
+            float: Seconds the caller must wait before using the reservation
+
+        Raises:
+            RateLimited: If the wait would exceed `max_wait` (nothing is reserved)
+        """
+        with self._lock:
+            self._refill()
+            wait = max(0.0, (amount - self._tokens) / self.rate)
+            if wait > max_wait:
+                raise RateLimited('', wait)
+            self._tokens -= amount
+            return wait
+
+    def refund(self, amount: float) -> None:
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+    def charge(self, amount: float) -> None:
+        """Take `amount` more tokens without waiting (usage above the reservation)."""
+        with self._lock:
+            self._refill()
+            self._tokens -= amount
+
+    def wait_time(self, amount: float) -> float:
+        with self._lock:
+            self._refill()
+            return max(0.0, (amount - self._tokens) / self.rate)
+
+    def penalize(self, seconds: float) -> None:
+        """Empty the bucket so it takes `seconds` to have capacity again (after a 429)."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -self.rate * seconds)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self._tokens
+
+
+class SQLiteTokenBucket(TokenBucket):
+    """
+    Token bucket stored in SQLite so several worker processes share it.
+
+    Args:
+        path (str): SQLite file shared by the workers
+        name (str): Bucket name
+        rate (float): Tokens added per second
+        capacity (float): Maximum tokens held
+    """
+
+    def __init__(self, path: str, name: str, rate: float, capacity: float):
+        self.path = path
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL, updated REAL)')
+            connection.execute('INSERT OR IGNORE INTO buckets VALUES (?, ?, ?)', (name, capacity, time.time()))
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _update(self, change) -> float:
+        # BEGIN IMMEDIATE serializes read-modify-write across processes
+        connection = self._connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            tokens, updated = connection.execute(
+                'SELECT tokens, updated FROM buckets WHERE name = ?', (self.name,)).fetchone()
+            now = time.time()
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            tokens, result = change(tokens)
+            connection.execute('UPDATE buckets SET tokens = ?, updated = ? WHERE name = ?', (tokens, now, self.name))
+            connection.execute('COMMIT')
+            return result
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+    def reserve(self, amount: float, max_wait: float) -> float:
+        def change(tokens: float) -> Tuple[float, float]:
+            wait = max(0.0, (amount - tokens) / self.rate)
+            if wait > max_wait:
+                raise RateLimited('', wait)
+            return tokens - amount, wait
+        return self._update(change)
+
+    def refund(self, amount: float) -> None:
+        self._update(lambda tokens: (min(self.capacity, tokens + amount), 0.0))
+
+    def charge(self, amount: float) -> None:
+        self._update(lambda tokens: (tokens - amount, 0.0))
+
+    def wait_time(self, amount: float) -> float:
+        return self._update(lambda tokens: (tokens, max(0.0, (amount - tokens) / self.rate)))
+
+    def penalize(self, seconds: float) -> None:
+        self._update(lambda tokens: (min(tokens, -self.rate * seconds), 0.0))
+
+    def available(self) -> float:
+        return self._update(lambda tokens: (tokens, tokens))
+
+
+class RateLimiter:
+    """
+    Buckets per (upstream, key, kind), created on first use.
+
+    Args:
+        limits_per_minute (Dict[Tuple[str, str], float]): (upstream, kind) → limit per minute (0 = unlimited)
+        max_wait_seconds (float): Longest acquire() may sleep before raising RateLimited
+        path (str): SQLite file to share buckets across workers ("" keeps them in-process)
+    """
+
+    def __init__(self, limits_per_minute: Dict[Tuple[str, str], float], max_wait_seconds: float, path: str = ''):
+        self.limits_per_minute = limits_per_minute
+        self.max_wait_seconds = max_wait_seconds
+        self.path = path
+        self._lock = threading.Lock()
+        self._buckets: Dict[Tuple[str, str, str], TokenBucket] = {}
+
+    def _bucket(self, upstream: str, key: str, kind: str) -> Optional[TokenBucket]:
+        limit = self.limits_per_minute.get((upstream, kind), 0)
+        if limit <= 0:
+            return None
+        with self._lock:
+            bucket = self._buckets.get((upstream, key, kind))
+            if bucket is None:
+                rate = limit / 60.0
+                capacity = max(1.0, rate * BURST_SECONDS)
+                if self.path:
+                    bucket = SQLiteTokenBucket(self.path, f'{upstream}/{key}/{kind}', rate, capacity)
+                else:
+                    bucket = TokenBucket(rate, capacity)
+                self._buckets[(upstream, key, kind)] = bucket
+            return bucket
+
+    def _amounts(self, requests: int, tokens: int) -> List[Tuple[str, int]]:
+        return [(kind, amount) for kind, amount in (('requests', requests), ('tokens', tokens)) if amount > 0]
+
+    def wait_time(self, upstream: str, key: str, requests: int = 1, tokens: int = 0) -> float:
+        """Seconds a call would currently have to wait (without reserving anything)."""
+        waits = [bucket.wait_time(amount) for kind, amount in self._amounts(requests, tokens)
+                 for bucket in [self._bucket(upstream, key, kind)] if bucket is not None]
+        return max(waits, default=0.0)
+
+    def acquire(self, upstream: str, key: str, requests: int = 1, tokens: int = 0,
+                max_wait: Optional[float] = None) -> float:
+        """
+        Reserve capacity for a call and wait until it may be made.
+
+        Args:
+            upstream (str): 'searchapi' or 'openai'
+            key (str): API key id
+            requests (int): Requests the call uses
+            tokens (int): Tokens the call is estimated to use
+            max_wait (float): Override for max_wait_seconds
+
+        Returns:
+            float: Seconds waited
+
+        Raises:
+            RateLimited: If the wait would exceed the maximum (nothing is reserved)
+        """
+        max_wait = self.max_wait_seconds if max_wait is None else max_wait
+        reserved: List[Tuple[TokenBucket, int]] = []
+        wait = 0.0
+        try:
+            for kind, amount in self._amounts(requests, tokens):
+                bucket = self._bucket(upstream, key, kind)
+                if bucket is not None:
+                    wait = max(wait, bucket.reserve(amount, max_wait))
+                    reserved.append((bucket, amount))
+        except RateLimited as e:
+            for bucket, amount in reserved:
+                bucket.refund(amount)
+            metrics.inc('rate_limited_total', upstream=upstream, action='rejected')
+            raise RateLimited(upstream, e.wait_seconds)
+        for kind, amount in self._amounts(requests, tokens):
+            metrics.inc('rate_limit_consumed_total', amount, upstream=upstream, kind=kind)
+        if wait > 0:
+            metrics.inc('rate_limited_total', upstream=upstream, action='waited')
+            metrics.observe('rate_limit_wait_ms', wait * 1000, upstream=upstream)
+            time.sleep(wait)
+        return wait
+
+    def settle(self, upstream: str, key: str, reserved_tokens: int, actual_tokens: int) -> None:
+        """Refund or charge the difference between a call's token reservation and its actual usage."""
+        bucket = self._bucket(upstream, key, 'tokens')
+        difference = actual_tokens - reserved_tokens
+        if bucket is None or difference == 0:
+            return
+        if difference > 0:
+            bucket.charge(difference)
+            metrics.inc('rate_limit_consumed_total', difference, upstream=upstream, kind='tokens')
+        else:
+            bucket.refund(-difference)
+        metrics.inc('rate_limit_settled_tokens_total', abs(difference), upstream=upstream,
+                    direction='charged' if difference > 0 else 'refunded')
+
+    def penalize(self, upstream: str, key: str, seconds: float) -> None:
+        """Block an upstream key for `seconds` after it answered 429."""
+        metrics.inc('rate_limited_total', upstream=upstream, action='upstream_429')
+        for kind in ('requests', 'tokens'):
+            bucket = self._bucket(upstream, key, kind)
+            if bucket is not None:
+                bucket.penalize(seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        """Available capacity per bucket (for metrics)."""
+        with self._lock:
+            buckets = list(self._buckets.items())
+        return {f'{upstream}/{key}/{kind}': round(bucket.available(), 1) for (upstream, key, kind), bucket in buckets}
+
+
+_limiters: Dict[tuple, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(settings: Settings) -> RateLimiter:
+    """
+    Return the shared rate limiter for these settings.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        RateLimiter: Shared limiter
+    """
+    key = (settings.searchapi_requests_per_minute, settings.openai_requests_per_minute,
+           settings.openai_tokens_per_minute, settings.rate_limit_max_wait_seconds, settings.rate_limit_path)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = RateLimiter(
+                {
+                    ('searchapi', 'requests'): settings.searchapi_requests_per_minute,
+                    ('openai', 'requests'): settings.openai_requests_per_minute,
+                    ('openai', 'tokens'): settings.openai_tokens_per_minute,
+                },
+                max_wait_seconds=settings.rate_limit_max_wait_seconds,
+                path=settings.rate_limit_path,
+            )
+        return limiter
+
+
+def _collect_metrics() -> Dict[str, float]:
+    values = {}
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        for name, available in limiter.snapshot().items():
+            upstream, key, kind = name.split('/')
+            values[f'rate_limit_{upstream}_{key.replace("-", "_").replace(".", "_")}_{kind}_available'] = available
+    return values
+
+
+metrics.register_collector(_collect_metrics)
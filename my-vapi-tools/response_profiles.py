@@ -0,0 +1,112 @@
+"""
+Response profiles and pre-serialized responses for /webhook.
+
+Vapi only reads `voice_response`, so /webhook can return one of three
+profiles: `voice` (status and voice response only), `standard` (adds the
+symptoms, medicines and a trimmed result list) or `debug` (the full
+pipeline dict). Encoded bodies of successful responses are kept in a small
+exact-match cache and served as bytes without re-encoding.
+
+orjson is used for encoding when installed, otherwise the standard json
+module.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+PROFILES = ('voice', 'standard', 'debug')
+
+# Result fields kept by the standard profile (no thumbnails or brand)
+STANDARD_RESULT_FIELDS = ('title', 'price', 'rating', 'reviews', 'link', 'is_prime', 'medicine_name')
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a response body as compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def shape_response(results: Dict, profile: str) -> Dict:
+    """
+    Reduce a pipeline result to the fields a profile returns.
+
+    Args:
+        results (Dict): Result of process_symptom_conversation
+        profile (str): One of PROFILES
+
+    Returns:
+        Dict: Response body
+    """
+    if profile == 'debug':
+        return results
+
+    shaped = {
+        "status": results.get("status"),
+        "voice_response": results.get("voice_response", "No products found.")
+    }
+    if "message" in results:
+        shaped["message"] = results["message"]
+    if profile == 'voice':
+        return shaped
+
+    search_results = results.get("search_results") or {}
+    shaped["symptoms"] = results.get("symptoms")
+    shaped["recommended_medicines"] = results.get("recommended_medicines", [])
+    if results.get("degraded_layers"):
+        shaped["degraded_layers"] = results["degraded_layers"]
+    shaped["results"] = [
+        {field: result[field] for field in STANDARD_RESULT_FIELDS if field in result}
+        for result in search_results.get("results", [])
+    ]
+    return shaped
+
+
+class ResponseCache:
+    """
+    Exact-match LRU cache of encoded response bodies with a TTL.
+
+    Args:
+        max_entries (int): Maximum bodies kept (least recently used are evicted)
+        ttl_seconds (float): How long a body may be served
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Any, tuple]' = OrderedDict()
+
+    def get(self, key: Any, now: Optional[float] = None) -> Optional[bytes]:
+        now = now or time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, body = entry
+            if now - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return body
+
+    def put(self, key: Any, body: bytes, now: Optional[float] = None) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (now or time.time(), body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
@@ -0,0 +1,190 @@
+"""
+Declarative filter rules for search results, shared by the tool and the pipeline.
+
+Rules come from RESULT_FILTER_RULES. The value is either a JSON object
+or the path to a JSON file, and any key it leaves out keeps its default
+from DEFAULT_RULES:
+
+    {
+        "exclude_keywords": ["book", "dvd"],    # drop titles containing any of these words
+        "require_terms": ["tablet", "capsule"], # keep only titles containing one of these (empty: no check)
+        "match_query": true,                    # keep only titles naming the searched medicine (see below)
+        "min_price": 2.0, "max_price": 40.0,    # dollars; products without a price are kept
+        "min_rating": 1.0, "min_reviews": 1
+    }
+
+`ResultFilter` compiles the rules once. Each keyword list becomes one
+case-insensitive regex with word boundaries, plural "s" allowed, so
+"book" also matches "books" but not "notebook". The configured checks
+become a predicate chain, cheap numeric checks first. Every record is
+evaluated in one pass and rejected at the first failing check.
+
+When a caller passes the query it searched for (the pipeline passes the
+medicine name), `match_query` also requires the title to mention a word of
+the query longer than three letters, or a known name of the medicine
+("Advil" for an "ibuprofen" search, from medicine_names.MEDICINE_SYNONYMS).
+"""
+
+import json
+import logging
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+
+import metrics
+from medicine_names import MEDICINE_SYNONYMS
+from product_record import ProductRecord
+from settings import Settings, on_reload
+from structured_logging import get_logger, log_event
+
+logger = get_logger(__name__)
+
+# Ratings run from 1 to 5 stars; 0 means unrated
+DEFAULT_RULES = {
+    "exclude_keywords": ["book", "dvd", "video", "movie", "kindle", "audio", "cd"],
+    "require_terms": [],
+    "min_price": None,
+    "max_price": None,
+    "min_rating": 1.0,
+    "min_reviews": 1,
+    "match_query": True,
+}
+
+_query_word = re.compile(r"[a-z0-9][a-z0-9'-]*")
+
+
+def _words_pattern(words: List[str]) -> Optional['re.Pattern']:
+    words = [word.strip() for word in words if word and word.strip()]
+    if not words:
+        return None
+    alternatives = '|'.join(re.escape(word) for word in sorted(set(words), key=len, reverse=True))
+    return re.compile(rf'\b(?:{alternatives})s?\b', re.IGNORECASE)
+
+
+class ResultFilter:
+    """
+    Compiled filter rules.
+
+    Args:
+        rules (Dict): Rule values (see DEFAULT_RULES); missing keys use the defaults
+        synonyms (Dict[str, List[str]]): Canonical medicine → other names, for `match_query`
+    """
+
+    def __init__(self, rules: Optional[Dict] = None, synonyms: Optional[Dict[str, List[str]]] = None):
+        self.rules = dict(DEFAULT_RULES, **(rules or {}))
+        self.synonyms = MEDICINE_SYNONYMS if synonyms is None else synonyms
+        checks: List[Callable[[ProductRecord], bool]] = []
+
+        min_rating = self.rules["min_rating"]
+        if min_rating:
+            checks.append(lambda record: record.rating >= min_rating)
+        min_reviews = self.rules["min_reviews"]
+        if min_reviews:
+            checks.append(lambda record: record.reviews >= min_reviews)
+        if self.rules["min_price"] is not None:
+            min_cents = int(round(float(self.rules["min_price"]) * 100))
+            checks.append(lambda record: record.price_cents is None or record.price_cents >= min_cents)
+        if self.rules["max_price"] is not None:
+            max_cents = int(round(float(self.rules["max_price"]) * 100))
+            checks.append(lambda record: record.price_cents is None or record.price_cents <= max_cents)
+        excluded = _words_pattern(self.rules["exclude_keywords"])
+        if excluded is not None:
+            checks.append(lambda record: excluded.search(record.title) is None)
+        required = _words_pattern(self.rules["require_terms"])
+        if required is not None:
+            checks.append(lambda record: required.search(record.title) is not None)
+        self._checks = tuple(checks)
+
+    def query_pattern(self, query: str) -> Optional['re.Pattern']:
+        """Words a title relevant to `query` mentions: its words over three letters and the medicine's other names."""
+        text = query.lower()
+        terms = [word for word in _query_word.findall(text) if len(word) > 3]
+        for canonical, variants in self.synonyms.items():
+            names = [canonical] + list(variants)
+            if any(re.search(rf'\b{re.escape(name)}\b', text) for name in names):
+                terms.extend(names)
+        return _words_pattern(terms)
+
+    def accepts(self, record: ProductRecord, query_pattern: Optional['re.Pattern'] = None) -> bool:
+        """True if the record passes every rule (and mentions the query, given its `query_pattern`)."""
+        for check in self._checks:
+            if not check(record):
+                return False
+        return query_pattern is None or query_pattern.search(record.title) is not None
+
+    def apply(self, records: Iterable[ProductRecord], query: str = '') -> List[ProductRecord]:
+        """
+        Keep the records that pass every rule.
+
+        Args:
+            records (Iterable[ProductRecord]): Candidate records
+            query (str): What was searched for, checked by `match_query` ("" skips that check)
+
+        Returns:
+            List[ProductRecord]: Accepted records, in their original order
+        """
+        records = list(records)
+        pattern = self.query_pattern(query) if query and self.rules["match_query"] else None
+        kept = [record for record in records if self.accepts(record, pattern)]
+        metrics.inc('result_filter_total', len(kept), result='kept')
+        metrics.inc('result_filter_total', len(records) - len(kept), result='rejected')
+        return kept
+
+
+def load_rules(value: str) -> Dict:
+    """
+    Parse RESULT_FILTER_RULES: a JSON object, or the path to a JSON file.
+
+    Raises:
+        ValueError: If the rules are not a JSON object or name unknown rules
+        OSError: If the file cannot be read
+    """
+    if not value.strip():
+        return {}
+    if value.lstrip().startswith('{'):
+        rules = json.loads(value)
+    else:
+        with open(value) as f:
+            rules = json.load(f)
+    if not isinstance(rules, dict):
+        raise ValueError("filter rules must be a JSON object")
+    unknown = set(rules) - set(DEFAULT_RULES)
+    if unknown:
+        raise ValueError(f"unknown filter rules: {', '.join(sorted(unknown))}")
+    return rules
+
+
+_filters: Dict[str, ResultFilter] = {}
+_filters_lock = threading.Lock()
+
+
+def get_result_filter(settings: Settings) -> ResultFilter:
+    """
+    Return the shared filter compiled from RESULT_FILTER_RULES.
+
+    Invalid rules are logged and the defaults are used instead.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        ResultFilter: Compiled filter
+    """
+    value = settings.result_filter_rules
+    with _filters_lock:
+        if value not in _filters:
+            try:
+                _filters[value] = ResultFilter(load_rules(value))
+            except (OSError, ValueError, TypeError) as e:
+                log_event(logger, "result_filter_rules_invalid", logging.WARNING, error=str(e))
+                _filters[value] = ResultFilter()
+        return _filters[value]
+
+
+def _drop_compiled_filters(_settings: Settings) -> None:
+    # An edited rules file is picked up on reload (SIGHUP)
+    with _filters_lock:
+        _filters.clear()
+
+
+on_reload(_drop_compiled_filters)
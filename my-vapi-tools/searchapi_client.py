@@ -0,0 +1,237 @@
+"""
+Shared SearchAPI access for the pipeline and the tool.
+
+Every Amazon search goes through fetch_organic_results(), which answers
+from the local product catalog when it can, coalesces identical in-flight
+live requests, and stores live responses back into the catalog. Live
+requests draw from the SearchAPI rate limiter; when it is exhausted an
+expired catalog entry is served instead, if there is one.
+
+Live responses are requested gzip-compressed and read as a stream
+(json_stream.py). Only the product fields we use are kept from each
+organic result. Reading stops after SEARCHAPI_MAX_RESULTS organic results,
+and the connection is closed instead of reading the rest of the body.
+Streamed and whole-body responses yield the same unfiltered results, which
+are what the catalog stores and coalesced callers share; callers cap and
+filter them for their own use (see SymptomSearchPipeline.search_single_medicine).
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import requests
+
+import metrics
+from cache_warmer import popularity
+from coalescing import get_flight, normalize_key
+from json_stream import iter_array_field
+from product_catalog import FreshnessPolicy, get_catalog
+from rate_limit import RateLimited, get_rate_limiter, is_rate_limit_error, key_id, retry_after_seconds
+from settings import Settings
+from structured_logging import get_logger, log_event
+
+logger = get_logger(__name__)
+
+# Organic result fields read by ProductRecord and the catalog; everything else is dropped
+PRODUCT_FIELDS = ('asin', 'title', 'brand', 'link', 'thumbnail', 'price', 'rating', 'reviews', 'is_prime')
+STREAM_CHUNK_BYTES = 16 * 1024
+
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='catalog-refresh')
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+
+
+def fetch_organic_results(settings: Settings, session: requests.Session, query: str,
+                          timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Return raw organic results for a query, from the catalog or from SearchAPI.
+
+    Args:
+        settings (Settings): Service settings
+        session (requests.Session): Pooled SearchAPI session
+        query (str): Search query or medicine name
+        timeout (float): Seconds allowed for a live request (defaults to SEARCHAPI_TIMEOUT)
+
+    Returns:
+        List[Dict]: Organic results (may be shared between callers, treat as read-only)
+
+    Raises:
+        Exception: If a live SearchAPI request is needed and fails
+    """
+    popularity.record(query)
+    catalog = get_catalog(settings)
+    hit = None
+    if catalog is not None:
+        try:
+            hit = catalog.lookup(query)
+        except Exception as e:
+            log_event(logger, "catalog_lookup_failed", logging.WARNING, error=str(e))
+            hit = None
+        if hit is not None and hit.freshness == FreshnessPolicy.FRESH:
+            metrics.inc('searchapi_lookups_total', source='catalog_fresh')
+            return hit.results
+        if hit is not None and hit.freshness == FreshnessPolicy.STALE:
+            metrics.inc('searchapi_lookups_total', source='catalog_stale')
+            schedule_refresh(settings, session, query)
+            return hit.results
+    try:
+        results = fetch_live(settings, session, query, timeout)
+    except RateLimited:
+        if hit is None:
+            raise
+        # Out of quota for now: an old answer beats no answer
+        metrics.inc('searchapi_lookups_total', source='catalog_rate_limited')
+        return hit.results
+    metrics.inc('searchapi_lookups_total', source='live')
+    return results
+
+
+def is_cached(settings: Settings, query: str) -> bool:
+    """
+    Whether fetch_organic_results() can answer a query from the catalog without a live request.
+
+    Args:
+        settings (Settings): Service settings
+        query (str): Search query
+
+    Returns:
+        bool: True if the query has a fresh or stale catalog entry
+    """
+    catalog = get_catalog(settings)
+    if catalog is None:
+        return False
+    try:
+        fetched_at = catalog.fetched_at(query)
+    except Exception as e:
+        log_event(logger, "catalog_lookup_failed", logging.WARNING, error=str(e))
+        return False
+    return fetched_at is not None and catalog.policy.classify(fetched_at) != FreshnessPolicy.EXPIRED
+
+
+def fetch_live(settings: Settings, session: requests.Session, query: str,
+               timeout: Optional[float] = None) -> List[Dict]:
+    """
+    Query SearchAPI directly (coalesced) and store the response in the catalog.
+
+    Args:
+        settings (Settings): Service settings
+        session (requests.Session): Pooled SearchAPI session
+        query (str): Search query or medicine name
+        timeout (float): Seconds allowed for the request (defaults to SEARCHAPI_TIMEOUT)
+
+    Returns:
+        List[Dict]: Raw organic results
+
+    Raises:
+        RateLimited: If the SearchAPI rate limit would make the request wait too long
+    """
+    limiter = get_rate_limiter(settings)
+    api_key_id = key_id(settings.searchapi_api_key)
+    timeout = timeout or settings.searchapi_timeout
+
+    def fetch() -> List[Dict]:
+        limiter.acquire('searchapi', api_key_id)
+        params = {
+            "engine": "amazon_search",
+            "q": query,
+            "api_key": settings.searchapi_api_key,
+            "amazon_domain": settings.amazon_domain,
+            "sort_by": "featured"
+        }
+        metrics.inc('searchapi_requests_total')
+        response = session.get(settings.searchapi_url, params=params, timeout=timeout,
+                               headers={'Accept-Encoding': 'gzip, deflate'}, stream=settings.searchapi_streaming)
+        try:
+            response.raise_for_status()
+            if settings.searchapi_streaming:
+                organic_results = read_organic_results(settings, response)
+            else:
+                organic_results = _first_products(settings, response.json().get("organic_results", []))
+        except requests.HTTPError as e:
+            if is_rate_limit_error(e):
+                limiter.penalize('searchapi', api_key_id, retry_after_seconds(e))
+            raise
+        finally:
+            # Closes the connection if the body was not read to the end (rather than downloading the rest)
+            response.close()
+        _store(settings, query, organic_results)
+        return organic_results
+
+    if not settings.coalescing_enabled:
+        return fetch()
+    return get_flight('searchapi').do(
+        normalize_key(query, settings.amazon_domain),
+        fetch,
+        timeout=timeout
+    )
+
+
+def read_organic_results(settings: Settings, response: requests.Response) -> List[Dict]:
+    """
+    Stream the organic results out of a SearchAPI response.
+
+    Args:
+        settings (Settings): Service settings
+        response (requests.Response): Response opened with stream=True
+
+    Returns:
+        List[Dict]: The first SEARCHAPI_MAX_RESULTS organic results, with PRODUCT_FIELDS only (unfiltered)
+
+    Raises:
+        ValueError: If the body is not valid JSON
+    """
+    products = _first_products(settings, iter_array_field(response.iter_content(STREAM_CHUNK_BYTES), 'organic_results'))
+    limit = settings.searchapi_max_results
+    metrics.inc('searchapi_stream_total', outcome='early_stop' if limit and len(products) >= limit else 'complete')
+    return products
+
+
+def _first_products(settings: Settings, organic_results) -> List[Dict]:
+    # The same projection and cap for streamed and whole-body responses; stops consuming a stream at the cap
+    limit = settings.searchapi_max_results
+    products: List[Dict] = []
+    for result in organic_results:
+        if not isinstance(result, dict):
+            continue
+        products.append({field: result[field] for field in PRODUCT_FIELDS if field in result})
+        if limit and len(products) >= limit:
+            break
+    return products
+
+
+def schedule_refresh(settings: Settings, session: requests.Session, query: str) -> bool:
+    """
+    Refresh a stale catalog entry in the background (at most one refresh per query at a time).
+
+    Returns:
+        bool: True if a refresh was scheduled
+    """
+    key = normalize_key(query, settings.amazon_domain)
+    with _refreshing_lock:
+        if key in _refreshing:
+            return False
+        _refreshing.add(key)
+
+    def refresh() -> None:
+        try:
+            fetch_live(settings, session, query)
+        except Exception as e:
+            log_event(logger, "catalog_refresh_failed", logging.WARNING, query=query, error=str(e))
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_executor.submit(refresh)
+    return True
+
+
+def _store(settings: Settings, query: str, organic_results: List[Dict]) -> None:
+    catalog = get_catalog(settings)
+    if catalog is None:
+        return
+    try:
+        catalog.store(query, organic_results)
+    except Exception as e:
+        log_event(logger, "catalog_store_failed", logging.WARNING, error=str(e))
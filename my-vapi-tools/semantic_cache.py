@@ -0,0 +1,254 @@
+"""
+Near-duplicate cache of whole-pipeline results.
+
+Voice transcripts of the same complaint are rarely worded the same way, so
+exact-match caches miss. A conversation may reuse a cached
+`process_symptom_conversation` output only if it mentions exactly the same
+canonical symptoms and the rest of what it says (the words left once the
+symptom keywords are removed: severity, duration, who is ill) is a near
+duplicate. That remainder is turned into a hashed feature vector (words and
+character trigrams) and compared with recent conversations in one NumPy
+matrix product against the cosine threshold.
+
+Conversations that mention pregnancy, a child, an injury, a long duration or
+a red-flag symptom are never stored or served from the cache. Every reuse is
+logged, counted and optionally appended to a JSONL audit file so reuses can
+be reviewed.
+"""
+
+import copy
+import json
+import logging
+import re
+import threading
+import time
+import zlib
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import numpy as np
+
+import metrics
+from settings import Settings
+from structured_logging import get_logger, log_event
+
+logger = get_logger(__name__)
+
+# Feature weights: exact words dominate, trigrams tolerate inflections and typos
+WORD_WEIGHT = 1.0
+TRIGRAM_WEIGHT = 0.3
+
+# Conversations that always get a fresh answer, whichever side of a match they are on
+BYPASS_PATTERNS = {
+    'pregnancy': re.compile(r"\b(pregnan\w*|expecting a baby|breast ?feeding|nursing)\b"),
+    'child': re.compile(r"\b(child|children|kids?|baby|babies|infant|toddler|newborn|son|daughter|"
+                        r"\d+[- ](year|month)[- ]old)\b"),
+    'trauma': re.compile(r"\b(trauma|injur\w*|knocked (out|over)|hit (my|his|her|their) head|fell (down|over|off)|"
+                         r"a fall|accident|concussion|blacked out)\b"),
+    'duration': re.compile(r"\b(weeks?|months?|years?|fortnight)\b"),
+    'red_flag': re.compile(r"\b(blurr(y|ed) vision|chest pain|short(ness)? of breath|can'?t breathe|faint\w*|"
+                           r"stiff neck|confus\w*|seizure|numb\w*|blood|bleeding|worst)\b"),
+}
+
+STOPWORDS = frozenset((
+    'a', 'an', 'and', 'am', 'are', 'as', 'at', 'be', 'been', 'but', 'by', 'for', 'from', 'have', 'has',
+    'had', 'i', 'im', 'i\'m', 'i\'ve', 'in', 'is', 'it', 'its', 'me', 'my', 'of', 'on', 'or', 'so', 'that',
+    'the', 'this', 'to', 'was', 'with', 'really', 'very', 'just', 'also', 'since', 'been', 'feel', 'feeling',
+    'got', 'get', 'some', 'kind', 'like', 'bit', 'little', 'lot', 'past', 'last', 'few', 'days', 'day',
+))
+
+_word_pattern = re.compile(r"[a-z0-9']+")
+
+
+def _bucket(feature: str, dim: int) -> Tuple[int, float]:
+    """Stable signed hashing trick (crc32 is identical across processes, unlike hash())."""
+    digest = zlib.crc32(feature.encode('utf-8'))
+    return digest % dim, (1.0 if digest & 0x80000000 else -1.0)
+
+
+def symptom_signature(conversation: str, symptom_keywords: Dict[str, List[str]]) -> FrozenSet[str]:
+    """Canonical symptoms a conversation mentions (same keyword matching as the pipeline fallback)."""
+    text = conversation.lower()
+    return frozenset(symptom for symptom, keywords in symptom_keywords.items()
+                     if any(keyword in text for keyword in keywords))
+
+
+def bypass_reason(conversation: str) -> Optional[str]:
+    """Why a conversation must never share a cached answer (e.g. 'pregnancy'), or None."""
+    text = conversation.lower()
+    return next((reason for reason, pattern in BYPASS_PATTERNS.items() if pattern.search(text)), None)
+
+
+def residual_words(conversation: str, symptom_keywords: Dict[str, List[str]]) -> List[str]:
+    """Words of a conversation other than stopwords and symptom keywords (with their inflections)."""
+    text = conversation.lower()
+    for keywords in symptom_keywords.values():
+        for keyword in keywords:
+            text = re.sub(r"\b" + re.escape(keyword) + r"\w*", ' ', text)
+    return [word for word in _word_pattern.findall(text) if word not in STOPWORDS]
+
+
+def vectorize(words: List[str], dim: int) -> np.ndarray:
+    """
+    Hash words into an L2-normalized feature vector.
+
+    Args:
+        words (List[str]): Residual words of a conversation
+        dim (int): Vector size
+
+    Returns:
+        np.ndarray: float32 vector of length dim (conversations with no words share one vector)
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    features = [] if words else [('empty', WORD_WEIGHT)]
+    for word in words:
+        features.append(('w:' + word, WORD_WEIGHT))
+        padded = f'#{word}#'
+        features.extend(('t:' + padded[i:i + 3], TRIGRAM_WEIGHT) for i in range(len(padded) - 2))
+    for feature, weight in features:
+        index, sign = _bucket(feature, dim)
+        vector[index] += sign * weight
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+
+class SemanticCache:
+    """
+    Fixed-capacity ring of recent successful pipeline results, searchable by similarity.
+
+    Args:
+        symptom_keywords (Dict[str, List[str]]): Canonical symptom → keywords
+        threshold (float): Minimum cosine similarity for reuse (0-1)
+        ttl_seconds (float): How long a cached result may be reused
+        max_entries (int): Ring capacity
+        dim (int): Hashed feature vector size
+        audit_path (str): Optional JSONL file each reuse is appended to
+    """
+
+    def __init__(self, symptom_keywords: Dict[str, List[str]], threshold: float, ttl_seconds: float,
+                 max_entries: int, dim: int = 1024, audit_path: Optional[str] = None):
+        self.symptom_keywords = symptom_keywords
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max(1, max_entries)
+        self.dim = dim
+        self.audit_path = audit_path or None
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((self.max_entries, dim), dtype=np.float32)
+        self._stored_at = np.zeros(self.max_entries)
+        self._max_results = np.zeros(self.max_entries, dtype=np.int64)
+        self._signatures = np.zeros(self.max_entries, dtype=np.int64)
+        self._conversations: List[Optional[str]] = [None] * self.max_entries
+        self._results: List[Optional[Dict]] = [None] * self.max_entries
+        self._next = 0
+
+    def _features(self, conversation: str) -> Tuple[np.ndarray, int]:
+        symptoms = symptom_signature(conversation, self.symptom_keywords)
+        signature = zlib.crc32('|'.join(sorted(symptoms)).encode('utf-8'))
+        return vectorize(residual_words(conversation, self.symptom_keywords), self.dim), signature
+
+    def lookup(self, conversation: str, max_results: int, now: Optional[float] = None) -> Optional[Dict]:
+        """
+        Find a cached result for a near-duplicate conversation.
+
+        Args:
+            conversation (str): New conversation
+            max_results (int): Requested results per medicine (must match the cached call)
+            now (float): Current time (for tests)
+
+        Returns:
+            Optional[Dict]: Copy of the cached result, annotated with the match, or None
+        """
+        now = now or time.time()
+        if bypass_reason(conversation):
+            metrics.inc('semantic_cache_total', result='bypass')
+            return None
+        vector, signature = self._features(conversation)
+        with self._lock:
+            valid = ((self._stored_at > now - self.ttl_seconds) & (self._max_results == max_results)
+                     & (self._signatures == signature))
+            if not valid.any():
+                metrics.inc('semantic_cache_total', result='miss')
+                return None
+            similarities = np.where(valid, self._vectors @ vector, -1.0)
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                metrics.inc('semantic_cache_total', result='miss')
+                return None
+            matched_conversation = self._conversations[best]
+            result = copy.deepcopy(self._results[best])
+
+        result["conversation"] = conversation
+        result["cache"] = {"source": "semantic", "similarity": round(similarity, 4)}
+        metrics.inc('semantic_cache_total', result='hit')
+        self._audit(conversation, matched_conversation, similarity, max_results, now)
+        return result
+
+    def store(self, conversation: str, max_results: int, result: Dict, now: Optional[float] = None) -> None:
+        """Remember a successful result (the oldest entry is overwritten when full; bypassed conversations are not stored)."""
+        if bypass_reason(conversation):
+            return
+        vector, signature = self._features(conversation)
+        with self._lock:
+            slot = self._next
+            self._next = (slot + 1) % self.max_entries
+            self._vectors[slot] = vector
+            self._stored_at[slot] = now or time.time()
+            self._max_results[slot] = max_results
+            self._signatures[slot] = signature
+            self._conversations[slot] = conversation
+            self._results[slot] = copy.deepcopy(result)
+            entries = int(np.count_nonzero(self._stored_at))
+        metrics.set_gauge('semantic_cache_entries', entries)
+
+    def _audit(self, conversation: str, matched_conversation: str, similarity: float, max_results: int,
+               now: float) -> None:
+        # Conversation text stays out of the logs; the opt-in audit file keeps it for review
+        log_event(logger, "semantic_cache_reuse", similarity=round(similarity, 4), max_results=max_results)
+        if not self.audit_path:
+            return
+        record = {
+            "ts": round(now, 3),
+            "conversation": conversation,
+            "matched_conversation": matched_conversation,
+            "similarity": round(similarity, 4),
+            "max_results": max_results,
+        }
+        try:
+            with self._lock, open(self.audit_path, 'a', encoding='utf-8') as audit_file:
+                audit_file.write(json.dumps(record) + '\n')
+        except OSError as e:
+            log_event(logger, "semantic_cache_audit_failed", logging.WARNING, error=str(e))
+
+
+_caches: Dict[tuple, SemanticCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_semantic_cache(settings: Settings) -> Optional[SemanticCache]:
+    """
+    Return the shared semantic cache for these settings, or None when it is disabled.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        Optional[SemanticCache]: Shared cache instance
+    """
+    if not settings.semantic_cache_enabled:
+        return None
+    from symptom_search_pipeline import SYMPTOM_KEYWORDS
+
+    key = (settings.semantic_cache_threshold, settings.semantic_cache_ttl_seconds,
+           settings.semantic_cache_max_entries, settings.semantic_cache_audit_path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = SemanticCache(
+                SYMPTOM_KEYWORDS,
+                threshold=settings.semantic_cache_threshold,
+                ttl_seconds=settings.semantic_cache_ttl_seconds,
+                max_entries=settings.semantic_cache_max_entries,
+                audit_path=settings.semantic_cache_audit_path,
+            )
+        return cache
@@ -0,0 +1,218 @@
+"""
+Per-call session state for multi-turn Vapi conversations.
+
+During one phone call Vapi invokes the tool repeatedly, each time with the
+whole conversation so far. A `CallSession` remembers what earlier
+invocations of the same call already computed: the conversation text
+processed, the symptoms found, the medicines recommended and their search
+results. The pipeline then runs Layer 1 on the new turns only, Layer 2 on
+new symptoms only and Layer 3 on new medicines only.
+
+Sessions are keyed by the Vapi call id and live in a `SessionStore`, an
+LRU with a TTL and an approximate memory budget.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import metrics
+from product_record import ProductRecord
+from settings import Settings
+
+# Rough per-record and per-session overhead used for the memory budget
+RECORD_BYTES = 600
+SESSION_BYTES = 2000
+
+
+class CallSession:
+    """
+    What earlier invocations of one call computed.
+
+    Hold `lock` while reading or updating a session: invocations for the
+    same call are processed one at a time.
+    """
+
+    def __init__(self, call_id: str, max_results: int):
+        self.call_id = call_id
+        self.max_results = max_results
+        self.lock = threading.Lock()
+        self.processed = ''
+        self.turns = 0
+        self.symptoms: List[str] = []
+        self.severity = 'unknown'
+        self.duration: Optional[str] = None
+        self.medicine_names: List[str] = []
+        self.results: Dict[str, List[ProductRecord]] = {}
+        self.search_results: Optional[Dict] = None
+        self.natural_response: Optional[str] = None
+        self.last_used = time.time()
+        # Last measured size_bytes(), for the store's memory budget
+        self.bytes = SESSION_BYTES
+
+    def new_text(self, conversation: str) -> str:
+        """
+        The part of the conversation not processed yet.
+
+        A conversation that no longer starts with the processed text (Vapi
+        trimmed or rewrote the transcript) is processed again from scratch.
+        """
+        if self.processed and conversation.startswith(self.processed):
+            return conversation[len(self.processed):]
+        if self.processed:
+            self.reset()
+        return conversation
+
+    def reset(self) -> None:
+        self.processed = ''
+        self.symptoms = []
+        self.severity = 'unknown'
+        self.duration = None
+        self.medicine_names = []
+        self.results = {}
+        self.search_results = None
+        self.natural_response = None
+
+    def add_symptoms(self, symptoms_data: Dict) -> List[str]:
+        """
+        Merge Layer 1 output for the new turns.
+
+        Returns:
+            List[str]: Symptoms not seen earlier in the call
+        """
+        new = [symptom for symptom in dict.fromkeys(symptoms_data.get('symptoms') or [])
+               if symptom not in self.symptoms]
+        self.symptoms.extend(new)
+        if symptoms_data.get('severity') not in (None, 'unknown'):
+            self.severity = symptoms_data['severity']
+        if symptoms_data.get('duration'):
+            self.duration = symptoms_data['duration']
+        return new
+
+    def add_medicines(self, medicine_names: List[str]) -> List[str]:
+        """
+        Merge Layer 2 output for new symptoms.
+
+        Returns:
+            List[str]: Medicines not recommended earlier in the call
+        """
+        new = [medicine for medicine in dict.fromkeys(medicine_names) if medicine not in self.medicine_names]
+        self.medicine_names.extend(new)
+        return new
+
+    def unsearched(self) -> List[str]:
+        """Recommended medicines without stored search results (new, or failed earlier)."""
+        return [medicine for medicine in self.medicine_names if medicine not in self.results]
+
+    def symptoms_data(self) -> Dict:
+        return {
+            "symptoms": list(self.symptoms),
+            "severity": self.severity,
+            "duration": self.duration,
+            "context": None
+        }
+
+    def size_bytes(self) -> int:
+        """Approximate memory held by the session (hold `lock`)."""
+        records = sum(len(results) for results in self.results.values())
+        return (SESSION_BYTES + len(self.processed) + len(self.natural_response or '')
+                + sum(len(medicine) for medicine in self.medicine_names) + records * RECORD_BYTES)
+
+
+class SessionStore:
+    """
+    Sessions by call id, evicted after `ttl_seconds` idle or least recently used first over `max_bytes`.
+
+    Args:
+        ttl_seconds (float): Idle time after which a session is dropped
+        max_bytes (int): Approximate memory budget for all sessions
+    """
+
+    def __init__(self, ttl_seconds: float, max_bytes: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._sessions: 'OrderedDict[str, CallSession]' = OrderedDict()
+
+    def get(self, call_id: str, max_results: int, now: Optional[float] = None) -> CallSession:
+        """
+        Return the call's session, starting a new one if there is none (or max_results changed).
+
+        Args:
+            call_id (str): Vapi call id
+            max_results (int): Maximum results per medicine for this invocation
+            now (float): Current time (for tests)
+
+        Returns:
+            CallSession: The session
+        """
+        now = now or time.time()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(call_id)
+            if session is None or session.max_results != max_results:
+                session = self._sessions[call_id] = CallSession(call_id, max_results)
+                metrics.inc('session_lookups_total', result='new')
+            else:
+                self._sessions.move_to_end(call_id)
+                metrics.inc('session_lookups_total', result='existing')
+            session.last_used = now
+            return session
+
+    def trim(self) -> None:
+        """
+        Evict least recently used sessions until the store fits its memory budget.
+
+        Sessions in the middle of a turn are not waited for: they count with
+        the size measured the last time they were idle.
+        """
+        with self._lock:
+            for session in self._sessions.values():
+                if session.lock.acquire(blocking=False):
+                    try:
+                        session.bytes = session.size_bytes()
+                    finally:
+                        session.lock.release()
+            total = sum(session.bytes for session in self._sessions.values())
+            while total > self.max_bytes and len(self._sessions) > 1:
+                _call_id, session = self._sessions.popitem(last=False)
+                total -= session.bytes
+                metrics.inc('session_evictions_total', reason='memory')
+            metrics.set_gauge('session_bytes', total)
+            metrics.set_gauge('sessions', len(self._sessions))
+
+    def _expire(self, now: float) -> None:
+        expired = [call_id for call_id, session in self._sessions.items()
+                   if now - session.last_used > self.ttl_seconds]
+        for call_id in expired:
+            del self._sessions[call_id]
+        if expired:
+            metrics.inc('session_evictions_total', len(expired), reason='ttl')
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+_stores: Dict[tuple, SessionStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_session_store(settings: Settings) -> Optional[SessionStore]:
+    """
+    Return the shared session store for these settings, or None when sessions are disabled.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        Optional[SessionStore]: Shared store
+    """
+    if not settings.session_enabled:
+        return None
+    key = (settings.session_ttl_seconds, settings.session_max_bytes)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            store = _stores[key] = SessionStore(settings.session_ttl_seconds, settings.session_max_bytes)
+        return store
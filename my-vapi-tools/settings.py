@@ -0,0 +1,390 @@
+"""
+Immutable service configuration.
+
+Settings are resolved once (from `.env` and the process environment) when
+the service starts and then injected into the pipeline, the tool and the
+server. Nothing in the request path reads or mutates `os.environ`.
+Reloading is an explicit action, wired to SIGHUP by the server.
+"""
+
+import logging
+import os
+import signal
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from dotenv import dotenv_values, find_dotenv
+
+from structured_logging import LogConfig, get_logger, log_event
+
+logger = get_logger(__name__)
+
+
+# Per `.env` path, the variables the last load put into os.environ
+_dotenv_loaded: Dict[str, Dict[str, str]] = {}
+_dotenv_lock = threading.Lock()
+
+
+def _load_dotenv(dotenv_path: Optional[str], override: bool) -> None:
+    # Like dotenv.load_dotenv, but a reload first takes back what the previous
+    # load of this file set, so removed lines disappear and real variables win
+    path = dotenv_path or find_dotenv()
+    values = dotenv_values(path) if path else {}
+    with _dotenv_lock:
+        for name, value in _dotenv_loaded.pop(path, {}).items():
+            if os.environ.get(name) == value:
+                del os.environ[name]
+        loaded = {}
+        for name, value in values.items():
+            if value is not None and (override or name not in os.environ):
+                os.environ[name] = loaded[name] = value
+        _dotenv_loaded[path] = loaded
+
+
+def _env_str(name: str, default: Optional[str] = None) -> Optional[str]:
+    value = os.getenv(name)
+    return value if value not in (None, '') else default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == '':
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Read-only configuration for the symptom search services."""
+
+    # API keys
+    searchapi_api_key: Optional[str] = field(default=None, repr=False)
+    openai_api_key: Optional[str] = field(default=None, repr=False)
+
+    # Endpoints and timeouts (seconds)
+    searchapi_url: str = "https://www.searchapi.io/api/v1/search"
+    amazon_domain: str = "amazon.com"
+    searchapi_timeout: float = 30.0
+    openai_timeout: float = 60.0
+
+    # Candidate models per LLM layer (comma-separated; see model_router.py)
+    extraction_model: str = "gpt-4o-mini,gpt-4o"
+    recommendation_model: str = "gpt-4o,gpt-4o-mini"
+    formatting_model: str = "gpt-4o-mini,gpt-4o"
+
+    # Structured output for Layers 1 and 2 (json_schema, json_object or off) and streamed parsing
+    structured_output: str = "json_schema"
+    llm_streaming: bool = True
+    # Overlap Layers 2 and 3: search each medicine as soon as Layer 2 streams its name
+    pipeline_overlap: bool = False
+
+    # End-to-end deadline (0 = none), its split across layers, and the least time worth an upstream call
+    pipeline_deadline_seconds: float = 0
+    deadline_split: str = "extraction:2,recommendation:2,search:4,formatting:2"
+    deadline_min_call_seconds: float = 0.5
+
+    # Model routing: quality tier per model, minimum tier per layer, failover
+    model_tiers: str = "gpt-4o:3,gpt-4.1:3,gpt-4o-mini:2,gpt-4.1-mini:2,gpt-4.1-nano:1,gpt-3.5-turbo:1"
+    extraction_min_tier: int = 2
+    recommendation_min_tier: int = 3
+    formatting_min_tier: int = 1
+    model_failure_threshold: int = 3
+    model_cooldown_seconds: int = 30
+
+    # HTTP connection pool sizes
+    http_pool_connections: int = 10
+    http_pool_maxsize: int = 20
+
+    # Cache settings
+    cache_ttl_seconds: int = 3600
+    cache_max_entries: int = 1000
+
+    # Single-flight coalescing of identical in-flight upstream calls
+    coalescing_enabled: bool = True
+    coalesce_timeout: float = 45.0
+
+    # Local product catalog (SQLite) serving Layer 3; opt-in, with a bounded size
+    catalog_enabled: bool = False
+    catalog_path: str = "product_catalog.db"
+    catalog_max_age_seconds: int = 6 * 3600
+    catalog_stale_serve_seconds: int = 24 * 3600
+    catalog_canonical_fallback: bool = True
+    catalog_retention_seconds: int = 7 * 24 * 3600
+    catalog_max_queries: int = 5000
+
+    # Background cache warmer for popular SearchAPI queries
+    cache_warmer_enabled: bool = False
+    cache_warmer_interval_seconds: int = 300
+    cache_warmer_quota_per_hour: int = 60
+    cache_warmer_top_n: int = 50
+    cache_warmer_refresh_ahead_fraction: float = 0.8
+
+    # Layer 3 ranking: results kept after cross-medicine ranking and dedupe (0 keeps all)
+    layer3_top_k: int = 10
+
+    # /webhook response profile (voice, standard, debug) and cache of encoded responses
+    webhook_response_profile: str = "voice"
+    response_cache_enabled: bool = True
+
+    # Local Layer 1 classifier (train with train_symptom_classifier.py; empty path disables it)
+    symptom_classifier_path: str = ""
+    symptom_classifier_threshold: float = 0.9
+
+    # Canonical medicine names between Layers 2 and 3; MEDICINE_SYNONYMS_PATH adds JSON synonyms
+    medicine_canonicalization: bool = True
+    medicine_synonyms_path: str = ""
+
+    # Search only the fewest Layer 2 medicines covering every symptom, at most MAX_MEDICINE_SEARCHES per turn
+    medicine_cover_enabled: bool = False
+    max_medicine_searches: int = 3
+
+    # Search result filter rules: a JSON object or the path to a JSON file (see result_filters.py)
+    result_filter_rules: str = ""
+
+    # Near-duplicate cache of whole-pipeline results
+    semantic_cache_enabled: bool = True
+    semantic_cache_threshold: float = 0.8
+    semantic_cache_ttl_seconds: int = 1800
+    semantic_cache_max_entries: int = 1000
+    semantic_cache_audit_path: str = ""
+
+    # Per-call session state for multi-turn Vapi calls
+    session_enabled: bool = True
+    session_ttl_seconds: int = 1800
+    session_max_bytes: int = 50000000
+
+    # Admission control per server process (overflow gets a degraded answer)
+    admission_enabled: bool = True
+    admission_max_in_flight: int = 8
+    admission_max_queue: int = 16
+    admission_max_wait_seconds: float = 2.0
+
+    # Retried /webhook tool calls (same tool-call id) attach to the running one or replay its response
+    idempotency_enabled: bool = True
+    idempotency_retention_seconds: int = 600
+    idempotency_max_entries: int = 10000
+    idempotency_wait_seconds: float = 30.0
+
+    # Client-side rate limits per minute (0 = unlimited); RATE_LIMIT_PATH shares them across workers
+    searchapi_requests_per_minute: float = 0
+    openai_requests_per_minute: float = 0
+    openai_tokens_per_minute: float = 0
+    rate_limit_max_wait_seconds: float = 1.0
+    rate_limit_path: str = ""
+
+    # Live SearchAPI responses: stream-parse them and keep the first this many organic results (0 = all)
+    searchapi_streaming: bool = True
+    searchapi_max_results: int = 20
+
+    # Symptom search tool: most queries planned per request and how many run at once
+    search_max_queries: int = 3
+    search_concurrency: int = 3
+
+    # Batch processing
+    batch_max_workers: int = 8
+    batch_max_conversations: int = 500
+
+    # Server
+    port: int = 8080
+
+    log: LogConfig = field(default_factory=LogConfig, compare=False, hash=False)
+
+    @classmethod
+    def from_env(cls, dotenv_path: Optional[str] = None, override: bool = False) -> 'Settings':
+        """
+        Build settings from `.env` and the current environment.
+
+        Args:
+            dotenv_path (str): Optional path to a `.env` file
+            override (bool): Let `.env` values replace variables already set
+
+        Returns:
+            Settings: Resolved settings
+        """
+        _load_dotenv(dotenv_path, override)
+        return cls(
+            searchapi_api_key=_env_str('SEARCHAPI_API_KEY'),
+            openai_api_key=_env_str('OPENAI_API_KEY'),
+            searchapi_url=_env_str('SEARCHAPI_URL', cls.searchapi_url),
+            amazon_domain=_env_str('AMAZON_DOMAIN', cls.amazon_domain),
+            searchapi_timeout=_env_float('SEARCHAPI_TIMEOUT', cls.searchapi_timeout),
+            openai_timeout=_env_float('OPENAI_TIMEOUT', cls.openai_timeout),
+            extraction_model=_env_str('EXTRACTION_MODEL', cls.extraction_model),
+            recommendation_model=_env_str('RECOMMENDATION_MODEL', cls.recommendation_model),
+            formatting_model=_env_str('FORMATTING_MODEL', cls.formatting_model),
+            structured_output=_env_str('STRUCTURED_OUTPUT', cls.structured_output),
+            llm_streaming=_env_bool('LLM_STREAMING', cls.llm_streaming),
+            pipeline_overlap=_env_bool('PIPELINE_OVERLAP', cls.pipeline_overlap),
+            pipeline_deadline_seconds=_env_float('PIPELINE_DEADLINE_SECONDS', cls.pipeline_deadline_seconds),
+            deadline_split=_env_str('DEADLINE_SPLIT', cls.deadline_split),
+            deadline_min_call_seconds=_env_float('DEADLINE_MIN_CALL_SECONDS', cls.deadline_min_call_seconds),
+            model_tiers=_env_str('MODEL_TIERS', cls.model_tiers),
+            extraction_min_tier=_env_int('EXTRACTION_MIN_TIER', cls.extraction_min_tier),
+            recommendation_min_tier=_env_int('RECOMMENDATION_MIN_TIER', cls.recommendation_min_tier),
+            formatting_min_tier=_env_int('FORMATTING_MIN_TIER', cls.formatting_min_tier),
+            model_failure_threshold=_env_int('MODEL_FAILURE_THRESHOLD', cls.model_failure_threshold),
+            model_cooldown_seconds=_env_int('MODEL_COOLDOWN_SECONDS', cls.model_cooldown_seconds),
+            http_pool_connections=_env_int('HTTP_POOL_CONNECTIONS', cls.http_pool_connections),
+            http_pool_maxsize=_env_int('HTTP_POOL_MAXSIZE', cls.http_pool_maxsize),
+            cache_ttl_seconds=_env_int('CACHE_TTL_SECONDS', cls.cache_ttl_seconds),
+            cache_max_entries=_env_int('CACHE_MAX_ENTRIES', cls.cache_max_entries),
+            coalescing_enabled=_env_bool('COALESCING_ENABLED', cls.coalescing_enabled),
+            coalesce_timeout=_env_float('COALESCE_TIMEOUT', cls.coalesce_timeout),
+            catalog_enabled=_env_bool('CATALOG_ENABLED', cls.catalog_enabled),
+            catalog_path=_env_str('CATALOG_PATH', cls.catalog_path),
+            catalog_max_age_seconds=_env_int('CATALOG_MAX_AGE_SECONDS', cls.catalog_max_age_seconds),
+            catalog_stale_serve_seconds=_env_int('CATALOG_STALE_SERVE_SECONDS', cls.catalog_stale_serve_seconds),
+            catalog_canonical_fallback=_env_bool('CATALOG_CANONICAL_FALLBACK', cls.catalog_canonical_fallback),
+            catalog_retention_seconds=_env_int('CATALOG_RETENTION_SECONDS', cls.catalog_retention_seconds),
+            catalog_max_queries=_env_int('CATALOG_MAX_QUERIES', cls.catalog_max_queries),
+            cache_warmer_enabled=_env_bool('CACHE_WARMER_ENABLED', cls.cache_warmer_enabled),
+            cache_warmer_interval_seconds=_env_int('CACHE_WARMER_INTERVAL_SECONDS', cls.cache_warmer_interval_seconds),
+            cache_warmer_quota_per_hour=_env_int('CACHE_WARMER_QUOTA_PER_HOUR', cls.cache_warmer_quota_per_hour),
+            cache_warmer_top_n=_env_int('CACHE_WARMER_TOP_N', cls.cache_warmer_top_n),
+            cache_warmer_refresh_ahead_fraction=_env_float('CACHE_WARMER_REFRESH_AHEAD_FRACTION', cls.cache_warmer_refresh_ahead_fraction),
+            layer3_top_k=_env_int('LAYER3_TOP_K', cls.layer3_top_k),
+            webhook_response_profile=_env_str('WEBHOOK_RESPONSE_PROFILE', cls.webhook_response_profile),
+            response_cache_enabled=_env_bool('RESPONSE_CACHE_ENABLED', cls.response_cache_enabled),
+            symptom_classifier_path=_env_str('SYMPTOM_CLASSIFIER_PATH', cls.symptom_classifier_path),
+            symptom_classifier_threshold=_env_float('SYMPTOM_CLASSIFIER_THRESHOLD', cls.symptom_classifier_threshold),
+            medicine_canonicalization=_env_bool('MEDICINE_CANONICALIZATION', cls.medicine_canonicalization),
+            medicine_synonyms_path=_env_str('MEDICINE_SYNONYMS_PATH', cls.medicine_synonyms_path),
+            medicine_cover_enabled=_env_bool('MEDICINE_COVER_ENABLED', cls.medicine_cover_enabled),
+            max_medicine_searches=_env_int('MAX_MEDICINE_SEARCHES', cls.max_medicine_searches),
+            result_filter_rules=_env_str('RESULT_FILTER_RULES', cls.result_filter_rules),
+            semantic_cache_enabled=_env_bool('SEMANTIC_CACHE_ENABLED', cls.semantic_cache_enabled),
+            semantic_cache_threshold=_env_float('SEMANTIC_CACHE_THRESHOLD', cls.semantic_cache_threshold),
+            semantic_cache_ttl_seconds=_env_int('SEMANTIC_CACHE_TTL_SECONDS', cls.semantic_cache_ttl_seconds),
+            semantic_cache_max_entries=_env_int('SEMANTIC_CACHE_MAX_ENTRIES', cls.semantic_cache_max_entries),
+            semantic_cache_audit_path=_env_str('SEMANTIC_CACHE_AUDIT_PATH', cls.semantic_cache_audit_path),
+            session_enabled=_env_bool('SESSION_ENABLED', cls.session_enabled),
+            session_ttl_seconds=_env_int('SESSION_TTL_SECONDS', cls.session_ttl_seconds),
+            session_max_bytes=_env_int('SESSION_MAX_BYTES', cls.session_max_bytes),
+            admission_enabled=_env_bool('ADMISSION_ENABLED', cls.admission_enabled),
+            admission_max_in_flight=_env_int('ADMISSION_MAX_IN_FLIGHT', cls.admission_max_in_flight),
+            admission_max_queue=_env_int('ADMISSION_MAX_QUEUE', cls.admission_max_queue),
+            admission_max_wait_seconds=_env_float('ADMISSION_MAX_WAIT_SECONDS', cls.admission_max_wait_seconds),
+            idempotency_enabled=_env_bool('IDEMPOTENCY_ENABLED', cls.idempotency_enabled),
+            idempotency_retention_seconds=_env_int('IDEMPOTENCY_RETENTION_SECONDS', cls.idempotency_retention_seconds),
+            idempotency_max_entries=_env_int('IDEMPOTENCY_MAX_ENTRIES', cls.idempotency_max_entries),
+            idempotency_wait_seconds=_env_float('IDEMPOTENCY_WAIT_SECONDS', cls.idempotency_wait_seconds),
+            searchapi_requests_per_minute=_env_float('SEARCHAPI_REQUESTS_PER_MINUTE', cls.searchapi_requests_per_minute),
+            openai_requests_per_minute=_env_float('OPENAI_REQUESTS_PER_MINUTE', cls.openai_requests_per_minute),
+            openai_tokens_per_minute=_env_float('OPENAI_TOKENS_PER_MINUTE', cls.openai_tokens_per_minute),
+            rate_limit_max_wait_seconds=_env_float('RATE_LIMIT_MAX_WAIT_SECONDS', cls.rate_limit_max_wait_seconds),
+            rate_limit_path=_env_str('RATE_LIMIT_PATH', cls.rate_limit_path),
+            searchapi_streaming=_env_bool('SEARCHAPI_STREAMING', cls.searchapi_streaming),
+            searchapi_max_results=_env_int('SEARCHAPI_MAX_RESULTS', cls.searchapi_max_results),
+            search_max_queries=_env_int('SEARCH_MAX_QUERIES', cls.search_max_queries),
+            search_concurrency=_env_int('SEARCH_CONCURRENCY', cls.search_concurrency),
+            batch_max_workers=_env_int('BATCH_MAX_WORKERS', cls.batch_max_workers),
+            batch_max_conversations=_env_int('BATCH_MAX_CONVERSATIONS', cls.batch_max_conversations),
+            port=_env_int('PORT', cls.port),
+            log=LogConfig.from_env(),
+        )
+
+    def missing_keys(self) -> List[str]:
+        """Names of required API keys that are not configured."""
+        missing = []
+        if not self.searchapi_api_key:
+            missing.append('SEARCHAPI_API_KEY')
+        if not self.openai_api_key:
+            missing.append('OPENAI_API_KEY')
+        return missing
+
+
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+_reload_lock = threading.Lock()
+_reload_callbacks: List[Callable[[Settings], None]] = []
+_reload_requested = threading.Event()
+_reloader: Optional[threading.Thread] = None
+
+
+def get_settings() -> Settings:
+    """Return the process-wide settings, resolving them on first use."""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = Settings.from_env()
+    return _settings
+
+
+def reload_settings() -> Settings:
+    """
+    Re-resolve settings and notify registered callbacks.
+
+    In-flight requests keep the Settings object they started with; only
+    requests that call get_settings() afterwards see the new values.
+    Precedence is the same as at startup: real environment variables win
+    over `.env`, and a line removed from `.env` no longer applies.
+
+    Returns:
+        Settings: The newly loaded settings
+    """
+    global _settings
+    # One reload at a time; _settings_lock is only held to swap the object
+    with _reload_lock:
+        new_settings = Settings.from_env()
+        with _settings_lock:
+            _settings = new_settings
+            callbacks = list(_reload_callbacks)
+        for callback in callbacks:
+            callback(new_settings)
+    return new_settings
+
+
+def on_reload(callback: Callable[[Settings], None]) -> None:
+    """Register a callback that runs after every reload_settings()."""
+    with _settings_lock:
+        _reload_callbacks.append(callback)
+
+
+def install_reload_signal_handler(signum: int = getattr(signal, 'SIGHUP', 0)) -> bool:
+    """
+    Reload settings when the process receives `signum` (SIGHUP by default).
+
+    The handler only sets an event. The reload itself (and the callbacks,
+    which stop and start threads) runs on a background thread, because the
+    signal may interrupt the main thread while it holds a lock the reload
+    needs.
+
+    Must be called from the main thread. Returns False where the signal is
+    unavailable (e.g. Windows) or when not on the main thread.
+    """
+    global _reloader
+    if not signum or threading.current_thread() is not threading.main_thread():
+        return False
+    with _settings_lock:
+        if _reloader is None:
+            _reloader = threading.Thread(target=_reload_when_requested, name='settings-reloader', daemon=True)
+            _reloader.start()
+    signal.signal(signum, lambda _signum, _frame: _reload_requested.set())
+    return True
+
+
+def _reload_when_requested() -> None:
+    while True:
+        _reload_requested.wait()
+        _reload_requested.clear()
+        try:
+            reload_settings()
+        except Exception as e:
+            # Keep serving the old settings and keep listening for the next signal
+            log_event(logger, "settings_reload_failed", logging.ERROR, error=str(e))
@@ -0,0 +1,273 @@
+"""
+Non-blocking structured logging for the symptom search services.
+
+Request threads redact and truncate their fields into a private,
+size-bounded copy and put the record on an in-memory queue. A background
+listener thread does the rest (JSON encoding and the actual write), so large
+Vapi payloads never slow down the request that produced them.
+
+Importing this module (or any pipeline module) does not touch the host's
+logging. Only entry points (the server, the CLIs) call `setup_logging()`;
+a library user keeps whatever handlers they configured.
+"""
+
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+# Keys whose values may contain patient health information (transcripts,
+# symptoms, generated answers) or free text derived from it (search
+# queries, medicine names, exception messages that can echo a prompt or a
+# request URL). Their values are never written verbatim.
+HEALTH_TEXT_KEYS = {
+    'conversation', 'transcript', 'messages', 'content', 'context',
+    'symptoms', 'arguments', 'natural_response', 'voice_response',
+    'artifact', 'summary', 'text', 'error', 'query', 'medicine'
+}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
+_dropped_lock = threading.Lock()
+_dropped_records = 0
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+class LogConfig:
+    """Logging knobs, read once when logging is set up."""
+
+    def __init__(self, level: str = 'INFO', payload_sample_rate: float = 0.01,
+                 max_field_chars: int = 200, redact_health_text: bool = True,
+                 queue_size: int = 10000):
+        self.level = level
+        self.payload_sample_rate = payload_sample_rate
+        self.max_field_chars = max_field_chars
+        self.redact_health_text = redact_health_text
+        self.queue_size = queue_size
+
+    @classmethod
+    def from_env(cls) -> 'LogConfig':
+        return cls(
+            level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+            payload_sample_rate=_env_float('LOG_PAYLOAD_SAMPLE_RATE', 0.01),
+            max_field_chars=_env_int('LOG_MAX_FIELD_CHARS', 200),
+            redact_health_text=os.getenv('LOG_REDACT_HEALTH_TEXT', 'true').lower() != 'false',
+            queue_size=_env_int('LOG_QUEUE_SIZE', 10000),
+        )
+
+
+_config = LogConfig.from_env()
+
+
+def sanitize(value: Any, max_chars: int, redact: bool, depth: int = 0) -> Any:
+    """
+    Redact health text and truncate large values in a log field.
+
+    Args:
+        value (Any): Field value (dict, list, string or scalar)
+        max_chars (int): Maximum length of any string kept in the record
+        redact (bool): Replace values under HEALTH_TEXT_KEYS with a length marker
+        depth (int): Current nesting depth (deep structures are summarized)
+
+    Returns:
+        Any: A JSON-serializable, size-bounded copy of the value
+    """
+    if depth > 6:
+        return '[nested]'
+    if isinstance(value, dict):
+        cleaned = {}
+        for index, (key, item) in enumerate(value.items()):
+            if index >= 50:
+                cleaned['_truncated_keys'] = len(value) - 50
+                break
+            if redact and key in HEALTH_TEXT_KEYS:
+                cleaned[key] = _redacted_marker(item)
+            else:
+                cleaned[key] = sanitize(item, max_chars, redact, depth + 1)
+        return cleaned
+    if isinstance(value, (list, tuple)):
+        items = [sanitize(item, max_chars, redact, depth + 1) for item in value[:20]]
+        if len(value) > 20:
+            items.append(f'[+{len(value) - 20} items]')
+        return items
+    if isinstance(value, str):
+        if len(value) > max_chars:
+            return value[:max_chars] + f'...[+{len(value) - max_chars} chars]'
+        return value
+    if value is None or isinstance(value, (int, float, bool)):
+        return value
+    return sanitize(str(value), max_chars, redact, depth + 1)
+
+
+def _redacted_marker(value: Any) -> str:
+    if isinstance(value, str):
+        return f'[redacted len={len(value)}]'
+    if isinstance(value, (list, tuple, dict)):
+        return f'[redacted items={len(value)}]'
+    return '[redacted]'
+
+
+class JSONFormatter(logging.Formatter):
+    """Formats records as single-line JSON objects. Runs on the listener thread."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        fields = getattr(record, 'fields', None)
+        if fields:
+            if not getattr(record, 'fields_sanitized', False):
+                fields = sanitize(fields, _config.max_field_chars, _config.redact_health_text)
+            payload.update(fields)
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves formatting to the listener thread.
+
+    The stock handler formats the message on the calling thread in prepare();
+    here only the structured fields are sanitized into a private copy, so the
+    caller may keep mutating its dicts after logging. A full queue drops the
+    record instead of blocking the request.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        fields = getattr(record, 'fields', None)
+        if fields:
+            record.fields = sanitize(fields, _config.max_field_chars, _config.redact_health_text)
+            record.fields_sanitized = True
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        global _dropped_records
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with _dropped_lock:
+                _dropped_records += 1
+
+
+def setup_logging(config: Optional[LogConfig] = None) -> None:
+    """
+    Route all logging through the background queue listener. Safe to call more than once.
+
+    Replaces the root logger's handlers, so only entry points should call it.
+
+    Args:
+        config (LogConfig): Optional logging configuration (defaults to environment values)
+    """
+    global _listener, _config
+    with _setup_lock:
+        if config is not None:
+            _config = config
+        root = logging.getLogger()
+        root.setLevel(_config.level)
+        if _listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(JSONFormatter())
+
+        log_queue: queue.Queue = queue.Queue(maxsize=_config.queue_size)
+        for handler in list(root.handlers):
+            root.removeHandler(handler)
+        root.addHandler(_DeferredQueueHandler(log_queue))
+
+        _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown_logging)
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a module logger. Its records are structured once an entry point calls setup_logging()."""
+    return logging.getLogger(name)
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields: Any) -> None:
+    """
+    Log a structured event. Field values are copied (redacted and truncated) before the call returns.
+
+    Args:
+        logger (logging.Logger): Logger to write to
+        event (str): Short event name used as the message
+        level (int): Logging level
+        **fields: Structured fields attached to the record
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={'fields': fields})
+
+
+def log_payload(logger: logging.Logger, event: str, payload: Any, level: int = logging.INFO, **fields: Any) -> None:
+    """
+    Log a potentially large request payload.
+
+    Only a sampled fraction of payloads (LOG_PAYLOAD_SAMPLE_RATE) is logged in
+    full (still redacted and truncated). The rest are reduced to a cheap
+    summary of their top-level keys so the hot path never walks large bodies.
+
+    Args:
+        logger (logging.Logger): Logger to write to
+        event (str): Short event name used as the message
+        payload (Any): Request body or other large structure
+        level (int): Logging level
+        **fields: Extra structured fields
+    """
+    if not logger.isEnabledFor(level):
+        return
+    if random.random() < _config.payload_sample_rate:
+        fields['payload'] = payload
+        fields['payload_sampled'] = True
+    else:
+        fields['payload_keys'] = sorted(payload.keys()) if isinstance(payload, dict) else type(payload).__name__
+        fields['payload_sampled'] = False
+    logger.log(level, event, extra={'fields': fields})
+
+
+def dropped_record_count() -> int:
+    """Number of records dropped because the log queue was full."""
+    return _dropped_records
+
+
+class Timer:
+    """Small helper for attaching elapsed milliseconds to log events."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+
+    def elapsed_ms(self) -> float:
+        return round((time.perf_counter() - self.start) * 1000, 1)
@@ -0,0 +1,341 @@
+"""
+Local Layer 1 fast path: TF-IDF features plus linear classifiers in NumPy.
+
+Trained offline (see train_symptom_classifier.py) from logged GPT
+extractions, e.g. bulk_process.py output. Symptoms are predicted with one
+logistic regression per symptom, severity with a softmax regression, and
+duration is read with a pattern ("2 days", "since yesterday"). Predictions
+take well under a millisecond and come with a confidence score; the
+pipeline skips the GPT call when the confidence reaches
+SYMPTOM_CLASSIFIER_THRESHOLD.
+"""
+
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from settings import Settings, on_reload
+from structured_logging import get_logger, log_event
+
+logger = get_logger(__name__)
+
+SEVERITIES = ('mild', 'moderate', 'severe', 'unknown')
+
+# Layer 1 contexts that did not come from GPT (excluded from training data)
+NON_GPT_CONTEXT_PREFIXES = ('Extracted using fallback method', 'Error extracting symptoms', 'Extracted by local classifier')
+
+_word_pattern = re.compile(r"[a-z0-9']+")
+_number_words = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6, 'seven': 7,
+    'eight': 8, 'nine': 9, 'ten': 10, 'couple': 2, 'few': 3,
+}
+_duration_pattern = re.compile(
+    r"\b(\d+|a|an|one|two|three|four|five|six|seven|eight|nine|ten|couple(?: of)?|few)\s+"
+    r"(hour|day|night|week|month|year)s?\b"
+)
+_since_pattern = re.compile(r"\bsince (yesterday|last night|this morning|last week|monday|tuesday|wednesday|"
+                            r"thursday|friday|saturday|sunday)\b")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased words plus adjacent-word bigrams."""
+    words = _word_pattern.findall(text.lower())
+    return words + [f'{first} {second}' for first, second in zip(words, words[1:])]
+
+
+def extract_duration(text: str) -> Optional[str]:
+    """Duration mentioned in a conversation ("2 days", "since yesterday"), or None."""
+    text = text.lower()
+    match = _duration_pattern.search(text)
+    if match:
+        amount = match.group(1).replace(' of', '')
+        count = int(amount) if amount.isdigit() else _number_words[amount]
+        unit = match.group(2)
+        return f"{count} {unit}" + ("s" if count != 1 else "")
+    match = _since_pattern.search(text)
+    if match:
+        return f"since {match.group(1)}"
+    return None
+
+
+def normalize_label(symptom: str) -> str:
+    return ' '.join(_word_pattern.findall(str(symptom).lower()))
+
+
+def _sigmoid(values: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(values, -30, 30)))
+
+
+def _softmax(values: np.ndarray) -> np.ndarray:
+    shifted = np.exp(values - values.max(axis=-1, keepdims=True))
+    return shifted / shifted.sum(axis=-1, keepdims=True)
+
+
+class SymptomClassifier:
+    """
+    TF-IDF + linear symptom/severity classifier.
+
+    Args:
+        vocabulary (Sequence[str]): Feature terms
+        idf (np.ndarray): Inverse document frequency per term
+        symptom_labels (Sequence[str]): Symptom names, one per column of symptom_weights
+        symptom_weights (np.ndarray): (terms, symptoms) weights
+        symptom_bias (np.ndarray): Bias per symptom
+        severity_weights (np.ndarray): (terms, SEVERITIES) weights
+        severity_bias (np.ndarray): Bias per severity
+    """
+
+    def __init__(self, vocabulary: Sequence[str], idf: np.ndarray, symptom_labels: Sequence[str],
+                 symptom_weights: np.ndarray, symptom_bias: np.ndarray,
+                 severity_weights: np.ndarray, severity_bias: np.ndarray):
+        self.vocabulary = list(vocabulary)
+        self.index = {term: i for i, term in enumerate(self.vocabulary)}
+        self.idf = idf
+        self.symptom_labels = list(symptom_labels)
+        self.symptom_weights = symptom_weights
+        self.symptom_bias = symptom_bias
+        self.severity_weights = severity_weights
+        self.severity_bias = severity_bias
+
+    def features(self, text: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse TF-IDF features: (term indices, L2-normalized values)."""
+        counts = Counter(self.index[token] for token in tokenize(text) if token in self.index)
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        indices = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        values = (1.0 + np.log(np.fromiter(counts.values(), dtype=float, count=len(counts)))) * self.idf[indices]
+        return indices, values / np.linalg.norm(values)
+
+    def predict(self, conversation: str) -> Tuple[Dict, float]:
+        """
+        Predict Layer 1 output for a conversation.
+
+        Args:
+            conversation (str): User's conversation
+
+        Returns:
+            Tuple[Dict, float]: Symptoms data (same shape as GPT's) and a 0-1 confidence
+        """
+        indices, values = self.features(conversation)
+        symptom_probs = _sigmoid(values @ self.symptom_weights[indices] + self.symptom_bias)
+        severity_probs = _softmax(values @ self.severity_weights[indices] + self.severity_bias)
+
+        symptoms = [self.symptom_labels[i] for i in np.flatnonzero(symptom_probs >= 0.5)] if len(indices) else []
+        severity_index = int(np.argmax(severity_probs))
+        # The least certain decision bounds the confidence; no symptoms at all is never confident
+        symptom_confidence = float(np.min(np.maximum(symptom_probs, 1.0 - symptom_probs))) if len(symptom_probs) else 0.0
+        confidence = min(symptom_confidence, float(severity_probs[severity_index])) if symptoms else 0.0
+        return {
+            "symptoms": symptoms,
+            "severity": SEVERITIES[severity_index],
+            "duration": extract_duration(conversation),
+            "context": f"Extracted by local classifier (confidence {confidence:.2f})",
+            "source": "classifier"
+        }, confidence
+
+    def save(self, path: str) -> None:
+        np.savez_compressed(
+            path,
+            vocabulary=np.array(self.vocabulary, dtype=str),
+            idf=self.idf,
+            symptom_labels=np.array(self.symptom_labels, dtype=str),
+            symptom_weights=self.symptom_weights,
+            symptom_bias=self.symptom_bias,
+            severity_weights=self.severity_weights,
+            severity_bias=self.severity_bias,
+        )
+
+    @classmethod
+    def load(cls, path: str) -> 'SymptomClassifier':
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                vocabulary=data['vocabulary'].tolist(),
+                idf=data['idf'],
+                symptom_labels=data['symptom_labels'].tolist(),
+                symptom_weights=data['symptom_weights'],
+                symptom_bias=data['symptom_bias'],
+                severity_weights=data['severity_weights'],
+                severity_bias=data['severity_bias'],
+            )
+
+
+def training_example(record: Dict) -> Optional[Tuple[str, List[str], str]]:
+    """
+    Turn a logged pipeline result into (conversation, symptoms, severity), or None if unusable.
+
+    Only complete GPT extractions are used: records whose Layer 1 `source` is
+    anything but 'gpt' (keywords, the classifier, a stream cut off by the
+    deadline) or whose `degraded_layers` include extraction are skipped.
+    Older records without a source are checked by their context prefix.
+    """
+    conversation = record.get('conversation')
+    symptoms_data = record.get('symptoms')
+    if not isinstance(conversation, str) or not isinstance(symptoms_data, dict) or 'cache' in record:
+        return None
+    if symptoms_data.get('source', 'gpt') != 'gpt' or 'extraction' in (record.get('degraded_layers') or []):
+        return None
+    if str(symptoms_data.get('context') or '').startswith(NON_GPT_CONTEXT_PREFIXES):
+        return None
+    symptoms = [normalize_label(symptom) for symptom in symptoms_data.get('symptoms') or []]
+    severity = str(symptoms_data.get('severity') or 'unknown').lower()
+    return conversation, sorted(set(s for s in symptoms if s)), severity if severity in SEVERITIES else 'unknown'
+
+
+def train(examples: Sequence[Tuple[str, List[str], str]], min_df: int = 2, min_label_count: int = 3,
+          max_features: int = 20000, epochs: int = 60, learning_rate: float = 4.0, l2: float = 1e-4,
+          batch_size: int = 128, seed: int = 0) -> SymptomClassifier:
+    """
+    Fit the classifier with mini-batch gradient descent.
+
+    Args:
+        examples (Sequence[Tuple[str, List[str], str]]): (conversation, symptoms, severity) triples
+        min_df (int): Minimum documents a term must appear in
+        min_label_count (int): Minimum examples a symptom needs to get its own classifier
+        max_features (int): Vocabulary size cap (most frequent terms kept)
+        epochs (int): Passes over the data
+        learning_rate (float): Gradient step size
+        l2 (float): L2 regularization strength
+        batch_size (int): Examples per gradient step
+        seed (int): Shuffling seed
+
+    Returns:
+        SymptomClassifier: Trained model
+    """
+    if not examples:
+        raise ValueError("No training examples")
+
+    document_frequency = Counter()
+    for conversation, _symptoms, _severity in examples:
+        document_frequency.update(set(tokenize(conversation)))
+    terms = [term for term, count in document_frequency.most_common(max_features) if count >= min_df]
+    idf = np.array([math.log((1 + len(examples)) / (1 + document_frequency[term])) + 1.0 for term in terms])
+
+    label_counts = Counter(symptom for _conversation, symptoms, _severity in examples for symptom in symptoms)
+    labels = sorted(label for label, count in label_counts.items() if count >= min_label_count)
+    label_index = {label: i for i, label in enumerate(labels)}
+
+    model = SymptomClassifier(terms, idf, labels, np.zeros((len(terms), len(labels))), np.zeros(len(labels)),
+                              np.zeros((len(terms), len(SEVERITIES))), np.zeros(len(SEVERITIES)))
+    features = [model.features(conversation) for conversation, _symptoms, _severity in examples]
+    symptom_targets = np.zeros((len(examples), len(labels)))
+    severity_targets = np.zeros((len(examples), len(SEVERITIES)))
+    for row, (_conversation, symptoms, severity) in enumerate(examples):
+        for symptom in symptoms:
+            if symptom in label_index:
+                symptom_targets[row, label_index[symptom]] = 1.0
+        severity_targets[row, SEVERITIES.index(severity)] = 1.0
+
+    rng = np.random.default_rng(seed)
+    for _epoch in range(epochs):
+        order = rng.permutation(len(examples))
+        for start in range(0, len(order), batch_size):
+            rows = order[start:start + batch_size]
+            # Dense only for the batch: (batch, terms)
+            batch = np.zeros((len(rows), len(terms)))
+            for position, row in enumerate(rows):
+                indices, values = features[row]
+                batch[position, indices] = values
+            symptom_error = _sigmoid(batch @ model.symptom_weights + model.symptom_bias) - symptom_targets[rows]
+            severity_error = _softmax(batch @ model.severity_weights + model.severity_bias) - severity_targets[rows]
+            scale = learning_rate / len(rows)
+            model.symptom_weights -= scale * (batch.T @ symptom_error) + learning_rate * l2 * model.symptom_weights
+            model.symptom_bias -= scale * symptom_error.sum(axis=0)
+            model.severity_weights -= scale * (batch.T @ severity_error) + learning_rate * l2 * model.severity_weights
+            model.severity_bias -= scale * severity_error.sum(axis=0)
+    return model
+
+
+def evaluate(model: SymptomClassifier, examples: Iterable[Tuple[str, List[str], str]],
+             threshold: float) -> Dict:
+    """
+    Compare the model's output with GPT's extractions.
+
+    Args:
+        model (SymptomClassifier): Trained model
+        examples (Iterable[Tuple[str, List[str], str]]): Held-out (conversation, symptoms, severity)
+        threshold (float): Confidence at which the pipeline would skip GPT
+
+    Returns:
+        Dict: Agreement with GPT overall and on the requests that would skip GPT, plus latency
+    """
+    true_positives = false_positives = false_negatives = 0
+    exact = severity_correct = covered = covered_exact = total = 0
+    latencies: List[float] = []
+    for conversation, symptoms, severity in examples:
+        start = time.perf_counter()
+        predicted, confidence = model.predict(conversation)
+        latencies.append((time.perf_counter() - start) * 1000)
+        expected, actual = set(symptoms), set(predicted['symptoms'])
+        true_positives += len(expected & actual)
+        false_positives += len(actual - expected)
+        false_negatives += len(expected - actual)
+        exact += expected == actual
+        severity_correct += severity == predicted['severity']
+        if confidence >= threshold:
+            covered += 1
+            covered_exact += expected == actual
+        total += 1
+
+    precision = true_positives / (true_positives + false_positives) if true_positives + false_positives else 0.0
+    recall = true_positives / (true_positives + false_negatives) if true_positives + false_negatives else 0.0
+    latencies.sort()
+    return {
+        "examples": total,
+        "symptom_precision": round(precision, 4),
+        "symptom_recall": round(recall, 4),
+        "symptom_f1": round(2 * precision * recall / (precision + recall), 4) if precision + recall else 0.0,
+        "exact_symptom_match": round(exact / total, 4) if total else 0.0,
+        "severity_accuracy": round(severity_correct / total, 4) if total else 0.0,
+        "threshold": threshold,
+        "fast_path_coverage": round(covered / total, 4) if total else 0.0,
+        "fast_path_exact_symptom_match": round(covered_exact / covered, 4) if covered else 0.0,
+        "predict_ms_p50": round(latencies[len(latencies) // 2], 4) if latencies else 0.0,
+        "predict_ms_p99": round(latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))], 4) if latencies else 0.0,
+    }
+
+
+_classifiers: Dict[str, Optional[SymptomClassifier]] = {}
+_classifiers_lock = threading.Lock()
+
+
+def get_symptom_classifier(settings: Settings) -> Optional[SymptomClassifier]:
+    """
+    Return the shared classifier loaded from SYMPTOM_CLASSIFIER_PATH, or None when unset or unreadable.
+
+    Args:
+        settings (Settings): Service settings
+
+    Returns:
+        Optional[SymptomClassifier]: Loaded model
+    """
+    path = settings.symptom_classifier_path
+    if not path:
+        return None
+    with _classifiers_lock:
+        if path not in _classifiers:
+            try:
+                _classifiers[path] = SymptomClassifier.load(path)
+                log_event(logger, "symptom_classifier_loaded", path=path,
+                          symptoms=len(_classifiers[path].symptom_labels))
+            except (OSError, KeyError, ValueError) as e:
+                # Remember the failure so every request does not retry the load
+                _classifiers[path] = None
+                log_event(logger, "symptom_classifier_load_failed", logging.WARNING, path=path,
+                          exists=os.path.exists(path), error=str(e))
+        return _classifiers[path]
+
+
+def _drop_loaded_models(_settings: Settings) -> None:
+    # A retrained model written to the same path is picked up on reload (SIGHUP)
+    with _classifiers_lock:
+        _classifiers.clear()
+
+
+on_reload(_drop_loaded_models)
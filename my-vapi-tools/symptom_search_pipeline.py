@@ -1,17 +1,93 @@
-import os
+import copy
 import json
-import requests
-import httpx
-from typing import Dict, List, Optional, Tuple
-from dotenv import load_dotenv
-from openai import OpenAI
+import logging
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import metrics
+from coalescing import CoalescingTimeout, get_flight, normalize_key
+from deadline import Deadline, DeadlineExceeded, is_timeout_error, is_valid_budget, parse_split
+from http_clients import get_openai_client, get_search_session
+from medicine_cover import get_coverage_table
+from medicine_names import get_canonicalizer
+from model_router import get_model_router
+from product_catalog import get_catalog
+from product_record import ProductRecord
+from ranking import rank_results
+from result_filters import get_result_filter
+from rate_limit import estimate_tokens, is_rate_limit_error, used_tokens
+from searchapi_client import fetch_organic_results
+from semantic_cache import get_semantic_cache
+from session_state import CallSession, get_session_store
+from settings import Settings, get_settings
+from symptom_classifier import get_symptom_classifier
+from structured_logging import get_logger, log_event, setup_logging, Timer
+from tolerant_json import IncrementalJSONParser, JSONRepairError, parse_llm_json
 
-# Create a clean session without proxies to avoid issues
-session = requests.Session()
-session.proxies = {}
+logger = get_logger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Symptom keywords used when GPT extraction fails (and to fingerprint conversations for the semantic cache)
+SYMPTOM_KEYWORDS = {
+    'headache': ['headache', 'head pain', 'migraine', 'head is killing', 'head is pounding'],
+    'fever': ['fever', 'temperature', 'hot', 'burning up'],
+    'sore throat': ['sore throat', 'throat pain', 'throat sore'],
+    'cough': ['cough', 'coughing', 'dry cough'],
+    'fatigue': ['fatigue', 'tired', 'exhausted', 'weak'],
+    'body aches': ['body aches', 'muscle pain', 'joint pain', 'achy'],
+    'nausea': ['nausea', 'sick', 'queasy'],
+    'congestion': ['congestion', 'stuffy nose', 'blocked nose'],
+    'runny nose': ['runny nose', 'dripping nose'],
+    'sneezing': ['sneezing', 'sneeze'],
+    'itchy eyes': ['itchy eyes', 'eye irritation'],
+    'back pain': ['back pain', 'backache'],
+    'stomach pain': ['stomach pain', 'abdominal pain', 'belly ache'],
+    'insomnia': ['insomnia', 'trouble sleeping', 'can\'t sleep'],
+    'anxiety': ['anxiety', 'anxious', 'worried'],
+    'stress': ['stress', 'stressed'],
+    'allergies': ['allergies', 'allergic']
+}
+
+# Structured output schemas for Layers 1 and 2 (field order is the streaming order)
+SYMPTOMS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "symptoms": {"type": "array", "items": {"type": "string"}},
+        "severity": {"type": "string", "enum": ["mild", "moderate", "severe", "unknown"]},
+        "duration": {"type": ["string", "null"]},
+        "context": {"type": ["string", "null"]}
+    },
+    "required": ["symptoms", "severity", "duration", "context"],
+    "additionalProperties": False
+}
+MEDICINES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "medicines": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["medicines"],
+    "additionalProperties": False
+}
+
+# Symptom → over-the-counter medicine mapping used when GPT recommendations fail
+MEDICINE_MAPPINGS = {
+    'headache': ['acetaminophen', 'ibuprofen', 'aspirin'],
+    'fever': ['acetaminophen', 'ibuprofen'],
+    'sore throat': ['throat lozenges', 'acetaminophen', 'ibuprofen'],
+    'cough': ['dextromethorphan', 'guaifenesin', 'cough syrup'],
+    'fatigue': ['caffeine', 'vitamin b12'],
+    'body aches': ['ibuprofen', 'acetaminophen'],
+    'nausea': ['pepto-bismol', 'ginger'],
+    'congestion': ['pseudoephedrine', 'saline nasal spray'],
+    'runny nose': ['antihistamines', 'saline nasal spray'],
+    'sneezing': ['antihistamines', 'cetirizine'],
+    'itchy eyes': ['antihistamine eye drops', 'cetirizine'],
+    'back pain': ['ibuprofen', 'acetaminophen', 'topical analgesics'],
+    'stomach pain': ['pepto-bismol', 'antacids'],
+    'insomnia': ['diphenhydramine', 'melatonin'],
+    'anxiety': ['valerian root', 'chamomile'],
+    'stress': ['b vitamins', 'magnesium'],
+    'allergies': ['cetirizine', 'loratadine', 'diphenhydramine']
+}
 
 class SymptomSearchPipeline:
     """
@@ -24,36 +100,138 @@ class SymptomSearchPipeline:
     4. SearchAPI JSON → GPT extracts details and formats natural language response
     """
     
-    def __init__(self):
-        self.searchapi_key = os.getenv('SEARCHAPI_API_KEY')
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.base_search_url = "https://www.searchapi.io/api/v1/search"
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or get_settings()
+        self.searchapi_key = self.settings.searchapi_api_key
+        self.openai_api_key = self.settings.openai_api_key
+        self.base_search_url = self.settings.searchapi_url
         
         if not self.searchapi_key:
             raise ValueError("SEARCHAPI_API_KEY not found in environment variables")
         if not self.openai_api_key:
             raise ValueError("OPENAI_API_KEY not found in environment variables")
         
-        # Initialize OpenAI client with a custom HTTPX client that ignores env proxies
+        # Shared clients ignore proxy/CA environment variables (trust_env=False)
+        self.session = get_search_session(self.settings)
+        self.client = get_openai_client(self.settings)
+        
+        # The current request's deadline (set per request; None = no deadline)
+        self.deadline: Optional[Deadline] = None
+    
+    def new_deadline(self, budget_seconds: Optional[float] = None) -> Deadline:
+        """
+        Start a request deadline for this pipeline (PIPELINE_DEADLINE_SECONDS unless a budget is given).
+        
+        Use one pipeline instance per request while a deadline is set.
+        
+        Args:
+            budget_seconds (float): Budget for this request (None uses the configured one, 0 means none)
+            
+        Returns:
+            Deadline: The deadline, also stored on the pipeline
+        
+        Raises:
+            ValueError: If the budget is not a finite number of seconds >= 0
+        """
+        if not is_valid_budget(budget_seconds):
+            raise ValueError(f"deadline_seconds must be a number of seconds >= 0, got {budget_seconds!r}")
+        if budget_seconds is None:
+            budget_seconds = self.settings.pipeline_deadline_seconds
+        self.deadline = Deadline(budget_seconds,
+                                 parse_split(self.settings.deadline_split),
+                                 self.settings.deadline_min_call_seconds)
+        return self.deadline
+    
+    def for_request(self, budget_seconds: Optional[float] = None) -> 'SymptomSearchPipeline':
+        """
+        Copy of this pipeline with its own deadline, for one request run alongside others.
+        
+        The copy shares settings, clients and caches; only the deadline is its own.
+        
+        Args:
+            budget_seconds (float): Budget for the request (as for new_deadline)
+            
+        Returns:
+            SymptomSearchPipeline: Pipeline for the request
+        """
+        pipeline = copy.copy(self)
+        pipeline.new_deadline(budget_seconds)
+        return pipeline
+    
+    def _upstream_timeout(self, layer: str, cap: float) -> float:
+        # Timeout for an upstream call; raises DeadlineExceeded when not worth starting
+        return self.deadline.timeout(layer, cap) if self.deadline is not None else cap
+    
+    def _within_deadline(self, layer: str, cap: float, call: Callable[[float], Any]) -> Any:
+        """
+        Run an upstream call with the timeout the deadline allows the layer.
+        
+        A timeout the deadline shortened is raised as DeadlineExceeded: the
+        request ran out of budget, the upstream did not fail, so the model
+        router neither fails over nor counts it against the model.
+        """
+        timeout = self._upstream_timeout(layer, cap)
         try:
-            http_client = httpx.Client(trust_env=False)
-            self.client = OpenAI(api_key=self.openai_api_key, http_client=http_client)
-        except TypeError as e:
-            if "proxies" in str(e):
-                # Fallback: clear proxies from env and try again
-                proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'NO_PROXY', 'no_proxy']
-                for var in proxy_vars:
-                    if var in os.environ:
-                        del os.environ[var]
-                http_client = httpx.Client(trust_env=False)
-                self.client = OpenAI(api_key=self.openai_api_key, http_client=http_client)
-            else:
-                raise e
+            return call(timeout)
+        except Exception as e:
+            if timeout < cap and is_timeout_error(e):
+                raise DeadlineExceeded(f"{layer}: no answer within the {timeout:.2f}s the deadline left") from e
+            raise
+    
+    def _degrade(self, layer: str) -> None:
+        if self.deadline is not None:
+            self.deadline.degrade(layer)
+    
+    def _record_fallback(self, layer: str) -> None:
+        metrics.inc('llm_fallback_total', layer=layer)
+        self._degrade(layer)
     
     def extract_symptoms_from_conversation(self, conversation: str) -> Dict:
         """
         Layer 1: Extract symptoms from user conversation using GPT.
         
+        When a local classifier is configured and confident enough, its
+        prediction is used and GPT is skipped. Concurrent calls with the same
+        (normalized) conversation share one GPT call.
+        
+        Args:
+            conversation (str): User's conversation or description of their condition
+            
+        Returns:
+            Dict: Extracted symptoms and context
+        """
+        classifier = get_symptom_classifier(self.settings)
+        if classifier is not None:
+            symptoms_data, confidence = classifier.predict(conversation)
+            if confidence >= self.settings.symptom_classifier_threshold:
+                metrics.inc('layer1_source_total', source='classifier')
+                return symptoms_data
+        metrics.inc('layer1_source_total', source='gpt')
+        
+        if not self.settings.coalescing_enabled:
+            return self._extract_symptoms(conversation)
+        try:
+            result = get_flight('layer1').do(
+                normalize_key(conversation),
+                lambda: self._extract_symptoms(conversation),
+                timeout=self._coalesce_timeout('extraction')
+            )
+            return copy.deepcopy(result)
+        except (CoalescingTimeout, DeadlineExceeded) as e:
+            log_event(logger, "layer1_coalesce_timeout", logging.WARNING, error=str(e))
+            self._degrade('extraction')
+            return {
+                "symptoms": self._extract_symptoms_fallback(conversation),
+                "severity": "unknown",
+                "duration": None,
+                "context": "Extracted using fallback method",
+                "source": "keywords"
+            }
+    
+    def _extract_symptoms(self, conversation: str) -> Dict:
+        """
+        Uncoalesced Layer 1 implementation (one GPT call).
+        
         Args:
             conversation (str): User's conversation or description of their condition
             
@@ -89,42 +267,31 @@ class SymptomSearchPipeline:
             IMPORTANT: Return ONLY valid JSON, no additional text or explanations.
             """
             
-            response = self._chat_completion(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": conversation}
-                ],
-                temperature=1.0,
-                max_tokens=300
-            )
-            
-            # Parse the JSON response
-            content = response.choices[0].message.content.strip()
-            
-            # Clean up the content - remove markdown code blocks if present
-            if content.startswith('```json'):
-                content = content[7:-3]  # Remove ```json and ``` markers
-            elif content.startswith('```'):
-                content = content[3:-3]  # Remove ``` markers
-            
-            # Remove any leading/trailing whitespace
-            content = content.strip()
-            
-            # Try to parse the JSON
+            # Stop reading once the fields later layers need are complete (context is optional)
             try:
-                result = json.loads(content)
-            except json.JSONDecodeError as e:
-                # If JSON parsing fails, try to extract symptoms manually
-                print(f"JSON parsing failed: {e}. Content: {content}")
-                
-                # Fallback: try to extract symptoms using a simpler approach
+                result = self._json_completion(
+                    layer='extraction',
+                    schema_name='symptoms',
+                    schema=SYMPTOMS_SCHEMA,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": conversation}
+                    ],
+                    temperature=1.0,
+                    max_tokens=300,
+                    stop_when=lambda fields: {'symptoms', 'severity', 'duration'} <= set(fields)
+                )
+            except JSONRepairError as e:
+                # Nothing recoverable: extract symptoms with the keyword table
+                log_event(logger, "layer1_json_parse_failed", logging.WARNING, error=str(e))
+                self._record_fallback('extraction')
                 fallback_symptoms = self._extract_symptoms_fallback(conversation)
                 result = {
                     "symptoms": fallback_symptoms,
                     "severity": "moderate",
                     "duration": None,
-                    "context": "Extracted using fallback method"
+                    "context": "Extracted using fallback method",
+                    "source": "keywords"
                 }
             
             # Ensure the result has the required fields
@@ -135,6 +302,17 @@ class SymptomSearchPipeline:
             if 'symptoms' not in result or not isinstance(result['symptoms'], list):
                 result['symptoms'] = []
             
+            # Where Layer 1's answer came from (the classifier's training data is GPT output only)
+            cut_off = self.deadline is not None and 'extraction' in self.deadline.degraded
+            if result.get('source') != 'keywords':
+                result['source'] = 'gpt_partial' if cut_off else 'gpt'
+            if not result['symptoms'] and cut_off:
+                # The stream was cut off before the symptoms array completed: use the keyword table
+                log_event(logger, "layer1_stopped_without_symptoms", logging.WARNING)
+                metrics.inc('llm_fallback_total', layer='extraction')
+                result['symptoms'] = self._extract_symptoms_fallback(conversation)
+                result['source'] = 'keywords'
+            
             # Ensure other fields exist
             result.setdefault('severity', 'unknown')
             result.setdefault('duration', None)
@@ -143,14 +321,16 @@ class SymptomSearchPipeline:
             return result
             
         except Exception as e:
-            print(f"Error in extract_symptoms_from_conversation: {str(e)}")
+            log_event(logger, "layer1_failed", logging.ERROR, error=str(e))
+            self._record_fallback('extraction')
             # Fallback: try to extract symptoms manually
             fallback_symptoms = self._extract_symptoms_fallback(conversation)
             return {
                 "symptoms": fallback_symptoms,
                 "severity": "unknown",
                 "duration": None,
-                "context": f"Error extracting symptoms: {str(e)}"
+                "context": f"Error extracting symptoms: {str(e)}",
+                "source": "keywords"
             }
     
     def _extract_symptoms_fallback(self, conversation: str) -> List[str]:
@@ -166,29 +346,8 @@ class SymptomSearchPipeline:
         conversation_lower = conversation.lower()
         symptoms = []
         
-        # Common symptom keywords
-        symptom_keywords = {
-            'headache': ['headache', 'head pain', 'migraine'],
-            'fever': ['fever', 'temperature', 'hot'],
-            'sore throat': ['sore throat', 'throat pain', 'throat sore'],
-            'cough': ['cough', 'coughing', 'dry cough'],
-            'fatigue': ['fatigue', 'tired', 'exhausted', 'weak'],
-            'body aches': ['body aches', 'muscle pain', 'joint pain', 'achy'],
-            'nausea': ['nausea', 'sick', 'queasy'],
-            'congestion': ['congestion', 'stuffy nose', 'blocked nose'],
-            'runny nose': ['runny nose', 'dripping nose'],
-            'sneezing': ['sneezing', 'sneeze'],
-            'itchy eyes': ['itchy eyes', 'eye irritation'],
-            'back pain': ['back pain', 'backache'],
-            'stomach pain': ['stomach pain', 'abdominal pain', 'belly ache'],
-            'insomnia': ['insomnia', 'trouble sleeping', 'can\'t sleep'],
-            'anxiety': ['anxiety', 'anxious', 'worried'],
-            'stress': ['stress', 'stressed'],
-            'allergies': ['allergies', 'allergic']
-        }
-        
         # Check for each symptom
-        for symptom, keywords in symptom_keywords.items():
+        for symptom, keywords in SYMPTOM_KEYWORDS.items():
             for keyword in keywords:
                 if keyword in conversation_lower:
                     if symptom not in symptoms:
@@ -197,12 +356,86 @@ class SymptomSearchPipeline:
         
         return symptoms
     
-    def recommend_medicines_from_symptoms(self, symptoms_data: Dict) -> List[str]:
+    def recommend_medicines_from_symptoms(self, symptoms_data: Dict,
+                                          on_medicine: Optional[Callable[[str], None]] = None) -> List[str]:
         """
         Layer 2: Convert symptoms to specific medicine names using GPT.
         
+        Concurrent calls with the same symptom set, severity and duration share one GPT call.
+        Names are canonicalized (see medicine_names.py) and duplicates collapsed before
+        they reach Layer 3.
+        
         Args:
             symptoms_data (Dict): Output from extract_symptoms_from_conversation
+            on_medicine (Callable[[str], None]): Called with each canonical medicine name as GPT streams it
+                (only the caller that makes the shared GPT call sees streamed names)
+            
+        Returns:
+            List[str]: Unique canonical medicine names
+        """
+        canonicalizer = get_canonicalizer(self.settings)
+        if canonicalizer is not None and on_medicine is not None:
+            streamed = on_medicine
+            on_medicine = lambda medicine: streamed(canonicalizer.canonical(medicine))
+        symptoms = symptoms_data.get('symptoms', [])
+        if not self.settings.coalescing_enabled:
+            medicines = self._canonical_medicines(self._recommend_medicines(symptoms_data, on_medicine))
+        else:
+            try:
+                medicines = self._canonical_medicines(get_flight('layer2').do(
+                    normalize_key(symptoms, symptoms_data.get('severity'), symptoms_data.get('duration')),
+                    lambda: self._recommend_medicines(symptoms_data, on_medicine),
+                    timeout=self._coalesce_timeout('recommendation')
+                ))
+            except (CoalescingTimeout, DeadlineExceeded) as e:
+                log_event(logger, "layer2_coalesce_timeout", logging.WARNING, error=str(e))
+                self._degrade('recommendation')
+                return self._canonical_medicines(self._recommend_medicines_fallback(symptoms))
+        coverage = get_coverage_table(self.settings)
+        if coverage is not None:
+            coverage.learn(symptoms, medicines)
+        return medicines
+    
+    def _select_medicines(self, symptoms: List[str], medicine_names: List[str],
+                          searched: Iterable[str] = ()) -> List[str]:
+        """
+        Fewest medicines covering the symptoms, at most MAX_MEDICINE_SEARCHES of them needing a search.
+        
+        Args:
+            symptoms (List[str]): Extracted symptoms
+            medicine_names (List[str]): Layer 2's medicines (and any already searched)
+            searched (Iterable[str]): Medicines with results already available
+            
+        Returns:
+            List[str]: Medicines to search and present (all of them when MEDICINE_COVER_ENABLED is off)
+        """
+        coverage = get_coverage_table(self.settings)
+        if coverage is None:
+            return medicine_names
+        selected = coverage.select(symptoms, medicine_names, self.settings.max_medicine_searches, searched)
+        if len(selected) < len(medicine_names):
+            log_event(logger, "medicines_selected", recommended=len(medicine_names), selected=len(selected))
+        return selected
+    
+    def _canonical_medicines(self, medicine_names: List[str]) -> List[str]:
+        # Same product set, same search: "Tylenol 500mg" and "paracetamol" become "acetaminophen"
+        canonicalizer = get_canonicalizer(self.settings)
+        if canonicalizer is None:
+            return list(medicine_names)
+        return canonicalizer.canonicalize_all(medicine_names)
+    
+    def _coalesce_timeout(self, layer: str) -> float:
+        # Waiting on another request's call is bounded by our own deadline too
+        return self._upstream_timeout(layer, self.settings.coalesce_timeout)
+    
+    def _recommend_medicines(self, symptoms_data: Dict,
+                             on_medicine: Optional[Callable[[str], None]] = None) -> List[str]:
+        """
+        Uncoalesced Layer 2 implementation (one GPT call).
+        
+        Args:
+            symptoms_data (Dict): Output from extract_symptoms_from_conversation
+            on_medicine (Callable[[str], None]): Called with each medicine name as GPT streams it
             
         Returns:
             List[str]: List of recommended medicine names
@@ -230,48 +463,47 @@ class SymptomSearchPipeline:
             - cough → ["dextromethorphan", "guaifenesin", "cough syrup"]
             - allergies → ["cetirizine", "loratadine", "diphenhydramine"]
             
-            Return only a JSON array of medicine names (strings), no explanations.
-            Example: ["acetaminophen", "ibuprofen", "throat lozenges"]
+            Return a JSON object with a "medicines" array of medicine names (strings), no explanations.
+            Example: {"medicines": ["acetaminophen", "ibuprofen", "throat lozenges"]}
             
-            IMPORTANT: Return ONLY valid JSON array, no additional text or explanations.
+            IMPORTANT: Return ONLY valid JSON, no additional text or explanations.
             """
             
             user_prompt = f"Symptoms: {', '.join(symptoms)}\nSeverity: {symptoms_data.get('severity', 'unknown')}\nDuration: {symptoms_data.get('duration', 'unknown')}"
             
-            response = self._chat_completion(
-                model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                temperature=1.0,
-                max_tokens=200
-            )
-            
-            content = response.choices[0].message.content.strip()
-            
-            # Clean up the content - remove markdown code blocks if present
-            if content.startswith('```json'):
-                content = content[7:-3]
-            elif content.startswith('```'):
-                content = content[3:-3]
-            
-            # Remove any leading/trailing whitespace
-            content = content.strip()
+            def on_element(field: str, value: Any) -> None:
+                if on_medicine is not None and field == 'medicines' and isinstance(value, str):
+                    on_medicine(value)
             
             try:
-                medicines = json.loads(content)
-                if isinstance(medicines, list):
-                    return medicines
-                else:
-                    print(f"Invalid medicine format: {medicines}")
-                    return self._recommend_medicines_fallback(symptoms)
-            except json.JSONDecodeError as e:
-                print(f"Medicine JSON parsing failed: {e}. Content: {content}")
+                result = self._json_completion(
+                    layer='recommendation',
+                    schema_name='medicines',
+                    schema=MEDICINES_SCHEMA,
+                    messages=[
+                        {"role": "system", "content": system_prompt},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=1.0,
+                    max_tokens=200,
+                    on_element=on_element
+                )
+            except JSONRepairError as e:
+                log_event(logger, "layer2_json_parse_failed", logging.WARNING, error=str(e))
+                self._record_fallback('recommendation')
                 return self._recommend_medicines_fallback(symptoms)
             
+            # Accept the schema's {"medicines": [...]} and a bare array
+            medicines = result.get('medicines') if isinstance(result, dict) else result
+            if isinstance(medicines, list) and all(isinstance(medicine, str) for medicine in medicines):
+                return medicines
+            log_event(logger, "layer2_invalid_format", logging.WARNING, result_type=type(result).__name__)
+            self._record_fallback('recommendation')
+            return self._recommend_medicines_fallback(symptoms)
+            
         except Exception as e:
-            print(f"Error in recommend_medicines_from_symptoms: {str(e)}")
+            log_event(logger, "layer2_failed", logging.ERROR, error=str(e))
+            self._record_fallback('recommendation')
             return self._recommend_medicines_fallback(symptoms)
     
     def _recommend_medicines_fallback(self, symptoms: List[str]) -> List[str]:
@@ -284,30 +516,10 @@ class SymptomSearchPipeline:
         Returns:
             List[str]: List of recommended medicines
         """
-        medicine_mappings = {
-            'headache': ['acetaminophen', 'ibuprofen', 'aspirin'],
-            'fever': ['acetaminophen', 'ibuprofen'],
-            'sore throat': ['throat lozenges', 'acetaminophen', 'ibuprofen'],
-            'cough': ['dextromethorphan', 'guaifenesin', 'cough syrup'],
-            'fatigue': ['caffeine', 'vitamin b12'],
-            'body aches': ['ibuprofen', 'acetaminophen'],
-            'nausea': ['pepto-bismol', 'ginger'],
-            'congestion': ['pseudoephedrine', 'saline nasal spray'],
-            'runny nose': ['antihistamines', 'saline nasal spray'],
-            'sneezing': ['antihistamines', 'cetirizine'],
-            'itchy eyes': ['antihistamine eye drops', 'cetirizine'],
-            'back pain': ['ibuprofen', 'acetaminophen', 'topical analgesics'],
-            'stomach pain': ['pepto-bismol', 'antacids'],
-            'insomnia': ['diphenhydramine', 'melatonin'],
-            'anxiety': ['valerian root', 'chamomile'],
-            'stress': ['b vitamins', 'magnesium'],
-            'allergies': ['cetirizine', 'loratadine', 'diphenhydramine']
-        }
-        
         recommended_medicines = []
         for symptom in symptoms:
-            if symptom in medicine_mappings:
-                recommended_medicines.extend(medicine_mappings[symptom])
+            if symptom in MEDICINE_MAPPINGS:
+                recommended_medicines.extend(MEDICINE_MAPPINGS[symptom])
         
         # Remove duplicates while preserving order
         seen = set()
@@ -328,46 +540,70 @@ class SymptomSearchPipeline:
             max_results (int): Maximum number of results per medicine
             
         Returns:
-            Dict: Search results for all medicines
+            Dict: Search results for all medicines ("results" holds ProductRecords)
+        """
+        if self.deadline is None or not self.deadline.bounded:
+            return self._gather_search_results(self.search_single_medicine(medicine, max_results)
+                                               for medicine in medicine_names)
+        # Under a deadline, search in parallel and keep whatever finishes in time
+        executor = ThreadPoolExecutor(max_workers=max(1, min(len(medicine_names), self.settings.batch_max_workers)))
+        searches: Dict[str, Future] = {}
+        try:
+            for medicine in medicine_names:
+                searches[medicine] = executor.submit(self.search_single_medicine, medicine, max_results)
+            return self._collect_searches(medicine_names, searches)
+        finally:
+            _cancel_pending(searches.values())
+            executor.shutdown(wait=False)
+    
+    def _collect_searches(self, medicine_names: List[str], searches: Dict[str, Future]) -> Dict:
+        """
+        Layer 3 result from submitted searches.
+        
+        Without a deadline every search must succeed. Under a deadline, searches
+        that fail or do not finish within the layer's time are left out and
+        Layer 3 is reported as degraded.
+        
+        Args:
+            medicine_names (List[str]): Medicines in result order
+            searches (Dict[str, Future]): Search per medicine
+            
+        Returns:
+            Dict: Search results for all medicines ("results" holds ProductRecords)
+        """
+        if self.deadline is None or not self.deadline.bounded:
+            return self._gather_search_results(searches[medicine].result() for medicine in medicine_names)
+        wait([searches[medicine] for medicine in medicine_names], timeout=max(0.0, self.deadline.remaining('search')))
+        completed, missed = [], []
+        for medicine in medicine_names:
+            search = searches[medicine]
+            if search.done() and search.exception() is None:
+                completed.append(search.result())
+            else:
+                search.cancel()
+                missed.append(medicine)
+        if missed:
+            log_event(logger, "layer3_partial", logging.WARNING, missed=len(missed), completed=len(completed))
+            self._degrade('search')
+        return self._gather_search_results(completed)
+    
+    def _gather_search_results(self, result_lists: Iterable[List[ProductRecord]]) -> Dict:
+        """
+        Combine and rank per-medicine results into the Layer 3 result.
+        
+        Args:
+            result_lists (Iterable[List[ProductRecord]]): Results per medicine (searches may run lazily)
+            
+        Returns:
+            Dict: Search results for all medicines ("results" holds ProductRecords)
         """
         try:
             all_results = []
             
-            for medicine in medicine_names:
-                # Prepare search parameters
-                params = {
-                    "engine": "amazon_search",
-                    "q": medicine,
-                    "api_key": self.searchapi_key,
-                    "amazon_domain": "amazon.com",
-                    "sort_by": "featured"
-                }
-                
-                # Make API request using clean session
-                response = session.get(self.base_search_url, params=params, timeout=30)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # Process results
-                if "organic_results" in data:
-                    medicine_results = []
-                    for result in data["organic_results"][:max_results]:
-                        processed_result = {
-                            "title": result.get("title", ""),
-                            "brand": result.get("brand", ""),
-                            "price": result.get("price", "Price not available"),
-                            "rating": result.get("rating", 0),
-                            "reviews": result.get("reviews", 0),
-                            "link": result.get("link", ""),
-                            "thumbnail": result.get("thumbnail", ""),
-                            "is_prime": result.get("is_prime", False),
-                            "medicine_name": medicine
-                        }
-                        if processed_result["rating"] > 0 and processed_result["reviews"] > 0:
-                            medicine_results.append(processed_result)
-                    
-                    all_results.extend(medicine_results)
+            for results in result_lists:
+                all_results.extend(results)
+            
+            all_results = self._rank_results(all_results)
             
             return {
                 "status": "success",
@@ -382,12 +618,46 @@ class SymptomSearchPipeline:
                 "results": []
             }
     
+    def search_single_medicine(self, medicine: str, max_results: int = 5) -> List[ProductRecord]:
+        """
+        Search SearchAPI for one medicine and keep products passing the filter rules (RESULT_FILTER_RULES).
+        
+        Args:
+            medicine (str): Medicine name to search for
+            max_results (int): Maximum number of organic results to consider
+            
+        Returns:
+            List[ProductRecord]: Processed product records
+            
+        Raises:
+            Exception: If the SearchAPI request fails
+        """
+        return get_result_filter(self.settings).apply(
+            (ProductRecord.from_search_result(result, medicine)
+             for result in self._fetch_organic_results(medicine)[:max_results]),
+            query=medicine
+        )
+    
+    def _fetch_organic_results(self, query: str) -> List[Dict]:
+        """
+        Fetch raw organic results for a query from the product catalog or SearchAPI.
+        Identical concurrent live queries share one SearchAPI call.
+        
+        Args:
+            query (str): Search query
+            
+        Returns:
+            List[Dict]: Raw organic results (shared between callers, treat as read-only)
+        """
+        return fetch_organic_results(self.settings, self.session, query,
+                                     timeout=self._upstream_timeout('search', self.settings.searchapi_timeout))
+    
     def extract_medicine_details_and_format_response(self, search_results: Dict, original_symptoms: Dict) -> str:
         """
         Layer 4: Extract medicine details from SearchAPI JSON and format natural language response.
         
         Args:
-            search_results (Dict): Results from search_medicines_on_amazon
+            search_results (Dict): Results from search_medicines_on_amazon (ProductRecords)
             original_symptoms (Dict): Original symptoms data from Layer 1
             
         Returns:
@@ -419,7 +689,7 @@ class SymptomSearchPipeline:
                 "symptoms": original_symptoms.get("symptoms", []),
                 "severity": original_symptoms.get("severity", "unknown"),
                 "duration": original_symptoms.get("duration"),
-                "search_results": search_results.get("results", [])
+                "search_results": [record.to_prompt_dict() for record in search_results.get("results", [])]
             }
             
             user_prompt = f"""
@@ -429,8 +699,8 @@ class SymptomSearchPipeline:
             Please list only the FIRST 3 product names and prices in a numbered format (1, 2, 3).
             """
             
-            response = self._chat_completion(
-                model="gpt-4o",
+            response = self._routed_completion(
+                layer='formatting',
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
@@ -442,12 +712,128 @@ class SymptomSearchPipeline:
             return response.choices[0].message.content.strip()
             
         except Exception as e:
-            return "Error formatting products."
+            # Same list format, built locally (GPT failed or the deadline left no time)
+            log_event(logger, "layer4_failed", logging.WARNING, error=str(e))
+            self._degrade('formatting')
+            return _list_products(search_results.get("results", []))
 
-    def _chat_completion(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int):
+    def _json_completion(self, layer: str, schema_name: str, schema: Dict, messages: List[Dict[str, str]],
+                         temperature: float, max_tokens: int,
+                         stop_when: Optional[Callable[[List[Any]], bool]] = None,
+                         on_element: Optional[Callable[[str, Any], None]] = None) -> Any:
+        """
+        JSON completion with schema-enforced output, streamed and parsed tolerantly.
+        
+        Structured output follows STRUCTURED_OUTPUT (json_schema, json_object or off).
+        With LLM_STREAMING, the completion is parsed as it arrives and reading stops
+        as soon as `stop_when` is satisfied by the completed top-level fields.
+        
+        Args:
+            layer (str): LLM layer ('extraction' or 'recommendation')
+            schema_name (str): Name of the JSON schema
+            schema (Dict): JSON schema of the expected output
+            messages (List[Dict[str, str]]): Chat messages
+            temperature (float): Sampling temperature
+            max_tokens (int): Completion token limit
+            stop_when (Callable): Given the completed field names (or element indexes), True to stop reading
+            on_element (Callable): Called with (field name, element) as each element of an array field completes
+                (a failover to another model may repeat elements)
+            
+        Returns:
+            Any: Parsed value (repaired if malformed or truncated)
+            
+        Raises:
+            JSONRepairError: If no JSON could be recovered
+        """
+        mode = self.settings.structured_output
+        if mode == 'json_schema':
+            response_format = {"type": "json_schema", "json_schema": {"name": schema_name, "schema": schema, "strict": True}}
+        elif mode == 'json_object':
+            response_format = {"type": "json_object"}
+        else:
+            response_format = None
+        
+        def complete(model: str, **options):
+            if response_format is None:
+                return self._chat_completion(model, messages, temperature, max_tokens, **options)
+            try:
+                return self._chat_completion(model, messages, temperature, max_tokens,
+                                             response_format=response_format, **options)
+            except Exception as e:
+                if 'response_format' not in str(e):
+                    raise
+                # Model without structured output support: rely on the tolerant parser
+                return self._chat_completion(model, messages, temperature, max_tokens, **options)
+        
+        def read(model: str) -> Tuple[IncrementalJSONParser, bool, Optional[int]]:
+            # Per attempt, so a failover gets only the time that is left
+            return self._within_deadline(layer, self.settings.openai_timeout, lambda timeout: read_within(model, timeout))
+        
+        def read_within(model: str, timeout: float) -> Tuple[IncrementalJSONParser, bool, Optional[int]]:
+            parser = IncrementalJSONParser(on_element)
+            call_end = time.monotonic() + timeout if self.deadline is not None and self.deadline.bounded else None
+            if not self.settings.llm_streaming:
+                response = complete(model, timeout=timeout)
+                parser.feed(response.choices[0].message.content or '')
+                return parser, False, used_tokens(response)
+            stream = complete(model, stream=True, timeout=timeout)
+            stopped_early = False
+            try:
+                for chunk in stream:
+                    delta = chunk.choices[0].delta.content if chunk.choices else None
+                    if delta and parser.feed(delta) and stop_when and stop_when([key for key, _ in parser.members]):
+                        stopped_early = True
+                        break
+                    if call_end is not None and time.monotonic() > call_end:
+                        # Out of time: keep whatever fields are complete
+                        log_event(logger, "llm_stream_deadline", logging.WARNING, layer=layer, model=model)
+                        self._degrade(layer)
+                        stopped_early = True
+                        break
+            finally:
+                _close_stream(stream)
+            # Streams report no usage: the prompt plus what was actually generated
+            return parser, stopped_early, estimate_tokens(messages, 0) + len(parser.buffer) // 4
+        
+        parser, stopped_early, _ = get_model_router(self.settings).call(
+            layer, read, tokens=estimate_tokens(messages, max_tokens), usage=lambda result: result[2])
+        try:
+            if stopped_early:
+                # Every field read so far is complete; the rest is deliberately unread
+                value, outcome = parser.result(), 'early_stop'
+            else:
+                value, repaired = parse_llm_json(parser.buffer)
+                outcome = 'repaired' if repaired else 'ok'
+        except JSONRepairError:
+            metrics.inc('llm_json_parse_total', layer=layer, outcome='failed')
+            raise
+        metrics.inc('llm_json_parse_total', layer=layer, outcome=outcome)
+        return value
+    
+    def _routed_completion(self, layer: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int):
+        """
+        Chat completion on the model the router picks for this layer, failing over to other candidates.
+        
+        Args:
+            layer (str): LLM layer ('extraction', 'recommendation' or 'formatting')
+            messages (List[Dict[str, str]]): Chat messages
+            temperature (float): Sampling temperature
+            max_tokens (int): Completion token limit
+        """
+        return get_model_router(self.settings).call(
+            layer,
+            lambda model: self._within_deadline(
+                layer, self.settings.openai_timeout,
+                lambda timeout: self._chat_completion(model, messages, temperature, max_tokens, timeout=timeout)),
+            tokens=estimate_tokens(messages, max_tokens)
+        )
+    
+    def _chat_completion(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int,
+                         **options):
         """
         Compatibility wrapper for chat.completions.create across SDK/model variants.
         Tries 'max_completion_tokens' first, falls back to 'max_tokens', and vice versa.
+        Extra `options` (response_format, stream, timeout) are passed to every attempt.
         """
         # Try with max_completion_tokens first
         try:
@@ -456,8 +842,12 @@ class SymptomSearchPipeline:
                 messages=messages,
                 temperature=temperature,
                 max_completion_tokens=max_tokens,
+                **options,
             )
         except Exception as first_error:
+            if is_rate_limit_error(first_error) or is_timeout_error(first_error):
+                # A 429 or a timeout is not a parameter problem: retrying only adds delay
+                raise
             error_text = str(first_error)
             # If max_completion_tokens is unsupported, try max_tokens
             try:
@@ -466,14 +856,18 @@ class SymptomSearchPipeline:
                     messages=messages,
                     temperature=temperature,
                     max_tokens=max_tokens,
+                    **options,
                 )
             except Exception as second_error:
+                if is_rate_limit_error(second_error) or is_timeout_error(second_error):
+                    raise
                 # Final attempt: omit token parameter entirely
                 try:
                     return self.client.chat.completions.create(
                         model=model,
                         messages=messages,
                         temperature=temperature,
+                        **options,
                     )
                 except Exception as third_error:
                     # Raise combined error info
@@ -483,61 +877,222 @@ class SymptomSearchPipeline:
                         f"Third attempt without token param failed: {third_error}"
                     )
     
-    def process_conversation(self, conversation: str, max_results: int = 5) -> Dict:
+    def process_conversation(self, conversation: str, max_results: int = 5,
+                             deadline_seconds: Optional[float] = None) -> Dict:
         """
         Main pipeline method that processes the entire conversation through all layers.
         
+        With PIPELINE_OVERLAP, Layer 3 searches start while Layer 2 is still
+        streaming. The result's "trace" has start/end milliseconds per layer
+        and how much time overlapping saved.
+        
+        Under a deadline (PIPELINE_DEADLINE_SECONDS or `deadline_seconds`) each
+        layer gets a share of the time left, and a layer that runs out falls
+        back: keyword symptoms or medicines, the searches that finished, or a
+        locally formatted list. "degraded_layers" names the layers that fell back.
+        
         Args:
             conversation (str): User's conversation or description
             max_results (int): Maximum results per medicine
+            deadline_seconds (float): Time budget for this request (overrides PIPELINE_DEADLINE_SECONDS)
             
         Returns:
             Dict: Complete pipeline results including natural language response
         """
         try:
-            # Layer 1: Extract symptoms
-            print("🔍 Layer 1: Extracting symptoms from conversation...")
-            symptoms_data = self.extract_symptoms_from_conversation(conversation)
-            
-            if not symptoms_data.get("symptoms"):
-                return {
-                    "status": "error",
-                    "message": "No symptoms could be extracted from the conversation",
-                    "conversation": conversation,
-                    "pipeline_steps": ["symptom_extraction"]
-                }
-            
-            # Layer 2: Recommend medicines
-            print("💊 Layer 2: Recommending medicines based on symptoms...")
-            medicine_names = self.recommend_medicines_from_symptoms(symptoms_data)
-            
-            if not medicine_names:
-                return {
-                    "status": "error",
-                    "message": "No medicines could be recommended for the symptoms",
-                    "conversation": conversation,
-                    "symptoms": symptoms_data,
-                    "pipeline_steps": ["symptom_extraction", "medicine_recommendation"]
-                }
-            
-            # Layer 3: Search on Amazon
-            print("🛒 Layer 3: Searching for medicines on Amazon...")
-            search_results = self.search_medicines_on_amazon(medicine_names, max_results)
+            timer = Timer()
+            trace: Dict[str, float] = {}
+            deadline = self.new_deadline(deadline_seconds)
+            if self.settings.pipeline_overlap:
+                symptoms_data, medicine_names, search_results, error_result = self._understand_and_search(
+                    conversation, max_results, timer, trace)
+                if error_result:
+                    return error_result
+            else:
+                symptoms_data, medicine_names, error_result = self._understand_conversation(conversation, timer, trace)
+                if error_result:
+                    return error_result
+                
+                # Layer 3: Search on Amazon
+                deadline.begin('search')
+                trace['layer3_start_ms'] = timer.elapsed_ms()
+                log_event(logger, "layer3_start", elapsed_ms=trace['layer3_start_ms'], medicine_count=len(medicine_names))
+                search_results = self.search_medicines_on_amazon(medicine_names, max_results)
+                trace['layer3_end_ms'] = timer.elapsed_ms()
             
             # Layer 4: Extract details and format response
-            print("📝 Layer 4: Extracting details and formatting response...")
+            deadline.begin('formatting')
+            trace['layer4_start_ms'] = timer.elapsed_ms()
+            log_event(logger, "layer4_start", elapsed_ms=trace['layer4_start_ms'], result_count=len(search_results.get("results", [])))
             natural_response = self.extract_medicine_details_and_format_response(search_results, symptoms_data)
+            if not search_results.get("results") and 'search' in deadline.degraded:
+                # Searches ran out of time: name the medicines rather than "No products found."
+                natural_response = _list_medicines(medicine_names)
+            trace['layer4_end_ms'] = timer.elapsed_ms()
+            
+            trace = _finish_trace(trace, timer)
+            if deadline.bounded:
+                trace['deadline_ms'] = deadline.report()['budget_ms']
+            log_event(logger, "pipeline_complete", elapsed_ms=trace['total_ms'], overlap_saved_ms=trace['overlap_saved_ms'],
+                      degraded_layers=deadline.degraded)
+            for layer in deadline.degraded:
+                metrics.inc('pipeline_degraded_total', layer=layer)
+            
+            result = self._success_result(conversation, symptoms_data, medicine_names, search_results, natural_response)
+            result["trace"] = trace
+            result["degraded_layers"] = list(deadline.degraded)
+            return result
             
+        except Exception as e:
             return {
-                "status": "success",
+                "status": "error",
+                "message": f"Pipeline failed: {str(e)}",
                 "conversation": conversation,
-                "pipeline_steps": ["symptom_extraction", "medicine_recommendation", "amazon_search", "response_formatting"],
-                "symptoms": symptoms_data,
-                "recommended_medicines": medicine_names,
-                "search_results": search_results,
-                "natural_response": natural_response
+                "pipeline_steps": []
             }
+    
+    def process_conversation_degraded(self, conversation: str, max_results: int = 5) -> Dict:
+        """
+        Cheap answer for overloaded servers: no GPT and no live SearchAPI calls.
+        
+        Symptoms and medicines come from the keyword tables, products from the
+        local catalog (at any age), and the voice response is formatted locally.
+        
+        Args:
+            conversation (str): User's conversation or description
+            max_results (int): Maximum results per medicine
+            
+        Returns:
+            Dict: Pipeline results marked "degraded": true
+        """
+        symptoms = self._extract_symptoms_fallback(conversation)
+        medicine_names = self._canonical_medicines(self._recommend_medicines_fallback(symptoms))
+        symptoms_data = {
+            "symptoms": symptoms,
+            "severity": "unknown",
+            "duration": None,
+            "context": "Extracted using fallback method",
+            "source": "keywords"
+        }
+        
+        records = []
+        result_filter = get_result_filter(self.settings)
+        catalog = get_catalog(self.settings)
+        for medicine in medicine_names if catalog is not None else []:
+            try:
+                hit = catalog.lookup(medicine)
+            except Exception as e:
+                log_event(logger, "degraded_catalog_lookup_failed", logging.WARNING, error=str(e))
+                hit = None
+            records.extend(result_filter.apply(
+                (ProductRecord.from_search_result(result, medicine)
+                 for result in (hit.results if hit is not None else [])[:max_results]),
+                query=medicine))
+        
+        ranked = self._rank_results(records)
+        search_results = {"status": "success", "total_results": len(ranked), "results": ranked}
+        natural_response = _list_products(ranked)
+        
+        result = self._success_result(conversation, symptoms_data, medicine_names, search_results, natural_response)
+        result["degraded"] = True
+        return result
+    
+    def process_call_turn(self, conversation: str, session: CallSession,
+                          deadline_seconds: Optional[float] = None) -> Dict:
+        """
+        Process one invocation of a multi-turn call incrementally.
+        
+        Layer 1 runs on the turns added since the last invocation, Layer 2 on
+        symptoms not seen earlier in the call and Layer 3 on medicines not
+        searched yet. Results are merged with the session's and re-ranked;
+        Layer 4 runs only when the merged results changed.
+        
+        Args:
+            conversation (str): The whole conversation so far
+            session (CallSession): The call's session (from session_state.SessionStore)
+            deadline_seconds (float): Time budget for this invocation (overrides PIPELINE_DEADLINE_SECONDS)
             
+        Returns:
+            Dict: Complete pipeline results; "session" describes what was reused
+        """
+        try:
+            with session.lock:
+                timer = Timer()
+                deadline = self.new_deadline(deadline_seconds)
+                new_text = session.new_text(conversation)
+                new_symptoms: List[str] = []
+                new_medicines: List[str] = []
+                
+                if new_text.strip():
+                    # Layer 1 on the new turns only
+                    deadline.begin('extraction')
+                    symptoms_data = self.extract_symptoms_from_conversation(new_text)
+                    new_symptoms = session.add_symptoms(symptoms_data)
+                    if new_symptoms:
+                        # Layer 2 for new symptoms only
+                        deadline.begin('recommendation')
+                        medicines = self.recommend_medicines_from_symptoms(
+                            dict(session.symptoms_data(), symptoms=new_symptoms))
+                        # Medicines searched earlier in the call may already cover the new symptoms
+                        searched = [medicine for medicine in session.medicine_names if medicine in session.results]
+                        medicines = self._select_medicines(new_symptoms, searched + medicines, searched)
+                        new_medicines = session.add_medicines(medicines)
+                session.processed = conversation
+                session.turns += 1
+                
+                if not session.symptoms:
+                    return {
+                        "status": "error",
+                        "message": "No symptoms could be extracted from the conversation",
+                        "conversation": conversation,
+                        "pipeline_steps": ["symptom_extraction"]
+                    }
+                if not session.medicine_names:
+                    return {
+                        "status": "error",
+                        "message": "No medicines could be recommended for the symptoms",
+                        "conversation": conversation,
+                        "symptoms": session.symptoms_data(),
+                        "pipeline_steps": ["symptom_extraction", "medicine_recommendation"]
+                    }
+                
+                # Layer 3 for medicines without stored results; failures are retried next turn
+                searched = session.unsearched()
+                deadline.begin('search')
+                for medicine in searched:
+                    try:
+                        session.results[medicine] = self.search_single_medicine(medicine, session.max_results)
+                    except Exception as e:
+                        log_event(logger, "session_search_failed", logging.WARNING, medicine=medicine, error=str(e))
+                        self._degrade('search')
+                
+                if searched or session.natural_response is None:
+                    deadline.begin('formatting')
+                    search_results = self._gather_search_results(
+                        session.results[medicine] for medicine in session.medicine_names if medicine in session.results)
+                    # Layer 4
+                    session.natural_response = self.extract_medicine_details_and_format_response(
+                        search_results, session.symptoms_data())
+                    session.search_results = search_results
+                
+                reused = len(session.medicine_names) - len(searched)
+                metrics.inc('session_medicines_total', reused, source='reused')
+                metrics.inc('session_medicines_total', len(searched), source='searched')
+                log_event(logger, "call_turn_complete", elapsed_ms=timer.elapsed_ms(), turn=session.turns,
+                          new_symptoms=len(new_symptoms), new_medicines=len(new_medicines), reused_medicines=reused)
+                
+                result = self._success_result(conversation, session.symptoms_data(), list(session.medicine_names),
+                                              session.search_results, session.natural_response)
+                result["degraded_layers"] = list(deadline.degraded)
+                result["session"] = {
+                    "call_id": session.call_id,
+                    "turn": session.turns,
+                    "new_symptoms": new_symptoms,
+                    "new_medicines": new_medicines,
+                    "reused_medicines": reused
+                }
+                return result
+        
         except Exception as e:
             return {
                 "status": "error",
@@ -545,48 +1100,375 @@ class SymptomSearchPipeline:
                 "conversation": conversation,
                 "pipeline_steps": []
             }
+    
+    def process_conversations(self, conversations: List[str], max_results: int = 5,
+                              max_workers: Optional[int] = None, deadline_seconds: Optional[float] = None) -> List[Dict]:
+        """
+        Process many conversations with cross-conversation deduplication.
+        
+        Identical transcripts (after normalization) run Layers 1, 2 and 4 once.
+        The union of all recommended medicines is searched once per medicine,
+        then results are fanned back out per conversation. Work runs on a
+        bounded thread pool and results are returned in input order.
+        
+        Each unique conversation runs on its own copy of the pipeline with its
+        own deadline, and the shared searches on another; all of them start
+        when the batch does.
+        
+        Args:
+            conversations (List[str]): Conversations to process
+            max_results (int): Maximum results per medicine
+            max_workers (int): Concurrency bound (defaults to BATCH_MAX_WORKERS)
+            deadline_seconds (float): Time budget per conversation (overrides PIPELINE_DEADLINE_SECONDS)
+            
+        Returns:
+            List[Dict]: One pipeline result per input conversation, in input order
+        """
+        max_workers = max(1, max_workers or self.settings.batch_max_workers)
+        
+        # Deduplicate transcripts
+        unique_index: Dict[Tuple, int] = {}
+        unique_conversations: List[str] = []
+        positions: List[int] = []
+        for conversation in conversations:
+            key = normalize_key(conversation)
+            if key not in unique_index:
+                unique_index[key] = len(unique_conversations)
+                unique_conversations.append(conversation)
+            positions.append(unique_index[key])
+        
+        workers = [self.for_request(deadline_seconds) for _ in unique_conversations]
+        searcher = self.for_request(deadline_seconds)
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            # Layers 1 and 2 per unique conversation
+            understood = list(executor.map(
+                lambda index: workers[index]._understand_conversation_safely(unique_conversations[index]),
+                range(len(unique_conversations))))
+            
+            # Layer 3 once per distinct medicine across the whole batch
+            medicines_by_key: Dict[Tuple, str] = {}
+            for _symptoms, medicine_names, error_result in understood:
+                if not error_result:
+                    for medicine in medicine_names:
+                        medicines_by_key.setdefault(normalize_key(medicine), medicine)
+            searcher.deadline.begin('search')
+            searched = dict(zip(
+                medicines_by_key.keys(),
+                executor.map(lambda m: searcher._search_single_medicine_safely(m, max_results),
+                             medicines_by_key.values())
+            ))
+            
+            # Layer 4 per unique conversation
+            def finish(index: int) -> Dict:
+                conversation = unique_conversations[index]
+                symptoms_data, medicine_names, error_result = understood[index]
+                if error_result:
+                    return error_result
+                worker = workers[index]
+                search_results = worker._merge_medicine_searches(
+                    medicine_names, [searched[normalize_key(medicine)] for medicine in medicine_names]
+                )
+                worker.deadline.begin('formatting')
+                natural_response = worker.extract_medicine_details_and_format_response(search_results, symptoms_data)
+                result = worker._success_result(conversation, symptoms_data, medicine_names, search_results,
+                                                natural_response)
+                if search_results.get("failed_medicines"):
+                    worker._degrade('search')
+                if worker.deadline.degraded:
+                    result["degraded_layers"] = list(worker.deadline.degraded)
+                return result
+            
+            unique_results = list(executor.map(finish, range(len(unique_conversations))))
+        
+        log_event(logger, "batch_complete", conversations=len(conversations),
+                  unique_conversations=len(unique_conversations), unique_medicines=len(medicines_by_key))
+        
+        # Fan out in input order; duplicates get their own copy
+        results = []
+        seen = set()
+        for conversation, index in zip(conversations, positions):
+            result = unique_results[index] if index not in seen else copy.deepcopy(unique_results[index])
+            seen.add(index)
+            if result.get("conversation") != conversation:
+                result = dict(result, conversation=conversation)
+            results.append(result)
+        return results
+    
+    def _understand_conversation(self, conversation: str, timer: Timer, trace: Optional[Dict[str, float]] = None,
+                                 on_medicine: Optional[Callable[[str], None]] = None
+                                 ) -> Tuple[Dict, List[str], Optional[Dict]]:
+        """
+        Run Layers 1 and 2.
+        
+        Layer 1 stops reading GPT's stream once symptoms, severity and duration
+        are complete, so Layer 2 starts without waiting for "context".
+        
+        Args:
+            conversation (str): User's conversation or description
+            timer (Timer): Timer for progress logging
+            trace (Dict[str, float]): Receives layer start/end milliseconds
+            on_medicine (Callable[[str], None]): Called with each medicine name as Layer 2 streams it
+            
+        Returns:
+            Tuple[Dict, List[str], Optional[Dict]]: Symptoms data, medicine names and an error result (None on success)
+        """
+        if trace is None:
+            trace = {}
+        
+        # Layer 1: Extract symptoms
+        if self.deadline is not None:
+            self.deadline.begin('extraction')
+        trace['layer1_start_ms'] = timer.elapsed_ms()
+        log_event(logger, "layer1_start")
+        symptoms_data = self.extract_symptoms_from_conversation(conversation)
+        trace['layer1_end_ms'] = timer.elapsed_ms()
+        
+        if not symptoms_data.get("symptoms"):
+            return symptoms_data, [], {
+                "status": "error",
+                "message": "No symptoms could be extracted from the conversation",
+                "conversation": conversation,
+                "pipeline_steps": ["symptom_extraction"]
+            }
+        
+        # Layer 2: Recommend medicines
+        if self.deadline is not None:
+            self.deadline.begin('recommendation')
+        trace['layer2_start_ms'] = timer.elapsed_ms()
+        log_event(logger, "layer2_start", elapsed_ms=trace['layer2_start_ms'], symptom_count=len(symptoms_data["symptoms"]))
+        symptoms = symptoms_data["symptoms"]
+        coverage = get_coverage_table(self.settings)
+        streamed: List[str] = []
+        if coverage is not None and on_medicine is not None:
+            forward = on_medicine
+            
+            def on_medicine(medicine: str) -> None:
+                # Search a streamed medicine early only if it covers a symptom nothing streamed covers yet
+                covered = 0
+                for mask in coverage.masks(symptoms, streamed):
+                    covered |= mask
+                if coverage.masks(symptoms, [medicine])[0] & ~covered and len(streamed) < self.settings.max_medicine_searches:
+                    streamed.append(medicine)
+                    forward(medicine)
+        medicine_names = self.recommend_medicines_from_symptoms(symptoms_data, on_medicine)
+        medicine_names = self._select_medicines(symptoms, medicine_names, streamed)
+        trace['layer2_end_ms'] = timer.elapsed_ms()
+        
+        if not medicine_names:
+            return symptoms_data, [], {
+                "status": "error",
+                "message": "No medicines could be recommended for the symptoms",
+                "conversation": conversation,
+                "symptoms": symptoms_data,
+                "pipeline_steps": ["symptom_extraction", "medicine_recommendation"]
+            }
+        
+        return symptoms_data, medicine_names, None
+    
+    def _understand_and_search(self, conversation: str, max_results: int, timer: Timer, trace: Dict[str, float]
+                               ) -> Tuple[Dict, List[str], Optional[Dict], Optional[Dict]]:
+        """
+        Run Layers 1 to 3 overlapped: each medicine is searched as soon as Layer 2 streams its name.
+        
+        Names Layer 2 did not stream (a fallback list, or a coalesced caller
+        that waited for another request's GPT call) are searched once Layer 2
+        finishes. Searches for streamed names missing from the final list
+        (after a model failover) are discarded.
+        
+        Args:
+            conversation (str): User's conversation or description
+            max_results (int): Maximum results per medicine
+            timer (Timer): Timer for progress logging
+            trace (Dict[str, float]): Receives layer start/end milliseconds
+            
+        Returns:
+            Tuple: Symptoms data, medicine names, search results and an error result (None on success)
+        """
+        searches: Dict[str, Future] = {}
+        executor = ThreadPoolExecutor(max_workers=max(1, self.settings.batch_max_workers))
+        try:
+            def start_search(medicine: str) -> None:
+                if medicine in searches:
+                    return
+                if not searches:
+                    if self.deadline is not None:
+                        self.deadline.begin('search')
+                    trace['layer3_start_ms'] = timer.elapsed_ms()
+                    log_event(logger, "layer3_start", elapsed_ms=trace['layer3_start_ms'], overlapped=True)
+                searches[medicine] = executor.submit(self.search_single_medicine, medicine, max_results)
+            
+            symptoms_data, medicine_names, error_result = self._understand_conversation(
+                conversation, timer, trace, on_medicine=start_search)
+            if error_result:
+                return symptoms_data, medicine_names, None, error_result
+            
+            streamed = len(searches)
+            for medicine in medicine_names:
+                start_search(medicine)
+            metrics.inc('pipeline_overlap_searches_total', streamed, source='stream')
+            metrics.inc('pipeline_overlap_searches_total', len(searches) - streamed, source='final')
+            search_results = self._collect_searches(medicine_names, searches)
+        finally:
+            # Includes streamed names the final list dropped: nothing reads those
+            _cancel_pending(searches.values())
+            executor.shutdown(wait=False)
+        trace['layer3_end_ms'] = timer.elapsed_ms()
+        return symptoms_data, medicine_names, search_results, None
+    
+    def _understand_conversation_safely(self, conversation: str) -> Tuple[Dict, List[str], Optional[Dict]]:
+        try:
+            return self._understand_conversation(conversation, Timer())
+        except Exception as e:
+            return {}, [], {
+                "status": "error",
+                "message": f"Pipeline failed: {str(e)}",
+                "conversation": conversation,
+                "pipeline_steps": []
+            }
+    
+    def _search_single_medicine_safely(self, medicine: str, max_results: int) -> Tuple[List[ProductRecord], Optional[str]]:
+        try:
+            return self.search_single_medicine(medicine, max_results), None
+        except Exception as e:
+            return [], str(e)
+    
+    def _merge_medicine_searches(self, medicine_names: List[str],
+                                 searches: List[Tuple[List[ProductRecord], Optional[str]]]) -> Dict:
+        """
+        Combine per-medicine search outcomes into a Layer 3 result (same shape as search_medicines_on_amazon).
+        
+        A failed search only drops its own medicine; the result is an error only
+        when every search failed.
+        
+        Args:
+            medicine_names (List[str]): Medicines, in the same order as searches
+            searches (List[Tuple[List[ProductRecord], Optional[str]]]): (records, error) per medicine
+            
+        Returns:
+            Dict: Search results for the medicines that were found ("failed_medicines" lists the rest)
+        """
+        failed = [medicine for medicine, (_results, error) in zip(medicine_names, searches) if error]
+        if failed and len(failed) == len(searches):
+            return {
+                "status": "error",
+                "message": f"Search failed: {searches[0][1]}",
+                "results": []
+            }
+        # Records are immutable, so conversations sharing a medicine can share them
+        all_results = self._rank_results([result for results, error in searches if not error for result in results])
+        merged = {
+            "status": "success",
+            "total_results": len(all_results),
+            "results": all_results
+        }
+        if failed:
+            merged["failed_medicines"] = failed
+        return merged
+    
+    def _rank_results(self, results: List[ProductRecord]) -> List[ProductRecord]:
+        """
+        Rank results from all medicines together, drop duplicate products and keep the top LAYER3_TOP_K.
+        
+        Args:
+            results (List[ProductRecord]): Records from one or more medicine searches
+            
+        Returns:
+            List[ProductRecord]: Unique records, best first
+        """
+        return rank_results(
+            results,
+            [result.medicine_name for result in results],
+            self.settings.layer3_top_k or None
+        )
+    
+    def _success_result(self, conversation: str, symptoms_data: Dict, medicine_names: List[str],
+                        search_results: Dict, natural_response: str) -> Dict:
+        # Records become plain dicts only here, at the response edge
+        search_results = dict(search_results, results=[record.to_dict() for record in search_results["results"]])
+        return {
+            "status": "success",
+            "conversation": conversation,
+            "pipeline_steps": ["symptom_extraction", "medicine_recommendation", "amazon_search", "response_formatting"],
+            "symptoms": symptoms_data,
+            "recommended_medicines": medicine_names,
+            "search_results": search_results,
+            "natural_response": natural_response
+        }
 
 # Function to be called by Vapi
-def process_symptom_conversation(conversation: str, max_results: int = 5) -> Dict:
+def process_symptom_conversation(conversation: str, max_results: int = 5, settings: Optional[Settings] = None,
+                                 call_id: Optional[str] = None, deadline_seconds: Optional[float] = None) -> Dict:
     """
     Main function to be called by Vapi when user reports symptoms or health concerns.
     
     Args:
         conversation (str): User's conversation or description of their condition
         max_results (int): Maximum number of results per medicine
+        settings (Settings): Service settings (defaults to the process-wide settings)
+        call_id (str): Vapi call id; invocations of the same call only process new turns
+        deadline_seconds (float): Time budget (defaults to PIPELINE_DEADLINE_SECONDS; 0 = none)
         
     Returns:
         Dict: Complete pipeline results with natural language response
     """
     try:
-        # Clear any proxy-related environment variables that might be causing issues
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'NO_PROXY', 'no_proxy']
-        for var in proxy_vars:
-            if var in os.environ:
-                del os.environ[var]
-
-        # Clear any Vapi-related environment variables that might be causing issues
-        vapi_vars = ['VAPI_INSTALL', 'VAPI_CONFIG', 'VAPI_ENV']
-        for var in vapi_vars:
-            if var in os.environ:
-                del os.environ[var]
-        
-        # Clear any requests-related environment variables that might cause issues
-        requests_vars = ['REQUESTS_CA_BUNDLE', 'CURL_CA_BUNDLE', 'SSL_CERT_FILE']
-        for var in requests_vars:
-            if var in os.environ:
-                del os.environ[var]
-        
-        pipeline = SymptomSearchPipeline()
-        results = pipeline.process_conversation(conversation, max_results)
-        
-        # Ensure the natural response is always available
-        if results["status"] == "success":
-            results["voice_response"] = results.get("natural_response", "No products found.")
+        pipeline = SymptomSearchPipeline(settings)
+        
+        # Multi-turn call: reuse what earlier invocations computed
+        session_store = get_session_store(pipeline.settings) if call_id else None
+        if session_store is not None:
+            results = _add_voice_response(pipeline.process_call_turn(
+                conversation, session_store.get(call_id, max_results), deadline_seconds))
         else:
-            results["voice_response"] = "No products found."
+            # Reuse the result of a recent near-duplicate conversation
+            semantic_cache = get_semantic_cache(pipeline.settings)
+            if semantic_cache is not None:
+                cached = semantic_cache.lookup(conversation, max_results)
+                if cached is not None:
+                    return cached
+            
+            results = _add_voice_response(pipeline.process_conversation(conversation, max_results, deadline_seconds))
+            if semantic_cache is not None and results["status"] == "success" and not results.get("degraded_layers"):
+                semantic_cache.store(conversation, max_results, results)
+            return results
+    
+    except Exception as e:
+        return {
+            "status": "error",
+            "message": f"Failed to process conversation: {str(e)}",
+            "conversation": conversation,
+            "voice_response": "No products found."
+        }
+    
+    # Evicting sessions is housekeeping: it must not turn a finished turn into an error
+    session_store.trim()
+    return results
+
+def process_symptom_conversation_degraded(conversation: str, max_results: int = 5,
+                                          settings: Optional[Settings] = None) -> Dict:
+    """
+    Fast fallback for process_symptom_conversation when the server is overloaded.
+    
+    Serves a semantically cached result if there is one, otherwise keyword
+    fallbacks with catalog products (see SymptomSearchPipeline.process_conversation_degraded).
+    
+    Args:
+        conversation (str): User's conversation or description of their condition
+        max_results (int): Maximum number of results per medicine
+        settings (Settings): Service settings (defaults to the process-wide settings)
         
-        return results
+    Returns:
+        Dict: Pipeline results with voice response
+    """
+    try:
+        pipeline = SymptomSearchPipeline(settings)
+        semantic_cache = get_semantic_cache(pipeline.settings)
+        if semantic_cache is not None:
+            cached = semantic_cache.lookup(conversation, max_results)
+            if cached is not None:
+                return cached
+        return _add_voice_response(pipeline.process_conversation_degraded(conversation, max_results))
     
     except Exception as e:
         return {
@@ -596,7 +1478,82 @@ def process_symptom_conversation(conversation: str, max_results: int = 5) -> Dic
             "voice_response": "No products found."
         }
 
+def process_symptom_conversations(conversations: List[str], max_results: int = 5,
+                                  settings: Optional[Settings] = None, max_workers: Optional[int] = None) -> List[Dict]:
+    """
+    Batch version of process_symptom_conversation for back-office re-runs and bulk calls.
+    
+    Identical transcripts are processed once and each distinct medicine is
+    searched once across the whole batch.
+    
+    Args:
+        conversations (List[str]): Conversations to process
+        max_results (int): Maximum number of results per medicine
+        settings (Settings): Service settings (defaults to the process-wide settings)
+        max_workers (int): Concurrency bound (defaults to BATCH_MAX_WORKERS)
+        
+    Returns:
+        List[Dict]: Pipeline results with voice responses, in input order
+    """
+    try:
+        pipeline = SymptomSearchPipeline(settings)
+        results = pipeline.process_conversations(conversations, max_results, max_workers)
+        return [_add_voice_response(result) for result in results]
+    
+    except Exception as e:
+        return [{
+            "status": "error",
+            "message": f"Failed to process conversation: {str(e)}",
+            "conversation": conversation,
+            "voice_response": "No products found."
+        } for conversation in conversations]
+
+def _cancel_pending(futures: Iterable[Future]) -> None:
+    # shutdown(wait=False) still runs queued searches, spending SearchAPI quota on results
+    # nobody reads; searches already running end at their deadline-capped timeout
+    for future in futures:
+        future.cancel()
+
+
+def _list_products(records: List[ProductRecord]) -> str:
+    # The "1. Product Name - Price" list Layer 4 asks GPT for, built locally
+    return "\n".join(
+        f"{position}. {record.title} - {record.price}" for position, record in enumerate(records[:3], start=1)
+    ) or "No products found."
+
+def _list_medicines(medicine_names: List[str]) -> str:
+    # Template answer when no product search finished in time
+    if not medicine_names:
+        return "No products found."
+    names = medicine_names[:3]
+    listed = names[0] if len(names) == 1 else f"{', '.join(names[:-1])} and {names[-1]}"
+    return f"I couldn't look up products in time. Common options are {listed}."
+
+def _finish_trace(trace: Dict[str, float], timer: Timer) -> Dict[str, float]:
+    # Time saved by overlapping = sum of layer durations beyond the wall-clock total
+    trace['total_ms'] = timer.elapsed_ms()
+    layer_ms = sum(trace[f'layer{layer}_end_ms'] - trace[f'layer{layer}_start_ms']
+                   for layer in range(1, 5)
+                   if f'layer{layer}_start_ms' in trace and f'layer{layer}_end_ms' in trace)
+    trace['overlap_saved_ms'] = round(max(0.0, layer_ms - trace['total_ms']), 1)
+    return trace
+
+def _close_stream(stream) -> None:
+    # Closing the HTTP response stops generation being read (and billed) past what we need
+    close = getattr(stream, 'close', None) or getattr(getattr(stream, 'response', None), 'close', None)
+    if close is not None:
+        close()
+
+def _add_voice_response(results: Dict) -> Dict:
+    # Ensure the natural response is always available
+    if results["status"] == "success":
+        results["voice_response"] = results.get("natural_response", "No products found.")
+    else:
+        results["voice_response"] = "No products found."
+    return results
+
 if __name__ == "__main__":
+    setup_logging(get_settings().log)
     # Test the pipeline
     test_conversation = "I've been having a really bad headache and fever for the past 2 days. I also feel really tired and achy."
     results = process_symptom_conversation(test_conversation)
@@ -1,25 +1,111 @@
-from flask import Flask, request, jsonify
-from symptom_search_pipeline import process_symptom_conversation
-import os
-from dotenv import load_dotenv
+from flask import Flask, Response, request, jsonify
+from symptom_search_pipeline import (process_symptom_conversation, process_symptom_conversation_degraded,
+                                     process_symptom_conversations)
 import logging
+import time
+import metrics
+from admission import AdmissionController
+from cache_warmer import start_cache_warmer, stop_cache_warmer
+from coalescing import CoalescingTimeout, normalize_key
+from deadline import is_valid_budget
+from http_clients import get_search_session
+from idempotency import IdempotencyStore
+from response_profiles import PROFILES, ResponseCache, dumps, shape_response
+from settings import get_settings, install_reload_signal_handler, on_reload
+from structured_logging import setup_logging, get_logger, log_event, log_payload
 
+# Resolve configuration once at startup; SIGHUP reloads it explicitly
+settings = get_settings()
+install_reload_signal_handler()
 
+# Configure non-blocking structured logging
+setup_logging(settings.log)
+logger = get_logger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Encoded /webhook bodies of successful responses, keyed by conversation, max_results and profile
+response_cache = ResponseCache(settings.cache_max_entries, settings.cache_ttl_seconds)
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+# Bounds concurrent pipelines in this process; overflow gets a degraded answer
+admission = AdmissionController(settings.admission_max_in_flight, settings.admission_max_queue,
+                                settings.admission_max_wait_seconds)
+
+# Completed and in-flight /webhook responses by Vapi tool-call id, for retried deliveries
+idempotency = IdempotencyStore(settings.idempotency_retention_seconds, settings.idempotency_max_entries,
+                               settings.idempotency_wait_seconds)
+
+def _apply_reloaded_settings(new_settings):
+    global settings, response_cache, admission, idempotency
+    settings = new_settings
+    response_cache = ResponseCache(new_settings.cache_max_entries, new_settings.cache_ttl_seconds)
+    idempotency = IdempotencyStore(new_settings.idempotency_retention_seconds, new_settings.idempotency_max_entries,
+                                   new_settings.idempotency_wait_seconds)
+    admission = AdmissionController(new_settings.admission_max_in_flight, new_settings.admission_max_queue,
+                                    new_settings.admission_max_wait_seconds)
+    setup_logging(new_settings.log)
+    if _background_started:
+        stop_cache_warmer()
+        start_cache_warmer(new_settings, get_search_session(new_settings))
+    log_event(logger, "settings_reloaded")
+
+on_reload(_apply_reloaded_settings)
+
+def _run_pipeline(conversation, max_results, call_id=None, deadline_seconds=None):
+    # Shed load instead of queueing work the caller will have given up on
+    if not settings.admission_enabled:
+        return process_symptom_conversation(conversation, max_results, settings, call_id, deadline_seconds)
+    arrived = time.monotonic()
+    with admission.admit() as shed_reason:
+        if shed_reason:
+            log_event(logger, "request_shed", logging.WARNING, reason=shed_reason)
+            return process_symptom_conversation_degraded(conversation, max_results, settings)
+        # Time spent queued counts against the request's deadline
+        budget = deadline_seconds if deadline_seconds is not None else settings.pipeline_deadline_seconds
+        if budget:
+            budget = max(0.001, budget - (time.monotonic() - arrived))
+        return process_symptom_conversation(conversation, max_results, settings, call_id, budget)
+
+def _invalid_deadline_response(deadline_seconds):
+    # deadline_seconds comes from the caller; reject it before it reaches the pipeline
+    if is_valid_budget(deadline_seconds):
+        return None
+    return jsonify({
+        "status": "error",
+        "message": "deadline_seconds must be a number of seconds >= 0"
+    }), 400
+
+def _vapi_call_id(data):
+    # Vapi sends the call as "call" at the top level or inside "message"
+    call = data.get('call') or (data.get('message') or {}).get('call') or {}
+    return call.get('id') if isinstance(call, dict) else None
+
+def _vapi_tool_call_id(data):
+    # Function calls carry the id on "functionCall" (or at the top level)
+    function_call = data.get('functionCall') or {}
+    candidates = [function_call.get('id'), function_call.get('toolCallId'), data.get('toolCallId')]
+    return next((candidate for candidate in candidates if candidate), None)
 
 app = Flask(__name__)
 
+_background_started = False
+
+def start_background_tasks():
+    """Start per-process background work (the cache warmer); called by entry points, not on import."""
+    global _background_started
+    _background_started = True
+    start_cache_warmer(settings, get_search_session(settings))
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint for Vapi."""
     return jsonify({"status": "healthy", "service": "symptom-search-pipeline"})
 
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Metrics in Prometheus text format (or JSON with ?format=json)."""
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.snapshot())
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/process_conversation', methods=['POST'])
 def process_conversation():
     """
@@ -27,7 +113,9 @@ def process_conversation():
     Expected JSON payload:
     {
         "conversation": "I've been having headaches and fever for the past 2 days",
-        "max_results": 5
+        "max_results": 5,
+        "call_id": "optional Vapi call id; later calls with it only process new turns",
+        "deadline_seconds": 15
     }
     """
     try:
@@ -51,17 +139,80 @@ def process_conversation():
         # Get max_results (optional, default 5)
         max_results = data.get('max_results', 5)
         
-        logger.info(f"Processing conversation: {conversation[:100]}...")
+        invalid = _invalid_deadline_response(data.get('deadline_seconds'))
+        if invalid:
+            return invalid
+        
+        log_event(logger, "process_conversation_request", conversation=conversation, max_results=max_results)
         
         # Call the symptom search pipeline
-        results = process_symptom_conversation(conversation, max_results)
+        results = _run_pipeline(conversation, max_results, data.get('call_id'), data.get('deadline_seconds'))
         
-        logger.info(f"Pipeline completed. Status: {results.get('status')}")
+        log_event(logger, "process_conversation_complete", status=results.get('status'))
         
         return jsonify(results)
         
     except Exception as e:
-        logger.error(f"Error processing conversation: {str(e)}")
+        log_event(logger, "process_conversation_error", logging.ERROR, error=str(e))
+        return jsonify({
+            "status": "error",
+            "message": f"Internal server error: {str(e)}"
+        }), 500
+
+@app.route('/process_conversations_batch', methods=['POST'])
+def process_conversations_batch():
+    """
+    Batch endpoint for back-office re-runs and bulk calls.
+    Identical conversations are processed once and each medicine is searched once.
+    Expected JSON payload:
+    {
+        "conversations": ["I have a headache", "My throat is sore"],
+        "max_results": 5
+    }
+    Results are returned in input order.
+    """
+    try:
+        data = request.get_json()
+        
+        if not data:
+            return jsonify({
+                "status": "error",
+                "message": "No JSON data provided"
+            }), 400
+        
+        conversations = data.get('conversations')
+        if not isinstance(conversations, list) or not conversations:
+            return jsonify({
+                "status": "error",
+                "message": "Conversations parameter must be a non-empty list"
+            }), 400
+        
+        if not all(isinstance(conversation, str) and conversation for conversation in conversations):
+            return jsonify({
+                "status": "error",
+                "message": "Every conversation must be a non-empty string"
+            }), 400
+        
+        if len(conversations) > settings.batch_max_conversations:
+            return jsonify({
+                "status": "error",
+                "message": f"Too many conversations (max {settings.batch_max_conversations})"
+            }), 400
+        
+        max_results = data.get('max_results', 5)
+        
+        log_event(logger, "batch_request", count=len(conversations), max_results=max_results)
+        
+        results = process_symptom_conversations(conversations, max_results, settings)
+        
+        return jsonify({
+            "status": "success",
+            "total_conversations": len(results),
+            "results": results
+        })
+        
+    except Exception as e:
+        log_event(logger, "batch_error", logging.ERROR, error=str(e))
         return jsonify({
             "status": "error",
             "message": f"Internal server error: {str(e)}"
@@ -72,10 +223,20 @@ def webhook():
     """
     Webhook endpoint for Vapi to call with function requests.
     This endpoint handles the Vapi function calling format.
+    
+    The response profile is chosen with ?profile=voice|standard|debug
+    (default WEBHOOK_RESPONSE_PROFILE).
     """
     try:
+        profile = request.args.get('profile', settings.webhook_response_profile)
+        if profile not in PROFILES:
+            return jsonify({
+                "status": "error",
+                "message": f"Unknown profile: {profile} (expected one of {', '.join(PROFILES)})"
+            }), 400
+        
         data = request.get_json()
-        logger.info(f"Received webhook request: {data}")
+        log_payload(logger, "webhook_request", data)
         
         if not data:
             return jsonify({
@@ -104,12 +265,53 @@ def webhook():
                     "message": "Conversation parameter is required"
                 }), 400
             
-            logger.info(f"Processing function call: {function_name} with conversation: {conversation[:100]}...")
+            invalid = _invalid_deadline_response(arguments.get('deadline_seconds'))
+            if invalid:
+                return invalid
+            
+            call_id = _vapi_call_id(data)
+            log_event(logger, "webhook_function_call", function=function_name, conversation=conversation,
+                      max_results=max_results, profile=profile, call_id=call_id)
+            
+            # Calls with a session are incremental already; their bodies are call-specific
+            use_cache = settings.response_cache_enabled and not (call_id and settings.session_enabled)
+            cache_key = normalize_key(conversation, max_results, profile)
             
-            # Call the symptom search pipeline
-            results = process_symptom_conversation(conversation, max_results)
+            def produce():
+                body = response_cache.get(cache_key) if use_cache else None
+                if body is not None:
+                    metrics.inc('webhook_response_cache_total', result='hit')
+                    return body, True
+                # Call the symptom search pipeline
+                results = _run_pipeline(conversation, max_results, call_id, arguments.get('deadline_seconds'))
+                body = dumps(shape_response(results, profile))
+                # Errors and degraded answers are worth another try: neither cache nor retries reuse them
+                succeeded = (results.get("status") == "success" and not results.get("degraded")
+                             and not results.get("degraded_layers"))
+                if use_cache and succeeded:
+                    response_cache.put(cache_key, body)
+                metrics.inc('webhook_response_cache_total', result='miss' if use_cache else 'bypass')
+                return body, succeeded
             
-            return jsonify(results)
+            # A retried delivery of the same tool call must not run the pipeline (or advance the session) again
+            tool_call_id = _vapi_tool_call_id(data)
+            if tool_call_id and settings.idempotency_enabled:
+                try:
+                    body, outcome = idempotency.run(
+                        normalize_key(tool_call_id, conversation, max_results, profile), produce)
+                except CoalescingTimeout:
+                    log_event(logger, "webhook_retry_timeout", logging.WARNING, tool_call_id=tool_call_id)
+                    return jsonify({
+                        "status": "error",
+                        "message": "The original request for this tool call is still in progress"
+                    }), 503
+                if outcome != 'executed':
+                    log_event(logger, "webhook_retry", tool_call_id=tool_call_id, outcome=outcome)
+            else:
+                body, _ = produce()
+            
+            metrics.inc('webhook_response_bytes_total', len(body), profile=profile)
+            return Response(body, mimetype='application/json')
         else:
             return jsonify({
                 "status": "error",
@@ -117,7 +319,7 @@ def webhook():
             }), 400
             
     except Exception as e:
-        logger.error(f"Error processing webhook request: {str(e)}")
+        log_event(logger, "webhook_error", logging.ERROR, error=str(e))
         return jsonify({
             "status": "error",
             "message": f"Internal server error: {str(e)}"
@@ -132,7 +334,9 @@ def index():
         "description": "Multi-layer GPT pipeline for symptom extraction, medicine recommendation, and natural language response generation",
         "endpoints": {
             "health": "/health",
+            "metrics": "/metrics",
             "process_conversation": "/process_conversation",
+            "process_conversations_batch": "/process_conversations_batch",
             "webhook": "/webhook"
         },
         "pipeline_steps": [
@@ -144,19 +348,16 @@ def index():
     })
 
 if __name__ == '__main__':
-    # Get port from environment variable or default to 8080
-    port = int(os.environ.get('PORT', 8080))
+    # Get port from settings (PORT environment variable, default 8080)
+    port = settings.port
     
     # Check if required API keys are configured
-    if not os.getenv('SEARCHAPI_API_KEY'):
-        logger.error("SEARCHAPI_API_KEY not found in environment variables")
-        logger.error("Please add SEARCHAPI_API_KEY to your .env file")
-        exit(1)
-    
-    if not os.getenv('OPENAI_API_KEY'):
-        logger.error("OPENAI_API_KEY not found in environment variables")
-        logger.error("Please add OPENAI_API_KEY to your .env file")
+    for key in settings.missing_keys():
+        logger.error(f"{key} not found in environment variables")
+        logger.error(f"Please add {key} to your .env file")
+    if settings.missing_keys():
         exit(1)
     
+    start_background_tasks()
     logger.info(f"Starting Symptom Search Pipeline server on port {port}")
     app.run(host='0.0.0.0', port=port, debug=True)
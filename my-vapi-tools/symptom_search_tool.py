@@ -1,17 +1,66 @@
-import os
 import json
+import logging
 import requests
-import httpx
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Optional
-from dotenv import load_dotenv
-from openai import OpenAI
+import metrics
+from http_clients import get_openai_client, get_search_session
+from model_router import get_model_router
+from product_record import ProductRecord
+from ranking import rank_results
+from result_filters import get_result_filter
+from deadline import is_timeout_error
+from rate_limit import estimate_tokens, is_rate_limit_error
+from query_planner import plan_queries
+from searchapi_client import fetch_organic_results, is_cached
+from settings import Settings, get_settings
+from structured_logging import get_logger, log_event, setup_logging
 
-# Create a clean session without proxies to avoid issues
-session = requests.Session()
-session.proxies = {}
+logger = get_logger(__name__)
 
-# Load environment variables
-load_dotenv()
+# Common symptom to product mappings
+SYMPTOM_QUERY_MAPPINGS = {
+    # Pain-related symptoms
+    "headache": "headache relief medicine",
+    "migraine": "migraine relief medicine",
+    "back pain": "back pain relief",
+    "joint pain": "joint pain relief",
+    "muscle pain": "muscle pain relief",
+    "toothache": "toothache relief",
+    
+    # Cold and flu symptoms
+    "fever": "fever reducer medicine",
+    "cough": "cough medicine",
+    "sore throat": "sore throat relief",
+    "congestion": "nasal congestion relief",
+    "runny nose": "runny nose relief",
+    
+    # Digestive symptoms
+    "nausea": "nausea relief",
+    "upset stomach": "upset stomach relief",
+    "indigestion": "indigestion relief",
+    "heartburn": "heartburn relief",
+    
+    # Skin-related symptoms
+    "rash": "rash treatment",
+    "itching": "itching relief",
+    "dry skin": "dry skin treatment",
+    "acne": "acne treatment",
+    
+    # Sleep-related symptoms
+    "insomnia": "sleep aid",
+    "trouble sleeping": "sleep aid",
+    
+    # Allergy symptoms
+    "allergies": "allergy medicine",
+    "seasonal allergies": "seasonal allergy medicine",
+    
+    # General wellness
+    "stress": "stress relief",
+    "anxiety": "anxiety relief",
+    "vitamins": "vitamins",
+    "supplements": "health supplements"
+}
 
 class SymptomSearchTool:
     """
@@ -19,30 +68,20 @@ class SymptomSearchTool:
     Uses the Amazon Search API to find relevant health and wellness products.
     """
     
-    def __init__(self):
-        self.api_key = os.getenv('SEARCHAPI_API_KEY')
-        self.openai_api_key = os.getenv('OPENAI_API_KEY')
-        self.base_url = "https://www.searchapi.io/api/v1/search"
+    def __init__(self, settings: Optional[Settings] = None):
+        self.settings = settings or get_settings()
+        self.api_key = self.settings.searchapi_api_key
+        self.openai_api_key = self.settings.openai_api_key
+        self.base_url = self.settings.searchapi_url
         
         if not self.api_key:
             raise ValueError("SEARCHAPI_API_KEY not found in environment variables")
         
+        self.session = get_search_session(self.settings)
+        
         # Initialize OpenAI client if API key is available
         if self.openai_api_key:
-            try:
-                http_client = httpx.Client(trust_env=False)
-                self.openai_client = OpenAI(api_key=self.openai_api_key, http_client=http_client)
-            except TypeError as e:
-                if "proxies" in str(e):
-                    # Fallback: clear proxies from env and try again
-                    proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'NO_PROXY', 'no_proxy']
-                    for var in proxy_vars:
-                        if var in os.environ:
-                            del os.environ[var]
-                    http_client = httpx.Client(trust_env=False)
-                    self.openai_client = OpenAI(api_key=self.openai_api_key, http_client=http_client)
-                else:
-                    raise e
+            self.openai_client = get_openai_client(self.settings)
         else:
             self.openai_client = None
     
@@ -58,39 +97,30 @@ class SymptomSearchTool:
             Dict: Search results with product information
         """
         try:
-            # Construct search query based on symptoms
-            search_query = self._build_search_query(symptoms)
+            # Plan the fewest queries covering every mentioned symptom
+            plan = plan_queries(symptoms, SYMPTOM_QUERY_MAPPINGS,
+                                lambda query: is_cached(self.settings, query), self.settings.search_max_queries)
+            search_queries = plan.queries if plan is not None else [self._build_search_query(symptoms)]
             
-            # Prepare API request parameters
-            params = {
-                "engine": "amazon_search",
-                "q": search_query,
-                "api_key": self.api_key,
-                "amazon_domain": "amazon.com",
-                "sort_by": "featured"  # Default sort order
-            }
-            
-            # Make API request
-            response = requests.get(self.base_url, params=params, timeout=30)
-            response.raise_for_status()
-            
-            # Parse response
-            data = response.json()
-            
-            # Process and filter results
-            processed_results = self._process_results(data, symptoms)
+            # Fetch organic results (identical in-flight queries share one request)
+            organic_results = self._fetch_all(search_queries)
             
-            # Limit results
-            if len(processed_results) > max_results:
-                processed_results = processed_results[:max_results]
+            # Process and filter each query's results, then take the best of each in turn
+            processed_results = self._merge_results([
+                self._process_results({"organic_results": results}, symptoms) for results in organic_results
+            ], max_results)
             
-            return {
+            response = {
                 "status": "success",
                 "symptoms": symptoms,
-                "search_query": search_query,
-                "results": processed_results,
+                "search_query": "; ".join(search_queries),
+                "search_queries": search_queries,
+                "results": [record.to_dict(include_description=True) for record in processed_results],
                 "total_results": len(processed_results)
             }
+            if plan is not None:
+                response["query_plan"] = plan.to_dict()
+            return response
             
         except requests.RequestException as e:
             return {
@@ -105,65 +135,84 @@ class SymptomSearchTool:
                 "symptoms": symptoms
             }
     
-    def _build_search_query(self, symptoms: str) -> str:
+    def _fetch_organic_results(self, search_query: str) -> List[Dict]:
         """
-        Build an optimized search query based on symptoms.
+        Fetch raw organic results from the product catalog or SearchAPI,
+        coalescing identical concurrent live queries.
         
         Args:
-            symptoms (str): User's symptoms
+            search_query (str): Search query
             
         Returns:
-            str: Optimized search query
+            List[Dict]: Raw organic results (shared between callers, treat as read-only)
         """
-        # Common symptom to product mappings
-        symptom_mappings = {
-            # Pain-related symptoms
-            "headache": "headache relief medicine",
-            "migraine": "migraine relief medicine",
-            "back pain": "back pain relief",
-            "joint pain": "joint pain relief",
-            "muscle pain": "muscle pain relief",
-            "toothache": "toothache relief",
-            
-            # Cold and flu symptoms
-            "fever": "fever reducer medicine",
-            "cough": "cough medicine",
-            "sore throat": "sore throat relief",
-            "congestion": "nasal congestion relief",
-            "runny nose": "runny nose relief",
-            
-            # Digestive symptoms
-            "nausea": "nausea relief",
-            "upset stomach": "upset stomach relief",
-            "indigestion": "indigestion relief",
-            "heartburn": "heartburn relief",
-            
-            # Skin-related symptoms
-            "rash": "rash treatment",
-            "itching": "itching relief",
-            "dry skin": "dry skin treatment",
-            "acne": "acne treatment",
+        return fetch_organic_results(self.settings, self.session, search_query)
+    
+    def _fetch_all(self, search_queries: List[str]) -> List[List[Dict]]:
+        """
+        Fetch organic results for several queries, at most SEARCH_CONCURRENCY at a time.
+        
+        Args:
+            search_queries (List[str]): Planned queries
             
-            # Sleep-related symptoms
-            "insomnia": "sleep aid",
-            "trouble sleeping": "sleep aid",
+        Returns:
+            List[List[Dict]]: Results per query (empty for a query that failed)
             
-            # Allergy symptoms
-            "allergies": "allergy medicine",
-            "seasonal allergies": "seasonal allergy medicine",
+        Raises:
+            Exception: The first error, if every query failed
+        """
+        metrics.inc('search_plan_queries_total', len(search_queries))
+        if len(search_queries) == 1:
+            return [self._fetch_organic_results(search_queries[0])]
+        workers = max(1, min(len(search_queries), self.settings.search_concurrency))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(self._fetch_organic_results, query) for query in search_queries]
+        results, errors = [], []
+        for query, future in zip(search_queries, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                log_event(logger, "search_query_failed", logging.WARNING, query=query, error=str(e))
+                errors.append(e)
+                results.append([])
+        if len(errors) == len(search_queries):
+            raise errors[0]
+        return results
+    
+    def _merge_results(self, ranked_lists: List[List[ProductRecord]], max_results: int) -> List[ProductRecord]:
+        """
+        Interleave ranked results from several queries so each query is represented.
+        
+        Args:
+            ranked_lists (List[List[ProductRecord]]): Ranked records per query
+            max_results (int): Maximum number of records to return
             
-            # General wellness
-            "stress": "stress relief",
-            "anxiety": "anxiety relief",
-            "vitamins": "vitamins",
-            "supplements": "health supplements"
-        }
+        Returns:
+            List[ProductRecord]: Unique records, round-robin across queries
+        """
+        merged, seen = [], set()
+        for position in range(max((len(records) for records in ranked_lists), default=0)):
+            for records in ranked_lists:
+                if position < len(records) and records[position].key not in seen:
+                    seen.add(records[position].key)
+                    merged.append(records[position])
+        return merged[:max_results]
+    
+    def _build_search_query(self, symptoms: str) -> str:
+        """
+        Build an optimized search query based on symptoms.
         
+        Args:
+            symptoms (str): User's symptoms
+            
+        Returns:
+            str: Optimized search query
+        """
         # Convert symptoms to lowercase for matching
         symptoms_lower = symptoms.lower()
         
         # Check for exact matches in symptom mappings
-        for symptom, product_query in symptom_mappings.items():
+        for symptom, product_query in SYMPTOM_QUERY_MAPPINGS.items():
             if symptom in symptoms_lower:
                 return product_query
         
@@ -182,7 +231,7 @@ class SymptomSearchTool:
             # Fallback to general health products
             return "health wellness products"
     
-    def _process_results(self, data: Dict, symptoms: str) -> List[Dict]:
+    def _process_results(self, data: Dict, symptoms: str) -> List[ProductRecord]:
         """
         Process and filter search results to make them more relevant.
         
@@ -191,89 +240,33 @@ class SymptomSearchTool:
             symptoms (str): Original symptoms for context
             
         Returns:
-            List[Dict]: Processed and filtered results
+            List[ProductRecord]: Processed and filtered records
         """
-        processed_results = []
-        
         if "organic_results" not in data:
-            return processed_results
-        
-        for result in data["organic_results"]:
-            # Skip results that are not relevant (e.g., books, videos)
-            if self._is_relevant_result(result, symptoms):
-                processed_result = {
-                    "title": result.get("title", ""),
-                    "brand": result.get("brand", ""),
-                    "price": result.get("price", "Price not available"),
-                    "rating": result.get("rating", 0),
-                    "reviews": result.get("reviews", 0),
-                    "link": result.get("link", ""),
-                    "thumbnail": result.get("thumbnail", ""),
-                    "is_prime": result.get("is_prime", False),
-                    "description": self._extract_description(result)
-                }
-                
-                # Only include results with ratings and reviews
-                if processed_result["rating"] > 0 and processed_result["reviews"] > 0:
-                    processed_results.append(processed_result)
-        
-        # Sort by rating (highest first)
-        processed_results.sort(key=lambda x: x["rating"], reverse=True)
-        
-        return processed_results
-    
-    def _is_relevant_result(self, result: Dict, symptoms: str) -> bool:
-        """
-        Check if a search result is relevant to the symptoms.
-        
-        Args:
-            result (Dict): Search result
-            symptoms (str): User symptoms
-            
-        Returns:
-            bool: True if relevant, False otherwise
-        """
-        title = result.get("title", "").lower()
-        symptoms_lower = symptoms.lower()
-        
-        # Skip books, videos, and other non-product items
-        irrelevant_keywords = ["book", "dvd", "video", "movie", "kindle", "audio", "cd"]
-        for keyword in irrelevant_keywords:
-            if keyword in title:
-                return False
+            return []
         
-        # Check if any symptom-related words appear in the title
-        symptom_words = symptoms_lower.split()
-        for word in symptom_words:
-            if len(word) > 3 and word in title:  # Only check words longer than 3 characters
-                return True
+        # Drop non-products (books, videos, ...) and unrated results with the shared filter rules
+        result_filter = get_result_filter(self.settings)
+        processed_results = result_filter.apply(
+            ProductRecord.from_search_result(result) for result in data["organic_results"])
         
-        return True  # Default to True if no clear indicators
+        # Rank by rating, review volume, relevance, price and Prime; drop duplicate products
+        return rank_results(processed_results, symptoms)
     
-    def _extract_description(self, result: Dict) -> str:
+    def _routed_completion(self, layer: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int):
         """
-        Extract a meaningful description from the search result.
+        Chat completion on the model the router picks for this layer, failing over to other candidates.
         
         Args:
-            result (Dict): Search result
-            
-        Returns:
-            str: Extracted description
+            layer (str): LLM layer ('extraction', 'recommendation' or 'formatting')
+            messages (List[Dict[str, str]]): Chat messages
+            temperature (float): Sampling temperature
+            max_tokens (int): Completion token limit
         """
-        description = result.get("title", "")
-        
-        # Add rating information if available
-        rating = result.get("rating", 0)
-        reviews = result.get("reviews", 0)
-        
-        if rating > 0 and reviews > 0:
-            description += f" (Rated {rating} out of 5 stars with {reviews} reviews)"
-        
-        # Add Prime information if available
-        if result.get("is_prime", False):
-            description += " - Prime eligible"
-        
-        return description
+        return get_model_router(self.settings).call(
+            layer, lambda model: self._chat_completion(model, messages, temperature, max_tokens),
+            tokens=estimate_tokens(messages, max_tokens)
+        )
     
     def _chat_completion(self, model: str, messages: List[Dict[str, str]], temperature: float, max_tokens: int):
         """
@@ -292,6 +285,9 @@ class SymptomSearchTool:
                 max_completion_tokens=max_tokens,
             )
         except Exception as first_error:
+            if is_rate_limit_error(first_error) or is_timeout_error(first_error):
+                # A 429 or a timeout is not a parameter problem: retrying only adds delay
+                raise
             error_text = str(first_error)
             # If max_completion_tokens is unsupported, try max_tokens
             try:
@@ -302,6 +298,8 @@ class SymptomSearchTool:
                     max_tokens=max_tokens,
                 )
             except Exception as second_error:
+                if is_rate_limit_error(second_error) or is_timeout_error(second_error):
+                    raise
                 # Final attempt: omit token parameter entirely
                 try:
                     return self.openai_client.chat.completions.create(
@@ -336,7 +334,7 @@ class SymptomSearchTool:
                 return self._format_results_with_llm(results)
             except Exception as e:
                 # Fallback to original formatting if LLM fails
-                print(f"LLM formatting failed, falling back to template: {e}")
+                log_event(logger, "llm_formatting_failed", logging.WARNING, error=str(e))
                 return self._format_results_fallback(results)
         else:
             # Fallback to original formatting if no OpenAI client
@@ -376,8 +374,8 @@ class SymptomSearchTool:
         Please list only the FIRST 3 product names and prices in a numbered format (1, 2, 3).
         """
         
-        response = self._chat_completion(
-            model="gpt-4o",
+        response = self._routed_completion(
+            layer='formatting',
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
@@ -410,19 +408,20 @@ class SymptomSearchTool:
 
 
 # Function to be called by Vapi
-def search_products_for_symptoms(symptoms: str, max_results: int = 5) -> Dict:
+def search_products_for_symptoms(symptoms: str, max_results: int = 5, settings: Optional[Settings] = None) -> Dict:
     """
     Main function to be called by Vapi when user reports symptoms.
     
     Args:
         symptoms (str): User's symptoms or health concerns
         max_results (int): Maximum number of results to return
+        settings (Settings): Service settings (defaults to the process-wide settings)
         
     Returns:
         Dict: Search results with product recommendations
     """
     try:
-        tool = SymptomSearchTool()
+        tool = SymptomSearchTool(settings)
         results = tool.search_products_by_symptoms(symptoms, max_results)
         
         if results["status"] == "success":
@@ -441,6 +440,7 @@ def search_products_for_symptoms(symptoms: str, max_results: int = 5) -> Dict:
 
 
 if __name__ == "__main__":
+    setup_logging(get_settings().log)
     # Test the tool
     test_symptoms = "headache and fever"
     results = search_products_for_symptoms(test_symptoms)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for admission control and degraded responses.
+These tests run offline and do not require API keys.
+"""
+
+import os
+import runpy
+import tempfile
+import threading
+import time
+
+from admission import AdmissionController
+from offline_fakes import offline_settings
+from product_catalog import get_catalog
+from symptom_search_pipeline import SymptomSearchPipeline
+
+
+def test_overflow_is_shed_after_bounded_wait():
+    """One slot and one queue place: the third request is shed at once, the queued one times out."""
+    controller = AdmissionController(max_in_flight=1, max_queue=1, max_wait_seconds=0.2)
+    assert controller.try_acquire() is None
+    outcomes = []
+    waiter = threading.Thread(target=lambda: outcomes.append(controller.try_acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    assert controller.try_acquire() == 'queue_full'
+    waiter.join()
+    assert outcomes == ['timeout']
+
+    # A queued request gets the slot when it is released in time
+    waiter = threading.Thread(target=lambda: outcomes.append(controller.try_acquire()))
+    waiter.start()
+    time.sleep(0.05)
+    controller.release()
+    waiter.join()
+    assert outcomes[-1] is None and controller.in_flight == 1
+
+
+def test_degraded_response_uses_keywords_and_catalog():
+    """The degraded answer needs no GPT or live SearchAPI call and may use old catalog entries."""
+    with tempfile.TemporaryDirectory() as directory:
+        settings = offline_settings(catalog_enabled=True, catalog_path=os.path.join(directory, "catalog.db"))
+        get_catalog(settings).store("ibuprofen", [
+            {"title": "Ibuprofen 200mg", "asin": "B001", "rating": 4.7, "reviews": 900, "price": "$8.49"},
+        ], fetched_at=time.time() - 2 * 24 * 3600)
+        pipeline = SymptomSearchPipeline(settings)
+        pipeline.client = None  # any GPT call would fail
+        result = pipeline.process_conversation_degraded("my head is pounding", 5)
+    assert result["degraded"] is True
+    assert result["symptoms"]["symptoms"] == ["headache"]
+    assert result["natural_response"] == "1. Ibuprofen 200mg - $8.49"
+
+
+def test_gunicorn_workers_have_threads_to_queue_and_shed():
+    """Sync workers never see a second request; the config must give workers more threads than in-flight slots."""
+    config = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py"))
+    settings = offline_settings()
+    assert config["worker_class"] == "gthread"
+    assert config["threads"] > settings.admission_max_in_flight + settings.admission_max_queue
+
+
+if __name__ == "__main__":
+    print("🧪 Testing admission control")
+    print("=" * 50)
+    for test in [test_overflow_is_shed_after_bounded_wait, test_degraded_response_uses_keywords_and_catalog,
+                 test_gunicorn_workers_have_threads_to_queue_and_shed]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All admission control tests passed!")
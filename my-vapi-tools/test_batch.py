@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for batch processing with cross-conversation deduplication.
+These tests run offline with a fake OpenAI client and search; no API keys are needed.
+"""
+
+import json
+import time
+
+from offline_fakes import fake_fetch, fake_openai_client, offline_pipeline, offline_server
+
+MEDICINES = {"headache": ["ibuprofen", "acetaminophen"], "sore throat": ["throat lozenges", "acetaminophen"]}
+
+
+def _pipeline(layer1_calls: list, searched: list, failing: tuple = ()):
+    def reply(layer, user_prompt):
+        found = [symptom for symptom in MEDICINES if symptom in user_prompt.lower()]
+        if layer == 'layer1':
+            layer1_calls.append(user_prompt)
+            return json.dumps({"symptoms": found, "severity": "mild", "duration": None, "context": None})
+        if layer == 'layer2':
+            return json.dumps({"medicines": list(dict.fromkeys(m for symptom in found for m in MEDICINES[symptom]))})
+        return None
+    return offline_pipeline(fake_openai_client(reply), fake_fetch(searched, failing=failing), llm_streaming=False)
+
+
+def test_duplicates_run_once_and_medicines_are_searched_once():
+    """Transcripts equal after normalize_key run once; the union of medicines is searched once each."""
+    layer1_calls, searched = [], []
+    conversations = ["I have a headache", "  i have a   HEADACHE ", "My sore throat hurts"]
+    results = _pipeline(layer1_calls, searched).process_conversations(conversations, 5)
+
+    assert len(layer1_calls) == 2
+    assert sorted(searched) == ["acetaminophen", "ibuprofen", "throat lozenges"]
+    assert [result["conversation"] for result in results] == conversations
+    assert [result["recommended_medicines"] for result in results] == [
+        ["ibuprofen", "acetaminophen"], ["ibuprofen", "acetaminophen"], ["throat lozenges", "acetaminophen"]]
+    # Duplicates get their own copy
+    results[0]["search_results"]["results"].clear()
+    assert results[1]["search_results"]["total_results"] == 2
+
+
+def test_failed_search_only_drops_its_medicine():
+    """A failing medicine search leaves partial results for every conversation that shares it."""
+    layer1_calls, searched = [], []
+    results = _pipeline(layer1_calls, searched, failing=("acetaminophen",)).process_conversations(
+        ["I have a headache", "My sore throat hurts", "no symptoms here"], 5)
+
+    headache, throat, empty = results
+    assert headache["status"] == "success" and throat["status"] == "success"
+    assert [r["medicine_name"] for r in headache["search_results"]["results"]] == ["ibuprofen"]
+    assert [r["medicine_name"] for r in throat["search_results"]["results"]] == ["throat lozenges"]
+    assert headache["search_results"]["failed_medicines"] == ["acetaminophen"]
+    assert headache["degraded_layers"] == ["search"]
+    assert empty["status"] == "error"
+    assert searched.count("acetaminophen") == 1
+
+
+def test_each_conversation_gets_its_own_deadline():
+    """Under a deadline a slow Layer 4 falls back per conversation, and the shared pipeline keeps no deadline."""
+    client = fake_openai_client(delays={'layer4': 5})
+    pipeline = offline_pipeline(client, fake_fetch(), llm_streaming=False)
+    start = time.monotonic()
+    results = pipeline.process_conversations(["I have a headache", "My head hurts"], 5, max_workers=2,
+                                             deadline_seconds=1.5)
+    assert time.monotonic() - start < 2.5
+    assert [result["degraded_layers"] for result in results] == [["formatting"], ["formatting"]]
+    assert pipeline.deadline is None
+
+
+def test_batch_endpoint_validates_and_keeps_input_order():
+    """The endpoint rejects malformed batches and returns one result per conversation, in order."""
+    server = offline_server()
+    client = server.app.test_client()
+    received = []
+
+    def process(conversations, max_results, settings):
+        received.append((conversations, max_results))
+        return [{"status": "success", "conversation": conversation} for conversation in conversations]
+
+    original = server.process_symptom_conversations
+    server.process_symptom_conversations = process
+    try:
+        assert client.post('/process_conversations_batch', json={"conversations": []}).status_code == 400
+        assert client.post('/process_conversations_batch', json={"conversations": ["ok", ""]}).status_code == 400
+        too_many = ["headache"] * (server.settings.batch_max_conversations + 1)
+        assert client.post('/process_conversations_batch', json={"conversations": too_many}).status_code == 400
+        response = client.post('/process_conversations_batch', json={"conversations": ["b", "a"], "max_results": 3})
+    finally:
+        server.process_symptom_conversations = original
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert received == [(["b", "a"], 3)]
+    assert body["total_conversations"] == 2
+    assert [result["conversation"] for result in body["results"]] == ["b", "a"]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing batch processing")
+    print("=" * 50)
+    for test in [test_duplicates_run_once_and_medicines_are_searched_once, test_failed_search_only_drops_its_medicine,
+                 test_each_conversation_gets_its_own_deadline, test_batch_endpoint_validates_and_keeps_input_order]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All batch tests passed!")
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Test script for the resumable bulk processing CLI.
+These tests run offline with a stubbed pipeline; no API keys are needed.
+"""
+
+import json
+import os
+import tempfile
+
+import bulk_process
+from bulk_process import Checkpoint, recover_output, run
+
+
+def _write_lines(path, lines):
+    with open(path, 'w') as f:
+        f.write(''.join(line + '\n' for line in lines))
+
+
+def _read_output(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f]
+
+
+def _stub_pipeline(processed, failing=()):
+    def process(conversation, max_results, settings):
+        processed.append(conversation)
+        if conversation in failing:
+            raise RuntimeError("OpenAI unavailable")
+        return {"status": "success", "conversation": conversation}
+    return process
+
+
+def test_checkpoint_round_trip_and_input_mismatch():
+    """The watermark, sparse lines and failures survive a save; another input file is rejected."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'out.checkpoint')
+        checkpoint = Checkpoint(path, os.path.join(directory, 'in.jsonl'))
+        for line_number in (1, 2, 4):
+            checkpoint.mark_done(line_number)
+        checkpoint.mark_done(5, failed=True)
+        checkpoint.save()
+
+        loaded = Checkpoint.load(path, os.path.join(directory, 'in.jsonl'))
+        assert (loaded.watermark, loaded.done_above, loaded.failed) == (2, {4, 5}, {5})
+        assert loaded.is_done(2) and not loaded.is_done(3)
+        try:
+            Checkpoint.load(path, os.path.join(directory, 'other.jsonl'))
+            assert False, "expected a mismatched input to be rejected"
+        except ValueError:
+            pass
+
+
+def test_recover_output_truncates_partial_line_and_marks_written_records():
+    """A torn last line is dropped; complete lines written after the last save count as done."""
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'out.jsonl')
+        with open(output, 'w') as f:
+            f.write(json.dumps({"input_line": 1, "result": {"status": "success"}}) + '\n')
+            f.write(json.dumps({"input_line": 2, "result": {"status": "error"}}) + '\n')
+            f.write('{"input_line": 3, "resu')
+        checkpoint = Checkpoint(output + '.checkpoint', os.path.join(directory, 'in.jsonl'))
+        recover_output(output, checkpoint)
+
+        assert [record["input_line"] for record in _read_output(output)] == [1, 2]
+        assert checkpoint.is_done(1) and checkpoint.is_done(2) and not checkpoint.is_done(3)
+        assert checkpoint.failed == {2}
+
+
+def test_resume_writes_each_record_once_and_retries_errors_on_request():
+    """An interrupted run resumes without duplicates; --retry-errors reprocesses failed records only."""
+    original = bulk_process.process_symptom_conversation
+    with tempfile.TemporaryDirectory() as directory:
+        input_path, output = os.path.join(directory, 'in.jsonl'), os.path.join(directory, 'out.jsonl')
+        _write_lines(input_path, [json.dumps({"id": n, "conversation": f"c{n}"}) for n in range(1, 6)] + ['not json'])
+        try:
+            # First run: everything is written, but the checkpoint is only saved at the start
+            processed = []
+            bulk_process.process_symptom_conversation = _stub_pipeline(processed, failing=("c3",))
+            run(input_path, output, workers=2, checkpoint_every=1000)
+            with open(output + '.checkpoint', 'w') as f:
+                json.dump({"input": os.path.abspath(input_path), "watermark": 2, "done_above": []}, f)
+
+            # Resume: lines 3-6 reached the output after the stale checkpoint and must not run again
+            processed.clear()
+            summary = run(input_path, output, workers=2)
+            assert processed == [] and summary['processed'] == 0
+            assert sorted(record["input_line"] for record in _read_output(output)) == [1, 2, 3, 4, 5, 6]
+
+            bulk_process.process_symptom_conversation = _stub_pipeline(processed)
+            summary = run(input_path, output, workers=2, retry_errors=True)
+        finally:
+            bulk_process.process_symptom_conversation = original
+
+        assert processed == ["c3"] and summary['success'] == 1
+        last = {record["input_line"]: record for record in _read_output(output)}
+        assert last[3]["result"]["status"] == "success"
+        assert last[6]["invalid"] is True
+        assert Checkpoint.load(output + '.checkpoint', input_path).failed == set()
+
+
+if __name__ == "__main__":
+    print("🧪 Testing bulk processing")
+    print("=" * 50)
+    for test in [test_checkpoint_round_trip_and_input_mismatch,
+                 test_recover_output_truncates_partial_line_and_marks_written_records,
+                 test_resume_writes_each_record_once_and_retries_errors_on_request]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All bulk processing tests passed!")
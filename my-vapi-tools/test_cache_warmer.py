@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the background cache warmer: seed selection, the quota budget and its metrics.
+These tests run offline and do not require API keys.
+"""
+
+import os
+import tempfile
+import time
+
+import metrics
+import searchapi_client
+from cache_warmer import CacheWarmer, PopularityTracker, QuotaBudget, seed_queries
+from offline_fakes import fake_product, offline_server, offline_settings
+from product_catalog import query_key
+
+
+def test_seeds_are_canonical_and_observed_queries_rank_first():
+    """Seeds use canonical medicine names without duplicates; observed queries come before unobserved seeds."""
+    seeds = seed_queries()
+    keys = [query_key(seed) for seed in seeds]
+    assert len(keys) == len(set(keys))
+    assert "ibuprofen" in keys and "advil" not in keys
+
+    tracker = PopularityTracker()
+    now = time.time()
+    tracker.record("melatonin", now=now)
+    tracker.record("ibuprofen", now=now)
+    tracker.record("ibuprofen", now=now)
+    warmer = CacheWarmer(offline_settings(cache_warmer_top_n=2), session=None, tracker=tracker)
+    candidates = warmer.candidates()
+    assert candidates[:2] == ["ibuprofen", "melatonin"]
+    assert [query_key(query) for query in candidates].count("ibuprofen") == 1
+    assert len(candidates) == len(seeds) + (0 if "melatonin" in keys else 1)
+
+
+def test_quota_window_and_shared_budget():
+    """The per-process window frees calls after an hour; a SQLite budget is shared between workers."""
+    budget = QuotaBudget(2)
+    start = time.time()
+    assert budget.try_spend(start) and budget.try_spend(start + 1)
+    assert not budget.try_spend(start + 2)
+    assert budget.used(start + 2) == 2
+    assert budget.try_spend(start + 3602) and budget.used(start + 3602) == 1
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "limits.db")
+        worker_a, worker_b = QuotaBudget(3, path), QuotaBudget(3, path)
+        assert worker_a.try_spend() and worker_b.try_spend() and worker_a.try_spend()
+        assert not worker_b.try_spend()
+        assert worker_a.used() == worker_b.used() == 3
+
+
+def test_cycle_stops_at_budget_and_reports_metrics():
+    """A cycle refreshes missing entries until the budget runs out, and /metrics reports it."""
+    server = offline_server()
+    fetched = []
+
+    def fetch_live(settings, session, query, timeout=None):
+        fetched.append(query)
+        return [fake_product(query)]
+
+    saved = searchapi_client.fetch_live
+    searchapi_client.fetch_live = fetch_live
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            settings = offline_settings(catalog_enabled=True, catalog_path=os.path.join(directory, "catalog.db"),
+                                        cache_warmer_enabled=True, cache_warmer_quota_per_hour=3)
+            before = metrics.get_counter('cache_warmer_budget_exhausted_total')
+            warmer = CacheWarmer(settings, session=None, tracker=PopularityTracker())
+            assert warmer.run_once() == 3
+            assert fetched == seed_queries()[:3]
+            assert metrics.get_counter('cache_warmer_budget_exhausted_total') - before == 1
+    finally:
+        searchapi_client.fetch_live = saved
+
+    body = server.app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'cache_warmer_refreshes_total' in body
+    assert 'cache_warmer_quota_used_last_hour 3' in body
+    # Importing the server never starts the warmer
+    assert server._background_started is False
+
+
+if __name__ == "__main__":
+    print("🧪 Testing cache warmer")
+    print("=" * 50)
+    for test in [test_seeds_are_canonical_and_observed_queries_rank_first, test_quota_window_and_shared_budget,
+                 test_cycle_stops_at_budget_and_reports_metrics]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All cache warmer tests passed!")
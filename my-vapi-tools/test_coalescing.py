@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Test script for single-flight request coalescing.
+These tests run offline and do not require API keys.
+"""
+
+import asyncio
+import threading
+import time
+
+from coalescing import CoalescingTimeout, SingleFlight, normalize_key
+
+
+def _run_concurrently(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrent_calls_share_one_upstream_call():
+    """Identical concurrent calls should run the upstream function once."""
+    flight = SingleFlight('test')
+    upstream_calls = []
+    results = []
+
+    def fetch():
+        upstream_calls.append(1)
+        time.sleep(0.1)
+        return ["ibuprofen result"]
+
+    _run_concurrently(lambda: results.append(flight.do(normalize_key("Ibuprofen "), fetch)), 8)
+
+    assert len(upstream_calls) == 1
+    assert results == [["ibuprofen result"]] * 8
+    assert flight.stats()['shared_calls'] == 7
+
+
+def test_errors_propagate_to_every_waiter():
+    """An upstream error should be raised in the leader and in all waiters."""
+    flight = SingleFlight('test')
+    errors = []
+
+    def fetch():
+        time.sleep(0.1)
+        raise ValueError("SearchAPI unavailable")
+
+    def call():
+        try:
+            flight.do('key', fetch)
+        except ValueError as e:
+            errors.append(e)
+
+    _run_concurrently(call, 5)
+    assert len(errors) == 5
+
+
+def test_waiter_timeout():
+    """A waiter with a short timeout should give up without affecting the leader."""
+    flight = SingleFlight('test')
+    outcome = {}
+
+    def leader():
+        outcome['leader'] = flight.do('key', lambda: time.sleep(0.2) or 'done')
+
+    thread = threading.Thread(target=leader)
+    thread.start()
+    time.sleep(0.02)
+    try:
+        flight.do('key', lambda: 'unused', timeout=0.01)
+    except CoalescingTimeout:
+        outcome['waiter'] = 'timeout'
+    thread.join()
+
+    assert outcome == {'leader': 'done', 'waiter': 'timeout'}
+
+
+def test_asyncio_calls_share_one_task():
+    """Concurrent coroutines with the same key should await a single task."""
+    flight = SingleFlight('test')
+    upstream_calls = []
+
+    async def fetch():
+        upstream_calls.append(1)
+        await asyncio.sleep(0.05)
+        return 42
+
+    async def main():
+        return await asyncio.gather(*[flight.do_async('key', fetch) for _ in range(5)])
+
+    assert asyncio.run(main()) == [42] * 5
+    assert len(upstream_calls) == 1
+
+
+def test_normalize_key_ignores_case_whitespace_and_order():
+    """Keys built from equivalent inputs should be equal."""
+    assert normalize_key(["Fever", "headache"], "  Mild ") == normalize_key(["headache", "fever"], "mild")
+
+
+if __name__ == "__main__":
+    print("🧪 Testing single-flight coalescing")
+    print("=" * 50)
+    for test in [test_concurrent_calls_share_one_upstream_call, test_errors_propagate_to_every_waiter,
+                 test_waiter_timeout, test_asyncio_calls_share_one_task,
+                 test_normalize_key_ignores_case_whitespace_and_order]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All coalescing tests passed!")
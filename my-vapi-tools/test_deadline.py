@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for request deadlines and partial answers.
+These tests run offline with a fake OpenAI client and search; no API keys are needed.
+"""
+
+import time
+
+from deadline import Deadline, DeadlineExceeded, parse_split
+from model_router import get_model_router
+from offline_fakes import fake_fetch, fake_openai_client, offline_pipeline, offline_server
+from symptom_search_pipeline import SymptomSearchPipeline
+
+
+def _pipeline(search_delays: dict, formatting_delay: float = 0.05) -> SymptomSearchPipeline:
+    client = fake_openai_client(delays={'layer1': 0.05, 'layer2': 0.05, 'layer4': formatting_delay})
+    return offline_pipeline(client, fake_fetch(delay=0.05, delays=search_delays), llm_streaming=False,
+                            pipeline_deadline_seconds=1.5)
+
+
+def test_layers_share_the_remaining_budget():
+    """A layer gets its weight's share of what is left; calls stop once less than min_call is left."""
+    assert parse_split("extraction:2, search:4,bad,formatting:x") == {"extraction": 2.0, "search": 4.0}
+    deadline = Deadline(1.0, {"extraction": 1, "recommendation": 1, "search": 2, "formatting": 1}, min_call_seconds=0.1)
+    assert abs(deadline.begin("extraction") - 0.2) < 0.01
+    assert deadline.timeout("extraction", 30) <= 0.2
+    # The cap still applies, and a short layer share borrows up to min_call from the request
+    assert deadline.timeout("extraction", 0.05) == 0.05
+    deadline.end = time.monotonic() + 0.05
+    try:
+        deadline.timeout("extraction", 30)
+        assert False, "expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+    assert Deadline(0).timeout("search", 30) == 30
+
+
+def test_slow_search_and_formatting_return_partial_answer():
+    """Searches that miss the deadline are dropped and Layer 4 falls back to a local list, within budget."""
+    start = time.monotonic()
+    result = _pipeline({"acetaminophen": 3, "aspirin": 3}, formatting_delay=5).process_conversation("my head hurts", 5)
+    elapsed = time.monotonic() - start
+    assert elapsed < 1.8, elapsed
+    assert result["status"] == "success"
+    assert "search" in result["degraded_layers"] and "formatting" in result["degraded_layers"]
+    assert [r["medicine_name"] for r in result["search_results"]["results"]] == ["ibuprofen"]
+    assert result["natural_response"] == "1. ibuprofen tablets - $5.99"
+
+
+def test_cut_off_extraction_falls_back_to_keywords_and_zero_budget_means_none():
+    """Layer 1 stopped by the deadline before its symptoms array completes uses the keyword table."""
+    padded = '{"symptoms": [' + ' ' * 400 + '"headache"], "severity": "mild", "duration": null, "context": null}'
+    client = fake_openai_client(reply=lambda layer, prompt: padded if layer == 'layer1' else None)
+    pipeline = offline_pipeline(client, fake_fetch(), pipeline_deadline_seconds=1.5)
+    result = pipeline.process_conversation("I have a bad headache", 5)
+    assert result["status"] == "success"
+    assert "extraction" in result["degraded_layers"]
+    assert result["symptoms"]["symptoms"] == ["headache"]
+
+    # 0 turns the configured deadline off for this request; None keeps it
+    assert not pipeline.new_deadline(0).bounded
+    assert pipeline.new_deadline(None).budget_seconds == 1.5
+
+
+def test_invalid_deadline_seconds_is_a_bad_request():
+    """A deadline_seconds that is not a number of seconds >= 0 is rejected with 400 before the pipeline runs."""
+    client = offline_server().app.test_client()
+    for deadline_seconds in ["soon", -1, True]:
+        response = client.post('/process_conversation',
+                               json={"conversation": "my head hurts", "deadline_seconds": deadline_seconds})
+        assert response.status_code == 400, deadline_seconds
+        response = client.post('/webhook', json={"functionCall": {
+            "name": "process_symptom_conversation",
+            "arguments": {"conversation": "my head hurts", "deadline_seconds": deadline_seconds}}})
+        assert response.status_code == 400, deadline_seconds
+    try:
+        offline_pipeline().new_deadline("5")
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_timeout_the_deadline_shortened_is_not_a_model_failure():
+    """A call cut short by the request's budget neither fails over nor counts against the model."""
+    client = fake_openai_client(delays={'layer4': 5})
+    pipeline = offline_pipeline(client, fake_fetch(), llm_streaming=False, pipeline_deadline_seconds=1.5,
+                                formatting_model="deadline-a,deadline-b")
+    result = pipeline.process_conversation("my head hurts", 5)
+    assert "formatting" in result["degraded_layers"]
+    snapshot = get_model_router(pipeline.settings).snapshot()
+    assert snapshot['formatting/deadline-a']['error_rate'] == 0 and snapshot['formatting/deadline-a']['healthy']
+    assert snapshot['formatting/deadline-b']['calls'] == 0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing request deadlines")
+    print("=" * 50)
+    for test in [test_layers_share_the_remaining_budget, test_slow_search_and_formatting_return_partial_answer,
+                 test_cut_off_extraction_falls_back_to_keywords_and_zero_budget_means_none,
+                 test_invalid_deadline_seconds_is_a_bad_request, test_timeout_the_deadline_shortened_is_not_a_model_failure]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All deadline tests passed!")
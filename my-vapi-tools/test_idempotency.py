@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for idempotent handling of retried tool calls.
+These tests run offline and do not require API keys.
+"""
+
+import dataclasses
+import threading
+import time
+
+from coalescing import CoalescingTimeout
+from idempotency import IdempotencyStore
+from offline_fakes import offline_server
+
+
+def test_retry_during_execution_attaches():
+    """A retry arriving while the original runs should get its response without running again."""
+    store = IdempotencyStore(retention_seconds=60, max_entries=100, wait_seconds=5)
+    executions = []
+    outcomes = []
+
+    def produce():
+        executions.append(1)
+        time.sleep(0.1)
+        return b'{"status": "success"}', True
+
+    def deliver():
+        outcomes.append(store.run('call_abc', produce))
+
+    threads = [threading.Thread(target=deliver) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.01)
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1
+    assert sorted(outcome for _, outcome in outcomes) == ['attached', 'attached', 'attached', 'executed']
+    assert {body for body, _ in outcomes} == {b'{"status": "success"}'}
+
+
+def test_retry_after_completion_replays_within_retention():
+    """A later retry should replay the stored response until the retention window ends."""
+    store = IdempotencyStore(retention_seconds=0.2, max_entries=100, wait_seconds=5)
+    executions = []
+
+    def produce():
+        executions.append(1)
+        return b'{"run": %d}' % len(executions), True
+
+    assert store.run('call_abc', produce) == (b'{"run": 1}', 'executed')
+    assert store.run('call_abc', produce) == (b'{"run": 1}', 'replayed')
+    assert store.run('call_other', produce) == (b'{"run": 2}', 'executed')
+    time.sleep(0.25)
+    assert store.run('call_abc', produce) == (b'{"run": 3}', 'executed')
+
+
+def test_failures_are_not_stored_and_slow_originals_time_out():
+    """A failed execution should run again on retry; a retry should stop waiting after wait_seconds."""
+    store = IdempotencyStore(retention_seconds=60, max_entries=100, wait_seconds=0.05)
+
+    def fail():
+        raise RuntimeError("pipeline failed")
+
+    try:
+        store.run('call_abc', fail)
+        assert False, "expected the error to propagate"
+    except RuntimeError:
+        pass
+    assert store.run('call_abc', lambda: (b'ok', True)) == (b'ok', 'executed')
+
+    thread = threading.Thread(target=lambda: store.run('call_slow', lambda: time.sleep(0.2) or (b'late', True)))
+    thread.start()
+    time.sleep(0.02)
+    try:
+        store.run('call_slow', lambda: (b'unused', True))
+        assert False, "expected the retry to time out"
+    except CoalescingTimeout:
+        pass
+    thread.join()
+    assert store.run('call_slow', lambda: (b'unused', True)) == (b'late', 'replayed')
+
+
+def test_error_bodies_are_not_replayed():
+    """An error returned as a body (status 200) reaches the caller but a retry runs the tool call again."""
+    server = offline_server()
+    outcomes = iter([{"status": "error", "message": "Pipeline failed: SearchAPI timed out"},
+                     {"status": "success", "voice_response": "1. Advil - $8.99"}])
+    runs = []
+
+    def run_pipeline(conversation, max_results, call_id=None, deadline_seconds=None):
+        runs.append(conversation)
+        return next(outcomes)
+
+    saved = server._run_pipeline, server.settings
+    server._run_pipeline = run_pipeline
+    server.settings = dataclasses.replace(server.settings, idempotency_enabled=True, response_cache_enabled=False)
+    try:
+        client = server.app.test_client()
+        payload = {"functionCall": {"id": "call_retry", "name": "process_symptom_conversation",
+                                    "arguments": {"conversation": "headache"}}}
+        assert client.post('/webhook', json=payload).get_json()["status"] == "error"
+        assert client.post('/webhook', json=payload).get_json()["status"] == "success"
+        assert client.post('/webhook', json=payload).get_json()["status"] == "success"
+        assert len(runs) == 2
+    finally:
+        server._run_pipeline, server.settings = saved
+
+
+if __name__ == "__main__":
+    print("🧪 Testing idempotent tool-call handling")
+    print("=" * 50)
+    for test in [test_retry_during_execution_attaches, test_retry_after_completion_replays_within_retention,
+                 test_failures_are_not_stored_and_slow_originals_time_out, test_error_bodies_are_not_replayed]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All idempotency tests passed!")
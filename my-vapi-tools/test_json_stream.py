@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Test script for streamed extraction of SearchAPI organic results.
+These tests run offline and do not require API keys.
+"""
+
+import dataclasses
+import json
+import time
+from types import SimpleNamespace
+
+from json_stream import iter_array_field
+from searchapi_client import fetch_live, read_organic_results
+from settings import Settings
+
+
+def test_array_elements_stream_across_chunk_boundaries():
+    """Elements are decoded as they complete, even when numbers and UTF-8 characters are split between chunks."""
+    document = json.dumps({
+        "search_metadata": {"total_time_taken": 12345},
+        "ads": [{"title": "Ad"}],
+        "organic_results": [{"title": "Advil – 200 mg", "rating": 4.75}, 12345, {"title": 'Tylenol "[8]" {HR}\\'}],
+        "related_searches": [{"query": "x"}]
+    }, ensure_ascii=False).encode()
+    one_byte_chunks = [document[i:i + 1] for i in range(len(document))]
+    assert list(iter_array_field(one_byte_chunks, "organic_results")) == [
+        {"title": "Advil – 200 mg", "rating": 4.75}, 12345, {"title": 'Tylenol "[8]" {HR}\\'}]
+    assert list(iter_array_field([b'{"organic_results": []}'], "organic_results")) == []
+    assert list(iter_array_field([b'{"ads": [1, 2]}'], "organic_results")) == []
+    try:
+        list(iter_array_field([b'{"organic_results": [{"title": '], "organic_results"))
+        assert False, "expected ValueError"
+    except ValueError:
+        pass
+
+
+def test_large_element_is_decoded_once():
+    """An element split across thousands of chunks is scanned once, not decoded again per chunk."""
+    element = {"title": "Ibuprofen", "extensions": [{"text": "x" * 100, "tags": ["[a]", "{b}"]}] * 5000}
+    document = json.dumps({"organic_results": [element]}).encode()
+    chunks = [document[i:i + 64] for i in range(0, len(document), 64)]
+    start = time.perf_counter()
+    assert list(iter_array_field(chunks, "organic_results")) == [element]
+    assert time.perf_counter() - start < 1.0
+
+
+def test_both_modes_keep_the_same_first_results_unfiltered():
+    """Streaming keeps product fields of the first results, filtered or not, and stops reading; whole bodies match."""
+    results = [{"title": f"Ibuprofen {n}", "asin": f"A{n}", "rating": 4.5 if n % 2 else 0, "reviews": 10,
+                "price": "$4.99", "extensions": ["x" * 100], "sponsored": False} for n in range(50)]
+    body = json.dumps({"ads": [], "organic_results": results, "pagination": {"next": 2}}).encode()
+    chunks = [body[i:i + 256] for i in range(0, len(body), 256)]
+    read = []
+    closed = []
+
+    class Response:
+        def __init__(self, streaming):
+            self.streaming = streaming
+
+        def raise_for_status(self):
+            pass
+
+        def iter_content(self, chunk_size):
+            for chunk in chunks:
+                read.append(chunk)
+                yield chunk
+
+        def json(self):
+            return json.loads(body)
+
+        def close(self):
+            closed.append(self.streaming)
+
+    settings = dataclasses.replace(Settings.from_env(), searchapi_max_results=3)
+    products = read_organic_results(settings, Response(True))
+    assert [p["title"] for p in products] == ["Ibuprofen 0", "Ibuprofen 1", "Ibuprofen 2"]
+    assert set(products[0]) == {"title", "asin", "rating", "reviews", "price"}
+    assert len(read) < len(chunks) / 4
+
+    for streaming in (True, False):
+        session = SimpleNamespace(get=lambda url, **options: Response(options["stream"]))
+        mode = dataclasses.replace(settings, searchapi_api_key="test", searchapi_streaming=streaming,
+                                   coalescing_enabled=False, catalog_enabled=False)
+        assert fetch_live(mode, session, "ibuprofen") == products
+    assert closed == [True, False]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing streamed SearchAPI parsing")
+    print("=" * 50)
+    for test in [test_array_elements_stream_across_chunk_boundaries, test_large_element_is_decoded_once,
+                 test_both_modes_keep_the_same_first_results_unfiltered]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All streamed parsing tests passed!")
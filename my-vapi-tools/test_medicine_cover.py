@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for the medicine set-cover optimizer.
+These tests run offline with a fake OpenAI client and search; no API keys are needed.
+"""
+
+from medicine_cover import CoverageTable
+from offline_fakes import fake_fetch, fake_openai_client, offline_pipeline
+
+MAPPING = {
+    'headache': ['ibuprofen', 'acetaminophen', 'aspirin'],
+    'fever': ['acetaminophen', 'ibuprofen'],
+    'body aches': ['ibuprofen', 'acetaminophen'],
+    'cough': ['dextromethorphan', 'guaifenesin'],
+}
+
+
+def test_fewest_medicines_cover_every_symptom():
+    """The smallest cover wins, Layer 2's order breaks ties, and searched medicines are free."""
+    table = CoverageTable(MAPPING)
+    symptoms = ['headache', 'mild fever', 'body aches', 'cough']
+    medicines = ['aspirin', 'acetaminophen', 'ibuprofen', 'guaifenesin', 'dextromethorphan', 'throat lozenges']
+    assert table.select(symptoms, medicines, max_searches=3) == ['acetaminophen', 'guaifenesin']
+    assert table.select(symptoms, medicines, 3, searched=['ibuprofen']) == ['ibuprofen', 'guaifenesin']
+    # One search allowed: cover as much as possible
+    assert table.select(symptoms, medicines, max_searches=1) == ['acetaminophen']
+
+    # A symptom the table cannot cover keeps Layer 2's unknown picks, until learned
+    assert table.select(['cough', 'rash'], medicines + ['hydrocortisone cream'], 2) == ['guaifenesin', 'throat lozenges']
+    table.learn(['rash'], ['hydrocortisone cream'])
+    assert table.select(['cough', 'rash'], medicines + ['hydrocortisone cream'], 2) == ['guaifenesin', 'hydrocortisone cream']
+
+
+def test_pipeline_searches_only_the_cover():
+    """With MEDICINE_COVER_ENABLED one broad medicine is searched instead of five, with and without overlap."""
+    replies = {
+        'layer1': '{"symptoms": ["headache", "fever"], "severity": "mild", "duration": null, "context": "none"}',
+        'layer2': '{"medicines": ["acetaminophen", "ibuprofen", "aspirin", "naproxen", "throat lozenges"]}',
+    }
+    client = fake_openai_client(lambda layer, _prompt: replies.get(layer))
+
+    for overlap in (False, True):
+        searched = []
+        pipeline = offline_pipeline(client, fake_fetch(searched), llm_streaming=False, pipeline_overlap=overlap,
+                                    medicine_cover_enabled=True)
+        result = pipeline.process_conversation("headache and a fever", 5)
+        assert result["recommended_medicines"] == ["acetaminophen"]
+        assert searched == ["acetaminophen"], searched
+
+
+if __name__ == "__main__":
+    print("🧪 Testing medicine set cover")
+    print("=" * 50)
+    for test in [test_fewest_medicines_cover_every_symptom, test_pipeline_searches_only_the_cover]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All medicine set cover tests passed!")
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Test script for medicine name canonicalization.
+These tests run offline with a fake OpenAI client and search; no API keys are needed.
+"""
+
+import dataclasses
+import json
+import os
+import tempfile
+
+from medicine_names import MEDICINE_SYNONYMS, MedicineCanonicalizer, get_canonicalizer
+from offline_fakes import fake_fetch, fake_openai_client, offline_pipeline
+from settings import Settings
+
+
+def test_brands_strengths_and_spellings_share_a_key():
+    """Brands, salts, strengths and misspellings map to one ingredient key; other dosage forms stay distinct."""
+    canonicalizer = MedicineCanonicalizer(MEDICINE_SYNONYMS)
+    names = ["Tylenol", "acetaminophen", "Acetaminophen 500mg tablets", "paracetamol", "Tylenol Extra Strength"]
+    assert canonicalizer.canonicalize_all(names) == ["acetaminophen"]
+    assert canonicalizer.canonical("Advil Liqui-Gels 200 mg") == "ibuprofen"
+    assert canonicalizer.canonical("Tylenol PM") == "acetaminophen and diphenhydramine"
+    assert canonicalizer.canonical("Children's Motrin Liquid") == "children's ibuprofen liquid"
+    assert canonicalizer.canonical("Hydrocortisone 1% Cream") == "hydrocortisone cream"
+    assert canonicalizer.canonical("throat lozenges") == "throat lozenges"
+
+    # MEDICINE_SYNONYMS_PATH extends the built-in table
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synonyms.json")
+        with open(path, "w") as f:
+            json.dump({"ginger": ["gravol natural"]}, f)
+        settings = dataclasses.replace(Settings.from_env(), medicine_synonyms_path=path)
+        assert get_canonicalizer(settings).canonical("Gravol Natural chews") == "ginger"
+
+
+def test_pipeline_searches_each_canonical_medicine_once():
+    """Layer 2 variants of one medicine are collapsed before any search, with and without overlap."""
+    text = '{"medicines": ["Tylenol", "acetaminophen 500mg tablets", "paracetamol", "Advil"]}'
+    client = fake_openai_client(lambda layer, _prompt: text if layer == 'layer2' else None)
+
+    for overlap in (False, True):
+        searched = []
+        pipeline = offline_pipeline(client, fake_fetch(searched), llm_streaming=False, pipeline_overlap=overlap)
+        result = pipeline.process_conversation("my head hurts", 5)
+        assert result["recommended_medicines"] == ["acetaminophen", "ibuprofen"]
+        assert sorted(searched) == ["acetaminophen", "ibuprofen"], searched
+
+
+if __name__ == "__main__":
+    print("🧪 Testing medicine name canonicalization")
+    print("=" * 50)
+    for test in [test_brands_strengths_and_spellings_share_a_key, test_pipeline_searches_each_canonical_medicine_once]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All medicine name tests passed!")
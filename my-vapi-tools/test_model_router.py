@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script for per-layer model routing.
+These tests run offline and do not require API keys.
+"""
+
+from model_router import ModelRouter, parse_models, parse_tiers
+
+
+def _router():
+    return ModelRouter(
+        layer_models={'formatting': parse_models("big, small"), 'recommendation': parse_models("big,small")},
+        layer_min_tiers={'formatting': 1, 'recommendation': 3},
+        model_tiers=parse_tiers("big:3,small:1"),
+        failure_threshold=2,
+        cooldown_seconds=30,
+    )
+
+
+def test_fastest_model_meeting_the_tier_is_chosen():
+    """Formatting may use the small model when it is faster; recommendation needs tier 3."""
+    router = _router()
+    router.record('formatting', 'big', 900, True, now=100)
+    router.record('formatting', 'small', 200, True, now=100)
+    router.record('recommendation', 'big', 900, True, now=100)
+    router.record('recommendation', 'small', 200, True, now=100)
+    assert router.candidates('formatting', now=101)[0] == 'small'
+    assert router.candidates('recommendation', now=101) == ['big', 'small']
+
+
+def test_failing_model_fails_over_and_cools_down():
+    """Calls fail over to the next model, and a repeatedly failing model leaves rotation until its cooldown ends."""
+    router = _router()
+    router.record('formatting', 'small', 100, True)
+    router.record('formatting', 'big', 500, True)
+
+    def call(model):
+        if model == 'small':
+            raise RuntimeError("overloaded")
+        return model
+
+    assert router.call('formatting', call) == 'big'
+    assert router.call('formatting', call) == 'big'
+    assert router.candidates('formatting')[0] == 'big'
+    assert router.snapshot()['formatting/small']['healthy'] is False
+
+
+if __name__ == "__main__":
+    print("🧪 Testing model routing")
+    print("=" * 50)
+    for test in [test_fastest_model_meeting_the_tier_is_chosen, test_failing_model_fails_over_and_cools_down]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All model routing tests passed!")
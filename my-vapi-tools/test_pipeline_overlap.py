@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for overlapped Layer 2 / Layer 3 execution.
+These tests run offline with a fake OpenAI client and search; no API keys are needed.
+"""
+
+import time
+
+from offline_fakes import fake_fetch, fake_openai_client, offline_pipeline
+from symptom_search_pipeline import SymptomSearchPipeline
+
+
+def _pipeline(overlap: bool, searched: list) -> SymptomSearchPipeline:
+    return offline_pipeline(fetch=fake_fetch(searched, delay=0.2), pipeline_overlap=overlap)
+
+
+def test_overlap_searches_while_layer2_streams():
+    """Searches should start before Layer 2 finishes and the trace should show the saving."""
+    searched = []
+    result = _pipeline(True, searched).process_conversation("my head hurts", 5)
+    assert result["status"] == "success"
+    assert result["recommended_medicines"] == ["ibuprofen", "acetaminophen", "aspirin"]
+    assert [r["medicine_name"] for r in result["search_results"]["results"]].count("ibuprofen") == 1
+    trace = result["trace"]
+    assert trace["layer3_start_ms"] < trace["layer2_end_ms"]
+    assert trace["overlap_saved_ms"] > 0
+
+
+def test_sequential_trace_without_overlap():
+    """Without the flag the layers run one after another and nothing is saved."""
+    searched = []
+    result = _pipeline(False, searched).process_conversation("my head hurts", 5)
+    assert result["status"] == "success"
+    assert searched == ["ibuprofen", "acetaminophen", "aspirin"]
+    trace = result["trace"]
+    assert trace["layer3_start_ms"] >= trace["layer2_end_ms"]
+    assert trace["overlap_saved_ms"] == 0
+
+
+def test_searches_nobody_reads_are_cancelled():
+    """Queued searches for streamed names the final list dropped do not run after the deadline."""
+    searched = []
+    # Layer 2 streams two names, then fails validation: the final list is the fallback
+    layer2 = '{"medicines": ["slowmed", "dropped"], "medicines": "none"}'
+    client = fake_openai_client(reply=lambda layer, prompt: layer2 if layer == 'layer2' else None)
+    pipeline = offline_pipeline(client, fake_fetch(searched, delay=0.05, delays={"slowmed": 1}), pipeline_overlap=True,
+                                pipeline_deadline_seconds=1.5, batch_max_workers=1)
+    result = pipeline.process_conversation("my head hurts", 5)
+    assert "dropped" not in result["recommended_medicines"]
+    time.sleep(1.2)
+    assert searched == ["slowmed"]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing overlapped pipeline execution")
+    print("=" * 50)
+    for test in [test_overlap_searches_while_layer2_streams, test_sequential_trace_without_overlap,
+                 test_searches_nobody_reads_are_cancelled]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All pipeline overlap tests passed!")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the local SQLite product catalog.
+These tests run offline and do not require API keys.
+"""
+
+import os
+import sqlite3
+import tempfile
+import time
+
+from medicine_names import MEDICINE_SYNONYMS, MedicineCanonicalizer
+from product_catalog import FreshnessPolicy, ProductCatalog
+
+
+def _product(asin, title, reviews=100):
+    return {"title": title, "link": f"https://www.amazon.com/dp/{asin}", "price": "$5.99", "rating": 4.5,
+            "reviews": reviews}
+
+
+def _catalog(directory, **options):
+    return ProductCatalog(os.path.join(directory, "catalog.db"), FreshnessPolicy(3600, 24 * 3600),
+                          canonical=MedicineCanonicalizer(MEDICINE_SYNONYMS).canonical, **options)
+
+
+def test_lookup_freshness_and_store_replaces_entry():
+    """Entries age from fresh to stale to expired; storing a query again replaces its product list."""
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = _catalog(directory)
+        now = time.time()
+        catalog.store("Ibuprofen", [_product("B000000001", "Advil Ibuprofen Tablets"),
+                                    _product("B000000002", "Motrin IB Caplets")], fetched_at=now - 60)
+        hit = catalog.lookup("  ibuprofen ")
+        assert (hit.freshness, hit.source) == (FreshnessPolicy.FRESH, 'query')
+        assert [r["title"] for r in hit.results] == ["Advil Ibuprofen Tablets", "Motrin IB Caplets"]
+
+        catalog.store("ibuprofen", [_product("B000000002", "Motrin IB Caplets 200ct", reviews=900)],
+                      fetched_at=now - 2 * 3600)
+        hit = catalog.lookup("ibuprofen")
+        assert hit.freshness == FreshnessPolicy.STALE
+        assert [(r["title"], r["reviews"]) for r in hit.results] == [("Motrin IB Caplets 200ct", 900)]
+
+        catalog.store("ibuprofen", [_product("B000000002", "Motrin IB")], fetched_at=now - 2 * 24 * 3600)
+        assert catalog.lookup("ibuprofen").freshness == FreshnessPolicy.EXPIRED
+        assert catalog.lookup("naproxen") is None
+
+
+def test_fallback_only_borrows_the_same_medicine():
+    """An unseen name reuses its canonical medicine's entry as stale, never another medicine's products."""
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = _catalog(directory)
+        catalog.store("ibuprofen", [_product("B000000001", "Ibuprofen and Aspirin Comparison Pack")])
+
+        hit = catalog.lookup("Advil 200mg")
+        assert (hit.freshness, hit.source) == (FreshnessPolicy.STALE, 'canonical')
+        assert [r["title"] for r in hit.results] == ["Ibuprofen and Aspirin Comparison Pack"]
+        # The title mentions aspirin, but the products were stored for ibuprofen
+        assert catalog.lookup("aspirin") is None
+
+        plain = ProductCatalog(os.path.join(directory, "plain.db"), FreshnessPolicy(3600, 24 * 3600))
+        plain.store("ibuprofen", [_product("B000000001", "Advil Ibuprofen")])
+        assert plain.lookup("advil") is None
+
+
+def test_retention_and_size_bound_prune_entries_and_orphans():
+    """Old entries and those beyond max_queries are deleted, with products nothing refers to."""
+    with tempfile.TemporaryDirectory() as directory:
+        catalog = _catalog(directory, retention_seconds=24 * 3600, max_queries=2)
+        now = time.time()
+        catalog.store("aspirin", [_product("B000000003", "Bayer Aspirin")], fetched_at=now - 2 * 24 * 3600)
+        assert catalog.stats() == {"products": 0, "queries": 0}
+
+        for offset, (query, asin) in enumerate([("ibuprofen", "B000000001"), ("naproxen", "B000000002"),
+                                                ("loratadine", "B000000004")]):
+            catalog.store(query, [_product(asin, f"{query} tablets")], fetched_at=now + offset)
+        assert catalog.stats() == {"products": 2, "queries": 2}
+        assert catalog.lookup("ibuprofen") is None
+
+
+def test_catalog_created_before_canonical_keys_is_migrated():
+    """An existing database without the canonical_key column keeps working; its unused full-text index is dropped."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "catalog.db")
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE queries (query_key TEXT PRIMARY KEY, query TEXT NOT NULL, "
+                           "fetched_at REAL NOT NULL, result_count INTEGER NOT NULL)")
+        connection.execute("CREATE VIRTUAL TABLE products_fts USING fts5(title, brand)")
+        connection.commit()
+        connection.close()
+        catalog = ProductCatalog(path, FreshnessPolicy(3600, 24 * 3600),
+                                 canonical=MedicineCanonicalizer(MEDICINE_SYNONYMS).canonical)
+        catalog.store("acetaminophen", [_product("B000000005", "Tylenol Extra Strength")])
+        assert catalog.lookup("Tylenol").source == 'canonical'
+        tables = {row[0] for row in sqlite3.connect(path).execute("SELECT name FROM sqlite_master")}
+        assert not any(name.startswith("products_fts") for name in tables)
+
+
+if __name__ == "__main__":
+    print("🧪 Testing product catalog")
+    print("=" * 50)
+    for test in [test_lookup_freshness_and_store_replaces_entry, test_fallback_only_borrows_the_same_medicine,
+                 test_retention_and_size_bound_prune_entries_and_orphans,
+                 test_catalog_created_before_canonical_keys_is_migrated]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All product catalog tests passed!")
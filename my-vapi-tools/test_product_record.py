@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Test script for compact product records.
+These tests run offline and do not require API keys.
+"""
+
+from product_record import ProductRecord
+
+RAW = {
+    "title": "Advil Ibuprofen 200mg Tablets",
+    "brand": "Advil",
+    "price": "$12.99",
+    "rating": 4.8,
+    "reviews": "12,345",
+    "link": "https://www.amazon.com/Advil/dp/B000000002?th=1",
+    "thumbnail": "https://m.media-amazon.com/images/advil.jpg",
+    "is_prime": True,
+}
+
+
+def test_record_round_trips_to_response_dict():
+    """to_dict() should keep the keys and display values the API always returned."""
+    record = ProductRecord.from_search_result(RAW, "ibuprofen")
+    assert record.key == "B000000002"
+    assert record.price_cents == 1299
+    assert record.reviews == 12345
+    assert record.to_dict() == dict(RAW, reviews=12345, medicine_name="ibuprofen")
+    assert "description" in record.to_dict(include_description=True)
+    assert "medicine_name" not in ProductRecord.from_search_result(RAW).to_dict()
+
+
+def test_missing_price_and_shared_brand():
+    """Missing prices fall back to the old placeholder, other prices display as given; brands are interned."""
+    record = ProductRecord.from_search_result(dict(RAW, price=None))
+    assert record.price_cents is None
+    assert record.price == "Price not available"
+    # The display string is kept as given; cents are only for ranking
+    euro = ProductRecord.from_search_result(dict(RAW, price="12,99 €"))
+    assert euro.price == "12,99 €" and euro.to_prompt_dict()["price"] == "12,99 €"
+    other = ProductRecord.from_search_result(dict(RAW, brand="".join(["Ad", "vil"])))
+    assert other.brand is ProductRecord.from_search_result(RAW).brand
+
+
+if __name__ == "__main__":
+    print("🧪 Testing product records")
+    print("=" * 50)
+    for test in [test_record_round_trips_to_response_dict, test_missing_price_and_shared_brand]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All product record tests passed!")
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-symptom search query planning.
+These tests run offline and do not require API keys.
+"""
+
+import dataclasses
+
+from query_planner import plan_queries
+from settings import Settings
+from symptom_search_tool import SYMPTOM_QUERY_MAPPINGS, SymptomSearchTool
+
+
+def test_plan_covers_all_symptoms_with_fewest_searches():
+    """Compatible symptoms share a merged query; cached queries are preferred because they cost no call."""
+    plan = plan_queries("I have a headache and fever", SYMPTOM_QUERY_MAPPINGS)
+    assert plan.queries == ["pain reliever fever reducer"]
+    assert plan.covers["pain reliever fever reducer"] == ["headache", "fever"]
+
+    plan = plan_queries("cough, headache and a rash", SYMPTOM_QUERY_MAPPINGS)
+    assert sorted(plan.queries) == ["cough medicine", "headache relief medicine", "rash treatment"]
+    assert plan.uncovered == []
+
+    cached = {"headache relief medicine", "fever reducer medicine"}
+    plan = plan_queries("headache and fever", SYMPTOM_QUERY_MAPPINGS, cached.__contains__)
+    assert sorted(plan.queries) == sorted(cached) and sorted(plan.cached) == sorted(cached)
+
+    # The cap trades coverage for calls; unknown symptoms have no plan
+    assert len(plan_queries("cough, headache, rash and insomnia", SYMPTOM_QUERY_MAPPINGS, max_queries=2).uncovered) == 2
+    assert plan_queries("my elbow feels odd", SYMPTOM_QUERY_MAPPINGS) is None
+
+
+def test_tool_searches_each_planned_query_once():
+    """The tool runs the plan and interleaves the results of its queries."""
+    settings = dataclasses.replace(Settings.from_env(), openai_api_key="", searchapi_api_key="test", catalog_enabled=False)
+    tool = SymptomSearchTool(settings)
+    searched = []
+
+    def fetch(query):
+        searched.append(query)
+        return [{"title": f"{query} {n}", "asin": f"{query}-{n}", "rating": 4.5, "reviews": 100, "price": "$5.99"}
+                for n in range(3)]
+    tool._fetch_organic_results = fetch
+
+    result = tool.search_products_by_symptoms("headache and fever", max_results=3)
+    assert result["status"] == "success" and searched == ["pain reliever fever reducer"]
+
+    searched.clear()
+    result = tool.search_products_by_symptoms("cough and a rash", max_results=4)
+    assert sorted(searched) == ["cough medicine", "rash treatment"]
+    titles = [r["title"] for r in result["results"]]
+    assert len(titles) == 4 and sum(title.startswith("cough") for title in titles) == 2
+
+
+if __name__ == "__main__":
+    print("🧪 Testing search query planning")
+    print("=" * 50)
+    for test in [test_plan_covers_all_symptoms_with_fewest_searches, test_tool_searches_each_planned_query_once]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All query planning tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-signal ranking and cross-medicine dedupe.
+These tests run offline and do not require API keys.
+"""
+
+from product_record import ProductRecord
+from ranking import parse_price, rank_results, relevances
+
+
+def _product(asin, title, rating=4.5, reviews=1000, price="$9.99", is_prime=True, medicine="ibuprofen"):
+    return ProductRecord.from_search_result({
+        "title": title,
+        "brand": "Brand",
+        "price": price,
+        "rating": rating,
+        "reviews": reviews,
+        "link": f"https://www.amazon.com/dp/{asin}",
+        "is_prime": is_prime,
+    }, medicine)
+
+
+def test_parse_price():
+    """Prices in the shapes SearchAPI returns should parse to dollars."""
+    assert parse_price("$12.99") == 12.99
+    assert parse_price("$1,299.00") == 1299.0
+    assert parse_price({"value": 5.5}) == 5.5
+    assert parse_price("Price not available") is None
+
+
+def test_same_product_under_two_medicines_is_deduped():
+    """An ASIN found under two medicines should appear once."""
+    results = [
+        _product("B000000001", "Tylenol Acetaminophen 500mg", medicine="acetaminophen"),
+        _product("B000000001", "Tylenol Acetaminophen 500mg", medicine="fever reducer"),
+        _product("B000000002", "Advil Ibuprofen 200mg", medicine="ibuprofen"),
+    ]
+    ranked = rank_results(results, [r.medicine_name for r in results])
+    assert [r.key for r in ranked].count("B000000001") == 1
+    assert len(ranked) == 2
+
+
+def test_better_signals_rank_first_and_top_k_limits():
+    """Well-rated, widely reviewed, relevant products should rank above weak ones."""
+    results = [
+        _product("B000000001", "Phone case", rating=3.0, reviews=5, price="$30.00", is_prime=False),
+        _product("B000000002", "Advil Ibuprofen Tablets", rating=4.8, reviews=50000),
+        _product("B000000003", "Generic Ibuprofen", rating=4.6, reviews=2000, price="$4.99"),
+    ]
+    ranked = rank_results(results, "ibuprofen", top_k=2)
+    assert len(ranked) == 2
+    assert ranked[0].title == "Advil Ibuprofen Tablets"
+    assert all(r.title != "Phone case" for r in ranked)
+    # Titles are tokenized together; "Liqui-Gels" and "200mg" split like the per-title regex did
+    assert list(relevances(["Advil Liqui-Gels 200mg", "Phone case", "Ibuprofen–Advil\n"],
+                           ["advil liqui-gels", "ibuprofen", "advil 200"])) == [1.0, 0.0, 0.5]
+
+
+if __name__ == "__main__":
+    print("🧪 Testing result ranking")
+    print("=" * 50)
+    for test in [test_parse_price, test_same_product_under_two_medicines_is_deduped,
+                 test_better_signals_rank_first_and_top_k_limits]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All ranking tests passed!")
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for client-side rate limiting.
+These tests run offline and do not require API keys.
+"""
+
+import os
+import tempfile
+from types import SimpleNamespace
+
+from deadline import DeadlineExceeded
+from model_router import ModelRouter
+from rate_limit import RateLimited, RateLimiter
+
+
+def test_bucket_reports_wait_and_sqlite_is_shared():
+    """Callers learn the wait instead of blocking, and SQLite buckets are shared between limiters (workers)."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "limits.db")
+        worker_a = RateLimiter({('searchapi', 'requests'): 6}, max_wait_seconds=0.0, path=path)
+        worker_b = RateLimiter({('searchapi', 'requests'): 6}, max_wait_seconds=0.0, path=path)
+        # 6/minute with a 10 second burst: one request available
+        assert worker_a.acquire('searchapi', 'key') == 0.0
+        assert 9 < worker_b.wait_time('searchapi', 'key') <= 10
+        try:
+            worker_b.acquire('searchapi', 'key')
+            assert False, "expected RateLimited"
+        except RateLimited as e:
+            assert e.upstream == 'searchapi' and e.wait_seconds > 9
+
+    unlimited = RateLimiter({}, max_wait_seconds=0.0)
+    assert unlimited.acquire('openai', 'gpt-4o', tokens=10 ** 6) == 0.0
+
+
+def test_router_shares_the_key_bucket_and_settles_actual_usage():
+    """Every model draws from the key's bucket, and reservations are corrected to the usage a call reports."""
+    limiter = RateLimiter({('openai', 'tokens'): 6000}, max_wait_seconds=0.0)
+    router = ModelRouter({'formatting': ['small', 'big']}, {'formatting': 1}, {}, rate_limiter=limiter,
+                         rate_limit_key='key')
+
+    def reply(model):
+        return SimpleNamespace(model=model, usage=SimpleNamespace(total_tokens=200))
+
+    # 1000 tokens reserved, 200 used: 800 come back
+    assert router.call('formatting', reply, tokens=1000).model == 'small'
+    assert 790 < limiter.snapshot()['openai/key/tokens'] <= 801
+    # Not enough left for another 1000; the other model would draw from the same bucket
+    try:
+        router.call('formatting', lambda model: model, tokens=1000)
+        assert False, "expected RateLimited"
+    except RateLimited as e:
+        assert e.upstream == 'openai'
+    snapshot = router.snapshot()
+    assert snapshot['formatting/small']['healthy'] and snapshot['formatting/big']['calls'] == 0
+
+    # Usage above the reservation is charged too
+    limiter.settle('openai', 'key', 100, 400)
+    assert 490 < limiter.snapshot()['openai/key/tokens'] <= 501
+
+    # A failed call gives its whole reservation back
+    def fail(model):
+        raise DeadlineExceeded("out of time")
+    try:
+        router.call('formatting', fail, tokens=400)
+        assert False, "expected DeadlineExceeded"
+    except DeadlineExceeded:
+        pass
+    assert 490 < limiter.snapshot()['openai/key/tokens'] <= 501
+
+
+def test_oversized_request_is_charged_in_full():
+    """A request larger than the burst capacity waits for all of it instead of being capped."""
+    limiter = RateLimiter({('openai', 'tokens'): 600}, max_wait_seconds=5.0)
+    # Capacity is 100 tokens; 400 more take 40 seconds at 10 tokens a second
+    assert 39 < limiter.wait_time('openai', 'key', requests=0, tokens=500) <= 40
+    try:
+        limiter.acquire('openai', 'key', requests=0, tokens=500)
+        assert False, "expected RateLimited"
+    except RateLimited as e:
+        assert e.wait_seconds > 39
+    assert limiter.snapshot()['openai/key/tokens'] == 100
+
+
+if __name__ == "__main__":
+    print("🧪 Testing rate limiting")
+    print("=" * 50)
+    for test in [test_bucket_reports_wait_and_sqlite_is_shared, test_router_shares_the_key_bucket_and_settles_actual_usage,
+                 test_oversized_request_is_charged_in_full]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All rate limiting tests passed!")
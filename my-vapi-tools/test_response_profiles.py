@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script for /webhook response profiles and the encoded response cache.
+These tests run offline and do not require API keys.
+"""
+
+import json
+
+from response_profiles import ResponseCache, dumps, shape_response
+
+RESULTS = {
+    "status": "success",
+    "conversation": "I have a headache",
+    "pipeline_steps": ["symptom_extraction", "medicine_recommendation", "amazon_search", "response_formatting"],
+    "symptoms": {"symptoms": ["headache"]},
+    "recommended_medicines": ["ibuprofen"],
+    "search_results": {"status": "success", "total_results": 1, "results": [{
+        "title": "Advil", "brand": "Advil", "price": "$9.99", "rating": 4.8, "reviews": 100,
+        "link": "https://www.amazon.com/dp/B000000002", "thumbnail": "https://img", "is_prime": True,
+        "medicine_name": "ibuprofen"}]},
+    "natural_response": "1. Advil - $9.99",
+    "voice_response": "1. Advil - $9.99",
+}
+
+
+def test_profiles_trim_the_payload():
+    """voice returns only the voice response; standard drops thumbnails and the echoed conversation."""
+    assert shape_response(RESULTS, 'voice') == {"status": "success", "voice_response": "1. Advil - $9.99"}
+    standard = shape_response(RESULTS, 'standard')
+    assert "conversation" not in standard and "thumbnail" not in standard["results"][0]
+    assert standard["results"][0]["link"].endswith("B000000002")
+    assert shape_response(RESULTS, 'debug') is RESULTS
+    assert json.loads(dumps(shape_response(RESULTS, 'voice')))["voice_response"] == "1. Advil - $9.99"
+
+
+def test_response_cache_ttl_and_lru():
+    """Bodies expire after the TTL and the least recently used entry is evicted first."""
+    cache = ResponseCache(max_entries=2, ttl_seconds=10)
+    cache.put("a", b"1", now=100)
+    cache.put("b", b"2", now=100)
+    assert cache.get("a", now=105) == b"1"
+    cache.put("c", b"3", now=105)
+    assert cache.get("b", now=105) is None
+    assert cache.get("a", now=111) is None
+    assert cache.get("c", now=111) == b"3"
+
+
+if __name__ == "__main__":
+    print("🧪 Testing response profiles")
+    print("=" * 50)
+    for test in [test_profiles_trim_the_payload, test_response_cache_ttl_and_lru]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All response profile tests passed!")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for declarative search result filter rules.
+These tests run offline and do not require API keys.
+"""
+
+import dataclasses
+import json
+import os
+import tempfile
+
+from offline_fakes import offline_pipeline, offline_settings
+from product_record import ProductRecord
+from result_filters import ResultFilter, get_result_filter
+from settings import Settings
+from symptom_search_tool import SymptomSearchTool
+
+
+def _record(title, price="$5.99", rating=4.5, reviews=100):
+    return ProductRecord.from_search_result(
+        {"title": title, "price": price, "rating": rating, "reviews": reviews, "link": f"https://a/{title}"})
+
+
+def test_rules_compile_into_one_predicate_chain():
+    """Keywords match whole words (plurals too), and price, rating and review bounds apply."""
+    defaults = ResultFilter()
+    assert not defaults.accepts(_record("Headache Relief Audio Book"))
+    assert not defaults.accepts(_record("Pain Relief Books Bundle"))
+    assert defaults.accepts(_record("Acid Reducer Tablets"))  # "cd" is not a word here
+    assert not defaults.accepts(_record("Ibuprofen Tablets", rating=0))
+
+    rules = ResultFilter({"require_terms": ["tablet", "caplet"], "max_price": 10, "min_reviews": 50})
+    assert rules.accepts(_record("Ibuprofen Tablets 200mg"))
+    assert not rules.accepts(_record("Ibuprofen Liquid"))
+    assert not rules.accepts(_record("Ibuprofen Tablets Family Pack", price="$24.99"))
+    assert rules.accepts(_record("Ibuprofen Caplets", price=None))
+    assert not rules.accepts(_record("Ibuprofen Caplets", reviews=10))
+    assert [r.title for r in rules.apply([_record("A Tablets"), _record("B Liquid"), _record("C Caplets")])] == \
+        ["A Tablets", "C Caplets"]
+
+
+def test_tool_and_pipeline_share_configured_rules():
+    """RESULT_FILTER_RULES (inline or a file) filters both the tool and the pipeline; bad rules fall back to defaults."""
+    results = [
+        {"title": "Ibuprofen Tablets", "price": "$6.99", "rating": 4.6, "reviews": 900, "link": "https://a/1"},
+        {"title": "Ibuprofen Tablets Bulk", "price": "$39.99", "rating": 4.8, "reviews": 500, "link": "https://a/2"},
+        {"title": "Pain Relief DVD", "price": "$9.99", "rating": 4.1, "reviews": 20, "link": "https://a/3"},
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "rules.json")
+        with open(path, "w") as f:
+            json.dump({"max_price": 20}, f)
+        for rules in ('{"max_price": 20}', path):
+            tool = SymptomSearchTool(offline_settings(result_filter_rules=rules))
+            assert [r.title for r in tool._process_results({"organic_results": results}, "pain")] == ["Ibuprofen Tablets"]
+            pipeline = offline_pipeline(fetch=lambda query: results, result_filter_rules=rules)
+            assert [r.title for r in pipeline.search_single_medicine("ibuprofen")] == ["Ibuprofen Tablets"]
+
+    bad = dataclasses.replace(Settings.from_env(), result_filter_rules='{"max_prize": 20}')
+    assert get_result_filter(bad).rules["max_price"] is None
+
+
+def test_medicine_searches_keep_only_titles_naming_the_medicine():
+    """A medicine search keeps its own and brand-name products and drops unrelated ones, unless disabled."""
+    results = [
+        {"title": "Advil Liqui-Gels Pain Reliever", "rating": 4.7, "reviews": 900, "link": "https://a/1"},
+        {"title": "Basic Care Ibuprofen Tablets 200mg", "rating": 4.6, "reviews": 400, "link": "https://a/2"},
+        {"title": "Vitamin C Gummies", "rating": 4.8, "reviews": 5000, "link": "https://a/3"},
+    ]
+    pipeline = offline_pipeline(fetch=lambda query: results)
+    assert [r.title for r in pipeline.search_single_medicine("ibuprofen")] == \
+        ["Advil Liqui-Gels Pain Reliever", "Basic Care Ibuprofen Tablets 200mg"]
+
+    assert ResultFilter().apply([_record("Vitamin C Gummies")]) != []  # no query, no check
+    unchecked = offline_pipeline(fetch=lambda query: results, result_filter_rules='{"match_query": false}')
+    assert len(unchecked.search_single_medicine("ibuprofen")) == 3
+
+
+if __name__ == "__main__":
+    print("🧪 Testing result filter rules")
+    print("=" * 50)
+    for test in [test_rules_compile_into_one_predicate_chain, test_tool_and_pipeline_share_configured_rules,
+                 test_medicine_searches_keep_only_titles_naming_the_medicine]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All result filter tests passed!")
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for the near-duplicate semantic cache.
+These tests run offline and do not require API keys.
+"""
+
+import json
+import os
+import tempfile
+
+from semantic_cache import SemanticCache
+from symptom_search_pipeline import SYMPTOM_KEYWORDS
+
+RESULT = {"status": "success", "conversation": "bad headache and fever", "voice_response": "1. Tylenol - $9.99"}
+
+
+def _cache(**kwargs):
+    options = dict(threshold=0.8, ttl_seconds=60, max_entries=10)
+    options.update(kwargs)
+    return SemanticCache(SYMPTOM_KEYWORDS, **options)
+
+
+def test_reworded_complaint_reuses_result_and_is_audited():
+    """Different wording of the same symptoms should reuse the cached result and be written to the audit file."""
+    with tempfile.TemporaryDirectory() as directory:
+        audit_path = os.path.join(directory, "audit.jsonl")
+        cache = _cache(audit_path=audit_path)
+        cache.store("bad headache and fever", 5, RESULT, now=100)
+
+        reused = cache.lookup("I've got a bad headache and a fever", 5, now=110)
+        assert reused["voice_response"] == RESULT["voice_response"]
+        assert reused["conversation"] == "I've got a bad headache and a fever"
+        assert reused["cache"]["similarity"] >= 0.8
+        # Same symptoms, but the rest of the complaint differs
+        assert cache.lookup("my head is killing me and I'm burning up", 5, now=110) is None
+
+        with open(audit_path) as audit_file:
+            record = json.loads(audit_file.readline())
+        assert record["matched_conversation"] == "bad headache and fever"
+
+
+def test_different_symptoms_ttl_and_max_results_miss():
+    """A different symptom set or severity, an expired entry or another max_results must not reuse the result."""
+    cache = _cache()
+    cache.store("I have a headache", 5, RESULT, now=100)
+    assert cache.lookup("I have a headache and a fever", 5, now=110) is None
+    assert cache.lookup("I have a headache", 3, now=110) is None
+    assert cache.lookup("I have a severe headache", 5, now=110) is None
+    assert cache.lookup("I have a headache", 5, now=161) is None
+    assert cache.lookup("I have a headache", 5, now=110) is not None
+
+
+def test_risky_conversations_never_share_answers():
+    """Pregnancy, children, injuries, long durations and red flags must not reuse (or seed) a cached answer."""
+    cache = _cache()
+    cache.store("I have a mild headache", 5, RESULT, now=100)
+    for conversation in ["I'm pregnant and I have a mild headache",
+                         "my child has a mild headache",
+                         "I hit my head and got knocked out, now I have a mild headache",
+                         "I have a severe headache for three weeks with blurry vision",
+                         "I have a mild headache that started after a fall"]:
+        assert cache.lookup(conversation, 5, now=110) is None, conversation
+
+    cache = _cache()
+    cache.store("I'm pregnant and I have a mild headache", 5, RESULT, now=100)
+    assert cache.lookup("I have a mild headache", 5, now=110) is None
+    assert cache.lookup("I'm pregnant and I have a mild headache", 5, now=110) is None
+
+
+if __name__ == "__main__":
+    print("🧪 Testing semantic cache")
+    print("=" * 50)
+    for test in [test_reworded_complaint_reuses_result_and_is_audited, test_different_symptoms_ttl_and_max_results_miss,
+                 test_risky_conversations_never_share_answers]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All semantic cache tests passed!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for per-call session state in multi-turn conversations.
+These tests run offline with a fake OpenAI client and search; no API keys are needed.
+"""
+
+import json
+
+from offline_fakes import fake_openai_client, fake_product, offline_pipeline
+from product_record import ProductRecord
+from session_state import RECORD_BYTES, SESSION_BYTES, CallSession, SessionStore
+from symptom_search_pipeline import SymptomSearchPipeline
+
+SYMPTOMS = {"headache": ["ibuprofen", "acetaminophen"], "sore throat": ["throat lozenges", "acetaminophen"]}
+
+
+def _pipeline(calls: list) -> SymptomSearchPipeline:
+    def reply(layer, user_prompt):
+        if layer == 'layer1':
+            calls.append((layer, user_prompt))
+            found = [symptom for symptom in SYMPTOMS if symptom in user_prompt]
+            return json.dumps({"symptoms": found, "severity": "mild", "duration": None, "context": None})
+        if layer == 'layer2':
+            calls.append((layer, user_prompt))
+            return json.dumps({"medicines": [m for symptom in SYMPTOMS if symptom in user_prompt for m in SYMPTOMS[symptom]]})
+        calls.append((layer, ""))
+        return "1. Product - $1.00"
+
+    def fetch(query):
+        calls.append(("search", query))
+        return [fake_product(query, f"{query} pack")]
+    return offline_pipeline(fake_openai_client(reply), fetch, llm_streaming=False)
+
+
+def test_follow_up_turn_only_processes_new_text():
+    """A second invocation should extract from the new turn and search only new medicines."""
+    calls = []
+    pipeline = _pipeline(calls)
+    session = CallSession("call-1", max_results=5)
+    first_turn = "User: I have a headache."
+    first = pipeline.process_call_turn(first_turn, session)
+    assert first["status"] == "success"
+    assert first["recommended_medicines"] == ["ibuprofen", "acetaminophen"]
+
+    calls.clear()
+    second = pipeline.process_call_turn(first_turn + " User: now a sore throat too.", session)
+    assert second["symptoms"]["symptoms"] == ["headache", "sore throat"]
+    assert second["recommended_medicines"] == ["ibuprofen", "acetaminophen", "throat lozenges"]
+    assert calls[0] == ("layer1", " User: now a sore throat too.")
+    assert [query for kind, query in calls if kind == "search"] == ["throat lozenges"]
+    assert second["session"]["reused_medicines"] == 2
+
+    # Repeating the same conversation reuses everything
+    calls.clear()
+    pipeline.process_call_turn(first_turn + " User: now a sore throat too.", session)
+    assert calls == []
+
+
+def test_store_evicts_by_ttl_and_memory():
+    """Idle sessions expire, and the store stays within its memory budget."""
+    store = SessionStore(ttl_seconds=60, max_bytes=5000)
+    first = store.get("a", 5, now=1000)
+    assert store.get("a", 5, now=1030) is first
+    store.get("b", 5, now=1100)
+    assert len(store) == 1  # "a" idle for 70 seconds
+
+    big = store.get("c", 5, now=1100)
+    big.results["ibuprofen"] = [ProductRecord.from_search_result({"title": "x"})] * 10
+    store.trim()
+    assert len(store) == 1 and store.get("c", 5, now=1101) is big
+
+    # A session in the middle of a turn is not read; it keeps its last measured size
+    with big.lock:
+        big.results["aspirin"] = [ProductRecord.from_search_result({"title": "y"})] * 10
+        store.trim()
+    assert big.bytes == SESSION_BYTES + 10 * RECORD_BYTES
+
+
+if __name__ == "__main__":
+    print("🧪 Testing per-call session state")
+    print("=" * 50)
+    for test in [test_follow_up_turn_only_processes_new_text, test_store_evicts_by_ttl_and_memory]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All session state tests passed!")
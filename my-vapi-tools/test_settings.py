@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for resolved settings and explicit reloads.
+These tests run offline and do not require API keys.
+"""
+
+import os
+import signal
+import tempfile
+import threading
+import time
+
+import http_clients
+import settings as settings_module
+from settings import Settings, get_settings, on_reload, reload_settings
+
+
+def _with_env(values, action):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        return action()
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def test_from_env_parses_values_and_keeps_defaults_for_bad_ones():
+    """Environment values are typed; unparsable or empty values fall back to the defaults."""
+    loaded = _with_env({'SEARCHAPI_TIMEOUT': '12.5', 'BATCH_MAX_WORKERS': 'many', 'SESSION_ENABLED': 'no',
+                        'AMAZON_DOMAIN': ''},
+                       lambda: Settings.from_env(dotenv_path=os.devnull))
+    assert loaded.searchapi_timeout == 12.5
+    assert loaded.batch_max_workers == Settings.batch_max_workers
+    assert loaded.session_enabled is False
+    assert loaded.amazon_domain == Settings.amazon_domain
+    assert 'api_key' not in repr(loaded)
+
+
+def test_reload_swaps_settings_and_runs_callbacks():
+    """reload_settings() replaces get_settings() and passes the new object to callbacks."""
+    seen = []
+    on_reload(seen.append)
+    try:
+        reloaded = _with_env({'SEARCH_MAX_QUERIES': '7'}, reload_settings)
+    finally:
+        settings_module._reload_callbacks.remove(seen.append)
+    assert get_settings() is reloaded
+    assert reloaded.search_max_queries == 7
+    assert seen == [reloaded]
+
+
+def test_dotenv_reload_keeps_startup_precedence():
+    """Real variables win over `.env` on every load, and a variable removed from `.env` is dropped."""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, '.env')
+
+        def load(text):
+            with open(path, 'w') as f:
+                f.write(text)
+            return Settings.from_env(dotenv_path=path)
+
+        def scenario():
+            assert load("SEARCH_MAX_QUERIES=4\nSEARCHAPI_TIMEOUT=9\n").search_max_queries == 4
+            reloaded = load("SEARCH_MAX_QUERIES=5\nSEARCHAPI_TIMEOUT=11\n")
+            assert reloaded.search_max_queries == 5
+            assert reloaded.searchapi_timeout == 12.5
+            assert load("").search_max_queries == Settings.search_max_queries
+            assert 'SEARCH_MAX_QUERIES' not in os.environ
+        _with_env({'SEARCHAPI_TIMEOUT': '12.5'}, scenario)
+
+
+def test_reload_closes_dropped_clients():
+    """Clients built for replaced settings are closed after the grace period."""
+    old = Settings(openai_api_key="old")
+    session, client = http_clients.get_search_session(old), http_clients.get_openai_client(old)
+    delay = http_clients.CLOSE_DELAY_SECONDS
+    http_clients.CLOSE_DELAY_SECONDS = 0.0
+    try:
+        http_clients._drop_stale_clients(Settings(openai_api_key="new"))
+    finally:
+        http_clients.CLOSE_DELAY_SECONDS = delay
+    for _ in range(50):
+        if client.is_closed():
+            break
+        time.sleep(0.01)
+    assert client.is_closed()
+    assert http_clients.get_search_session(old) is not session
+
+
+def test_signal_reload_runs_outside_the_handler():
+    """A SIGHUP that arrives while the main thread holds the settings lock must not deadlock."""
+    if not hasattr(signal, 'SIGHUP'):
+        return
+    previous = signal.getsignal(signal.SIGHUP)
+    done = threading.Event()
+    threads = []
+
+    def callback(_settings):
+        threads.append(threading.current_thread().name)
+        done.set()
+
+    on_reload(callback)
+    try:
+        assert settings_module.install_reload_signal_handler()
+        with settings_module._settings_lock:
+            os.kill(os.getpid(), signal.SIGHUP)
+            time.sleep(0.05)
+            assert not done.is_set()
+        assert done.wait(5)
+    finally:
+        signal.signal(signal.SIGHUP, previous)
+        settings_module._reload_callbacks.remove(callback)
+    assert threads == ['settings-reloader']
+
+
+if __name__ == "__main__":
+    print("🧪 Testing settings")
+    print("=" * 50)
+    for test in [test_from_env_parses_values_and_keeps_defaults_for_bad_ones,
+                 test_reload_swaps_settings_and_runs_callbacks, test_dotenv_reload_keeps_startup_precedence,
+                 test_reload_closes_dropped_clients, test_signal_reload_runs_outside_the_handler]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All settings tests passed!")
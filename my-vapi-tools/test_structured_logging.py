@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for structured logging: redaction, payload sampling and the drop counter.
+These tests run offline and do not require API keys.
+"""
+
+import logging
+import os
+import queue
+import subprocess
+import sys
+
+import structured_logging
+from structured_logging import LogConfig, _DeferredQueueHandler, dropped_record_count, log_payload, sanitize
+
+
+class _ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def _capturing_logger(name):
+    logger = logging.getLogger(name)
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = _ListHandler()
+    logger.handlers = [handler]
+    return logger, handler
+
+
+def test_health_text_is_redacted_and_long_values_truncated():
+    """Health-text keys become length markers; other long strings are truncated."""
+    cleaned = sanitize({"conversation": "I have a headache", "symptoms": ["fever", "cough"],
+                        "query": "migraine relief", "error": "Timeout for 'I have a headache'",
+                        "path": "x" * 50, "nested": {"transcript": "secret"}}, max_chars=10, redact=True)
+    assert cleaned["conversation"] == "[redacted len=17]"
+    assert cleaned["symptoms"] == "[redacted items=2]"
+    assert cleaned["query"] == "[redacted len=15]" and cleaned["error"] == "[redacted len=31]"
+    assert cleaned["path"] == "x" * 10 + "...[+40 chars]"
+    assert cleaned["nested"] == {"transcript": "[redacted len=6]"}
+    assert sanitize({"conversation": "kept"}, max_chars=10, redact=False) == {"conversation": "kept"}
+
+
+def test_payloads_are_logged_in_full_only_when_sampled():
+    """Unsampled payloads log only their top-level keys."""
+    logger, handler = _capturing_logger('test_structured_logging.sampling')
+    saved = structured_logging._config
+    try:
+        structured_logging._config = LogConfig(payload_sample_rate=0.0)
+        log_payload(logger, "webhook_request", {"message": {}, "call": {}})
+        structured_logging._config = LogConfig(payload_sample_rate=1.0)
+        log_payload(logger, "webhook_request", {"message": {}})
+    finally:
+        structured_logging._config = saved
+
+    unsampled, sampled = (record.fields for record in handler.records)
+    assert unsampled == {"payload_keys": ["call", "message"], "payload_sampled": False}
+    assert sampled == {"payload": {"message": {}}, "payload_sampled": True}
+
+
+def test_full_queue_drops_and_counts_records():
+    """A full queue drops records and counts them; queued fields are a private copy."""
+    handler = _DeferredQueueHandler(queue.Queue(maxsize=1))
+    fields = {"product": {"name": "ibuprofen"}}
+    before = dropped_record_count()
+
+    for _ in range(3):
+        record = logging.LogRecord('test', logging.INFO, __file__, 1, 'event', None, None)
+        record.fields = fields
+        handler.emit(record)
+    fields["product"]["name"] = "changed after logging"
+
+    assert dropped_record_count() - before == 2
+    queued = handler.queue.get_nowait()
+    assert queued.fields == {"product": {"name": "ibuprofen"}}
+
+
+def test_importing_the_pipeline_leaves_host_logging_alone():
+    """Only entry points configure logging; a library import keeps the host's handlers."""
+    script = (
+        "import logging\n"
+        "handler = logging.StreamHandler()\n"
+        "root = logging.getLogger()\n"
+        "root.addHandler(handler)\n"
+        "root.setLevel(logging.WARNING)\n"
+        "import symptom_search_pipeline, symptom_search_tool\n"
+        "assert root.handlers == [handler], root.handlers\n"
+        "assert root.level == logging.WARNING\n"
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+
+
+if __name__ == "__main__":
+    print("🧪 Testing structured logging")
+    print("=" * 50)
+    for test in [test_health_text_is_redacted_and_long_values_truncated,
+                 test_payloads_are_logged_in_full_only_when_sampled, test_full_queue_drops_and_counts_records,
+                 test_importing_the_pipeline_leaves_host_logging_alone]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All structured logging tests passed!")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Test script for the local Layer 1 symptom classifier.
+These tests run offline and do not require API keys.
+"""
+
+import os
+import tempfile
+
+from offline_fakes import fake_fetch, fake_openai_client, offline_pipeline
+from symptom_classifier import SymptomClassifier, evaluate, extract_duration, train, training_example
+
+EXAMPLES = [
+    ("I have a terrible headache", ["headache"], "severe"),
+    ("my head hurts, awful headache", ["headache"], "severe"),
+    ("slight fever and chills", ["fever"], "mild"),
+    ("I have a mild fever", ["fever"], "mild"),
+    ("bad cough that will not stop", ["cough"], "moderate"),
+    ("coughing all night long", ["cough"], "moderate"),
+] * 10
+
+
+def test_training_example_skips_non_gpt_extractions():
+    """Only Layer 1 output that came from GPT should be used for training."""
+    record = {"conversation": "Headache", "symptoms": {"symptoms": ["Headache"], "severity": "Mild", "context": None}}
+    assert training_example(record) == ("Headache", ["headache"], "mild")
+    fallback = {"conversation": "x", "symptoms": {"symptoms": [], "context": "Extracted using fallback method"}}
+    assert training_example(fallback) is None
+    complete = offline_pipeline().process_conversation("I have a bad headache", 5)
+    assert training_example(complete) == ("I have a bad headache", ["headache"], "mild")
+    # A Layer 1 stream cut off by the deadline, with keyword symptoms or partial GPT output
+    cut_off = offline_pipeline(fake_openai_client(reply=lambda layer, prompt: (
+        '{"symptoms": [' + ' ' * 400 + '"headache"]}' if layer == 'layer1' else None)), fake_fetch(),
+        pipeline_deadline_seconds=1.5).process_conversation("I have a bad headache", 5)
+    assert cut_off["symptoms"]["source"] == "keywords" and cut_off["symptoms"]["context"] is None
+    assert training_example(cut_off) is None
+    partial = dict(record, degraded_layers=["extraction"])
+    assert training_example(partial) is None
+    assert training_example(dict(record, symptoms=dict(record["symptoms"], source="gpt_partial"))) is None
+    assert extract_duration("fever for the past 2 days") == "2 days"
+    assert extract_duration("coughing since yesterday") == "since yesterday"
+
+
+def test_trained_model_round_trips_and_agrees_with_labels():
+    """A model trained on consistent labels should reproduce them after save/load, and be unsure of unseen text."""
+    model = train(EXAMPLES, min_df=1)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "model.npz")
+        model.save(path)
+        loaded = SymptomClassifier.load(path)
+
+    predicted, confidence = loaded.predict("awful headache for 3 days")
+    assert predicted["symptoms"] == ["headache"]
+    assert predicted["duration"] == "3 days"
+    assert confidence > 0.5
+    assert loaded.predict("what is the weather like")[1] == 0.0
+    assert evaluate(loaded, EXAMPLES, 0.5)["exact_symptom_match"] == 1.0
+
+
+if __name__ == "__main__":
+    print("🧪 Testing symptom classifier")
+    print("=" * 50)
+    for test in [test_training_example_skips_non_gpt_extractions, test_trained_model_round_trips_and_agrees_with_labels]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All symptom classifier tests passed!")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Test script for tolerant and incremental JSON parsing of LLM output.
+These tests run offline and do not require API keys.
+"""
+
+from tolerant_json import IncrementalJSONParser, JSONRepairError, parse_llm_json, repair_json
+
+
+def test_repairs_common_llm_defects():
+    """Fences, prose, single quotes, Python literals, trailing commas and truncation should all parse."""
+    assert repair_json('```json\n{"symptoms": ["headache"]}\n```') == {"symptoms": ["headache"]}
+    assert repair_json("Sure! {'severity': 'mild', 'duration': None,} Hope this helps") == {
+        "severity": "mild", "duration": None}
+    # Truncated mid-string: the partial value is dropped, complete members are kept
+    assert repair_json('{"medicines": ["ibuprofen", "acetaminophen", "asp') == {"medicines": ["ibuprofen", "acetaminophen"]}
+    assert parse_llm_json('["ibuprofen"]') == (["ibuprofen"], False)
+    try:
+        repair_json("I cannot help with that")
+        assert False, "expected JSONRepairError"
+    except JSONRepairError:
+        pass
+
+
+def test_incremental_parser_emits_fields_as_they_complete():
+    """Each top-level field should be reported by the chunk that completes it."""
+    text = '{"symptoms": ["headache", "fever"], "severity": "moderate", "context": "long, text"}'
+    parser = IncrementalJSONParser()
+    emitted = []
+    for start in range(0, len(text), 4):
+        for key, _value in parser.feed(text[start:start + 4]):
+            emitted.append((key, start))
+    assert [key for key, _ in emitted] == ["symptoms", "severity", "context"]
+    assert emitted[0][1] < text.index('"context"')
+    assert parser.result()["context"] == "long, text"
+
+
+def test_incremental_parser_emits_array_elements():
+    """Elements of an array field should be reported before the array closes."""
+    text = '{"medicines": ["ibuprofen", "cough syrup, honey"], "note": "x"}'
+    seen = []
+    parser = IncrementalJSONParser(on_element=lambda field, value: seen.append((field, value, len(parser.buffer))))
+    for start in range(0, len(text), 4):
+        parser.feed(text[start:start + 4])
+    assert [(field, value) for field, value, _ in seen] == [("medicines", "ibuprofen"), ("medicines", "cough syrup, honey")]
+    assert seen[0][2] < text.index('honey')
+    assert parser.members[0] == ("medicines", ["ibuprofen", "cough syrup, honey"])
+
+
+if __name__ == "__main__":
+    print("🧪 Testing tolerant JSON parsing")
+    print("=" * 50)
+    for test in [test_repairs_common_llm_defects, test_incremental_parser_emits_fields_as_they_complete,
+                 test_incremental_parser_emits_array_elements]:
+        test()
+        print(f"✅ {test.__name__}")
+    print("🎉 All tolerant JSON tests passed!")
@@ -0,0 +1,294 @@
+"""
+Tolerant and incremental JSON parsing for LLM output.
+
+`repair_json` parses JSON the way models actually emit it: wrapped in
+markdown fences or prose, with single-quoted strings, Python literals,
+trailing commas, trailing text after the value, or cut off mid-way by the
+token limit. `IncrementalJSONParser` is fed a streamed completion chunk by
+chunk and reports each top-level object field (or array element) as soon
+as it is complete, so callers can act before the completion finishes. It
+can also report the elements of an array field one by one, before the
+array itself closes.
+"""
+
+import json
+import re
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+_fence_pattern = re.compile(r'```(?:json|JSON)?\s*(.*?)(?:```|$)', re.DOTALL)
+_literals = {'True': 'true', 'False': 'false', 'None': 'null'}
+_closers = {'{': '}', '[': ']'}
+_key_pattern = re.compile(r'^\s*["\']((?:[^"\'\\]|\\.)*)["\']\s*:\s*$')
+
+
+class JSONRepairError(ValueError):
+    """Raised when no JSON value can be recovered from the text."""
+
+
+def _strip_fences(text: str) -> str:
+    match = _fence_pattern.search(text)
+    return match.group(1) if match else text
+
+
+def _normalize(text: str) -> Tuple[str, List[str], List[Tuple[int, List[str]]], Optional[bool]]:
+    """
+    Rewrite the first JSON value in `text` into strict JSON as far as it goes.
+
+    Returns:
+        Tuple: (output, open brackets at the end, (length, open brackets) at each
+        separator for truncation recovery, True if the root value closed /
+        False if truncated / None if truncated inside a string)
+    """
+    starts = [i for i in (text.find('{'), text.find('[')) if i >= 0]
+    if not starts:
+        raise JSONRepairError("No JSON object or array found")
+    out: List[str] = []
+    stack: List[str] = []
+    cut_points: List[Tuple[int, List[str]]] = []
+    quote = None
+    escape = False
+    i = min(starts)
+    while i < len(text):
+        char = text[i]
+        if quote:
+            if escape:
+                escape = False
+                out.append(char)
+            elif char == '\\':
+                escape = True
+                out.append(char)
+            elif char == quote:
+                quote = None
+                out.append('"')
+            elif char == '"':
+                # Double quote inside a single-quoted string
+                out.append('\\"')
+            elif char == '\n':
+                out.append('\\n')
+            else:
+                out.append(char)
+        elif char in '"\'':
+            quote = char
+            out.append('"')
+        elif char in '{[':
+            stack.append(char)
+            out.append(char)
+        elif char in '}]':
+            if not stack:
+                break
+            # Drop a trailing comma before the closer
+            while out and out[-1].isspace():
+                out.pop()
+            if out and out[-1] == ',':
+                out.pop()
+            stack.pop()
+            out.append(_closers['{' if char == '}' else '['])
+            if not stack:
+                return ''.join(out), stack, cut_points, True
+        elif char == ',':
+            cut_points.append((len(out), list(stack)))
+            out.append(char)
+        elif char.isalpha():
+            end = i
+            while end < len(text) and (text[end].isalnum() or text[end] == '_'):
+                end += 1
+            word = text[i:end]
+            out.append(_literals.get(word, word))
+            i = end
+            continue
+        else:
+            out.append(char)
+        i += 1
+    return ''.join(out), stack, cut_points, None if quote else False
+
+
+def _close(text: str, stack: List[str]) -> str:
+    text = text.rstrip()
+    if text.endswith(','):
+        text = text[:-1]
+    return text + ''.join(_closers[bracket] for bracket in reversed(stack))
+
+
+def repair_json(text: str) -> Any:
+    """
+    Parse possibly malformed or truncated JSON from an LLM.
+
+    Args:
+        text (str): Model output
+
+    Returns:
+        Any: The recovered value (a truncated value keeps every complete member)
+
+    Raises:
+        JSONRepairError: If nothing parseable is found
+    """
+    text = _strip_fences(text or '')
+    normalized, stack, cut_points, closed = _normalize(text)
+    if closed:
+        try:
+            return json.loads(normalized)
+        except json.JSONDecodeError as e:
+            raise JSONRepairError(str(e))
+    # Truncated: close what is open, else back off to the last complete member.
+    # A string cut off mid-way is dropped rather than kept as a partial value.
+    candidates = [] if closed is None else [_close(normalized, stack)]
+    candidates.extend(_close(normalized[:length], open_stack) for length, open_stack in reversed(cut_points))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except json.JSONDecodeError:
+            continue
+    raise JSONRepairError("Could not recover truncated JSON")
+
+
+def parse_llm_json(text: str) -> Tuple[Any, bool]:
+    """
+    Parse LLM output, strictly first and then with repairs.
+
+    Returns:
+        Tuple[Any, bool]: The value and whether it needed repair
+
+    Raises:
+        JSONRepairError: If nothing parseable is found
+    """
+    try:
+        return json.loads(text), False
+    except (json.JSONDecodeError, TypeError):
+        return repair_json(text), True
+
+
+class IncrementalJSONParser:
+    """
+    Emits top-level members of a streamed JSON object or array as they complete.
+
+    Example:
+        parser = IncrementalJSONParser()
+        for chunk in stream:
+            for key, value in parser.feed(chunk):
+                ...   # key is the field name (objects) or the element index (arrays)
+        result = parser.result()
+
+    Args:
+        on_element (Callable[[str, Any], None]): Called with (field name, element)
+            for each element of an array field of the root object as it completes
+    """
+
+    def __init__(self, on_element: Optional[Callable[[str, Any], None]] = None):
+        self.on_element = on_element
+        self.buffer = ''
+        self._scanned = 0
+        self._root: Optional[str] = None
+        self._depth = 0
+        self._quote: Optional[str] = None
+        self._escape = False
+        self._member_start = 0
+        self._index = 0
+        self._array_field: Optional[str] = None
+        self._element_start = 0
+        self.closed = False
+        self.members: List[Tuple[Any, Any]] = []
+
+    def feed(self, chunk: str) -> List[Tuple[Any, Any]]:
+        """
+        Add streamed text.
+
+        Returns:
+            List[Tuple[Any, Any]]: (field name or element index, value) for members completed by this chunk
+        """
+        self.buffer += chunk
+        completed = []
+        for key, value in self._scan():
+            self.members.append((key, value))
+            completed.append((key, value))
+        return completed
+
+    def _scan(self) -> Iterator[Tuple[Any, Any]]:
+        buffer = self.buffer
+        while self._scanned < len(buffer) and not self.closed:
+            position = self._scanned
+            char = buffer[position]
+            self._scanned += 1
+            if self._root is None:
+                if char in '{[':
+                    self._root = char
+                    self._depth = 1
+                    self._member_start = self._scanned
+                continue
+            if self._quote:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == self._quote:
+                    self._quote = None
+            elif char in '"\'':
+                self._quote = char
+            elif char in '{[':
+                self._depth += 1
+                if self._depth == 2:
+                    self._enter_field(char, buffer[self._member_start:position])
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 1:
+                    self._element(buffer[self._element_start:position])
+                    self._array_field = None
+                elif self._depth == 0:
+                    self.closed = True
+                    member = self._member(buffer[self._member_start:position])
+                    if member is not None:
+                        yield member
+            elif char == ',' and self._depth == 1:
+                member = self._member(buffer[self._member_start:position])
+                self._member_start = self._scanned
+                if member is not None:
+                    yield member
+            elif char == ',' and self._depth == 2:
+                self._element(buffer[self._element_start:position])
+                self._element_start = self._scanned
+
+    def _enter_field(self, bracket: str, prefix: str) -> None:
+        # An array value of a root object field: track its elements
+        self._array_field = None
+        if self.on_element is None or self._root != '{' or bracket != '[':
+            return
+        match = _key_pattern.match(prefix)
+        if match:
+            self._array_field = match.group(1)
+            self._element_start = self._scanned
+
+    def _element(self, text: str) -> None:
+        if self._array_field is None or not text.strip():
+            return
+        try:
+            parsed = repair_json('[' + text + ']')
+        except JSONRepairError:
+            return
+        if isinstance(parsed, list) and len(parsed) == 1:
+            self.on_element(self._array_field, parsed[0])
+
+    def _member(self, text: str) -> Optional[Tuple[Any, Any]]:
+        if not text.strip():
+            return None
+        try:
+            if self._root == '{':
+                parsed = repair_json('{' + text + '}')
+                if isinstance(parsed, dict) and len(parsed) == 1:
+                    return next(iter(parsed.items()))
+                return None
+            parsed = repair_json('[' + text + ']')
+        except JSONRepairError:
+            return None
+        if isinstance(parsed, list) and len(parsed) == 1:
+            index = self._index
+            self._index += 1
+            return index, parsed[0]
+        return None
+
+    def result(self) -> Any:
+        """
+        The whole value parsed so far (repairing truncation).
+
+        Raises:
+            JSONRepairError: If nothing parseable was received
+        """
+        return repair_json(self.buffer)
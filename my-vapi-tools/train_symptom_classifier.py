@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Train the local Layer 1 symptom classifier from logged GPT extractions.
+
+Reads JSONL files of pipeline results (for example bulk_process.py output,
+where each line has "conversation" and the Layer 1 "symptoms" dict), holds
+out a fraction for evaluation, trains symptom_classifier.SymptomClassifier
+and prints an evaluation report comparing its output with GPT's.
+
+Usage:
+    python train_symptom_classifier.py results.jsonl --model symptom_classifier.npz
+    python train_symptom_classifier.py results.jsonl --model symptom_classifier.npz --evaluate-only
+
+Serve the model by setting SYMPTOM_CLASSIFIER_PATH (and optionally
+SYMPTOM_CLASSIFIER_THRESHOLD) for the pipeline.
+"""
+
+import argparse
+import json
+import random
+import sys
+from typing import List, Optional, Tuple
+
+from symptom_classifier import SymptomClassifier, evaluate, train, training_example
+
+
+def load_examples(paths: List[str]) -> Tuple[List[Tuple[str, List[str], str]], int]:
+    """
+    Read usable training examples from JSONL files.
+
+    Returns:
+        Tuple[List, int]: Examples and the number of skipped lines
+    """
+    examples = []
+    skipped = 0
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                try:
+                    example = training_example(json.loads(line))
+                except (json.JSONDecodeError, AttributeError):
+                    example = None
+                if example is None:
+                    skipped += 1
+                else:
+                    examples.append(example)
+    return examples, skipped
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Train the local Layer 1 symptom classifier")
+    parser.add_argument('inputs', nargs='+', help="JSONL files of pipeline results")
+    parser.add_argument('--model', default='symptom_classifier.npz', help="Model path (default: symptom_classifier.npz)")
+    parser.add_argument('--holdout', type=float, default=0.2, help="Fraction held out for evaluation (default: 0.2)")
+    parser.add_argument('--threshold', type=float, default=0.9, help="Fast-path confidence threshold to report on (default: 0.9)")
+    parser.add_argument('--epochs', type=int, default=60, help="Training epochs (default: 60)")
+    parser.add_argument('--min-label-count', type=int, default=3, help="Minimum examples per symptom (default: 3)")
+    parser.add_argument('--report', help="Also write the evaluation report as JSON to this path")
+    parser.add_argument('--evaluate-only', action='store_true', help="Evaluate an existing model on all inputs")
+    parser.add_argument('--seed', type=int, default=0, help="Shuffle seed (default: 0)")
+    args = parser.parse_args(argv)
+
+    examples, skipped = load_examples(args.inputs)
+    print(f"📚 {len(examples)} GPT-labelled examples ({skipped} lines skipped)")
+    if not examples:
+        print("❌ No usable examples", file=sys.stderr)
+        return 1
+
+    if args.evaluate_only:
+        model = SymptomClassifier.load(args.model)
+        held_out = examples
+    else:
+        random.Random(args.seed).shuffle(examples)
+        held_count = int(len(examples) * args.holdout)
+        held_out, training = examples[:held_count], examples[held_count:]
+        model = train(training, min_label_count=args.min_label_count, epochs=args.epochs, seed=args.seed)
+        model.save(args.model)
+        print(f"💾 Saved {args.model}: {len(model.vocabulary)} terms, {len(model.symptom_labels)} symptoms, "
+              f"trained on {len(training)} examples")
+
+    if not held_out:
+        print("⚠️  No held-out examples to evaluate (use --holdout > 0)")
+        return 0
+    report = evaluate(model, held_out, args.threshold)
+
+    print("\n📊 Classifier vs GPT")
+    print("=" * 40)
+    print(f"Examples: {report['examples']}")
+    print(f"Symptoms: precision {report['symptom_precision']}  recall {report['symptom_recall']}  F1 {report['symptom_f1']}")
+    print(f"Exact symptom set match: {report['exact_symptom_match']}")
+    print(f"Severity accuracy: {report['severity_accuracy']}")
+    print(f"At confidence >= {report['threshold']}: skips GPT for {report['fast_path_coverage']:.1%} of requests, "
+          f"exact match {report['fast_path_exact_symptom_match']}")
+    print(f"Predict latency ms: p50 {report['predict_ms_p50']}  p99 {report['predict_ms_p99']}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())